@@ -22,6 +22,7 @@ import force
 import funcselector
 import initsim
 import mccycle
+import rng
 from orderparam import stringify
 import writeoutput
 
@@ -53,6 +54,10 @@ class MProgram(object):
         self.orderp = funcman.OrderParamFunc()
         self.writexyz = funcman.WriteXyzFunc()
 
+        # random number stream for the MC code (only used if
+        # params['rngseed'] is set)
+        rng.setstreams(self.params, rng.DIRECTSTREAM, 0)
+
         # initialize positions (and velocities and forces if we are
         # doing MD rather than MC).
         if self.params['mctype'] == 'md':
@@ -186,7 +191,7 @@ class MProgram(object):
         sys.stderr.write("runtime in s: {:.3f}\n".format(endtime - starttime))
 
         # if we were npt, print new box volume
-        if self.params['mctype'] == 'npt':
+        if self.params['mctype'] in ['npt', 'nptpar']:
             sys.stderr.write('new box volume: {0}\n'\
                              .format(self.params['lboxx']*\
                                      self.params['lboxy']*\
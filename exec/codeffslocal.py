@@ -0,0 +1,103 @@
+#! /usr/bin/env python
+# codeffslocal.py
+# James Mithen
+# j.mithen@surrey.ac.uk
+#
+# FFS implementation on a single machine using a pool of worker
+# processes.  This script runs the same algorithm (DFFS, see Allen,
+# Valerani, ten Wolde J. Phys. Condens. matter 21, 463102) as
+# codeffs.py, but rather than submitting every shot as a separate
+# array task to the grid engine, the shots are handed to a pool of
+# worker processes that are kept alive for the entire simulation.
+# Each worker reads params.pkl and imports the modules only once, so
+# that there is no interpreter startup or scheduler latency per shot;
+# this matters for the (short) shots close to lambda0.
+#
+# The number of worker processes is given by the parameter 'nprocs'
+# in the input file (if this is 0, one worker per CPU is used).
+#
+# The batching of shots is exactly as for codeffs.py: 'nshots' shots
+# are always taken at each interface, and further batches of 'nshots'
+# shots are taken (up to 'nbatch' batches in total) only while there
+# are fewer than 'minsuccess' successful shots.  If the parameter
+# 'earlystop' is set, the workers share a count of the successful
+# shots at the current interface, and shots of the extra batches that
+# are still running once there are 'minsuccess' successes are aborted
+# (the abort is recorded in the shot file, and aborted shots are left
+# out of the interface statistics and counted in interfacei.out).
+# Shots of the first batch are never aborted.
+#
+# The output files are the same as those written by codeffs.py
+# (shotsi_j.out, posi_j.xyz, interfacei.out, interfacei.pkl), so that
+# ffsdiagnosis.py can be run in the same way once this script has
+# finished.
+
+import sys
+import os
+import multiprocessing
+import initsim
+from ffsfunctions import *
+import writeoutput
+
+# full path is the complete path to codeffslocal.py
+fullpath = os.path.abspath(os.path.dirname(sys.argv[0]))
+# epath is path to executable lambda0.py
+epath = os.path.normpath(os.path.join(fullpath, '..', 'scripts'))
+print 'path to script lambda0.py is', epath
+
+# get params and write to pickle file 'params.pkl' for future reading
+params = initsim.getparams()
+writeoutput.writepickparams(params)
+
+# write params to 'pickle.out' -> human readable version of params.pkl
+writeoutput.writeparams(params)
+
+numint = params['numint']
+nshots = params['nshots']
+nbatch = params['nbatch']
+minsuccess = params['minsuccess']
+ffsre = params['ffsrestart']
+nprocs = params['nprocs']
+if nprocs <= 0:
+    nprocs = multiprocessing.cpu_count()
+# syntactic sugar - if ffsre = FFSNEW, we are starting new simulation
+FFSNEW = -1
+
+# if ffsrestart in params file is set to -1, we start a 'new' FFS
+# simulation, going from phase A to lambda0.  This is a single run,
+# so there is nothing to be gained from the worker pool here.
+if ffsre == FFSNEW:
+    substring = '%s/lambda0.py' %epath
+    print "running command: %s" %substring
+    if os.system(substring) != 0:
+        sys.exit('Error: lambda0.py did not complete')
+    intstart = 0
+else:
+    intstart = ffsre
+
+# number of successful shots at the current interface, shared between
+# the worker processes
+successcount = multiprocessing.Value('i', 0)
+pool = multiprocessing.Pool(nprocs, initshotworker, (successcount,))
+print 'started pool of {0} worker processes'.format(nprocs)
+
+for nint in range(intstart, numint):
+    nsuccess = 0
+    successcount.value = 0
+    for bat in range(nbatch):
+        # extra batches are only taken if we have fewer than
+        # minsuccess successful shots
+        if bat > 0 and nsuccess >= minsuccess:
+            break
+        shotargs = [(nint, snum) for snum in
+                    range(bat*nshots + 1, (bat + 1)*nshots + 1)]
+        results = pool.map(poolshot, shotargs, chunksize=1)
+        nsuccess = nsuccess + sum(results)
+        print 'interface {0} batch {1}: {2} successful shots so far'\
+              .format(nint + 1, bat, nsuccess)
+
+    # clean up interface, as done by finish.py for codeffs.py
+    finishinterface(nint)
+
+pool.close()
+pool.join()
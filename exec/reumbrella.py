@@ -0,0 +1,342 @@
+#! /usr/bin/env python
+# reumbrella.py
+# James Mithen
+# j.mithen@surrey.ac.uk
+#
+# Umbrella sampling with replica exchange (Hamiltonian replica
+# exchange between neighbouring windows), with all of the windows run
+# in a single job on one machine.  The window centres are those
+# written by wumbrella.py (from 'firstwindow', 'windowsep' and
+# 'numwindows' in the input file), but rather than submitting one
+# umbrella.py job per window, the windows are handed to a pool of
+# worker processes that are kept alive for the entire simulation (as
+# for codeffslocal.py, the number of workers is given by the
+# parameter 'nprocs', and 0 means one worker per CPU).
+#
+# Each window does 'umbexchangecycles' biased blocks of 'nunbiased'
+# MC cycles exactly as in umbrella.py, and then exchanges of
+# configurations between neighbouring windows are attempted.  Swapping
+# the configurations of windows i and j is accepted with probability
+# min(1, exp(-(w_i(x_j) + w_j(x_i) - w_i(x_i) - w_j(x_j)))), where
+# w_i(x) is the bias of window i (umbrella.wfunc) for the order
+# parameter of configuration x; the unbiased energy does not change,
+# so this leaves the biased distribution of every window unchanged.
+# Even and odd pairs of neighbouring windows are tried alternately
+# (for two order parameters, neighbours along the first and along the
+# second order parameter are also tried alternately).
+#
+# The order parameter of every window is written after each biased
+# block to opvalequil{centre}.out and opval{centre}.out, and the
+# configuration to {centre}pos{cycles}.xyz after each block that
+# brings the number of cycles to a multiple of 'nsave', as by
+# umbrella.py, so usdiagnosis.py can be run in the same way once this
+# script has finished.  The file exchange.out has a line for each
+# round of exchanges, giving the number of cycles done and, for each
+# window, the index of the window that the configuration started in.
+#
+# To continue a run, restart from the last configurations of the
+# windows (simulation 'restart', initialpositions{centre}.xyz) with
+# 'umbcyclesdone' set to the number of cycles already done; the cycle
+# counts and the random number streams then carry on from there
+# instead of repeating those of the first run, and the opval and
+# exchange.out files of the first run are appended to.
+
+import sys
+import time
+import multiprocessing
+import numpy as np
+import funcselector
+import initsim
+import writeoutput
+import rng
+from orderparam import stringify
+from ffsfunctions import getpickparams
+from umbrella import wfunc
+from copy import deepcopy
+import os
+
+# parameters and MC functions of a worker process of the window pool
+_WORKERPARAMS = None
+_WORKERFUNCS = None
+
+def initwindowworker():
+    """Initialise a worker process of the window pool."""
+
+    global _WORKERPARAMS, _WORKERFUNCS
+    _WORKERPARAMS = getpickparams()
+    funcman = funcselector.FuncSelector(_WORKERPARAMS)
+    _WORKERFUNCS = (funcman.TotalEnergyFunc(), funcman.MCCycleFunc(),
+                    funcman.OrderParamFunc(), funcman.WriteXyzFunc())
+    # worker processes are forked from the same parent, and would
+    # otherwise all share the same numpy random state.
+    np.random.seed()
+
+def poolwindow(args):
+    """
+    Do a round of biased blocks for a single window in a worker
+    process of the window pool.  args is the tuple (window, strwc,
+    cyclesdone, nblock, centre, positions, lbox), where strwc is the
+    window centre as used in file names, cyclesdone is the number of
+    cycles done before the round, nblock is the number of biased
+    blocks and lbox is the list of box lengths for the configuration.
+    The configuration is written after every block that brings the
+    number of cycles to a multiple of params['nsave'].  Return the
+    tuple (positions, lbox, ops) of the final configuration and the
+    order parameter after each block.
+    """
+
+    window, strwc, cyclesdone, nblock, centre, positions, lbox = args
+    totalenergy, runcycle, orderp, writexyz = _WORKERFUNCS
+    params = _WORKERPARAMS.copy()
+    params['umb_centre'] = centre
+    params['lboxx'], params['lboxy'], params['lboxz'] = lbox
+    params['cycle'] = params['nunbiased']
+
+    # random number streams for this window and round (if
+    # params['rngseed'] is set).  The stream is one more than the
+    # number of blocks done before the round, so that no two rounds,
+    # including those of a restarted run, share a stream; stream 0 is
+    # used by the exchanges.
+    rand = rng.setstreams(params, cyclesdone // params['nunbiased'] + 1,
+                          window)
+
+    epot = totalenergy(positions, params)
+    op = orderp(positions, params)
+    w = wfunc(op, centre, params['k'])
+    ops = []
+    for cy in range(nblock):
+
+        # store values that may be reverted if bias-chain is rejected
+        temppositions = deepcopy(positions)
+        templbox = params['lboxx'], params['lboxy'], params['lboxz']
+        tempepot = epot
+
+        positions, epot = runcycle(positions, params, epot)
+
+        # w test and revert to temp values if rejected
+        newop = orderp(positions, params)
+        neww = wfunc(newop, centre, params['k'])
+        if rand() > min(1.0, np.exp(-1.0 * (neww - w))):
+            positions = temppositions
+            params['lboxx'], params['lboxy'], params['lboxz'] = templbox
+            epot = tempepot
+        else:
+            op, w = newop, neww
+        ops.append(op)
+
+        # write out pos file if required
+        cyclesdone += params['cycle']
+        if (cyclesdone % params['nsave'] == 0):
+            writexyz('{0}pos{1}.xyz'.format(strwc, cyclesdone), positions,
+                     params)
+
+    # output from the different workers is interleaved
+    sys.stdout.flush()
+    return positions, [params['lboxx'], params['lboxy'], params['lboxz']], ops
+
+class REProgram(object):
+    """Umbrella sampling with replica exchange between the windows."""
+
+    def __init__(self):
+        """
+        Read parameters, start the worker pool and get initial
+        positions for each window.
+        """
+
+        # get params and write to pickle file 'params.pkl' for the
+        # workers, and to 'params.out' (human readable version)
+        self.params = initsim.getparams()
+        writeoutput.writepickparams(self.params)
+        writeoutput.writeparams(self.params)
+
+        if len(self.params['numwindows']) == 1:
+            self.windowcentres = [[self.params['firstwindow'][0] + n*self.params['windowsep'][0]] \
+                                  for n in range(self.params['numwindows'][0])]
+        elif len(self.params['numwindows']) == 2:
+            self.windowcentres = [[self.params['firstwindow'][0] + n*self.params['windowsep'][0], \
+                                   self.params['firstwindow'][1] + m*self.params['windowsep'][1]] \
+                                  for m in range(self.params['numwindows'][1]) \
+                                  for n in range(self.params['numwindows'][0])]
+        else:
+            print " > 2 order parameters not supported"
+            sys.exit(0)
+        self.strwcs = ['_'.join([str(c) for c in wcentre])
+                       for wcentre in self.windowcentres]
+        self.exchangesets = self.neighbourpairs()
+
+        # start the workers before the FuncSelector below is created,
+        # so that each worker keeps its own simulation state (and
+        # random number generator) for the Fortran code
+        nprocs = self.params['nprocs']
+        if nprocs <= 0:
+            nprocs = multiprocessing.cpu_count()
+        self.pool = multiprocessing.Pool(nprocs, initwindowworker)
+        print 'started pool of {0} worker processes'.format(nprocs)
+
+        funcman = funcselector.FuncSelector(self.params)
+        self.orderp = funcman.OrderParamFunc()
+        self.writexyz = funcman.WriteXyzFunc()
+
+        # random numbers for accepting or rejecting the exchanges,
+        # from stream 0 with the number of blocks done before a
+        # restart as the shot number
+        self.rand = rng.setstreams(self.params, 0,
+                                   self.params['umbcyclesdone'] //
+                                   self.params['nunbiased'])
+
+        # initial configuration of each window.  For a restart, this
+        # is initialpositions{centre}.xyz as written by wumbrella.py,
+        # if it exists.
+        self.positions = []
+        self.lbox = []
+        self.ops = []
+        for wcentre, strwc in zip(self.windowcentres, self.strwcs):
+            wparams = deepcopy(self.params)
+            wparams['umb_centre'] = wcentre
+            if wparams['seed']:
+                wparams['nparseed'] = initsim.deduce_seed_size(wparams)
+            initfile = 'initialpositions{0}.xyz'.format(strwc)
+            if wparams['simulation'] == 'restart' and os.path.exists(initfile):
+                wparams['restartfile'] = initfile
+            positions = initsim.initpositions(wparams)
+            if wparams['simulation'] == 'new':
+                self.writexyz('initpositions{0}.xyz'.format(strwc),
+                              positions, wparams)
+            self.positions.append(positions)
+            self.lbox.append([wparams['lboxx'], wparams['lboxy'],
+                              wparams['lboxz']])
+            self.ops.append(self.orderp(positions, wparams))
+
+    def neighbourpairs(self):
+        """
+        Return the sets of pairs of neighbouring windows that are
+        tried in turn for exchanges.  No window is in more than one
+        pair of a set.
+        """
+
+        numwindows = self.params['numwindows']
+        exchangesets = []
+        stride = 1
+        for nwin in numwindows:
+            for first in [0, 1]:
+                pairs = [(i, i + stride) for i in range(len(self.windowcentres))
+                         if (i // stride) % nwin % 2 == first and
+                         (i // stride) % nwin + 1 < nwin]
+                if pairs:
+                    exchangesets.append(pairs)
+            stride = stride * nwin
+        return exchangesets
+
+    def run(self):
+        """Perform the umbrella sampling."""
+
+        nwindows = len(self.windowcentres)
+        nexchange = self.params['umbexchangecycles']
+        nrounds = -(-self.params['numbrellacycles'] // nexchange)
+        cyclesdone = self.params['umbcyclesdone']
+        equil = [self.params['umbequilcycles'] > cyclesdone] * nwindows
+
+        # files for writing order parameter - opvalequil for
+        # equilibration and opval for sampling cycles.  A continued
+        # run appends to the files of the first run, which already
+        # have the order parameter of the starting configurations.
+        if equil[0]:
+            opname = 'opvalequil{0}.out'
+        else:
+            opname = 'opval{0}.out'
+        if cyclesdone > 0:
+            mode = 'a'
+        else:
+            mode = 'w'
+        opfiles = [open(opname.format(strwc), mode) for strwc in self.strwcs]
+        if cyclesdone == 0:
+            for opfile, op in zip(opfiles, self.ops):
+                opfile.write('{0} {1}\n'.format(0, stringify(op)))
+        exfile = open('exchange.out', mode)
+
+        # window that the configuration in each window started in, and
+        # the number of attempted and accepted exchanges for each pair
+        replicas = range(nwindows)
+        natt = {}
+        nacc = {}
+
+        starttime = time.time()
+
+        for nround in range(nrounds):
+            # the last round is shorter if numbrellacycles is not a
+            # multiple of umbexchangecycles
+            nblock = min(nexchange,
+                         self.params['numbrellacycles'] - nround * nexchange)
+
+            args = [(i, self.strwcs[i], cyclesdone, nblock,
+                     self.windowcentres[i], self.positions[i], self.lbox[i])
+                    for i in range(nwindows)]
+            results = self.pool.map(poolwindow, args, chunksize=1)
+
+            # write out order parameter of each window after each block
+            # (the pos files have been written by the workers)
+            for i, (positions, lbox, ops) in enumerate(results):
+                self.positions[i] = positions
+                self.lbox[i] = lbox
+                self.ops[i] = ops[-1]
+                cycles = cyclesdone
+                for op in ops:
+                    cycles += self.params['nunbiased']
+                    opfiles[i].write('{0} {1}\n'.format(cycles, stringify(op)))
+                    # switch to opval.out when equilibration is complete
+                    if equil[i] and self.params['umbequilcycles'] <= cycles:
+                        opfiles[i].close()
+                        opfiles[i] = open('opval{0}.out'.format(self.strwcs[i]),
+                                          'w')
+                        equil[i] = False
+                opfiles[i].flush()
+            cyclesdone = cycles
+
+            # attempt exchanges between neighbouring windows
+            for i, j in self.exchangesets[nround % len(self.exchangesets)]:
+                ci, cj = self.windowcentres[i], self.windowcentres[j]
+                dw = (wfunc(self.ops[j], ci, self.params['k']) +
+                      wfunc(self.ops[i], cj, self.params['k']) -
+                      wfunc(self.ops[i], ci, self.params['k']) -
+                      wfunc(self.ops[j], cj, self.params['k']))
+                natt[(i, j)] = natt.get((i, j), 0) + 1
+                if self.rand() <= min(1.0, np.exp(-1.0 * dw)):
+                    nacc[(i, j)] = nacc.get((i, j), 0) + 1
+                    for state in [self.positions, self.lbox, self.ops,
+                                  replicas]:
+                        state[i], state[j] = state[j], state[i]
+            exfile.write('{0} {1}\n'.format(cyclesdone,
+                                            ' '.join([str(r) for r in replicas])))
+            exfile.flush()
+
+        endtime = time.time()
+        self.pool.close()
+        self.pool.join()
+        for opfile in opfiles:
+            opfile.close()
+        exfile.close()
+
+        # write final positions of each window to file
+        for i, strwc in enumerate(self.strwcs):
+            self.writexyz('finalpositions{0}.xyz'.format(strwc),
+                          self.positions[i], self.boxparams(i))
+
+        # write out exchange acceptance ratio for each pair of windows
+        for (i, j) in sorted(natt):
+            print 'exchange {0} {1}: acceptance ratio {2} {3} {4:.3f}'\
+                  .format(self.strwcs[i], self.strwcs[j], nacc.get((i, j), 0),
+                          natt[(i, j)], float(nacc.get((i, j), 0)) / natt[(i, j)])
+
+        # write runtime to stderr
+        sys.stderr.write("runtime in s: {:.3f}\n".format(endtime - starttime))
+
+    def boxparams(self, window):
+        """Return params with the box lengths of a window."""
+
+        params = self.params.copy()
+        params['lboxx'], params['lboxy'], params['lboxz'] = self.lbox[window]
+        return params
+
+if __name__ == '__main__':
+    reprog = REProgram()
+    reprog.run()
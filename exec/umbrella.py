@@ -21,11 +21,11 @@ import writeoutput
 import energy
 import force
 import mccycle
+import rng
 from orderparam import stringify
 import time
 import sys
 from copy import deepcopy
-import random
 import os
 import pickle
 
@@ -71,6 +71,12 @@ class MProgram(object):
         self.orderp = funcman.OrderParamFunc()
         self.writexyz = funcman.WriteXyzFunc()
 
+        # random number streams for the MC code and for accepting or
+        # rejecting each biased block.  If params['rngseed'] is set,
+        # each window (params['umb_window'], set by wumbrella.py) gets
+        # its own stream.
+        self.rand = rng.setwindowstreams(self.params)
+
         # initialize positions
         self.positions = initsim.initpositions(self.params)
 
@@ -131,8 +137,7 @@ class MProgram(object):
             self.umb_op = self.orderp(self.positions, self.params)
             self.w = self.wfunc()
             biasprob = min(1.0, np.exp(-1.0 * (self.w - tempw)))
-            random.seed()
-            temprand = random.random()
+            temprand = self.rand()
             
             if temprand > biasprob:
                 self.positions = deepcopy(temppositions)
@@ -168,18 +173,26 @@ class MProgram(object):
         sys.stderr.write("runtime in s: {:.3f}\n".format(endtime - starttime))
 
         # if we were npt, print new box volume
-        if self.params['mctype'] == 'npt':
+        if self.params['mctype'] in ['npt', 'nptpar']:
             sys.stderr.write('new box volume: {0}\n'\
                              .format(self.params['lboxx']*\
                                      self.params['lboxy']*\
                                      self.params['lboxz']))
 
     def wfunc(self):
-        quads = 0
-        for i, val in enumerate(self.umb_centre):
-            quads += self.params['k'][i] * (self.umb_op[i] - val)**2
-        w = 0.5 * quads
-        return w
+        return wfunc(self.umb_op, self.umb_centre, self.params['k'])
+
+def wfunc(op, centre, k):
+    """
+    Return the umbrella bias (in units of kT) for order parameter op
+    in the window with centre centre and spring constants k.
+    """
+
+    quads = 0
+    for i, val in enumerate(centre):
+        quads += k[i] * (op[i] - val)**2
+    w = 0.5 * quads
+    return w
 
 if __name__ == '__main__':
     mcprog = MProgram()
@@ -52,7 +52,7 @@ class Windowmaker(object):
     def prep_windows(self):
         """Produces initial positions and parameter files"""
         bashscript = open('wumbash.sh','w')
-        for wcentre in self.windowcentres:
+        for iwindow, wcentre in enumerate(self.windowcentres):
             
             strwc = ''
             for c in wcentre:
@@ -61,6 +61,7 @@ class Windowmaker(object):
         
             self.params['restartfile'] = 'initialpositions{0}.xyz'.format(strwc)
             self.params['umb_centre'] = wcentre
+            self.params['umb_window'] = iwindow
             self.params['nparseed'] = initsim.deduce_seed_size(self.params)
             pickle.dump(self.params, open('params{0}.pkl'.format(strwc),'w'))
 
@@ -22,6 +22,11 @@ public:
    inline double sepsq(const Particle& p1, const Particle& p2) const;
    inline bool isneigh(const Particle& p1, const Particle& p2, double& r2) const;
    inline bool isneigh(double* s, double&r2) const;
+   double getlboxx() const { return lboxx; }
+   double getlboxy() const { return lboxy; }
+   double getlboxz() const { return lboxz; }
+   double getnsep() const { return nsep; }
+   bool getperiodicz() const { return periodicz; }
 
 private:
    double lboxx;
@@ -0,0 +1,157 @@
+// celllist.cpp
+// James Mithen
+// j.mithen@surrey.ac.uk
+
+// Cell list for neighbour searches, see celllist.h.
+
+#include <vector>
+#include <cmath>
+#include "float.h"
+#include "celllist.h"
+#include "particle.h"
+#include "box.h"
+
+using std::vector;
+
+// Build cell list for particles in simbox, with cells of side at
+// least rcell.
+
+CellList::CellList(const ParticleArray& particles, const Box& simbox,
+                   const double rcell)
+{
+   const double lbox[3] = {simbox.getlboxx(), simbox.getlboxy(),
+                           simbox.getlboxz()};
+   periodic[0] = true;
+   periodic[1] = true;
+   periodic[2] = simbox.getperiodicz();
+
+   // in a very large (sparse) box, use bigger cells so that there
+   // are not many more cells than particles
+   const double maxcells = 2.0 * particles.size() + 27.0;
+   double rc = rcell;
+   while ((lbox[0] / rc) * (lbox[1] / rc) * (lbox[2] / rc) > maxcells) {
+      rc = 2.0 * rc;
+   }
+
+   for (int k = 0; k != 3; ++k) {
+      ncel[k] = static_cast<int>(lbox[k] / rc);
+      if (ncel[k] < 1) {
+         ncel[k] = 1;
+      }
+      rcel[k] = lbox[k] / ncel[k];
+   }
+
+   // sort the particles by cell (counting sort), so that the
+   // particles in cell c are cellpars[cellstart[c]] to
+   // cellpars[cellstart[c + 1] - 1]
+   const ParticleArray::size_type npar = particles.size();
+   vector<int> cellof(npar);
+   int c[3];
+   cellstart.assign(ncel[0] * ncel[1] * ncel[2] + 1, 0);
+   for (ParticleArray::size_type i = 0; i != npar; ++i) {
+      cellindex(particles[i], c);
+      cellof[i] = (c[0] * ncel[1] + c[1]) * ncel[2] + c[2];
+      ++cellstart[cellof[i] + 1];
+   }
+   for (vector<int>::size_type k = 1; k != cellstart.size(); ++k) {
+      cellstart[k] += cellstart[k - 1];
+   }
+   vector<int> next(cellstart.begin(), cellstart.end() - 1);
+   cellpars.resize(npar);
+   for (ParticleArray::size_type i = 0; i != npar; ++i) {
+      cellpars[next[cellof[i]]++] = i;
+   }
+}
+
+// Cell (x,y,z index) containing the particle p.
+
+void CellList::cellindex(const Particle& p, int* c) const
+{
+   for (int k = 0; k != 3; ++k) {
+      c[k] = static_cast<int>(floor(p.pos[k] / rcel[k]));
+      if (periodic[k]) {
+         c[k] = c[k] % ncel[k];
+         if (c[k] < 0) {
+            c[k] += ncel[k];
+         }
+      }
+      else if (c[k] < 0) {
+         c[k] = 0;
+      }
+      else if (c[k] >= ncel[k]) {
+         c[k] = ncel[k] - 1;
+      }
+   }
+}
+
+// Cells along axis k that are within 'shell' cells of cell c, each
+// cell appearing only once.
+
+void CellList::axiscells(const int k, const int c, const int shell,
+                         vector<int>& cells) const
+{
+   cells.clear();
+   if (periodic[k]) {
+      if (2 * shell + 1 >= ncel[k]) {
+         // every cell along this axis
+         for (int d = 0; d != ncel[k]; ++d) {
+            cells.push_back(d);
+         }
+      }
+      else {
+         for (int d = -shell; d <= shell; ++d) {
+            cells.push_back((c + d + ncel[k]) % ncel[k]);
+         }
+      }
+   }
+   else {
+      for (int d = c - shell; d <= c + shell; ++d) {
+         if (d >= 0 && d < ncel[k]) {
+            cells.push_back(d);
+         }
+      }
+   }
+}
+
+// Fill pnums with the indices of all particles in the cells within
+// 'shell' cells of the cell containing p (including p itself, if p is
+// one of the particles in the list).
+
+void CellList::candidates(const Particle& p, const int shell,
+                          vector<int>& pnums) const
+{
+   int c[3];
+   vector<int> cx, cy, cz;
+   cellindex(p, c);
+   axiscells(0, c[0], shell, cx);
+   axiscells(1, c[1], shell, cy);
+   axiscells(2, c[2], shell, cz);
+
+   pnums.clear();
+   for (vector<int>::size_type i = 0; i != cx.size(); ++i) {
+      for (vector<int>::size_type j = 0; j != cy.size(); ++j) {
+         for (vector<int>::size_type k = 0; k != cz.size(); ++k) {
+            int cnum = (cx[i] * ncel[1] + cy[j]) * ncel[2] + cz[k];
+            pnums.insert(pnums.end(), cellpars.begin() + cellstart[cnum],
+                         cellpars.begin() + cellstart[cnum + 1]);
+         }
+      }
+   }
+}
+
+// Distance within which all particles are guaranteed to be returned
+// by candidates for the given shell.  If every cell is searched, this
+// is DBL_MAX.
+
+double CellList::coverage(const int shell) const
+{
+   double cov = DBL_MAX;
+   for (int k = 0; k != 3; ++k) {
+      bool allcells = periodic[k] ? (2 * shell + 1 >= ncel[k]) :
+                                    (shell >= ncel[k] - 1);
+      if (!allcells && shell * rcel[k] < cov) {
+         cov = shell * rcel[k];
+      }
+   }
+   return cov;
+}
@@ -0,0 +1,45 @@
+// celllist.h
+// James Mithen
+// j.mithen@surrey.ac.uk
+
+// A cell list for finding the particles close to a given position
+// without looping over every particle.  The box is divided into
+// cuboid cells with sides of at least rcell, and the particles are
+// sorted by cell.  The periodicity of the Box is respected: x and y
+// are always periodic, z only if the Box is periodic in z (if not,
+// particles outside of the box in z are put in the top or bottom
+// layer of cells).
+
+#ifndef CELLLIST_H
+#define CELLLIST_H
+
+#include <vector>
+#include "particle.h"
+#include "box.h"
+
+class CellList
+{
+public:
+   CellList(const ParticleArray&, const Box&, const double);
+
+   // indices of all particles in the cells within 'shell' cells of
+   // the cell containing a particle
+   void candidates(const Particle&, const int, std::vector<int>&) const;
+
+   // all particles within this distance of a particle are returned
+   // by candidates with the same 'shell'
+   double coverage(const int) const;
+
+private:
+   void cellindex(const Particle&, int*) const;
+   void axiscells(const int, const int, const int,
+                  std::vector<int>&) const;
+
+   int ncel[3];
+   double rcel[3];
+   bool periodic[3];
+   std::vector<int> cellstart;
+   std::vector<int> cellpars;
+};
+
+#endif
@@ -2,74 +2,139 @@
 // James Mithen
 // j.mithen@surrey.ac.uk
 //
-// Functions for compiling a Graph of crystalline particles, and for
-// computing the largest cluster, which is the largest connected
-// component of the (undirected) Graph.  This uses Boost, in
-// particular the Boost Graph Library, see www.boost.org.
+// Functions for computing the largest cluster of crystalline
+// particles, which is the largest connected component of the
+// (undirected) graph with the crystalline particles as nodes and an
+// edge between every pair of crystalline neighbours.  The graph is
+// never stored: the edges are found either with a cell list or from
+// neighbour lists that have already been computed, and the connected
+// components are found with a union-find (disjoint set) structure.
 
-#include <boost/config.hpp>
-#include <iostream>
 #include <vector>
-#include <algorithm>
-#include <numeric>
-#include <utility>
-#include <boost/graph/connected_components.hpp>
-#include "typedefs.h"
 #include "particle.h"
 #include "box.h"
+#include "celllist.h"
 
 using std::vector;
-using std::cout;
-using std::endl;
 
-// Create graph with crystal pars as nodes and vertices between
-// neighbours.  Note "graph" type is defined in typedefs.h.
+// Root of the set containing node i.  The tree is flattened on the
+// way up (path halving), so that later calls are faster.
 
-graph getxgraph(const vector<Particle>& particles,
-                const vector<int>& xpars, const Box& simbox)
+static int findroot(vector<int>& parent, int i)
+{
+   while (parent[i] != i) {
+      parent[i] = parent[parent[i]];
+      i = parent[i];
+   }
+   return i;
+}
+
+// Merge the sets containing nodes i and j.  The root with the lower
+// index is kept, so that the root of each set is its lowest node.
+
+static void unite(vector<int>& parent, const int i, const int j)
+{
+   int ri = findroot(parent, i);
+   int rj = findroot(parent, j);
+   if (ri < rj) {
+      parent[rj] = ri;
+   }
+   else if (rj < ri) {
+      parent[ri] = rj;
+   }
+}
+
+// Return vector of ints containing the nodes of the largest set.  If
+// there are several sets of the largest size, the one containing the
+// lowest node is returned.  The nodes are in ascending order.
+
+static vector<int> largestset(vector<int>& parent)
+{
+   const vector<int>::size_type nnode = parent.size();
+   vector<int> root(nnode);
+   vector<int> size(nnode, 0);
+   for (vector<int>::size_type i = 0; i != nnode; ++i) {
+      root[i] = findroot(parent, i);
+      ++size[root[i]];
+   }
+
+   // the root of each set is its lowest node, so the first root with
+   // the largest size is in the set containing the lowest node
+   int maxroot = -1;
+   for (vector<int>::size_type i = 0; i != nnode; ++i) {
+      if (maxroot == -1 || size[i] > size[maxroot]) {
+         maxroot = i;
+      }
+   }
+
+   vector<int> ret;
+   for (vector<int>::size_type i = 0; i != nnode; ++i) {
+      if (root[i] == maxroot) {
+         ret.push_back(i);
+      }
+   }
+
+   return ret;
+}
+
+// Return vector of ints containing the nodes (indices into xpars) of
+// the largest connected component of crystal particles.  Neighbouring
+// crystal particles are found with a cell list.
+
+vector<int> largestcomponent(const ParticleArray& particles,
+                             const vector<int>& xpars, const Box& simbox)
 {
-   graph G;
    vector<int>::size_type nxtal = xpars.size();
-   vector<int>::size_type i,j;
+   vector<Particle> xparticles(nxtal);
+   vector<int> parent(nxtal);
+   for (vector<int>::size_type i = 0; i != nxtal; ++i) {
+      xparticles[i] = particles[xpars[i]];
+      parent[i] = i;
+   }
+
+   CellList clist(xparticles, simbox, simbox.getnsep());
+   vector<int> cands;
    double sep;
-   
-   for (i = 0; i != nxtal; ++i) {
-      // No easy api to add a node, so we add a loop to the graph.
-      // Note this is needed for when nxtal = 1.
-      add_edge(i, i, G);
-      for (j = i + 1; j != nxtal; ++j) {
-         if (simbox.isneigh(particles[xpars[i]], particles[xpars[j]], sep)) {
-            add_edge(i, j, G);
+   for (vector<int>::size_type i = 0; i != nxtal; ++i) {
+      clist.candidates(xparticles[i], 1, cands);
+      for (vector<int>::size_type k = 0; k != cands.size(); ++k) {
+         vector<int>::size_type j = cands[k];
+         if (j > i && simbox.isneigh(xparticles[i], xparticles[j], sep)) {
+            unite(parent, i, j);
          }
       }
    }
 
-   return G;
+   return largestset(parent);
 }
 
-// Return vector of ints containing nodes (particle nums) of largest
-// connected component.
+// Return vector of ints containing the nodes (indices into xpars) of
+// the largest connected component of crystal particles.  lneigh are
+// the (cutoff) neighbour lists of all of the particles, so that
+// particles i and j are joined if both are crystalline and j is in
+// the neighbour list of i.
 
-vector<int> largestcomponent(const graph& G)
+vector<int> largestcomponent(const vector<int>& xpars,
+                             const vector<vector<int> >& lneigh)
 {
-   // compute number of connected components
-   vector<int> component(num_vertices(G));
-   int num = connected_components(G, &component[0]);
-
-   // sort each particle into one of the connected components
-   vector<int> ncomp(num,0);
-   for (vector<int>::size_type i = 0; i != component.size(); ++i) {
-      ++ncomp[component[i]];
+   vector<int>::size_type nxtal = xpars.size();
+
+   // node number of each particle, or -1 if not crystalline
+   vector<int> node(lneigh.size(), -1);
+   vector<int> parent(nxtal);
+   for (vector<int>::size_type i = 0; i != nxtal; ++i) {
+      node[xpars[i]] = i;
+      parent[i] = i;
    }
 
-   int maxcomp = distance(ncomp.begin(),max_element(ncomp.begin(), ncomp.end()));
-          
-   vector<int> ret;
-   for (vector<int>::size_type i = 0; i != component.size(); ++i) {
-      if (component[i] == maxcomp) {
-         ret.push_back(i);
+   for (vector<int>::size_type i = 0; i != nxtal; ++i) {
+      const vector<int>& neighs = lneigh[xpars[i]];
+      for (vector<int>::size_type k = 0; k != neighs.size(); ++k) {
+         if (node[neighs[k]] != -1) {
+            unite(parent, i, node[neighs[k]]);
+         }
       }
    }
 
-   return ret;
+   return largestset(parent);
 }
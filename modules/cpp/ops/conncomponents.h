@@ -5,11 +5,13 @@
 #ifndef CONNCOMPONENTS_H
 #define CONNCOMPONENTS_H
 
-#include "typedefs.h"
+#include <vector>
 #include "particle.h"
 #include "box.h"
 
-graph getxgraph(const std::vector<Particle>&, const std::vector<int>&, const Box&);
-std::vector<int> largestcomponent(const graph&);
+std::vector<int> largestcomponent(const ParticleArray&,
+                                  const std::vector<int>&, const Box&);
+std::vector<int> largestcomponent(const std::vector<int>&,
+                                  const std::vector<std::vector<int> >&);
 
 #endif
@@ -2,100 +2,114 @@
 // James Mithen
 // j.mithen@surrey.ac.uk
 
-// Functions to compute neighbour separations.
+// Functions to compute neighbour separations.  Both use a cell list
+// (see celllist.h), so that the cost is linear in the number of
+// particles.
 
 #include <iostream>
 #include <vector>
+#include <algorithm>
+#include <utility>
+#include <cmath>
 #include "particle.h"
 #include "box.h"
+#include "celllist.h"
 #include "float.h"
 
 using std::vector;
 
 // get neighbour list and num neighbours where neighbours are defined
 // as being the closest 'n' particles to a given particle (usually we
-// will use n = 12).
+// will use n = 12).  The neighbours of each particle are in order of
+// increasing separation.  If there are fewer than n + 1 particles,
+// every other particle is a neighbour.
 
-void neighnearest(const vector<Particle>& allpars, const Box& simbox,
+void neighnearest(const ParticleArray& allpars, const Box& simbox,
                   vector<int>& numneigh, vector<vector<int> >& lneigh,
                   const int n)
 {
-   vector<Particle>::size_type i, j;
-   vector<int>::size_type k, m, indx;
-   double sepsq;
-   vector<vector<int> > bestsep = lneigh;
-
-   const vector<Particle>::size_type npar = allpars.size();
-
-   // fill up numneigh, since by construction here every particle
-   // has 'n' neighbours, this is easy.
-   for (k = 0; k != numneigh.size(); ++k) {
-      numneigh[k] = n;
+   const ParticleArray::size_type npar = allpars.size();
+   if (npar == 0) {
+      return;
    }
 
-   // fill up each neighbour list with token large value and with
-   // neighbour set to 0 (this could be any number)
-   for (k = 0; k != lneigh.size(); ++k) {
-      for (m = 0; m != n; ++m) {
-         lneigh[k].push_back(0);
-         bestsep[k].push_back(DBL_MAX - 1);
-      }
-   }
-
-   // go through each particle in turn, and find the 'n' nearest
-   // neighbours.
-   for (i = 0; i != npar; ++i) {
-      for (j = 0; j != npar; ++j) {
-         if (i != j) {
-            sepsq = simbox.sepsq(allpars[i], allpars[j]);
-
-            // if sep is less than largest current neighbour
-            // separation, then this particle is a neighbour
-            if (sepsq < bestsep[i][n - 1]) {
+   // choose cells so that there are a few particles per cell; the
+   // shell of cells around each particle is then usually enough to
+   // contain its n nearest neighbours.
+   double vol = simbox.getlboxx() * simbox.getlboxy() * simbox.getlboxz();
+   double rcell = pow(4.0 * vol / npar, 1.0 / 3.0);
+   CellList clist(allpars, simbox, rcell);
 
-               // find the correct index
-               indx = n - 1;
-               while (sepsq < bestsep[i][indx] and indx != -1) {
-                  --indx;
-               }
-               // we want to insert the new neighbour at
-               // position indx + 1, and shift everything to
-               // the right of it along one place, knocking
-               // off the end one..
+   vector<int> cands;
+   vector<std::pair<double, int> > seps;
+   ParticleArray::size_type i, k;
+   int shell, nfound;
 
-               lneigh[i].insert(lneigh[i].begin() + indx + 1, j);
-               bestsep[i].insert(bestsep[i].begin() + indx + 1, sepsq);
-
-               // delete last element
-               lneigh[i].pop_back();
-               bestsep[i].pop_back();
+   for (i = 0; i != npar; ++i) {
+      // search successively larger shells of cells until the n
+      // nearest particles found are guaranteed to be the n nearest
+      // particles overall.
+      shell = 1;
+      while (true) {
+         clist.candidates(allpars[i], shell, cands);
+         seps.clear();
+         for (k = 0; k != cands.size(); ++k) {
+            if (cands[k] != i) {
+               seps.push_back(std::make_pair(simbox.sepsq(allpars[i],
+                                                          allpars[cands[k]]),
+                                             cands[k]));
             }
          }
+         nfound = std::min(static_cast<int>(seps.size()), n);
+         // sort by separation, and then by particle index for
+         // particles at the same separation.
+         std::partial_sort(seps.begin(), seps.begin() + nfound,
+                           seps.end());
+         double cov = clist.coverage(shell);
+         if (cov == DBL_MAX ||
+             (nfound == n && seps[n - 1].first <= cov * cov)) {
+            break;
+         }
+         ++shell;
       }
+
+      lneigh[i].resize(nfound);
+      for (int m = 0; m != nfound; ++m) {
+         lneigh[i][m] = seps[m].second;
+      }
+      numneigh[i] = nfound;
    }
 }
 
 // get neighbour list and num neighbours where neighbours are defined
 // as being all particles within some cutoff radius 'rcut' of a given
-// particle.
+// particle.  The neighbours of each particle are in order of
+// increasing particle index.
 
-void neighcut(const vector<Particle>& allpars, const Box& simbox,
+void neighcut(const ParticleArray& allpars, const Box& simbox,
               vector<int>& numneigh, vector<vector<int> >& lneigh)
 {
-   const vector<Particle>::size_type npar = allpars.size();
+   const ParticleArray::size_type npar = allpars.size();
+
+   double r2;
+   ParticleArray::size_type i, k;
+   vector<int> cands;
 
-   double r2, sep[3];
-   vector<Particle>::size_type i,j;
+   // all neighbours of a particle are in the cells adjacent to its
+   // own cell if the cells have side at least nsep.
+   CellList clist(allpars, simbox, simbox.getnsep());
           
    for (i = 0; i != npar; ++i) {
-      for (j = 0; j != npar; ++j) {
-         if (i != j) {
-            if (simbox.isneigh(allpars[i], allpars[j], r2)) {
+      clist.candidates(allpars[i], 1, cands);
+      for (k = 0; k != cands.size(); ++k) {
+         if (cands[k] != i) {
+            if (simbox.isneigh(allpars[i], allpars[cands[k]], r2)) {
                // particles i and j are neighbours
-               lneigh[i].push_back(j);
+               lneigh[i].push_back(cands[k]);
             }
          }
       }
+      std::sort(lneigh[i].begin(), lneigh[i].end());
       // set number of neighbours of particle i
       numneigh[i] = lneigh[i].size();
    }
@@ -9,10 +9,10 @@
 #include "particle.h"
 #include "box.h"
 
-void neighnearest(const std::vector<Particle>&, const Box&,
+void neighnearest(const ParticleArray&, const Box&,
                   std::vector<int>&, std::vector<std::vector<int> >&,
                   const int);
-void neighcut(const std::vector<Particle>&, const Box&,
+void neighcut(const ParticleArray&, const Box&,
               std::vector<int>&, std::vector<std::vector<int> >&);
 
 #endif
@@ -5,23 +5,22 @@
 // Code for generating order parameter extension module using
 // Boost.Python.
 
+// the NumPy C API is imported here (see pyutil.h)
+#define OPEXT_IMPORT_ARRAY
+
 #include <boost/python.hpp>
-#include "boost/python/numeric.hpp"
 #include "pyfunctions.h"
+#include "pyutil.h"
 
 using namespace boost::python;
  
 BOOST_PYTHON_MODULE(op_ext)
 {
-   numeric::array::set_module_and_type("numpy", "ndarray");
-
-   // Registration of converters.  These are defined in pyfunctions.h
-   to_python_converter<TFCLASS, enum_to_python_int<TFCLASS> >();
-   to_python_converter<LDCLASS, enum_to_python_int<LDCLASS> >();
-   to_python_converter<std::vector<TFCLASS>, vector_to_python_list<TFCLASS> >();
-   to_python_converter<std::vector<LDCLASS>, vector_to_python_list<LDCLASS> >();
-   to_python_converter<std::vector<int>, vector_to_python_list<int> >();
-   to_python_converter<std::vector<double>, vector_to_python_list<double> >();
+   // import the NumPy C API, which is used for passing arrays to and
+   // from the functions below
+   if (_import_array() < 0) {
+      throw_error_already_set();
+   }
 
    // The string is the function name called from python
    def("q6global", py_q6global);   
@@ -35,4 +34,18 @@ BOOST_PYTHON_MODULE(op_ext)
    def("largestcluster", py_largestcluster);
    def("q4w4q6w6", py_q4w4q6w6);
    def("numneighcut", py_numneighcut);
+   def("setopthreads", py_setopthreads);
+   def("batchop", py_batchop);
+
+   // Stateful order parameter calculator, see opstate.h.  The
+   // constructor arguments are nsep, zperiodic, usenearest and
+   // (optionally) the tolerance for deciding that a particle has moved.
+   class_<OrderParamState>("OrderParamState",
+                           init<double, bool, bool, optional<double> >())
+      .def("nclusld", py_state_nclusld)
+      .def("ncluspolyld", py_state_ncluspolyld)
+      .def("fracsolidld", py_state_fracsolidld)
+      .def("nclustf", py_state_nclustf)
+      .def("fracsolidtf", py_state_fracsolidtf)
+      .def("q6global", py_state_q6global);
 }
@@ -91,3 +91,105 @@ complex<double> ylm(const int lval, const int mval,
 
    return res;
 }
+
+// d^m P_l(z) / dz^m, the m'th derivative of the Legendre polynomial
+// P_l, for l = 4 and l = 6, and 0 <= m <= l.  These are written out
+// as polynomials in z (Horner form).
+
+static void dlegendre4(const double z, double* d)
+{
+   const double z2 = z * z;
+   d[0] = ((35.0 * z2 - 30.0) * z2 + 3.0) / 8.0;
+   d[1] = (35.0 * z2 - 15.0) * z / 2.0;
+   d[2] = (105.0 * z2 - 15.0) / 2.0;
+   d[3] = 105.0 * z;
+   d[4] = 105.0;
+}
+
+static void dlegendre6(const double z, double* d)
+{
+   const double z2 = z * z;
+   d[0] = (((231.0 * z2 - 315.0) * z2 + 105.0) * z2 - 5.0) / 16.0;
+   d[1] = ((693.0 * z2 - 630.0) * z2 + 105.0) * z / 8.0;
+   d[2] = ((3465.0 * z2 - 1890.0) * z2 + 105.0) / 8.0;
+   d[3] = (3465.0 * z2 - 945.0) * z / 2.0;
+   d[4] = (10395.0 * z2 - 945.0) / 2.0;
+   d[5] = 10395.0 * z;
+   d[6] = 10395.0;
+}
+
+// Sum of the spherical harmonics Y(l,m) over a number of bond vectors
+// (x[b], y[b], z[b]), for -l <= m <= l.  The sum for m is stored in
+// res[m + l].
+//
+// For l = 4 and l = 6 the spherical harmonics are computed from the
+// Cartesian components of the bonds, without any trigonometric
+// functions.  Writing w = (x + iy)/r (so that w^m = sin^m(theta)
+// exp(i m phi)), and u = z/r = cos(theta),
+//
+// Y(l,m) = K(l,m) (-1)^m [d^m P_l(u) / du^m] w^m,  m >= 0
+//
+// where K(l,m) is the usual normalisation.  w^m is computed by
+// recurrence, and the m < 0 values follow from the m > 0 values by
+// Y(l,-m) = (-1)^m conj(Y(l,m)).  For other l we fall back to ylm.
+
+void ylmsum(const int lval, const vector<double>& x,
+            const vector<double>& y, const vector<double>& z,
+            complex<double>* res)
+{
+   const vector<double>::size_type nbond = x.size();
+
+   if (lval != 4 && lval != 6) {
+      for (int k = 0; k != 2 * lval + 1; ++k) {
+         res[k] = 0.0;
+      }
+      for (vector<double>::size_type b = 0; b != nbond; ++b) {
+         double r = sqrt(x[b] * x[b] + y[b] * y[b] + z[b] * z[b]);
+         double phi = (x[b] == 0.0 && y[b] == 0.0) ? 0.0 : atan2(y[b], x[b]);
+         for (int k = 0; k != 2 * lval + 1; ++k) {
+            res[k] += ylm(lval, k - lval, z[b] / r, phi);
+         }
+      }
+      return;
+   }
+
+   // sums of [d^m P_l(u) / du^m] w^m over the bonds, for m >= 0
+   double sumre[7] = {0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0};
+   double sumim[7] = {0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0};
+   double d[7];
+
+   for (vector<double>::size_type b = 0; b != nbond; ++b) {
+      const double rinv = 1.0 / sqrt(x[b] * x[b] + y[b] * y[b] +
+                                     z[b] * z[b]);
+      const double wre = x[b] * rinv;
+      const double wim = y[b] * rinv;
+      if (lval == 4) {
+         dlegendre4(z[b] * rinv, d);
+      }
+      else {
+         dlegendre6(z[b] * rinv, d);
+      }
+
+      // w^m, starting from w^0 = 1
+      double pre = 1.0;
+      double pim = 0.0;
+      sumre[0] += d[0];
+      for (int m = 1; m <= lval; ++m) {
+         const double tmp = pre * wre - pim * wim;
+         pim = pre * wim + pim * wre;
+         pre = tmp;
+         sumre[m] += d[m] * pre;
+         sumim[m] += d[m] * pim;
+      }
+   }
+
+   // multiply by (-1)^m K(l,m), and fill in negative m
+   double sign = 1.0;
+   for (int m = 0; m <= lval; ++m) {
+      double coeff = sign * sqrt((2.0 * lval + 1.0) * fact(lval - m) /
+                                 (4.0 * PI * fact(lval + m)));
+      res[lval + m] = complex<double>(coeff * sumre[m], coeff * sumim[m]);
+      res[lval - m] = sign * conj(res[lval + m]);
+      sign = -sign;
+   }
+}
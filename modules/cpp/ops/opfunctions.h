@@ -6,8 +6,11 @@
 #define OPFUNCTIONS_H
 
 #include <complex>
+#include <vector>
 
 std::complex<double> ylm(int, int, double, double);
 double plm(int, int, double);
+void ylmsum(const int, const std::vector<double>&, const std::vector<double>&,
+            const std::vector<double>&, std::complex<double>*);
 
 #endif
@@ -0,0 +1,383 @@
+// opstate.cpp
+// James Mithen
+// j.mithen@surrey.ac.uk
+
+// Stateful order parameter calculator, see opstate.h.
+
+#include <vector>
+#include <algorithm>
+#include "opstate.h"
+#include "particle.h"
+#include "box.h"
+#include "constants.h"
+#include "neighbours.h"
+#include "celllist.h"
+#include "qlmfunctions.h"
+#include "utility.h"
+
+using std::vector;
+
+OrderParamState::OrderParamState(const double ns, const bool pz,
+                                 const bool usenear,
+                                 const double tolerance) :
+   nsep(ns), zperiodic(pz), usenearest(usenear),
+   tolsq(tolerance * tolerance), initialised(false),
+   lboxx(0.0), lboxy(0.0), lboxz(0.0), simbox(0.0, 0.0, 0.0, ns, pz),
+   tfnparsurf(-1), tfnlinks(-1), tflinkval(0.0), ldnparsurf(-1)
+{
+}
+
+// Update the stored configuration to the particles in newpars, in a
+// box of dimensions lx, ly, lz.  Only the particles that have moved
+// by more than the tolerance are updated.
+
+void OrderParamState::update(const ParticleArray& newpars,
+                             const double lx, const double ly,
+                             const double lz)
+{
+   const int npar = newpars.size();
+
+   // start from scratch if the number of particles or the box has
+   // changed (as it will have done in an NPT simulation)
+   if (!initialised || npar != static_cast<int>(pars.size()) ||
+       lx != lboxx || ly != lboxy || lz != lboxz) {
+      lboxx = lx;
+      lboxy = ly;
+      lboxz = lz;
+      simbox = Box(lboxx, lboxy, lboxz, nsep, zperiodic);
+      pars.assign(newpars.begin(), newpars.end());
+      rebuild();
+      return;
+   }
+
+   // find the particles that have moved since they were last stored
+   vector<char> moved(npar, 0);
+   vector<int> mlist;
+   for (int i = 0; i != npar; ++i) {
+      if (simbox.sepsq(newpars[i], pars[i]) > tolsq) {
+         moved[i] = 1;
+         mlist.push_back(i);
+      }
+   }
+
+   if (mlist.empty()) {
+      return;
+   }
+
+   // if most of the particles have moved, it is cheaper to start
+   // from scratch
+   if (2 * mlist.size() > static_cast<vector<int>::size_type>(npar)) {
+      pars.assign(newpars.begin(), newpars.end());
+      rebuild();
+      return;
+   }
+
+   for (vector<int>::size_type k = 0; k != mlist.size(); ++k) {
+      pars[mlist[k]] = newpars[mlist[k]];
+   }
+
+   // update the neighbour lists, and mark all values that depend on
+   // the moved particles as out of date
+   vector<char> lchanged;
+   if (usenearest) {
+      lchanged = updatenearest();
+   }
+   else {
+      lchanged = updatecut(mlist, moved);
+   }
+   markchanged(moved, lchanged);
+}
+
+// Compute neighbour lists for the stored configuration from scratch,
+// and mark all other values as out of date.
+
+void OrderParamState::rebuild()
+{
+   const int npar = pars.size();
+
+   numneigh.assign(npar, 0);
+   lneigh.assign(npar, vector<int>());
+   if (usenearest) {
+      neighnearest(pars, simbox, numneigh, lneigh, 12);
+   }
+   else {
+      neighcut(pars, simbox, numneigh, lneigh);
+   }
+
+   q4lm.resize(boost::extents[npar][9]);
+   q6lm.resize(boost::extents[npar][13]);
+   q6lmt.resize(boost::extents[npar][13]);
+   q4lmb.resize(boost::extents[npar][9]);
+   q6lmb.resize(boost::extents[npar][13]);
+   q4bar.resize(npar);
+   w4bar.resize(npar);
+   q6bar.resize(npar);
+   w6bar.resize(npar);
+   numlinks.resize(npar);
+   classld.resize(npar);
+   classtf.resize(npar);
+
+   dirtyq4.assign(npar, 1);
+   dirtyq6.assign(npar, 1);
+   dirtyld.assign(npar, 1);
+   dirtytf.assign(npar, 1);
+   initialised = true;
+}
+
+// Update the neighbour lists (defined by the cutoff nsep) for the
+// particles in mlist, which have moved.  Return a vector flagging the
+// particles whose neighbour lists have been changed.
+
+vector<char> OrderParamState::updatecut(const vector<int>& mlist,
+                                        const vector<char>& moved)
+{
+   const int npar = pars.size();
+   vector<char> lchanged(npar, 0);
+   vector<int>::size_type k, m;
+   double r2;
+
+   // remove the moved particles from the lists of their old
+   // neighbours, and empty their own lists
+   for (k = 0; k != mlist.size(); ++k) {
+      const int i = mlist[k];
+      for (m = 0; m != lneigh[i].size(); ++m) {
+         const int j = lneigh[i][m];
+         if (!moved[j]) {
+            lneigh[j].erase(std::find(lneigh[j].begin(), lneigh[j].end(),
+                                      i));
+            lchanged[j] = 1;
+         }
+      }
+   }
+   for (k = 0; k != mlist.size(); ++k) {
+      lneigh[mlist[k]].clear();
+      lchanged[mlist[k]] = 1;
+   }
+
+   // find the new neighbours of the moved particles.  Pairs of moved
+   // particles are found twice, once from each side.
+   CellList clist(pars, simbox, nsep);
+   vector<int> cands;
+   for (k = 0; k != mlist.size(); ++k) {
+      const int i = mlist[k];
+      clist.candidates(pars[i], 1, cands);
+      for (m = 0; m != cands.size(); ++m) {
+         const int j = cands[m];
+         if (j != i && simbox.isneigh(pars[i], pars[j], r2)) {
+            lneigh[i].push_back(j);
+            if (!moved[j]) {
+               lneigh[j].push_back(i);
+               lchanged[j] = 1;
+            }
+         }
+      }
+   }
+
+   // keep each list in particle order, as for neighcut
+   for (int i = 0; i != npar; ++i) {
+      if (lchanged[i]) {
+         std::sort(lneigh[i].begin(), lneigh[i].end());
+         numneigh[i] = lneigh[i].size();
+      }
+   }
+
+   return lchanged;
+}
+
+// Recompute the (nearest 12) neighbour lists.  Return a vector
+// flagging the particles whose neighbour lists have changed.
+
+vector<char> OrderParamState::updatenearest()
+{
+   const int npar = pars.size();
+   vector<vector<int> > oldlneigh(npar);
+   lneigh.swap(oldlneigh);
+   numneigh.assign(npar, 0);
+   neighnearest(pars, simbox, numneigh, lneigh, 12);
+
+   vector<char> lchanged(npar, 0);
+   for (int i = 0; i != npar; ++i) {
+      if (lneigh[i] != oldlneigh[i]) {
+         lchanged[i] = 1;
+      }
+   }
+   return lchanged;
+}
+
+// Mark values as out of date given the particles that have moved, and
+// those whose neighbour lists have changed.  qlm(i) depends on the
+// positions of i and its neighbours; the LD averaged values and TF
+// links of i depend on qlm(i) and the qlm of its neighbours.
+
+void OrderParamState::markchanged(const vector<char>& moved,
+                                  const vector<char>& lchanged)
+{
+   const int npar = pars.size();
+   vector<char> qchanged(npar, 0);
+
+   for (int i = 0; i != npar; ++i) {
+      if (moved[i] || lchanged[i]) {
+         qchanged[i] = 1;
+      }
+      else {
+         for (int j = 0; j != numneigh[i]; ++j) {
+            if (moved[lneigh[i][j]]) {
+               qchanged[i] = 1;
+               break;
+            }
+         }
+      }
+   }
+
+   for (int i = 0; i != npar; ++i) {
+      bool bchanged = qchanged[i];
+      for (int j = 0; j != numneigh[i] && !bchanged; ++j) {
+         bchanged = qchanged[lneigh[i][j]];
+      }
+      if (qchanged[i]) {
+         dirtyq4[i] = 1;
+         dirtyq6[i] = 1;
+      }
+      if (bchanged) {
+         dirtyld[i] = 1;
+         dirtytf[i] = 1;
+      }
+   }
+}
+
+// Recompute the rows of qlm for the particles flagged in dirty.  For
+// l = 6 the normalised vectors \tilde{q6m}(i) are updated too.
+
+void OrderParamState::computeqlms(const int lval, vector<char>& dirty,
+                                  array2d& qlm)
+{
+   const int npar = dirty.size();
+#pragma omp parallel for schedule(static)
+   for (int i = 0; i < npar; ++i) {
+      if (dirty[i]) {
+         qlmipar(pars, simbox, numneigh, lneigh, lval, i, qlm);
+         if (lval == 6) {
+            qlmtildeipar(qlm, numneigh, lval, i, q6lmt);
+         }
+         dirty[i] = 0;
+      }
+   }
+}
+
+// Global order parameter Q6 of the stored configuration.
+
+double OrderParamState::q6global()
+{
+   computeqlms(6, dirtyq6, q6lm);
+   return Qpars(q6lm, range(0, pars.size()), 6);
+}
+
+// Classification of the stored configuration according to the LD
+// method.
+
+const vector<LDCLASS>& OrderParamState::ldclass(const int nparsurf)
+{
+   if (nparsurf != ldnparsurf) {
+      dirtyld.assign(pars.size(), 1);
+      ldnparsurf = nparsurf;
+   }
+
+   computeqlms(4, dirtyq4, q4lm);
+   computeqlms(6, dirtyq6, q6lm);
+
+   const int npar = dirtyld.size();
+#pragma omp parallel for schedule(static)
+   for (int i = 0; i < npar; ++i) {
+      if (dirtyld[i]) {
+         // Lechner dellago eq 6 and eq 5, for l = 4 and l = 6
+         qlmbaripar(q4lm, lneigh, 4, i, q4lmb);
+         qlmbaripar(q6lm, lneigh, 6, i, q6lmb);
+         vector<int> par(1, i);
+         q4bar[i] = Qpars(q4lmb, par, 4);
+         w4bar[i] = Wpars(q4lmb, par, 4);
+         q6bar[i] = Qpars(q6lmb, par, 6);
+         w6bar[i] = Wpars(q6lmb, par, 6);
+         if (i < nparsurf) {
+            classld[i] = SURFACE;
+         }
+         else {
+            classld[i] = classifyld(q4bar[i], q6bar[i], w4bar[i], w6bar[i]);
+         }
+         dirtyld[i] = 0;
+      }
+   }
+
+   return classld;
+}
+
+// Classification of the stored configuration according to the TF
+// method.
+
+const vector<TFCLASS>& OrderParamState::tfclass(const int nparsurf,
+                                                const int nlinks,
+                                                const double linkval)
+{
+   if (nparsurf != tfnparsurf || nlinks != tfnlinks ||
+       linkval != tflinkval) {
+      dirtytf.assign(pars.size(), 1);
+      tfnparsurf = nparsurf;
+      tfnlinks = nlinks;
+      tflinkval = linkval;
+   }
+
+   computeqlms(6, dirtyq6, q6lm);
+
+   const int npar = dirtytf.size();
+#pragma omp parallel for schedule(static)
+   for (int i = 0; i < npar; ++i) {
+      if (dirtytf[i]) {
+         // surface particles have no links (see getnlinks)
+         if (i < nparsurf) {
+            numlinks[i] = 0;
+         }
+         else {
+            numlinks[i] = nlinksipar(q6lmt, numneigh, lneigh, linkval, 6, i);
+         }
+         // see classifyparticlestf
+         if (numlinks[i] >= nlinks) {
+            classtf[i] = XTAL;
+         }
+         else if (i < nparsurf) {
+            classtf[i] = SURF;
+         }
+         else {
+            classtf[i] = LIQ;
+         }
+         dirtytf[i] = 0;
+      }
+   }
+
+   return classtf;
+}
+
+// Indices of particles in the largest LD cluster of the stored
+// configuration.
+
+vector<int> OrderParamState::largestclusterld(const int nparsurf)
+{
+   // with the cutoff neighbour definition, the cluster links are
+   // exactly the stored neighbour lists
+   if (!usenearest) {
+      return ::largestclusterld(lneigh, ldclass(nparsurf));
+   }
+   return ::largestclusterld(pars, simbox, ldclass(nparsurf));
+}
+
+// Indices of particles in the largest TF cluster of the stored
+// configuration.
+
+vector<int> OrderParamState::largestclustertf(const int nparsurf,
+                                              const int nlinks,
+                                              const double linkval)
+{
+   if (!usenearest) {
+      return ::largestclustertf(lneigh, tfclass(nparsurf, nlinks, linkval));
+   }
+   return ::largestclustertf(pars, simbox,
+                             tfclass(nparsurf, nlinks, linkval));
+}
@@ -0,0 +1,95 @@
+// opstate.h
+// James Mithen
+// j.mithen@surrey.ac.uk
+
+// A stateful order parameter calculator.  The functions in
+// pyfunctions.cpp compute everything (neighbour lists, qlm values,
+// classification, largest cluster) from scratch for every
+// configuration.  In an FFS or umbrella sampling simulation however,
+// the order parameter is computed every few MC cycles, and most of the
+// particles will not have moved far since the previous evaluation.
+// OrderParamState caches the neighbour lists and the per-particle
+// qlm values from the previous configuration, and recomputes them only
+// for particles that have moved by more than a tolerance 'tol' (and
+// for the particles whose neighbourhoods are affected by these moves).
+// With tol = 0 (the default) the results are the same as those of the
+// functions in pyfunctions.cpp.
+
+#ifndef OPSTATE_H
+#define OPSTATE_H
+
+#include <vector>
+#include "particle.h"
+#include "box.h"
+#include "typedefs.h"
+#include "constants.h"
+
+class OrderParamState
+{
+public:
+   OrderParamState(const double ns, const bool pz, const bool usenear,
+                   const double tolerance = 0.0);
+
+   // update the stored configuration
+   void update(const ParticleArray&, const double, const double,
+               const double);
+
+   // order parameters of the stored configuration
+   double q6global();
+   const std::vector<LDCLASS>& ldclass(const int);
+   const std::vector<TFCLASS>& tfclass(const int, const int, const double);
+   std::vector<int> largestclusterld(const int);
+   std::vector<int> largestclustertf(const int, const int, const double);
+
+private:
+   void rebuild();
+   std::vector<char> updatecut(const std::vector<int>&,
+                               const std::vector<char>&);
+   std::vector<char> updatenearest();
+   void markchanged(const std::vector<char>&, const std::vector<char>&);
+   void computeqlms(const int, std::vector<char>&, array2d&);
+
+   double nsep;
+   bool zperiodic;
+   bool usenearest;
+   double tolsq;
+
+   // the stored configuration
+   bool initialised;
+   double lboxx;
+   double lboxy;
+   double lboxz;
+   Box simbox;
+   std::vector<Particle> pars;
+   std::vector<int> numneigh;
+   std::vector<std::vector<int> > lneigh;
+
+   // qlm(i) for l = 4 and l = 6, and \tilde{q6m}(i)
+   array2d q4lm;
+   array2d q6lm;
+   array2d q6lmt;
+   // LD averaged values, and TF number of crystalline links
+   array2d q4lmb;
+   array2d q6lmb;
+   std::vector<double> q4bar;
+   std::vector<double> w4bar;
+   std::vector<double> q6bar;
+   std::vector<double> w6bar;
+   std::vector<int> numlinks;
+   std::vector<LDCLASS> classld;
+   std::vector<TFCLASS> classtf;
+
+   // particles for which the values above are out of date
+   std::vector<char> dirtyq4;
+   std::vector<char> dirtyq6;
+   std::vector<char> dirtyld;
+   std::vector<char> dirtytf;
+
+   // TF parameters used for the stored links
+   int tfnparsurf;
+   int tfnlinks;
+   double tflinkval;
+   int ldnparsurf;
+};
+
+#endif
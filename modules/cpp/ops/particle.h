@@ -2,15 +2,47 @@
 // James Mithen
 // j.mithen@surrey.ac.uk
 
-// A simple particle class for particle simulations e.g. MC/MD
+// A simple particle class for particle simulations e.g. MC/MD, and a
+// read-only view of an array of particles.
 
 #ifndef PARTICLE_H
 #define PARTICLE_H
 
+#include <vector>
+
+// A Particle is just its position, so that an array of Particles has
+// the same memory layout as an (n,3) C-ordered array of doubles.
+
 struct Particle
 {
    double pos[3];
-   char symbol; // for outputting e.g. jmol
+};
+
+// A read-only view of npar Particles stored contiguously in memory.
+// This can be a view of an (n,3) array of doubles, such as a NumPy
+// array of particle positions (see pyutil.h), so that the positions do
+// not have to be copied.  A vector<Particle> converts to a
+// ParticleArray implicitly.
+
+class ParticleArray
+{
+public:
+   typedef std::vector<Particle>::size_type size_type;
+
+   ParticleArray() : first(0), npar(0) {}
+   ParticleArray(const Particle* pars, const size_type n) :
+      first(pars), npar(n) {}
+   ParticleArray(const std::vector<Particle>& pars) :
+      first(pars.empty() ? 0 : &pars[0]), npar(pars.size()) {}
+
+   size_type size() const { return npar; }
+   const Particle& operator[](const size_type i) const { return first[i]; }
+   const Particle* begin() const { return first; }
+   const Particle* end() const { return first + npar; }
+
+protected:
+   const Particle* first;
+   size_type npar;
 };
 
 #endif
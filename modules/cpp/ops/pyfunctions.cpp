@@ -12,7 +12,7 @@
 // py_q6global       - global order parameter Q6 of whole system.
 // py_nclustf        - size of largest crystalline cluster, according to
 //                     ten-Wolde Frenkel method.
-// py_tfclass        - return vector<TFCLASS> that contains classification
+// py_tfclass        - return array (of int8) that contains classification
 //                     for every particle.  Each particle is idenfified as
 //                     LIQ (0), XTAL (1), SURF (2).
 // py_fracsolidtf    - fraction of crystalline particles (excluding surface
@@ -21,19 +21,29 @@
 //                     Lechner Dellago method.
 // py_fracsolidld    - fraction of crystalline particles (excluding surface
 //                     particles) according to Lecher Dellago method.
-// py_ldclass        - return vector<LDCLASS> that contains classification
+// py_ldclass        - return array (of int8) that contains classification
 //                     for every particle. Each particle is identified as
 //                     FCC (0), HCP (1), BCC (2), LIQUID (3), ICOS (4) or
 //                     SURFACE (5).
 // py_largestcluster - size of largest cluster (needs xtal particles to be
 //                     passed as argument).
-// py_q4w4q6w6       - return vector of with values of q4, w4, q6, w6 back
-//                     to back.
+// py_q4w4q6w6       - return (4,N) array with values of q4, w4, q6, w6 of
+//                     each particle.
+// py_setopthreads   - set number of OpenMP threads used for the order
+//                     parameter computation.
+// py_batchop        - order parameter of each of a stack of
+//                     configurations.
+//
+// The functions prefixed by "py_state_" do the same as those above,
+// but use an OrderParamState (see opstate.h), which is passed as the
+// first argument, so that only the particles that have moved since
+// the previous call are recomputed.  From Python these are methods of
+// the OrderParamState object e.g. state.nclusld(...).
 
 #include <iostream>
 #include <vector>
+#include <string>
 #include <boost/python.hpp>
-#include "boost/python/numeric.hpp"
 #include "qlmfunctions.h"
 #include "box.h"
 #include "constants.h"
@@ -43,6 +53,10 @@
 #include "typedefs.h"
 #include "conncomponents.h"
 #include "utility.h"
+#include "opstate.h"
+#ifdef _OPENMP
+#include <omp.h>
+#endif
 
 using std::vector;
 using std::cout;
@@ -51,17 +65,15 @@ using std::cout;
 // global order parameter Q6 of whole system (including surface if
 // there is one).
 
-double py_q6global(boost::python::numeric::array xpos,
-                   boost::python::numeric::array ypos,
-                   boost::python::numeric::array zpos,
+double py_q6global(boost::python::object positions,
                    const int npartot, const int nparsurf,
                    const double lboxx, const double lboxy,
                    const double lboxz, const bool zperiodic,
                    const double nsep,
                    const bool usenearest)
 {
-   // create vector of type "Particle"
-   vector<Particle> allpars = getparticles(xpos, ypos, zpos, npartot);
+   // particles (the positions are read in place, see pyutil.h)
+   PyParticleArray allpars(positions, npartot);
 
    // create "Box"
    Box simbox(lboxx, lboxy, lboxz, nsep, zperiodic);
@@ -90,9 +102,7 @@ double py_q6global(boost::python::numeric::array xpos,
 
 // size of largest crystalline cluster, according to TF method.
 
-double py_nclustf(boost::python::numeric::array xpos,
-                  boost::python::numeric::array ypos,
-                  boost::python::numeric::array zpos,
+double py_nclustf(boost::python::object positions,
                   const int npartot, const int nparsurf,
                   const double lboxx, const double lboxy,
                   const double lboxz, const bool zperiodic,
@@ -100,8 +110,8 @@ double py_nclustf(boost::python::numeric::array xpos,
                   const double linkval,
                   const bool usenearest)
 {
-   // create vector of type "Particle"
-   vector<Particle> allpars = getparticles(xpos, ypos, zpos, npartot);
+   // particles (the positions are read in place, see pyutil.h)
+   PyParticleArray allpars(positions, npartot);
 
    // create "Box"
    Box simbox(lboxx, lboxy, lboxz, nsep, zperiodic);
@@ -134,25 +144,26 @@ double py_nclustf(boost::python::numeric::array xpos,
    // classify particles using q4lbar etc.
    vector<TFCLASS> tfclass = classifyparticlestf(numlinks, nlinks, nparsurf);
 
-   // indices of particles in the largest cluster
-   vector<int> tfcnums = largestclustertf(allpars, simbox, tfclass);
+   // indices of particles in the largest cluster (with the cutoff
+   // definition, the links are just the neighbour lists)
+   vector<int> tfcnums = usenearest ?
+      largestclustertf(allpars, simbox, tfclass) :
+      largestclustertf(lneigh, tfclass);
    return tfcnums.size();
 }
 
 // classification of particles using TF method
 
-vector<TFCLASS> py_tfclass(boost::python::numeric::array xpos,
-                           boost::python::numeric::array ypos,
-                           boost::python::numeric::array zpos,
-                           const int npartot, const int nparsurf,
-                           const double lboxx, const double lboxy,
-                           const double lboxz, const bool zperiodic,
-                           const double nsep, const int nlinks,
-                           const double linkval,
-                           const bool usenearest)
+boost::python::object py_tfclass(boost::python::object positions,
+                                 const int npartot, const int nparsurf,
+                                 const double lboxx, const double lboxy,
+                                 const double lboxz, const bool zperiodic,
+                                 const double nsep, const int nlinks,
+                                 const double linkval,
+                                 const bool usenearest)
 {
-   // create vector of type "Particle"
-   vector<Particle> allpars = getparticles(xpos, ypos, zpos, npartot);
+   // particles (the positions are read in place, see pyutil.h)
+   PyParticleArray allpars(positions, npartot);
 
    // create "Box"
    Box simbox(lboxx, lboxy, lboxz, nsep, zperiodic);
@@ -186,23 +197,21 @@ vector<TFCLASS> py_tfclass(boost::python::numeric::array xpos,
    // classify particles using q4lbar etc.
    vector<TFCLASS> tfclass = classifyparticlestf(numlinks, nlinks, nparsurf);
 
-   return tfclass;
+   return toarray(tfclass);
 }
 
 // fraction of solid particles (excluding surface particles) according
 // to TF method.
 
-double py_fracsolidtf(boost::python::numeric::array xpos,
-                      boost::python::numeric::array ypos,
-                      boost::python::numeric::array zpos,
+double py_fracsolidtf(boost::python::object positions,
                       const int npartot,  const int nparsurf,
                       const double lboxx, const double lboxy,
                       const double lboxz, const bool zperiodic,
                       const double nsep, const int nlinks,
                       const double linval, const bool usenearest)
 {
-   // create vector of type "Particle"
-   vector<Particle> allpars = getparticles(xpos, ypos, zpos, npartot);
+   // particles (the positions are read in place, see pyutil.h)
+   PyParticleArray allpars(positions, npartot);
 
    // create "Box"
    Box simbox(lboxx, lboxy, lboxz, nsep, zperiodic);
@@ -242,16 +251,14 @@ double py_fracsolidtf(boost::python::numeric::array xpos,
 
 // size of largest crystalline cluster, according to LD method.
 
-double py_nclusld(boost::python::numeric::array xpos,
-                  boost::python::numeric::array ypos,
-                  boost::python::numeric::array zpos,
+double py_nclusld(boost::python::object positions,
                   const int npartot, const int nparsurf,
                   const double lboxx, const double lboxy,
                   const double lboxz, const bool zperiodic,
                   const double nsep, const bool usenearest)
 {
-   // create vector of type "Particle"
-   vector<Particle> allpars = getparticles(xpos, ypos, zpos, npartot);
+   // particles (the positions are read in place, see pyutil.h)
+   PyParticleArray allpars(positions, npartot);
 
    // create "Box"
    Box simbox(lboxx, lboxy, lboxz, nsep, zperiodic);
@@ -290,24 +297,25 @@ double py_nclusld(boost::python::numeric::array xpos,
                                                  q6lbar, w4lbar,
                                                  w6lbar);
 
-   // indices of particles in the largest cluster
-   vector<int> ldcnums = largestclusterld(allpars, simbox, ldclass);
+   // indices of particles in the largest cluster (with the cutoff
+   // definition, the links are just the neighbour lists)
+   vector<int> ldcnums = usenearest ?
+      largestclusterld(allpars, simbox, ldclass) :
+      largestclusterld(lneigh, ldclass);
    
    return ldcnums.size();
 }
 
 // number of each polymorph in  largest crystalline cluster, according to LD method.
 
-vector<int> py_ncluspolyld(boost::python::numeric::array xpos,
-                           boost::python::numeric::array ypos,
-                           boost::python::numeric::array zpos,
-                           const int npartot, const int nparsurf,
-                           const double lboxx, const double lboxy,
-                           const double lboxz, const bool zperiodic,
-                           const double nsep, const bool usenearest)
+boost::python::object py_ncluspolyld(boost::python::object positions,
+                                     const int npartot, const int nparsurf,
+                                     const double lboxx, const double lboxy,
+                                     const double lboxz, const bool zperiodic,
+                                     const double nsep, const bool usenearest)
 {
-   // create vector of type "Particle"
-   vector<Particle> allpars = getparticles(xpos, ypos, zpos, npartot);
+   // particles (the positions are read in place, see pyutil.h)
+   PyParticleArray allpars(positions, npartot);
 
    // create "Box"
    Box simbox(lboxx, lboxy, lboxz, nsep, zperiodic);
@@ -346,8 +354,11 @@ vector<int> py_ncluspolyld(boost::python::numeric::array xpos,
                                                  q6lbar, w4lbar,
                                                  w6lbar);
 
-   // indices of particles in the largest cluster
-   vector<int> ldcnums = largestclusterld(allpars, simbox, ldclass);
+   // indices of particles in the largest cluster (with the cutoff
+   // definition, the links are just the neighbour lists)
+   vector<int> ldcnums = usenearest ?
+      largestclusterld(allpars, simbox, ldclass) :
+      largestclusterld(lneigh, ldclass);
 
    // count the number of particles of each polymorph in the largest cluster
    vector<int> poly(SURFACE + 1, 0);
@@ -355,22 +366,20 @@ vector<int> py_ncluspolyld(boost::python::numeric::array xpos,
       ++poly[ldclass[ldcnums[i]]];
    }
    
-   return poly;
+   return toarray(poly);
 }
 
 // fraction of solid particles (excluding surface particles) according
 // to LD method.
 
-double py_fracsolidld(boost::python::numeric::array xpos,
-                      boost::python::numeric::array ypos,
-                      boost::python::numeric::array zpos,
+double py_fracsolidld(boost::python::object positions,
                       const int npartot,  const int nparsurf,
                       const double lboxx, const double lboxy,
                       const double lboxz, const bool zperiodic,
                       const double nsep, const bool usenearest)
 {
-   // create vector of type "Particle"
-   vector<Particle> allpars = getparticles(xpos, ypos, zpos, npartot);
+   // particles (the positions are read in place, see pyutil.h)
+   PyParticleArray allpars(positions, npartot);
 
    // create "Box"
    Box simbox(lboxx, lboxy, lboxz, nsep, zperiodic);
@@ -413,16 +422,14 @@ double py_fracsolidld(boost::python::numeric::array xpos,
 
 // classification of particles using LD method
 
-vector<LDCLASS> py_ldclass(boost::python::numeric::array xpos,
-                           boost::python::numeric::array ypos,
-                           boost::python::numeric::array zpos,
-                           const int npartot, const int nparsurf,
-                           const double lboxx, const double lboxy,
-                           const double lboxz, const bool zperiodic,
-                           const double nsep, const bool usenearest)
+boost::python::object py_ldclass(boost::python::object positions,
+                                 const int npartot, const int nparsurf,
+                                 const double lboxx, const double lboxy,
+                                 const double lboxz, const bool zperiodic,
+                                 const double nsep, const bool usenearest)
 {
-   // create vector of type "Particle"
-   vector<Particle> allpars = getparticles(xpos, ypos, zpos, npartot);
+   // particles (the positions are read in place, see pyutil.h)
+   PyParticleArray allpars(positions, npartot);
 
    // create "Box"
    Box simbox(lboxx, lboxy, lboxz, nsep, zperiodic);
@@ -460,44 +467,37 @@ vector<LDCLASS> py_ldclass(boost::python::numeric::array xpos,
    vector<LDCLASS> ldclass = classifyparticlesld(nparsurf, q4lbar,
                                                  q6lbar, w4lbar, w6lbar);
 
-   return ldclass;
+   return toarray(ldclass);
 }
 
 // indices of particles in largest cluster
-vector<int> py_largestcluster(boost::python::numeric::array cposx,
-                              boost::python::numeric::array cposy,
-                              boost::python::numeric::array cposz,
-                              const int npar, const double lboxx,
-                              const double lboxy, const double lboxz,
-                              const bool zperiodic, const double nsep)
+boost::python::object py_largestcluster(boost::python::object positions,
+                                        const int npar, const double lboxx,
+                                        const double lboxy, const double lboxz,
+                                        const bool zperiodic, const double nsep)
 {
-   // create vector of type "Particle"
-   vector<Particle> cpars = getparticles(cposx, cposy, cposz,
-                                         npar);
+   // particles (the positions are read in place, see pyutil.h)
+   PyParticleArray cpars(positions, npar);
 
    // create "Box"
    Box simbox(lboxx, lboxy, lboxz, nsep, zperiodic);
 
-   // graph of xtal particles, with each particle a vertex and each
-   // link an edge
-   graph xgraph = getxgraph(cpars, range(0, npar), simbox);
-
-   // largest cluster is the largest connected component of graph
-   vector<int> cnums = largestcomponent(xgraph);
+   // largest cluster is the largest connected component of graph of
+   // xtal particles, with each particle a vertex and each link an
+   // edge
+   vector<int> cnums = largestcomponent(cpars, range(0, npar), simbox);
 
-   return cnums;
+   return toarray(cnums);
 }
 
-vector<double> py_q4w4q6w6(boost::python::numeric::array xpos,
-                           boost::python::numeric::array ypos,
-                           boost::python::numeric::array zpos,
-                           const int npartot, const int nparsurf,
-                           const double lboxx, const double lboxy,
-                           const double lboxz, const bool zperiodic,
-                           const double nsep, const bool usenearest)
+boost::python::object py_q4w4q6w6(boost::python::object positions,
+                                  const int npartot, const int nparsurf,
+                                  const double lboxx, const double lboxy,
+                                  const double lboxz, const bool zperiodic,
+                                  const double nsep, const bool usenearest)
 {
-   // create vector of type "Particle"
-   vector<Particle> allpars = getparticles(xpos, ypos, zpos, npartot);
+   // particles (the positions are read in place, see pyutil.h)
+   PyParticleArray allpars(positions, npartot);
 
    // create "Box"
    Box simbox(lboxx, lboxy, lboxz, nsep, zperiodic);
@@ -531,31 +531,27 @@ vector<double> py_q4w4q6w6(boost::python::numeric::array xpos,
    vector<double> q6lbar = qls(q6lmb);
    vector<double> w6lbar = wls(q6lmb);
 
-   // we combine q4, w4, q6, w6 into a single long vector, and
-   // unwrap it when safely back in Python.  NB: this may well
-   // (probably is not) be the most efficient way to achieve this.
+   // we combine q4, w4, q6, w6 into a single long vector, which is
+   // returned as a (4, npartot) array.
    vector<double> q4w4q6w6;
    q4w4q6w6.reserve(4*npartot);
    q4w4q6w6.insert(q4w4q6w6.end(), q4lbar.begin(), q4lbar.end());
    q4w4q6w6.insert(q4w4q6w6.end(), w4lbar.begin(), w4lbar.end());
    q4w4q6w6.insert(q4w4q6w6.end(), q6lbar.begin(), q6lbar.end());
    q4w4q6w6.insert(q4w4q6w6.end(), w6lbar.begin(), w6lbar.end());
-   return q4w4q6w6;
+   return toarray(q4w4q6w6, 4, npartot);
 }
 
 // number of neighbours of each particle, where neighbours are defined
 // as those within a specified cutoff radius nsep
-vector<int> py_numneighcut(boost::python::numeric::array xpos,
-                           boost::python::numeric::array ypos,
-                           boost::python::numeric::array zpos,
-                           const int npartot,
-                           const double lboxx, const double lboxy,
-                           const double lboxz, const bool zperiodic,
-                           const double nsep)
+boost::python::object py_numneighcut(boost::python::object positions,
+                                     const int npartot,
+                                     const double lboxx, const double lboxy,
+                                     const double lboxz, const bool zperiodic,
+                                     const double nsep)
 {
-   // create vector of type "Particle"
-   vector<Particle> allpars = getparticles(xpos, ypos, zpos,
-                                           npartot);
+   // particles (the positions are read in place, see pyutil.h)
+   PyParticleArray allpars(positions, npartot);
           
    // create "Box"
    Box simbox(lboxx, lboxy, lboxz, nsep, zperiodic);
@@ -567,5 +563,221 @@ vector<int> py_numneighcut(boost::python::numeric::array xpos,
    // get all neighbours within separation nsep
    neighcut(allpars, simbox, numneigh, lneigh);    
 
-   return numneigh;
+   return toarray(numneigh);
+}
+
+// set number of threads used for the order parameter computation.  If
+// nthreads is 0 (or less), one thread per processor is used.  This
+// does nothing if the module was compiled without OpenMP.
+void py_setopthreads(const int nthreads)
+{
+#ifdef _OPENMP
+   if (nthreads > 0) {
+      omp_set_num_threads(nthreads);
+   }
+   else {
+      omp_set_num_threads(omp_get_num_procs());
+   }
+#endif
+}
+
+// order parameter of each of a stack of nframe configurations.
+// positions is an (nframe, n, 3) array with n >= npartot, and boxes an
+// (nframe, 3) array of the box dimensions of each configuration.
+// opname is the name of one of the order parameter functions
+// (without the "py_"): q6global, nclusld, ncluspolyld, fracsolidld,
+// nclustf or fracsolidtf.  The result is an (nframe, k) array, where k
+// is the number of values returned by the order parameter (k = 6 for
+// ncluspolyld, 1 otherwise).  The frames are divided between the
+// OpenMP threads, each of which keeps an OrderParamState, so that the
+// neighbour lists etc. are allocated once per thread rather than once
+// per frame.
+boost::python::object py_batchop(boost::python::object positions,
+                                 boost::python::object boxes,
+                                 const int npartot, const int nparsurf,
+                                 const bool zperiodic, const double nsep,
+                                 const bool usenearest, const int nlinks,
+                                 const double linkval,
+                                 const std::string& opname)
+{
+   enum BATCHOP {Q6GLOBAL, NCLUSLD, NCLUSPOLYLD, FRACLD, NCLUSTF, FRACTF};
+   BATCHOP op;
+   int ncol = 1;
+   if (opname == "q6global") {
+      op = Q6GLOBAL;
+   }
+   else if (opname == "nclusld") {
+      op = NCLUSLD;
+   }
+   else if (opname == "ncluspolyld") {
+      op = NCLUSPOLYLD;
+      ncol = SURFACE + 1;
+   }
+   else if (opname == "fracsolidld") {
+      op = FRACLD;
+   }
+   else if (opname == "nclustf") {
+      op = NCLUSTF;
+   }
+   else if (opname == "fracsolidtf") {
+      op = FRACTF;
+   }
+   else {
+      PyErr_SetString(PyExc_ValueError, "unknown order parameter");
+      boost::python::throw_error_already_set();
+   }
+
+   // the arrays are read in place (see pyutil.h)
+   boost::python::object posarr = asdoublearray(positions);
+   boost::python::object boxarr = asdoublearray(boxes);
+   PyArrayObject* ppos = reinterpret_cast<PyArrayObject*>(posarr.ptr());
+   PyArrayObject* pbox = reinterpret_cast<PyArrayObject*>(boxarr.ptr());
+   if (PyArray_NDIM(ppos) != 3 || PyArray_DIM(ppos, 2) != 3 ||
+       PyArray_DIM(ppos, 1) < npartot || PyArray_NDIM(pbox) != 2 ||
+       PyArray_DIM(pbox, 0) != PyArray_DIM(ppos, 0) ||
+       PyArray_DIM(pbox, 1) != 3) {
+      PyErr_SetString(PyExc_ValueError,
+                      "positions and boxes must be arrays of shape "
+                      "(nframe, npar, 3) and (nframe, 3)");
+      boost::python::throw_error_already_set();
+   }
+   const int nframe = PyArray_DIM(ppos, 0);
+   const int nstride = PyArray_DIM(ppos, 1);
+   const Particle* allpars = static_cast<const Particle*>(PyArray_DATA(ppos));
+   const double* lbox = static_cast<const double*>(PyArray_DATA(pbox));
+
+   vector<double> res(nframe * ncol);
+
+#pragma omp parallel
+   {
+      // nested parallel regions (in OrderParamState) run serially
+      OrderParamState state(nsep, zperiodic, usenearest);
+#pragma omp for schedule(static)
+      for (int m = 0; m < nframe; ++m) {
+         ParticleArray frame(allpars + m * nstride, npartot);
+         state.update(frame, lbox[3 * m], lbox[3 * m + 1], lbox[3 * m + 2]);
+         double* row = &res[m * ncol];
+         switch (op) {
+         case Q6GLOBAL:
+            row[0] = state.q6global();
+            break;
+         case NCLUSLD:
+            row[0] = state.largestclusterld(nparsurf).size();
+            break;
+         case NCLUSPOLYLD: {
+            vector<int> ldcnums = state.largestclusterld(nparsurf);
+            const vector<LDCLASS>& ldclass = state.ldclass(nparsurf);
+            for (vector<int>::size_type i = 0; i != ldcnums.size(); ++i) {
+               row[ldclass[ldcnums[i]]] += 1.0;
+            }
+            break;
+         }
+         case FRACLD:
+            row[0] = fracsolidld(state.ldclass(nparsurf), nparsurf);
+            break;
+         case NCLUSTF:
+            row[0] = state.largestclustertf(nparsurf, nlinks, linkval).size();
+            break;
+         case FRACTF:
+            row[0] = fracsolidtf(state.tfclass(nparsurf, nlinks, linkval),
+                                 nparsurf);
+            break;
+         }
+      }
+   }
+
+   return toarray(res, nframe, ncol);
+}
+
+// size of largest crystalline cluster, according to LD method, using
+// the stored state.
+
+double py_state_nclusld(OrderParamState& state,
+                        boost::python::object positions,
+                        const int npartot, const int nparsurf,
+                        const double lboxx, const double lboxy,
+                        const double lboxz)
+{
+   PyParticleArray allpars(positions, npartot);
+   state.update(allpars, lboxx, lboxy, lboxz);
+   return state.largestclusterld(nparsurf).size();
+}
+
+// number of each polymorph in largest crystalline cluster, according
+// to LD method, using the stored state.
+
+boost::python::object py_state_ncluspolyld(OrderParamState& state,
+                                           boost::python::object positions,
+                                           const int npartot, const int nparsurf,
+                                           const double lboxx, const double lboxy,
+                                           const double lboxz)
+{
+   PyParticleArray allpars(positions, npartot);
+   state.update(allpars, lboxx, lboxy, lboxz);
+   vector<int> ldcnums = state.largestclusterld(nparsurf);
+   const vector<LDCLASS>& ldclass = state.ldclass(nparsurf);
+
+   // count the number of particles of each polymorph in the largest cluster
+   vector<int> poly(SURFACE + 1, 0);
+   for (int i = 0; i < ldcnums.size(); ++i) {
+      ++poly[ldclass[ldcnums[i]]];
+   }
+   return toarray(poly);
+}
+
+// fraction of solid particles (excluding surface particles) according
+// to LD method, using the stored state.
+
+double py_state_fracsolidld(OrderParamState& state,
+                            boost::python::object positions,
+                            const int npartot, const int nparsurf,
+                            const double lboxx, const double lboxy,
+                            const double lboxz)
+{
+   PyParticleArray allpars(positions, npartot);
+   state.update(allpars, lboxx, lboxy, lboxz);
+   return fracsolidld(state.ldclass(nparsurf), nparsurf);
+}
+
+// size of largest crystalline cluster, according to TF method, using
+// the stored state.
+
+double py_state_nclustf(OrderParamState& state,
+                        boost::python::object positions,
+                        const int npartot, const int nparsurf,
+                        const double lboxx, const double lboxy,
+                        const double lboxz, const int nlinks,
+                        const double linkval)
+{
+   PyParticleArray allpars(positions, npartot);
+   state.update(allpars, lboxx, lboxy, lboxz);
+   return state.largestclustertf(nparsurf, nlinks, linkval).size();
+}
+
+// fraction of solid particles (excluding surface particles) according
+// to TF method, using the stored state.
+
+double py_state_fracsolidtf(OrderParamState& state,
+                            boost::python::object positions,
+                            const int npartot, const int nparsurf,
+                            const double lboxx, const double lboxy,
+                            const double lboxz, const int nlinks,
+                            const double linkval)
+{
+   PyParticleArray allpars(positions, npartot);
+   state.update(allpars, lboxx, lboxy, lboxz);
+   return fracsolidtf(state.tfclass(nparsurf, nlinks, linkval), nparsurf);
+}
+
+// global order parameter Q6 of whole system, using the stored state.
+
+double py_state_q6global(OrderParamState& state,
+                         boost::python::object positions,
+                         const int npartot, const int nparsurf,
+                         const double lboxx, const double lboxy,
+                         const double lboxz)
+{
+   PyParticleArray allpars(positions, npartot);
+   state.update(allpars, lboxx, lboxy, lboxz);
+   return state.q6global();
 }
@@ -2,109 +2,94 @@
 // James Mithen
 // j.mithen@surrey.ac.uk
 
-// Declarations for functions to be called by Python via Boost.Python
+// Declarations for functions to be called by Python via Boost.Python.
+// The particle positions are passed as a single (npartot, 3) NumPy
+// array, and results that are arrays are returned as NumPy arrays
+// (see pyutil.h).
 
 #ifndef PYFUNCTIONS_H
 #define PYFUNCTIONS_H
 
 #include <vector>
+#include <string>
 #include <boost/python.hpp>
-#include "boost/python/extract.hpp"
-#include "boost/python/numeric.hpp"
 #include "constants.h"
+#include "opstate.h"
 
-double py_fracsolidld(boost::python::numeric::array,
-                      boost::python::numeric::array,
-                      boost::python::numeric::array, 
+double py_fracsolidld(boost::python::object,
                       const int, const int, const double, const double,
                       const double, const bool, const double, const bool);
-double py_fracsolidtf(boost::python::numeric::array,
-                      boost::python::numeric::array,
-                      boost::python::numeric::array, 
+double py_fracsolidtf(boost::python::object,
                       const int, const int, const double, const double,
                       const double, const bool, const double, const int,
                       const double, const bool);
-double py_q6global(boost::python::numeric::array,
-                   boost::python::numeric::array,
-                   boost::python::numeric::array,
+double py_q6global(boost::python::object,
                    const int, const int,
                    const double, const double,
                    const double, const bool,
                    const double, const bool);
-double py_nclustf(boost::python::numeric::array,
-                  boost::python::numeric::array,
-                  boost::python::numeric::array,
+double py_nclustf(boost::python::object,
                   const int, const int,
                   const double, const double,
                   const double, const bool, const double,
                   const int, const double, const bool);
-std::vector<TFCLASS> py_tfclass(boost::python::numeric::array,
-                                boost::python::numeric::array,
-                                boost::python::numeric::array,
-                                const int, const int,
-                                const double, const double,
-                                const double, const bool, const double,
-                                const int, const double, const bool);
-double py_nclusld(boost::python::numeric::array,
-                  boost::python::numeric::array,
-                  boost::python::numeric::array,
+boost::python::object py_tfclass(boost::python::object,
+                                 const int, const int,
+                                 const double, const double,
+                                 const double, const bool, const double,
+                                 const int, const double, const bool);
+double py_nclusld(boost::python::object,
                   const int, const int, const double, const double,
                   const double, const bool, const double, const bool);
-std::vector<int> py_ncluspolyld(boost::python::numeric::array,
-                                boost::python::numeric::array,
-                                boost::python::numeric::array, 
-                                const int, const int, const double, const double,
-                                const double, const bool, const double, const bool);
-std::vector<LDCLASS> py_ldclass(boost::python::numeric::array,
-                                boost::python::numeric::array,
-                                boost::python::numeric::array, 
-                                const int, const int, const double, const double,
-                                const double, const bool, const double, const bool);
-std::vector<int> py_largestcluster(boost::python::numeric::array,
-                                   boost::python::numeric::array,
-                                   boost::python::numeric::array, 
-                                   const int, const double, const double,
-                                   const double, const bool, const double);
-std::vector<double> py_q4w4q6w6(boost::python::numeric::array,
-                                boost::python::numeric::array,
-                                boost::python::numeric::array, 
-                                const int, const int, const double, const double,
-                                const double, const bool, const double, const bool);
-std::vector<int> py_numneighcut(boost::python::numeric::array,
-                                boost::python::numeric::array,
-                                boost::python::numeric::array,
-                                const int, const double, const double,
-                                const double, const bool, const double);
-
-// structs used to convert from C++ types to python types
-template <typename T>
-struct vector_to_python_list
-{
-   static PyObject* convert(std::vector<T> const& v)
-      {
-         using namespace std;
-         using namespace boost::python;
-         using boost::python::list;
-         list l;
-         typename vector<T>::const_iterator p;
-         for(p=v.begin();p!=v.end();++p) {
-            l.append(object(*p));
-         }
-         return incref(l.ptr());
-      }
-};
-
-template <typename T>
-struct enum_to_python_int
-{
-   static PyObject* convert(T const& v)
-      {
-         using namespace std;
-         using namespace boost::python;
-         object l;
-         l = object(static_cast<int>(v));
-         return incref(l.ptr());
-      }
-};
+boost::python::object py_ncluspolyld(boost::python::object,
+                                     const int, const int, const double,
+                                     const double, const double, const bool,
+                                     const double, const bool);
+boost::python::object py_ldclass(boost::python::object,
+                                 const int, const int, const double,
+                                 const double, const double, const bool,
+                                 const double, const bool);
+boost::python::object py_largestcluster(boost::python::object,
+                                        const int, const double,
+                                        const double, const double,
+                                        const bool, const double);
+boost::python::object py_q4w4q6w6(boost::python::object,
+                                  const int, const int, const double,
+                                  const double, const double, const bool,
+                                  const double, const bool);
+boost::python::object py_numneighcut(boost::python::object,
+                                     const int, const double, const double,
+                                     const double, const bool, const double);
+void py_setopthreads(const int);
+boost::python::object py_batchop(boost::python::object,
+                                 boost::python::object,
+                                 const int, const int, const bool,
+                                 const double, const bool, const int,
+                                 const double, const std::string&);
+double py_state_nclusld(OrderParamState&,
+                        boost::python::object,
+                        const int, const int, const double, const double,
+                        const double);
+boost::python::object py_state_ncluspolyld(OrderParamState&,
+                                           boost::python::object,
+                                           const int, const int,
+                                           const double, const double,
+                                           const double);
+double py_state_fracsolidld(OrderParamState&,
+                            boost::python::object,
+                            const int, const int, const double, const double,
+                            const double);
+double py_state_nclustf(OrderParamState&,
+                        boost::python::object,
+                        const int, const int, const double, const double,
+                        const double, const int, const double);
+double py_state_fracsolidtf(OrderParamState&,
+                            boost::python::object,
+                            const int, const int, const double, const double,
+                            const double, const int, const double);
+double py_state_q6global(OrderParamState&,
+                         boost::python::object,
+                         const int, const int, const double, const double,
+                         const double);
 
 #endif
@@ -3,36 +3,91 @@
 // j.mithen@surrey.ac.uk
 
 // Utility functions needed to make the Boost.Python interface work
-// properly.
+// properly, see pyutil.h.
 
 #include <vector>
+#include <algorithm>
 #include <boost/python.hpp>
-#include "boost/python/extract.hpp"
-#include "boost/python/numeric.hpp"
 #include "particle.h"
+#include "constants.h"
+#include "pyutil.h"
 
 using std::vector;
+using boost::python::object;
+using boost::python::handle;
 
-// get vector of "Particle" type from numeric arrays of particle
-// positions.
-
-vector<Particle> getparticles(boost::python::numeric::array& xpos,
-                              boost::python::numeric::array& ypos,
-                              boost::python::numeric::array& zpos,
-                              const int npartot)
-{
-
-   vector<Particle> allpars(npartot);
-          
-   // we will probably want to remove the "Particle" class from the
-   // code at some point to prevent the conversion below.  Also, I
-   // have no idea how expensive the 'extract' functionality
-   // provided by boost is...
-   for (vector<Particle>::size_type i = 0; i != allpars.size(); ++i) {
-      allpars[i].pos[0] = boost::python::extract<double>(xpos[i]);
-      allpars[i].pos[1] = boost::python::extract<double>(ypos[i]);
-      allpars[i].pos[2] = boost::python::extract<double>(zpos[i]);
+// Return C-contiguous, aligned NumPy array of doubles with the values
+// in obj.  This is obj itself if it is already such an array.
+
+object asdoublearray(object obj)
+{
+   return object(handle<>(PyArray_FROM_OTF(obj.ptr(), NPY_DOUBLE,
+                                           NPY_ARRAY_IN_ARRAY)));
+}
+
+// Get particles from NumPy array of particle positions, with shape
+// (n,3) and n >= npartot.
+
+PyParticleArray::PyParticleArray(object positions, const int npartot)
+{
+   arr = asdoublearray(positions);
+   PyArrayObject* parr = reinterpret_cast<PyArrayObject*>(arr.ptr());
+
+   if (PyArray_NDIM(parr) != 2 || PyArray_DIM(parr, 1) != 3 ||
+       PyArray_DIM(parr, 0) < npartot) {
+      PyErr_SetString(PyExc_ValueError,
+                      "positions must be an array of shape (npar, 3)");
+      boost::python::throw_error_already_set();
    }
 
-   return allpars;
+   first = static_cast<const Particle*>(PyArray_DATA(parr));
+   npar = npartot;
+}
+
+// New one dimensional NumPy array of type typenum, with the values
+// in v.
+
+template <typename T>
+static object newarray(const vector<T>& v, const int typenum)
+{
+   npy_intp dims[1] = {static_cast<npy_intp>(v.size())};
+   object ret(handle<>(PyArray_SimpleNew(1, dims, typenum)));
+   PyArrayObject* parr = reinterpret_cast<PyArrayObject*>(ret.ptr());
+   std::copy(v.begin(), v.end(), static_cast<T*>(PyArray_DATA(parr)));
+   return ret;
+}
+
+object toarray(const vector<int>& v)
+{
+   return newarray(v, NPY_INT);
+}
+
+object toarray(const vector<double>& v)
+{
+   return newarray(v, NPY_DOUBLE);
+}
+
+// The classifications are returned as arrays of int8, with values as
+// in the enums LDCLASS and TFCLASS (see constants.h).
+
+object toarray(const vector<LDCLASS>& v)
+{
+   return newarray(vector<npy_int8>(v.begin(), v.end()), NPY_INT8);
+}
+
+object toarray(const vector<TFCLASS>& v)
+{
+   return newarray(vector<npy_int8>(v.begin(), v.end()), NPY_INT8);
+}
+
+// Two dimensional (nrow, ncol) NumPy array of doubles, where v holds
+// the rows back to back.
+
+object toarray(const vector<double>& v, const int nrow, const int ncol)
+{
+   npy_intp dims[2] = {nrow, ncol};
+   object ret(handle<>(PyArray_SimpleNew(2, dims, NPY_DOUBLE)));
+   PyArrayObject* parr = reinterpret_cast<PyArrayObject*>(ret.ptr());
+   std::copy(v.begin(), v.end(), static_cast<double*>(PyArray_DATA(parr)));
+   return ret;
 }
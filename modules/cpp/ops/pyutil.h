@@ -2,16 +2,51 @@
 // James Mithen
 // j.mithen@surrey.ac.uk
 
+// Utilities for passing NumPy arrays between Python and C++ without
+// going through Python lists.  These use the NumPy C API directly.
+// The API is imported once, in op_ext.cpp, which defines
+// OPEXT_IMPORT_ARRAY before including this file.
+
 #ifndef PYUTIL_H
 #define PYUTIL_H
 
-#include "particle.h"
 #include <vector>
-#include "boost/python/numeric.hpp"
+#include <boost/python.hpp>
+#include "particle.h"
+#include "constants.h"
+
+#define NPY_NO_DEPRECATED_API NPY_1_7_API_VERSION
+#define PY_ARRAY_UNIQUE_SYMBOL OPEXT_ARRAY_API
+#ifndef OPEXT_IMPORT_ARRAY
+#define NO_IMPORT_ARRAY
+#endif
+#include <numpy/arrayobject.h>
+
+// Particles whose positions are the first npar rows of an (n,3)
+// NumPy array.  If the array is already a C-contiguous array of
+// doubles (as the positions array in the code always is) the
+// positions are read in place, otherwise a contiguous copy is made.
+// Either way a reference to the array is held for as long as the
+// PyParticleArray exists.
+
+class PyParticleArray : public ParticleArray
+{
+public:
+   PyParticleArray(boost::python::object, const int);
+
+private:
+   boost::python::object arr;
+};
+
+// C-contiguous NumPy array of doubles (a copy only if needed)
+boost::python::object asdoublearray(boost::python::object);
 
-std::vector<Particle> getparticles(boost::python::numeric::array&,
-                                   boost::python::numeric::array&,
-                                   boost::python::numeric::array&,
-                                   const int);
+// Conversion of results to NumPy arrays
+boost::python::object toarray(const std::vector<int>&);
+boost::python::object toarray(const std::vector<double>&);
+boost::python::object toarray(const std::vector<LDCLASS>&);
+boost::python::object toarray(const std::vector<TFCLASS>&);
+boost::python::object toarray(const std::vector<double>&, const int,
+                              const int);
 
 #endif
@@ -4,6 +4,12 @@
 
 // All functions concerned with calculation of 'Ten-Wolde Frenkel' and
 // 'Lechner Dellago' order parameters.
+//
+// The loops over particles in qlms, qlmtildes, qlmbars, qls, wls and
+// getnlinks are parallelised with OpenMP (if the code is compiled
+// with -fopenmp).  Each particle's values are computed by a single
+// thread in the same way as for the serial code, so the results do
+// not depend on the number of threads.
 
 #include "boost/multi_array.hpp"
 #include <iostream>
@@ -21,55 +27,86 @@ using std::vector;
 
 typedef boost::multi_array<complex<double>,2> array2d;
 
-vector<int> largestclustertf(const vector<Particle>& allpars,
-                             const Box& simbox,
-                             const vector<TFCLASS>& tfclass)
+// Indices of crystal particles according to TF and LD classification
+
+static vector<int> xtalparstf(const vector<TFCLASS>& tfclass)
 {
-   // get vector with indices that are all crystal particles
    vector<int> xps;
    for (vector<TFCLASS>::size_type i = 0; i != tfclass.size(); ++i) {
       if (tfclass[i] == XTAL) {
          xps.push_back(i);
       }
    }
+   return xps;
+}
+
+static vector<int> xtalparsld(const vector<LDCLASS>& ldclass)
+{
+   vector<int> xps;
+   for (vector<LDCLASS>::size_type i = 0; i != ldclass.size(); ++i) {
+      if ((ldclass[i] == FCC) or (ldclass[i] == HCP) or
+          (ldclass[i] == BCC) or (ldclass[i] == ICOS)) {
+         xps.push_back(i);
+      }
+   }
+   return xps;
+}
 
-   // graph of xtal particles, with each particle a vertex and each
-   // link an edge
-   graph xgraph = getxgraph(allpars, xps, simbox);
+vector<int> largestclustertf(const ParticleArray& allpars,
+                             const Box& simbox,
+                             const vector<TFCLASS>& tfclass)
+{
+   // get vector with indices that are all crystal particles
+   vector<int> xps = xtalparstf(tfclass);
 
-   // largest cluster is the largest connected component of graph
-   vector<int> cnums = largestcomponent(xgraph);
+   // largest cluster is the largest connected component of graph of
+   // xtal particles, with each particle a vertex and each link an
+   // edge
+   vector<int> cnums = largestcomponent(allpars, xps, simbox);
 
    // now largest component returns indexes into array xps, we need
    // to reindex so that it contains indices into psystem.allpars
-   // (see utility.cpp)
+   // (see utility.h)
    reindex(cnums, xps);
    return cnums;   
 }
 
-vector<int> largestclusterld(const vector<Particle>& allpars,
+vector<int> largestclusterld(const ParticleArray& allpars,
                              const Box& simbox,
                              const vector<LDCLASS>& ldclass)
 {
    // get vector with indices that are all crystal particles
-   vector<int> xps;
-   for (vector<LDCLASS>::size_type i = 0; i != ldclass.size(); ++i) {
-      if ((ldclass[i] == FCC) or (ldclass[i] == HCP) or
-          (ldclass[i] == BCC) or (ldclass[i] == ICOS)) {
-         xps.push_back(i);
-      }
-   }
-
-   // graph of xtal particles, with each particle a vertex and each
-   // link an edge
-   graph xgraph = getxgraph(allpars, xps, simbox);
+   vector<int> xps = xtalparsld(ldclass);
 
-   // largest cluster is the largest connected component of graph
-   vector<int> cnums = largestcomponent(xgraph);
+   // largest cluster is the largest connected component of graph of
+   // xtal particles, with each particle a vertex and each link an
+   // edge
+   vector<int> cnums = largestcomponent(allpars, xps, simbox);
 
    // now largest component returns indexes into array xps, we need
    // to reindex so that it contains indices into psystem.allpars
-   // (see utility.cpp)
+   // (see utility.h)
+   reindex(cnums, xps);
+   return cnums;
+}
+
+// As above, but the links between crystal particles are taken from
+// the (cutoff) neighbour lists lneigh, which saves finding them again
+
+vector<int> largestclustertf(const vector<vector<int> >& lneigh,
+                             const vector<TFCLASS>& tfclass)
+{
+   vector<int> xps = xtalparstf(tfclass);
+   vector<int> cnums = largestcomponent(xps, lneigh);
+   reindex(cnums, xps);
+   return cnums;   
+}
+
+vector<int> largestclusterld(const vector<vector<int> >& lneigh,
+                             const vector<LDCLASS>& ldclass)
+{
+   vector<int> xps = xtalparsld(ldclass);
+   vector<int> cnums = largestcomponent(xps, lneigh);
    reindex(cnums, xps);
    return cnums;
 }
@@ -107,6 +144,33 @@ double fracsolidld(const vector<LDCLASS>& classld, const int nparsurf)
    return static_cast<double>(nsolid) / (npar - nparsurf);
 }
 
+// Number of 'links' of particle i, i.e. the number of neighbours j
+// for which the dot product \tilde{qlm}(i).\tilde{qlm}(j) is at least
+// linkval.
+
+int nlinksipar(const array2d& qlmt, const vector<int>& numneigh,
+               const vector<vector<int> >& lneigh, const double linkval,
+               const int lval, const int i)
+{
+   int nlin = 0;
+   int k;
+   double linval;
+
+   // go through each neighbour in turn
+   for (int j = 0; j != numneigh[i]; ++j) {
+      k = lneigh[i][j];
+      linval = 0.0;
+      for (int m = 0; m != 2 * lval + 1; ++m)
+         // dot product (sometimes denoted Sij)
+         linval += qlmt[i][m].real() * qlmt[k][m].real() +
+                   qlmt[i][m].imag() * qlmt[k][m].imag();
+      if (linval >= linkval) {
+         nlin = nlin + 1;
+      }
+   }
+   return nlin;
+}
+
 // Return a vector whose elements are number of 'links' for each
 // particle in qlm matrix.
 
@@ -117,29 +181,15 @@ vector<int> getnlinks(const array2d& qlmt, const vector<int>& numneigh,
 {
    array2d::index npar = qlmt.shape()[0];
    vector<int> numlinks(npar, 0);
-   int nlin,k;
-   double linval;
 
    // compute dot product \tilde{qlm}(i).\tilde{qlm}(j) for each
    // neighbour pair, whenever this is greater than the threshold
    // (linkval), we call this a crystal link
 
-   for (array2d::index i = nsurf; i != npar; ++i) {
-      nlin = 0;
-      // go through each neighbour in turn
-      for (int j = 0; j != numneigh[i]; ++j) {
-         k = lneigh[i][j];
-         linval = 0.0;
-         for (int m = 0; m != 2 * lval + 1; ++m)
-            // dot product (sometimes denoted Sij)
-            linval += qlmt[i][m].real() * qlmt[k][m].real() +
-                      qlmt[i][m].imag() * qlmt[k][m].imag();
-         if (linval >= linkval) {
-            nlin = nlin + 1;
-         }
-      }
+#pragma omp parallel for schedule(static)
+   for (array2d::index i = nsurf; i < npar; ++i) {
       // store number of links for this particle
-      numlinks[i] = nlin;                                                            
+      numlinks[i] = nlinksipar(qlmt, numneigh, lneigh, linkval, lval, i);
    }
 
    return numlinks;
@@ -188,6 +238,29 @@ vector<TFCLASS> classifyparticlestf(const vector<int>& numlinks,
    return parclass;
 }
 
+// Classify a single (non-surface) particle as FCC, HCP, BCC, LIQUID
+// or ICOSAHEDRAL from its averaged bond order parameters.
+
+LDCLASS classifyld(const double q4, const double q6, const double w4,
+                   const double w6)
+{
+   if (q6 < 0.3) {
+      return LIQUID;
+   }
+   // particle is solid
+   if (abs(w6) > 0.05) {
+      return ICOS;
+   }
+   else if (w6 > 0.0) {
+      return BCC;
+   }
+   // either HCP or FCC
+   if (w4 > 0.0) {
+      return HCP;
+   }
+   return FCC;
+}
+
 // Classify particles as FCC, HCP, BCC, LIQUID, ICOSAHEDRAL or SURFACE
 // according to the Lechner Dellago (LD) method.
 
@@ -205,25 +278,7 @@ vector<LDCLASS> classifyparticlesld(const int nsurf,
          parclass[i] = SURFACE;
       }
       else {
-         if (q6[i] < 0.3) {
-            parclass[i] = LIQUID;
-         }
-         else { // particle is solid
-            if (abs(w6[i]) > 0.05) {
-               parclass[i] = ICOS;
-            }
-            else if (w6[i] > 0.0) {
-               parclass[i] = BCC;
-            }
-            else { // either HCP or FCC
-               if (w4[i] > 0.0) {
-                  parclass[i] = HCP;
-               }
-               else {
-                  parclass[i] = FCC;
-               }
-            }
-         }
+         parclass[i] = classifyld(q4[i], q6[i], w4[i], w6[i]);
       }
    }
 
@@ -346,16 +401,16 @@ vector<double> qls(const array2d& qlm)
    int lval = (qlm.shape()[1] - 1)/ 2;
    vector<double> ql;
    ql.resize(npar);
-   vector<int> par(1,0);
 
-   for (array2d::index i = 0; i != npar; ++i)
+#pragma omp parallel for schedule(static)
+   for (int i = 0; i < npar; ++i)
    {
       // this is a bit inefficient, since we make a lot of
       // function calls and multiplications.  But is saves code
       // replication and in any case this function should only
       // need to be called once for any particular particle
       // configuration.
-      par[0] = i;
+      vector<int> par(1, i);
       ql[i] = Qpars(qlm, par, lval);
    }
    return ql;
@@ -373,21 +428,45 @@ vector<double> wls(const array2d& qlm)
    int lval = (qlm.shape()[1] - 1) / 2;
    vector<double> wl;
    wl.resize(npar);
-   vector<int> par(1,0);   
 
-   for (array2d::index i = 0; i != npar; ++i)
+#pragma omp parallel for schedule(static)
+   for (int i = 0; i < npar; ++i)
    {
       // this is a bit inefficient, since we make a lot of
       // function calls and multiplications.  But is saves code
       // replication and in any case this function should only
       // need to be called once for any particular particle
       // configuration
-      par[0] = i;
+      vector<int> par(1, i);
       wl[i] = Wpars(qlm, par, lval);
    }
    return wl;      
 }
 
+// Store normalised row i of qlm, \tilde{qlm}(i), in row i of qlmt.
+
+void qlmtildeipar(const array2d& qlm, const vector<int>& numneigh,
+                  const int lval, const int i, array2d& qlmt)
+{
+   // if particle has no neighbours, all entries in qlm[i]
+   // will be zero, and so the norm will be zero
+   if (numneigh[i] >= 1) {
+      double qnorm = 0.0;
+      for (int k = 0; k != 2 * lval + 1; ++k) {
+         qnorm = qnorm + norm(qlm[i][k]);
+      }
+      qnorm = sqrt(qnorm);
+      for (int k = 0; k != 2 * lval + 1; ++k) {
+         qlmt[i][k] = qlm[i][k] / qnorm;
+      }
+   }
+   else {
+      for (int k = 0; k != 2 * lval + 1; ++k) {
+         qlmt[i][k] = 0.0;
+      }
+   }
+}
+
 // Convert matrix of qlm(i) to matrix of \tilde{qlm}(i) \tilde{qlm}(i)
 // is simply a normalised version of vector qlm(i)
 
@@ -398,23 +477,30 @@ array2d qlmtildes(const array2d& qlm, const vector<int>& numneigh,
    array2d qlmt(boost::extents[npar][2 * lval + 1]);
           
    // normalise each of rows in the matrix, this gives qlmtilde
-   for (int i = 0; i != npar; ++i) {
-      // if particle has no neighbours, all entries in qlm[i]
-      // will be zero, and so the norm will be zero
-      if (numneigh[i] >= 1) {
-         double qnorm = 0.0;
-         for (int k = 0; k != 2 * lval + 1; ++k) {
-            qnorm = qnorm + norm(qlm[i][k]);
-         }
-         qnorm = sqrt(qnorm);
-         for (int k = 0; k != 2 * lval + 1; ++k) {
-            qlmt[i][k] = qlm[i][k] / qnorm;
-         }
-      }
+#pragma omp parallel for schedule(static)
+   for (int i = 0; i < npar; ++i) {
+      qlmtildeipar(qlm, numneigh, lval, i, qlmt);
    }
    return qlmt;
 }
 
+// Store qlmbar(i), qlm of particle i averaged over particle i and
+// its neighbours, in row i of qlmbar.
+
+void qlmbaripar(const array2d& qlm, const vector<vector<int> >& lneigh,
+                const int lval, const int i, array2d& qlmbar)
+{
+   int nn = lneigh[i].size(); // num neighbours
+   for (int m = 0; m != 2 * lval + 1; ++m) {
+      complex<double> qlmval = qlm[i][m];
+      // add contribution to qlmval from neighbours
+      for (int nnum = 0; nnum != nn; ++nnum) {
+         qlmval = qlmval + qlm[lneigh[i][nnum]][m];
+      }
+      qlmbar[i][m] = qlmval / static_cast<double>(nn + 1);
+   }
+}
+
 // Return matrix of qlmbar(i), qlm for each particle averaged over all
 // nearest neighbours.  The matrix has dimensions [i,(2l + 1)]. See
 // Lechner and Dellago JCP 129, 114707 Equation (6) BUT (!) note there
@@ -428,79 +514,67 @@ array2d qlmbars(const array2d& qlm, const vector<vector<int> >& lneigh,
    int npar = qlm.shape()[0];
    array2d qlmbar(boost::extents[npar][2 * lval + 1]);       
 
-   for (int i = 0; i != npar; ++i) {
-      for (int m = 0; m != 2 * lval + 1; ++m) {
-         complex<double> qlmval = qlm[i][m];
-         // add contribution to qlmval from neighbours
-         int nn = lneigh[i].size(); // num neighbours
-         for (int nnum = 0; nnum != nn; ++nnum) {
-            qlmval = qlmval + qlm[lneigh[i][nnum]][m];
-         }
-         qlmbar[i][m] = qlmval / static_cast<double>(nn + 1);
-      }
+#pragma omp parallel for schedule(static)
+   for (int i = 0; i < npar; ++i) {
+      qlmbaripar(qlm, lneigh, lval, i, qlmbar);
    }
    return qlmbar;
 }
 
+// Store qlm(i) for particle i in row i of qlm.
+
+void qlmipar(const ParticleArray& particles, const Box& simbox,
+             const vector<int>& numneigh,
+             const vector<vector<int> >& lneigh,
+             const int lval, const int i, array2d& qlm)
+{
+   const int nn = numneigh[i];
+   double sep[3];
+   int k;
+
+   // gather the bond vectors to the neighbours into separate x, y
+   // and z buffers; the Box method here takes into account the
+   // periodic bcs
+   vector<double> bx(nn), by(nn), bz(nn);
+   for (int j = 0; j != nn; ++j) {
+      simbox.sep(particles[i], particles[lneigh[i][j]], sep);
+      bx[j] = sep[0];
+      by[j] = sep[1];
+      bz[j] = sep[2];
+   }
+
+   // sum of spherical harmonics over all bonds (see opfunctions.cpp)
+   vector<complex<double> > ysum(2 * lval + 1);
+   ylmsum(lval, bx, by, bz, &ysum[0]);
+   for (k = 0; k != 2 * lval + 1; ++k) {
+      qlm[i][k] = ysum[k];
+   }
+
+   // We now have N_b(i)*qlm(i) for particle i stored in qlm[i][k]
+   // Now divide by N_b(i)
+   if (numneigh[i] >= 1) {
+      for (k = 0; k != 2 * lval + 1; ++k){
+         qlm[i][k] = qlm[i][k]/(static_cast<double>(numneigh[i]));
+      }
+   }
+}
+
 // Return matrix of qlm(i).  The matrix has dimensions [i,(2l + 1)]
 
-array2d qlms(const vector<Particle>& particles, const Box& simbox,
+array2d qlms(const ParticleArray& particles, const Box& simbox,
              const vector<int>& numneigh,
              const vector<vector<int> >& lneigh,
              const int lval)
 {
-   const vector<Particle>::size_type npar = particles.size();
+   const int npar = particles.size();
           
    // 2d array of complex numbers to store qlm for each particle
    array2d qlm(boost::extents[npar][2 * lval + 1]);
-   std::fill(qlm.origin(), qlm.origin() + qlm.size(), 0.0);
 
-   double r2,r,costheta,phi,rh;
-   double sep[3];
-   int k,m;
-   vector<Particle>::size_type i,j;
-          
-   for (i = 0; i != npar; ++i) {
-      for (j = 0; j != numneigh[i]; ++j) {
-         // get sep and r^2 for neighbouring particle
-         // the class method here takes into account the
-         // periodic bcs
-         simbox.sep(particles[i], particles[lneigh[i][j]], sep);
-         r2 = sep[0] * sep[0] + sep[1] * sep[1] + sep[2] * sep[2];
-
-         // compute angles cos(theta) and phi in
-         // spherical coords
-         r = sqrt(r2);
-         costheta = sep[2] / r;
-         rh = sqrt(sep[0] * sep[0] + sep[1] * sep[1]);
-         if ((sep[0] == 0.0) && (sep[1] == 0.0)) {
-            phi = 0.0;
-         }
-         else if (sep[1] > 0.0) {
-            phi = acos(sep[0] / rh);
-         }
-         else {
-            phi = 2.0 * PI - acos(sep[0] / rh);
-         }
-
-         // compute contribution of particle j to qlm of
-         // particle i
-         for (k = 0; k != 2 * lval + 1; ++k) {
-            m = -lval + k;
-            // spherical harmonic
-            qlm[i][k] += ylm(lval, m, costheta, phi);
-         }
-      }
-
-      // We now have N_b(i)*qlm(i) for particle i stored in qlm[i][k]
-      // Now divide by N_b(i)
-      if (numneigh[i] >= 1) {
-         for (int k = 0; k != 2 * lval + 1; ++k){
-            qlm[i][k] = qlm[i][k]/(static_cast<double>(numneigh[i]));
-         }
-      }
-                         
-   } // next particle i
+#pragma omp parallel for schedule(static)
+   for (int i = 0; i < npar; ++i) {
+      qlmipar(particles, simbox, numneigh, lneigh, lval, i, qlm);
+   }
 
    // the array we are returning is qlm(i), see comments in qdata.cpp
    return qlm;
@@ -13,20 +13,29 @@
 #include "constants.h"
 
 // Compute the spherical harmonics etc.
-array2d qlms(const std::vector<Particle>&, const Box&,
+void qlmipar(const ParticleArray&, const Box&,
+             const std::vector<int>&,
+             const std::vector<std::vector<int> >&, const int, const int,
+             array2d&);
+array2d qlms(const ParticleArray&, const Box&,
              const std::vector<int>&,
              const std::vector<std::vector<int> >&, const int);
 
 // Get normalised qlm matrix 
+void qlmtildeipar(const array2d&, const std::vector<int>&, const int,
+                  const int, array2d&);
 array2d qlmtildes(const array2d&, const std::vector<int>&,
                   const int);
 
 // Computes the LD 'averaged' qlms from the qlm matrix
+void qlmbaripar(const array2d&, const std::vector<std::vector<int> >&,
+                const int, const int, array2d&);
 array2d qlmbars(const array2d&, const std::vector<std::vector<int> >&,
                 const int);
 
-// Q value of some particles
+// Q and W values of some particles
 double Qpars(const array2d&, const std::vector<int>&, const int);
+double Wpars(const array2d&, const std::vector<int>&, const int);
 
 // vector of ql(i) values for every particle
 std::vector<double> qls(const array2d&);
@@ -35,11 +44,15 @@ std::vector<double> qls(const array2d&);
 std::vector<double> wls(const array2d&);
 
 // Number of crystalline links that each particle has (tenWolde-Frenkel)
+int nlinksipar(const array2d&, const std::vector<int>&,
+               const std::vector<std::vector<int> >&, const double,
+               const int, const int);
 std::vector<int> getnlinks(const array2d&, const std::vector<int>&,
                            const std::vector<std::vector<int> >&, const int,
                            const int, const double, const int);
 
 // Classify particles as BCC, HCP, FCC, etc. according to LD method
+LDCLASS classifyld(const double, const double, const double, const double);
 std::vector<LDCLASS> classifyparticlesld(const int,
                                          const std::vector<double>&,
                                          const std::vector<double>&,
@@ -51,9 +64,13 @@ std::vector<TFCLASS> classifyparticlestf(const std::vector<int>&, const int,
                                          const int);
 
 // Largest cluster of XTAL particles, and fraction of XTAL particles in system
-std::vector<int> largestclusterld(const std::vector<Particle>&, const Box&,
+std::vector<int> largestclusterld(const ParticleArray&, const Box&,
+                                  const std::vector<LDCLASS>&);
+std::vector<int> largestclustertf(const ParticleArray&, const Box&,
+                                  const std::vector<TFCLASS>&);
+std::vector<int> largestclusterld(const std::vector<std::vector<int> >&,
                                   const std::vector<LDCLASS>&);
-std::vector<int> largestclustertf(const std::vector<Particle>&, const Box&,
+std::vector<int> largestclustertf(const std::vector<std::vector<int> >&,
                                   const std::vector<TFCLASS>&);
 double fracsolidtf(const std::vector<TFCLASS>&, const int);
 double fracsolidld(const std::vector<LDCLASS>&, const int);
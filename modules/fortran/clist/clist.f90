@@ -7,7 +7,12 @@
 ! SUBROUTINES:
 ! new_nlist   - create neighbour list from particle positions
 ! getnumcells - return the number of cells in each dimension (x, y and z)
-! cellindx    - get the 3 indices of a cell (x, y, z) from its number
+! nlist_prev  - get the previous particle in the cell list of each particle
+! update_nlist - move a single particle to its new cell in the cell list
+! new_vlist   - create Verlet list of pairs of particles within rv
+! vlist_maxdispsq - maximum squared displacement since list was built
+! checker_numcells - number of cells in each dimension for checkerboard MC
+! checker_cell    - get the cell indices of the n-th cell of one colour
 
 subroutine new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar,&
                      ncelx, ncely, ncelz, ll, hoc, rnx, rny, rnz)
@@ -65,6 +70,7 @@ end subroutine new_nlist
 subroutine getnumcells(lboxx, lboxy, lboxz, rc, ncelx, ncely, ncelz)
   !!! from box dimensions, get the number of cells in each dim.
 
+  use cellstencil, only: cellsub, nsten, cellstencil_set
   implicit none
   integer, parameter :: db = 8 !selected_real_kind(13)
   
@@ -78,77 +84,285 @@ subroutine getnumcells(lboxx, lboxy, lboxz, rc, ncelx, ncely, ncelz)
   !f2py intent(in) :: lboxx, lboxy, lboxz, rc
   !f2py intent(out) :: ncelx, ncely, ncelz
 
-  ! build the cell list, this will fill ll, hoc, ncelx, ncely, ncelz
+  ! the number of cells in each dimension is chosen independently, so
+  ! that a thin or tall box (e.g. a slab with a surface) still gets
+  ! cells of side close to rc / cellsub (see cellstencil.f90).  There
+  ! may be fewer cells in a dimension than the stencil spans (see
+  ! cellstencil_heads).
+  if (nsten == 0) call cellstencil_set(cellsub)
+  ncelx = max(int(lboxx * cellsub / rc), 1)
+  ncely = max(int(lboxy * cellsub / rc), 1)
+  ncelz = max(int(lboxz * cellsub / rc), 1)
+
+end subroutine getnumcells
+
+subroutine nlist_prev(ll, hoc, ncelx, ncely, ncelz, npar, lp)
+  !!! from the cell list (ll, hoc), get lp, the previous particle in
+  !!! the linked list of each particle (zero for the particle at the
+  !!! head of the cell).  With lp, a particle can be removed from its
+  !!! cell without traversing the cell (see update_nlist).
+
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  integer, intent(in) :: ncelx, ncely, ncelz, npar
+  integer, dimension(npar), intent(in) :: ll
+  integer, dimension(ncelx, ncely, ncelz), intent(in) :: hoc
+
+  ! outputs
+  integer, dimension(npar), intent(out) :: lp
+
+  !f2py intent(in) :: ll, hoc, ncelx, ncely, ncelz, npar
+  !f2py intent(out) :: lp
+
+  integer :: i, j, k, ipar
+
+  do i = 1, ncelx
+     do j = 1, ncely
+        do k = 1, ncelz
+           ipar = hoc(i, j, k)
+           if (ipar /= 0) then
+              lp(ipar) = 0
+              do while (ll(ipar) /= 0)
+                 lp(ll(ipar)) = ipar
+                 ipar = ll(ipar)
+              end do
+           end if
+        end do
+     end do
+  end do
+
+end subroutine nlist_prev
+
+subroutine update_nlist(ipar, xold, yold, zold, xnew, ynew, znew,&
+                        ncelx, ncely, ncelz, rnx, rny, rnz, npar, ll,&
+                        lp, hoc)
+  !!! update the cell list (ll, lp, hoc) after particle ipar has moved
+  !!! from (xold, yold, zold) to (xnew, ynew, znew).  If the particle
+  !!! has changed cell, it is removed from the old cell and put at
+  !!! the head of the new cell; this takes constant time, whereas
+  !!! new_nlist goes through every particle.
+
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  integer, intent(in) :: ipar, ncelx, ncely, ncelz, npar
+  real(kind=db), intent(in) :: xold, yold, zold, xnew, ynew, znew
+  real(kind=db), intent(in) :: rnx, rny, rnz
+
+  ! outputs
+  integer, dimension(npar), intent(inout) :: ll, lp
+  integer, dimension(ncelx, ncely, ncelz), intent(inout) :: hoc
+
+  !f2py intent(in) :: ipar, xold, yold, zold, xnew, ynew, znew
+  !f2py intent(in) :: ncelx, ncely, ncelz, rnx, rny, rnz, npar
+  !f2py intent(in,out) :: ll, lp, hoc
+
+  integer :: ocelx, ocely, ocelz, ncx, ncy, ncz
+
+  ocelx = int(xold / rnx) + 1
+  ocely = int(yold / rny) + 1
+  ocelz = int(zold / rnz) + 1
+  ncx = int(xnew / rnx) + 1
+  ncy = int(ynew / rny) + 1
+  ncz = int(znew / rnz) + 1
+
+  if (ocelx == ncx .and. ocely == ncy .and. ocelz == ncz) return
+
+  ! remove from the old cell
+  if (lp(ipar) == 0) then
+     hoc(ocelx, ocely, ocelz) = ll(ipar)
+  else
+     ll(lp(ipar)) = ll(ipar)
+  end if
+  if (ll(ipar) /= 0) then
+     lp(ll(ipar)) = lp(ipar)
+  end if
+
+  ! put at the head of the new cell
+  ll(ipar) = hoc(ncx, ncy, ncz)
+  if (ll(ipar) /= 0) then
+     lp(ll(ipar)) = ipar
+  end if
+  lp(ipar) = 0
+  hoc(ncx, ncy, ncz) = ipar
+
+end subroutine update_nlist
+
+subroutine new_vlist(xpos, ypos, zpos, rv, lboxx, lboxy, lboxz, npar,&
+                     zperiodic, maxpair, npair, pairi, pairj)
+  !!! create Verlet list: every pair of particles (i < j) separated
+  !!! by less than rv is stored, once, in pairi and pairj.  If there
+  !!! are more than maxpair pairs, only the first maxpair are stored
+  !!! and npair returns the total number, so that the caller can
+  !!! enlarge pairi and pairj and call again.
+
+  use cellstencil, only: maxsten, cellstencil_heads
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  integer, intent(in) :: npar, maxpair
+  real(kind=db), dimension(npar), intent(in) :: xpos, ypos, zpos
+  real(kind=db), intent(in) :: rv, lboxx, lboxy, lboxz
+  logical, intent(in) :: zperiodic
+
+  ! outputs
+  integer, intent(out) :: npair
+  integer, dimension(maxpair), intent(out) :: pairi, pairj
+
+  !f2py intent(in) :: xpos, ypos, zpos, rv, lboxx, lboxy, lboxz, npar
+  !f2py intent(in) :: zperiodic, maxpair
+  !f2py intent(out) :: npair, pairi, pairj
+
+  integer, dimension(npar) :: ll
+  integer, allocatable, dimension(:,:,:) :: hoc
+  integer :: ncelx, ncely, ncelz, cellnum, icelx, icely, icelz, ipar,&
+             jpar, nhead
+  integer, dimension(maxsten) :: heads
+  real(kind=db) :: rnx, rny, rnz, rvsq, sepx, sepy, sepz
+
+  ! cell list with cells of side at least rv / cellsub (see getnumcells)
+  call getnumcells(lboxx, lboxy, lboxz, rv, ncelx, ncely, ncelz)
+  allocate( hoc(ncelx, ncely, ncelz) )
+  call new_nlist(xpos, ypos, zpos, rv, lboxx, lboxy, lboxz, npar,&
+                 ncelx, ncely, ncelz, ll, hoc, rnx, rny, rnz)
+
+  rvsq = rv**2
+  npair = 0
+  do ipar = 1, npar
+     icelx = int(xpos(ipar) / rnx) + 1
+     icely = int(ypos(ipar) / rny) + 1
+     icelz = int(zpos(ipar) / rnz) + 1
+
+     ! cellstencil_heads gives each of the neighbouring cells once, so
+     ! taking j > i gives each pair once
+     call cellstencil_heads(hoc, icelx, icely, icelz, ncelx, ncely,&
+                            ncelz, zperiodic, nhead, heads)
+     do cellnum = 1, nhead
+        jpar = heads(cellnum)
+        do while (jpar /= 0)
+           if (jpar > ipar) then
+              sepx = xpos(jpar) - xpos(ipar)
+              sepx = sepx - lboxx * nint(sepx / lboxx)
+              sepy = ypos(jpar) - ypos(ipar)
+              sepy = sepy - lboxy * nint(sepy / lboxy)
+              sepz = zpos(jpar) - zpos(ipar)
+              if (zperiodic) then
+                 sepz = sepz - lboxz * nint(sepz / lboxz)
+              end if
+              if (sepx**2 + sepy**2 + sepz**2 < rvsq) then
+                 npair = npair + 1
+                 if (npair <= maxpair) then
+                    pairi(npair) = ipar
+                    pairj(npair) = jpar
+                 end if
+              end if
+           end if
+           jpar = ll(jpar)
+        end do
+     end do
+  end do
+
+  deallocate(hoc)
+
+end subroutine new_vlist
+
+subroutine vlist_maxdispsq(xpos, ypos, zpos, xref, yref, zref, lboxx,&
+                           lboxy, lboxz, npar, zperiodic, dispsq)
+  !!! maximum squared displacement of any particle from its position
+  !!! when the Verlet list was built (xref, yref, zref).
+
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  integer, intent(in) :: npar
+  real(kind=db), dimension(npar), intent(in) :: xpos, ypos, zpos,&
+                                                xref, yref, zref
+  real(kind=db), intent(in) :: lboxx, lboxy, lboxz
+  logical, intent(in) :: zperiodic
+
+  ! outputs
+  real(kind=db), intent(out) :: dispsq
+
+  !f2py intent(in) :: xpos, ypos, zpos, xref, yref, zref
+  !f2py intent(in) :: lboxx, lboxy, lboxz, npar, zperiodic
+  !f2py intent(out) :: dispsq
+
+  integer :: i
+  real(kind=db) :: dx, dy, dz
+
+  dispsq = 0.0_db
+  do i = 1, npar
+     ! the particles may have been put back in the box since the
+     ! list was built
+     dx = xpos(i) - xref(i)
+     dx = dx - lboxx * nint(dx / lboxx)
+     dy = ypos(i) - yref(i)
+     dy = dy - lboxy * nint(dy / lboxy)
+     dz = zpos(i) - zref(i)
+     if (zperiodic) then
+        dz = dz - lboxz * nint(dz / lboxz)
+     end if
+     dispsq = max(dispsq, dx**2 + dy**2 + dz**2)
+  end do
+
+end subroutine vlist_maxdispsq
+
+subroutine checker_numcells(lboxx, lboxy, lboxz, rc, ncelx, ncely, ncelz)
+  !!! number of cells in each dimension for the checkerboard
+  !!! decomposition used by the parallel MC code.  This is the largest
+  !!! even number of cells with sides of at least rc, so that
+  !!! particles in two different cells of the same colour cannot
+  !!! interact.  The caller must check that there are at least 4
+  !!! cells in each dimension.
+
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  real(kind=db), intent(in) :: lboxx, lboxy, lboxz, rc
+
+  ! outputs
+  integer, intent(out) :: ncelx, ncely, ncelz
+
+  !f2py intent(in) :: lboxx, lboxy, lboxz, rc
+  !f2py intent(out) :: ncelx, ncely, ncelz
+
   ncelx = int(lboxx / rc)
   ncely = int(lboxy / rc)
   ncelz = int(lboxz / rc)
-  
-  ! if fewer than 3 cells in any direction, make box a single cell
-  if (ncelx < 3 .or. ncely < 3 .or. ncelz < 3) then
-     ncelx = 1
-     ncely = 1
-     ncelz = 1
-  end if
+  ncelx = ncelx - mod(ncelx, 2)
+  ncely = ncely - mod(ncely, 2)
+  ncelz = ncelz - mod(ncelz, 2)
 
-end subroutine getnumcells
+end subroutine checker_numcells
+
+subroutine checker_cell(n, icol, ncelx, ncely, ncelz, celx, cely, celz)
+  !!! get cell indices celx, cely, celz of the n-th cell (n from 1 to
+  !!! ncelx * ncely * ncelz / 8) of colour icol (from 0 to 7).  The
+  !!! colour is given by whether each of the three cell indices is odd
+  !!! or even.
 
-subroutine cellindx(celnum, icelx, icely, icelz, ncelx, ncely, ncelz,&
-                    celx, cely, celz)
-  !!! get cell indices celx, cely, celz.
-  
   implicit none
-  integer, parameter :: db = 8 !selected_real_kind(13)
-  
-  ! subroutine arguments
+
   ! inputs
-  integer, intent(in) :: celnum, icelx, icely, icelz, ncelx, ncely, ncelz
+  integer, intent(in) :: n, icol, ncelx, ncely, ncelz
   ! outputs
   integer, intent(out) :: celx, cely, celz
 
-  !f2py intent(in) :: celnum, icelx, icely, icelz, ncelx, ncely, ncelz
+  !f2py intent(in) :: n, icol, ncelx, ncely, ncelz
   !f2py intent(out) :: celx, cely, celz
-  
-  integer :: bcelx, bcely, bcelz, zcelnum, dcelx, dcely, dcelz
 
-  ! handle case of ncelx, ncely, ncelz = 1
-  if (ncelx == 1) then
-     celx = 1
-     cely = 1
-     celz = 1
-  else
-     
-     ! base cell is the bottom left of the 27 cells
-     bcelx = icelx - 1
-     bcely = icely - 1
-     bcelz = icelz - 1
-
-     ! numbers to add to base cell index
-     zcelnum = celnum - 1
-     dcelx = mod(zcelnum, 3)
-     dcely = mod(zcelnum / 3, 3)
-     dcelz = mod(zcelnum / 9, 3)
-
-     celx = bcelx + dcelx
-     cely = bcely + dcely
-     celz = bcelz + dcelz
-
-     ! periodic boundary conditions
-     if (celx <= 0) then
-        celx = celx + ncelx
-     else if (celx > ncelx) then
-        celx = celx - ncelx
-     end if
+  integer :: hx, hy
 
-     if (cely <= 0) then
-        cely = cely + ncely
-     else if (cely > ncely) then
-        cely = cely - ncely
-     end if
+  hx = ncelx / 2
+  hy = ncely / 2
+  celx = 2 * mod(n - 1, hx) + mod(icol, 2) + 1
+  cely = 2 * mod((n - 1) / hx, hy) + mod(icol / 2, 2) + 1
+  celz = 2 * ((n - 1) / (hx * hy)) + icol / 4 + 1
 
-     if (celz <= 0) then
-        celz = celz + ncelz
-     else if (celz > ncelz) then
-        celz = celz - ncelz
-     end if
-  end if
-end subroutine cellindx
+end subroutine checker_cell
@@ -14,8 +14,13 @@
 ! gauss_totalencreatelist - create the cell list and return total
 !                           p.e.
 ! gauss_totalenlist       - compute total p.e. using cell lists
+! gauss_totalenpairs      - compute total p.e. using Verlet list
 ! gauss_enlist            - compute total p.e. of particle i using
 !                           cell lists
+! gauss_enbuf             - add p.e. between a particle and a buffer of
+!                           particles (used by gauss_enlist)
+! gauss_totalenlistscaled - compute total p.e. using cell lists, with
+!                           the box and positions scaled
 
 subroutine gauss_totalenergy(xpos, ypos, zpos, rc, rcsq,&
                              lboxx, lboxy, lboxz, vrc, vrc2, npar,&
@@ -273,7 +278,7 @@ subroutine gauss_totalencreatelist(xpos, ypos, zpos, rc, rcsq,&
   
   ! get the number of cells and build the cell list
   call getnumcells(lboxx, lboxy, lboxz, rc, ncelx, ncely, ncelz)
-  allocate( hoc(ncelx, ncely, ncelx) )
+  allocate( hoc(ncelx, ncely, ncelz) )
   call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar,&
                  ncelx, ncely, ncelz, ll, hoc, rnx, rny, rnz)
   ! get total energy using cell list
@@ -292,6 +297,7 @@ subroutine gauss_totalenlist(ll, hoc, ncelx, ncely, ncelz,&
                              zperiodic, etot)
   ! Compute total potential energy of system using cell lists
 
+  use cellstencil, only: maxsten, cellstencil_heads
   implicit none
   integer, parameter :: db = 8 !selected_real_kind(13)
 
@@ -309,8 +315,8 @@ subroutine gauss_totalenlist(ll, hoc, ncelx, ncely, ncelz,&
   real(kind=db), intent(out) :: etot
 
   real(kind=db) :: eij, xposi, yposi, zposi
-  integer :: icelx, icely, icelz, cellnum, jpar, celx, cely, celz, &
-             nceltot, ipar
+  integer :: icelx, icely, icelz, cellnum, jpar, ipar, nhead
+  integer, dimension(maxsten) :: heads
   etot = 0.0_db
 
   do ipar = 1, npar
@@ -324,23 +330,13 @@ subroutine gauss_totalenlist(ll, hoc, ncelx, ncely, ncelz,&
      icely = int(yposi / rny) + 1
      icelz = int(zposi / rnz) + 1
 
-     ! go through each cell in turn (27 in total in three dimensions),
+     ! go through each nonempty cell of the stencil (cellstencil.f90),
      ! and add pot energy between particle i and all particles in the
      ! cell.
-     if (ncelx == 1) then
-        nceltot = 1
-     else
-        nceltot = 27
-     end if
-
-     do cellnum = 1, nceltot
-
-        ! get the next cell indexes (ncelx, ncely, ncelz)
-        call cellindx(cellnum, icelx, icely, icelz,& ! cell of particle i
-                      ncelx, ncely, ncelz,&          ! total num cells in each dim
-                      celx, cely, celz)              ! cell index we want
-
-        jpar = hoc(celx, cely, celz)
+     call cellstencil_heads(hoc, icelx, icely, icelz, ncelx, ncely,&
+                            ncelz, zperiodic, nhead, heads)
+     do cellnum = 1, nhead
+        jpar = heads(cellnum)
 
         do while (jpar /= 0)
            if (ipar /= jpar) then
@@ -363,6 +359,42 @@ subroutine gauss_totalenlist(ll, hoc, ncelx, ncely, ncelz,&
 
 end subroutine gauss_totalenlist
 
+subroutine gauss_totalenpairs(npair, pairi, pairj, xpos, ypos, zpos,&
+                              rc, rcsq, lboxx, lboxy, lboxz, vrc, vrc2,&
+                              npar, nsurf, zperiodic, etot)
+  ! Compute total potential energy of system using Verlet list (see
+  ! new_vlist in clist.f90).  Each pair appears once in the list.
+
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  integer, intent(in) :: npair
+  integer, dimension(npair), intent(in) :: pairi, pairj
+  real(kind=db), dimension(npar), intent(in) :: xpos, ypos, zpos
+  real(kind=db), intent(in) :: rc, rcsq, lboxx, lboxy, lboxz, vrc, vrc2
+  integer, intent(in) :: npar, nsurf
+  logical, intent(in) :: zperiodic
+
+  ! outputs
+  real(kind=db), intent(out) :: etot
+
+  real(kind=db) :: eij
+  integer :: k, ipar, jpar
+
+  etot = 0.0_db
+  do k = 1, npair
+     ipar = pairi(k)
+     jpar = pairj(k)
+     call gauss_eij(ipar, jpar, xpos(ipar), ypos(ipar), zpos(ipar),&
+                    xpos(jpar), ypos(jpar), zpos(jpar),&
+                    lboxx, lboxy, lboxz, rc, rcsq, vrc, vrc2, npar,&
+                    nsurf, zperiodic, eij)
+     etot = etot + eij
+  end do
+
+end subroutine gauss_totalenpairs
+
 subroutine gauss_kineticen(xvel, yvel, zvel, npar, ekintot)
   ! Compute kinetic energy (assume mass = 1 in our units)
 
@@ -388,6 +420,7 @@ subroutine gauss_enlist(ll, hoc, ncelx, ncely, ncelz, ipar, xposi,&
                         zperiodic, epot)
   ! Compute potential energy of particle i using cell lists
 
+  use cellstencil, only: maxsten, cellstencil_heads
   implicit none
   integer, parameter :: db = 8 !selected_real_kind(13)
 
@@ -405,8 +438,14 @@ subroutine gauss_enlist(ll, hoc, ncelx, ncely, ncelz, ipar, xposi,&
   ! outputs
   real(kind=db), intent(out) :: epot
 
-  real(kind=db) :: rnx, rny, rnz, eij
-  integer :: icelx, icely, icelz, cellnum, jpar, celx, cely, celz, nceltot
+  ! size of the buffers of particle positions
+  integer, parameter :: maxbuf = 256
+
+  real(kind=db) :: rnx, rny, rnz
+  integer :: icelx, icely, icelz, cellnum, jpar, nhead, nbuf
+  integer, dimension(maxsten) :: heads
+  real(kind=db), dimension(maxbuf) :: xbuf, ybuf, zbuf
+  logical, dimension(maxbuf) :: fluid
   epot = 0.0_db
 
   ! cell dimension in x, y and z directions
@@ -419,37 +458,175 @@ subroutine gauss_enlist(ll, hoc, ncelx, ncely, ncelz, ipar, xposi,&
   icely = int(yposi / rny) + 1
   icelz = int(zposi / rnz) + 1
   
-  ! go through each cell in turn (27 in total in three dimensions),
+  ! go through each nonempty cell of the stencil (cellstencil.f90),
   ! and add pot energy between particle i and all particles in the
-  ! cell.  Note if
-  if (ncelx == 1) then
-     nceltot = 1
-  else
-     nceltot = 27
-  end if
-  
-  do cellnum = 1, nceltot
-     
-     ! get the next cell indexes (ncelx, ncely, ncelz)
-     call cellindx(cellnum, icelx, icely, icelz,& ! cell of particle i
-                   ncelx, ncely, ncelz,&          ! total num cells in each dim
-                   celx, cely, celz)              ! cell index we want
-     
-     jpar = hoc(celx, cely, celz)
+  ! cell (each cell is visited once, see cellstencil_heads).
+  call cellstencil_heads(hoc, icelx, icely, icelz, ncelx, ncely,&
+                         ncelz, zperiodic, nhead, heads)
+  ! The positions of the particles are gathered into buffers, and the
+  ! p.e. of each full buffer is computed by gauss_enbuf.
+  nbuf = 0
+  do cellnum = 1, nhead
+     jpar = heads(cellnum)
      
      do while (jpar /= 0)
         if (ipar /= jpar) then
-           
-           ! get p.e. between particles i and j
-           call gauss_eij(ipar, jpar, xposi, yposi, zposi, xpos(jpar),&
-                          ypos(jpar), zpos(jpar), lboxx, lboxy, lboxz,&
-                          rc, rcsq, vrc, vrc2, npar, nsurf, zperiodic,&
-                          eij)           
-           epot = epot + eij
+           nbuf = nbuf + 1
+           xbuf(nbuf) = xpos(jpar)
+           ybuf(nbuf) = ypos(jpar)
+           zbuf(nbuf) = zpos(jpar)
+           fluid(nbuf) = ipar > nsurf .and. jpar > nsurf
+           if (nbuf == maxbuf) then
+              call gauss_enbuf(nbuf, xbuf, ybuf, zbuf, fluid, xposi,&
+                               yposi, zposi, lboxx, lboxy, lboxz, rcsq,&
+                               vrc, vrc2, zperiodic, epot)
+              nbuf = 0
+           end if
         end if
         jpar = ll(jpar)
 
      end do
   enddo
+  call gauss_enbuf(nbuf, xbuf, ybuf, zbuf, fluid, xposi, yposi, zposi,&
+                   lboxx, lboxy, lboxz, rcsq, vrc, vrc2, zperiodic,&
+                   epot)
 
 end subroutine gauss_enlist
+
+subroutine gauss_enbuf(nbuf, xbuf, ybuf, zbuf, fluid, xposi, yposi,&
+                       zposi, lboxx, lboxy, lboxz, rcsq, vrc, vrc2,&
+                       zperiodic, epot)
+  ! Add to epot the potential energy between a particle at xposi,
+  ! yposi, zposi and the nbuf particles at xbuf, ybuf, zbuf; fluid is
+  ! true if both particles of the pair are fluid particles.  As in
+  ! len_enbuf, the loop over the particles has no branches, so that
+  ! the compiler can vectorise it, and epot is the same as if
+  ! gauss_eij were called for each pair.
+
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  integer, intent(in) :: nbuf
+  real(kind=db), dimension(nbuf), intent(in) :: xbuf, ybuf, zbuf
+  logical, dimension(nbuf), intent(in) :: fluid
+  real(kind=db), intent(in) :: xposi, yposi, zposi
+  real(kind=db), intent(in) :: lboxx, lboxy, lboxz, rcsq, vrc, vrc2
+  logical, intent(in) :: zperiodic
+
+  ! outputs
+  real(kind=db), intent(inout) :: epot
+
+  !f2py intent(in) :: nbuf, xbuf, ybuf, zbuf, fluid, xposi, yposi, zposi
+  !f2py intent(in) :: lboxx, lboxy, lboxz, rcsq, vrc, vrc2, zperiodic
+  !f2py intent(in,out) :: epot
+
+  real(kind=db), dimension(nbuf) :: eij
+  real(kind=db) :: sepx, sepy, sepz, sepsq, hlboxz
+  integer :: n
+
+  ! no periodic boundary in z if hlboxz is huge
+  if (zperiodic) then
+     hlboxz = 0.5 * lboxz
+  else
+     hlboxz = huge(hlboxz)
+  end if
+
+  do n = 1, nbuf
+     sepx = xposi - xbuf(n)
+     sepx = sepx - merge(lboxx, 0.0_db, sepx > 0.5 * lboxx)&
+                 + merge(lboxx, 0.0_db, sepx < -0.5 * lboxx)
+     sepy = yposi - ybuf(n)
+     sepy = sepy - merge(lboxy, 0.0_db, sepy > 0.5 * lboxy)&
+                 + merge(lboxy, 0.0_db, sepy < -0.5 * lboxy)
+     sepz = zposi - zbuf(n)
+     sepz = sepz - merge(lboxz, 0.0_db, sepz > hlboxz)&
+                 + merge(lboxz, 0.0_db, sepz < -hlboxz)
+     sepsq = sepx**2 + sepy**2 + sepz**2
+
+     eij(n) = merge(merge(exp(-sepsq) - vrc, exp(-sepsq) - vrc2,&
+                          fluid(n)), 0.0_db, sepsq < rcsq)
+  end do
+
+  do n = 1, nbuf
+     epot = epot + eij(n)
+  end do
+
+end subroutine gauss_enbuf
+
+subroutine gauss_totalenlistscaled(ll, hoc, ncelx, ncely, ncelz, rnx,&
+                                   rny, rnz, xpos, ypos, zpos,&
+                                   scalefacx, scalefacy, scalefacz, rc,&
+                                   rcsq, lboxx, lboxy, lboxz, vrc,&
+                                   vrc2, npar, nsurf, zperiodic, etot)
+  ! Compute total potential energy of system using cell lists, for the
+  ! positions multiplied by scalefacx, scalefacy and scalefacz, in
+  ! the box lboxx, lboxy, lboxz (i.e. the box after scaling).  The
+  ! cell list (and rnx, rny, rnz) is for the unscaled positions; the
+  ! cells must be at least rc wide after scaling.  This gives the
+  ! energy for a trial volume move without changing the positions.
+
+  use cellstencil, only: maxsten, cellstencil_heads
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  integer, dimension(npar), intent(in) :: ll
+  integer, intent(in) :: ncelx, ncely, ncelz
+  real(kind=db), intent(in) :: rnx, rny, rnz
+  integer, dimension(ncelx, ncely, ncelz), intent(in) :: hoc
+  real(kind=db), dimension(npar), intent(in) :: xpos, ypos, zpos
+  real(kind=db), intent(in) :: scalefacx, scalefacy, scalefacz
+  real(kind=db), intent(in) :: rc, rcsq, lboxx, lboxy, lboxz, vrc, vrc2
+  integer, intent(in) :: npar, nsurf
+  logical, intent(in) :: zperiodic
+
+  ! outputs
+  real(kind=db), intent(out) :: etot
+
+  real(kind=db) :: eij, xposi, yposi, zposi
+  integer :: icelx, icely, icelz, cellnum, jpar, ipar, nhead
+  integer, dimension(maxsten) :: heads
+  etot = 0.0_db
+
+  do ipar = 1, npar
+
+     ! determine cell that particle i is in
+     icelx = int(xpos(ipar) / rnx) + 1
+     icely = int(ypos(ipar) / rny) + 1
+     icelz = int(zpos(ipar) / rnz) + 1
+
+     xposi = xpos(ipar) * scalefacx
+     yposi = ypos(ipar) * scalefacy
+     zposi = zpos(ipar) * scalefacz
+
+     ! go through each nonempty cell of the stencil (cellstencil.f90),
+     ! and add pot energy between particle i and all particles in the
+     ! cell.
+     call cellstencil_heads(hoc, icelx, icely, icelz, ncelx, ncely,&
+                            ncelz, zperiodic, nhead, heads)
+     do cellnum = 1, nhead
+        jpar = heads(cellnum)
+
+        do while (jpar /= 0)
+           if (ipar /= jpar) then
+
+              ! get p.e. between particles i and j
+              call gauss_eij(ipar, jpar, xposi, yposi, zposi,&
+                             xpos(jpar) * scalefacx,&
+                             ypos(jpar) * scalefacy,&
+                             zpos(jpar) * scalefacz, lboxx, lboxy,&
+                             lboxz, rc, rcsq, vrc, vrc2, npar, nsurf,&
+                             zperiodic, eij)
+              etot = etot + eij
+           end if
+           jpar = ll(jpar)
+
+        end do
+     end do
+  end do
+
+  ! double counting of potential energy
+  etot = etot / 2.0_db
+
+end subroutine gauss_totalenlistscaled
@@ -9,6 +9,8 @@
 ! gauss_fij             - compute force on particle i due to particle j
 ! gauss_forcecreatelist - create cell list then return force on each par
 ! gauss_forcelist       - compute force on every particle using cell list
+! gauss_forcepairs      - compute force on every particle using Verlet
+!                         list
 
 subroutine gauss_fij(ipar, jpar, xposi, yposi, zposi, xposj, yposj, zposj,&
                      lboxx, lboxy, lboxz, rc, rcsq,  npar, nsurf,&
@@ -119,7 +121,7 @@ subroutine gauss_forcecreatelist(xpos, ypos, zpos, rc, rcsq,&
   
   ! get the number of cells and build the cell list
   call getnumcells(lboxx, lboxy, lboxz, rc, ncelx, ncely, ncelz)
-  allocate(hoc(ncelx, ncely, ncelx))
+  allocate(hoc(ncelx, ncely, ncelz))
   call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar,&
                  ncelx, ncely, ncelz, ll, hoc, rnx, rny, rnz)
   ! get total energy using cell list
@@ -135,8 +137,12 @@ subroutine gauss_forcelist(ll, hoc, ncelx, ncely, ncelz,&
                            rnx, rny, rnz, xpos, ypos, zpos,&
                            rc, rcsq, lboxx, lboxy, lboxz, npar,&
                            nsurf, zperiodic, fx, fy, fz)
-  ! Compute force on every particle using cell list for efficiency
+  ! Compute force on every particle using cell list for efficiency.
+  ! Each pair is seen from both of its particles, so it is only
+  ! computed from the particle with the lower index, and the force on
+  ! the other particle is taken from Newton's third law.
 
+  use cellstencil, only: maxsten, cellstencil_heads
   implicit none
   integer, parameter :: db = 8 !selected_real_kind(13)
 
@@ -154,8 +160,8 @@ subroutine gauss_forcelist(ll, hoc, ncelx, ncely, ncelz,&
   real(kind=db), dimension(npar), intent(out) :: fx, fy, fz
 
   real(kind=db) :: eij, xposi, yposi, zposi, fxij, fyij, fzij
-  integer :: icelx, icely, icelz, cellnum, jpar, celx, cely, celz, &
-             nceltot, ipar
+  integer :: icelx, icely, icelz, cellnum, jpar, ipar, nhead
+  integer, dimension(maxsten) :: heads
 
   fx = 0.0_db
   fy = 0.0_db
@@ -172,26 +178,16 @@ subroutine gauss_forcelist(ll, hoc, ncelx, ncely, ncelz,&
      icely = int(yposi / rny) + 1
      icelz = int(zposi / rnz) + 1
 
-     ! go through each cell in turn (27 in total in three dimensions),
+     ! go through each nonempty cell of the stencil (cellstencil.f90),
      ! and add pot energy between particle i and all particles in the
-     ! cell.  Note if
-     if (ncelx == 1) then
-        nceltot = 1
-     else
-        nceltot = 27
-     end if
-
-     do cellnum = 1, nceltot
-
-        ! get the next cell indexes (ncelx, ncely, ncelz)
-        call cellindx(cellnum, icelx, icely, icelz,& ! cell of particle i
-                      ncelx, ncely, ncelz,&          ! total num cells in each dim
-                      celx, cely, celz)              ! cell index we want
-
-        jpar = hoc(celx, cely, celz)
+     ! cell (each cell is visited once, see cellstencil_heads).
+     call cellstencil_heads(hoc, icelx, icely, icelz, ncelx, ncely,&
+                            ncelz, zperiodic, nhead, heads)
+     do cellnum = 1, nhead
+        jpar = heads(cellnum)
 
         do while (jpar /= 0)
-           if (ipar /= jpar) then
+           if (jpar > ipar) then
 
               ! get force on particle i due to particle j
               call gauss_fij(ipar, jpar, xposi, yposi, zposi, xpos(jpar),&
@@ -200,7 +196,10 @@ subroutine gauss_forcelist(ll, hoc, ncelx, ncely, ncelz,&
                              zperiodic, fxij, fyij, fzij)
               fx(ipar) = fx(ipar) + fxij
               fy(ipar) = fy(ipar) + fyij
-              fz(ipar) = fz(ipar) + fzij              
+              fz(ipar) = fz(ipar) + fzij
+              fx(jpar) = fx(jpar) - fxij
+              fy(jpar) = fy(jpar) - fyij
+              fz(jpar) = fz(jpar) - fzij
            end if
            ! next particle in this cell
            jpar = ll(jpar)
@@ -209,3 +208,50 @@ subroutine gauss_forcelist(ll, hoc, ncelx, ncely, ncelz,&
   end do
 
 end subroutine gauss_forcelist
+
+subroutine gauss_forcepairs(npair, pairi, pairj, xpos, ypos, zpos,&
+                            rc, rcsq, lboxx, lboxy, lboxz, npar,&
+                            nsurf, zperiodic, fx, fy, fz)
+  ! Compute force on every particle using Verlet list (see new_vlist
+  ! in clist.f90).  Each pair appears once in the list, so the force
+  ! on particle j due to particle i is taken from Newton's third law.
+
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  integer, intent(in) :: npair
+  integer, dimension(npair), intent(in) :: pairi, pairj
+  real(kind=db), dimension(npar), intent(in) :: xpos, ypos, zpos
+  real(kind=db), intent(in) :: rc, rcsq, lboxx, lboxy, lboxz
+  integer, intent(in) :: npar, nsurf
+  logical, intent(in) :: zperiodic
+
+  ! outputs
+  real(kind=db), dimension(npar), intent(out) :: fx, fy, fz
+
+  real(kind=db) :: fxij, fyij, fzij
+  integer :: k, ipar, jpar
+
+  fx = 0.0_db
+  fy = 0.0_db
+  fz = 0.0_db
+
+  do k = 1, npair
+     ipar = pairi(k)
+     jpar = pairj(k)
+
+     ! get force on particle i due to particle j
+     call gauss_fij(ipar, jpar, xpos(ipar), ypos(ipar), zpos(ipar),&
+                    xpos(jpar), ypos(jpar), zpos(jpar),&
+                    lboxx, lboxy, lboxz, rc, rcsq, npar, nsurf,&
+                    zperiodic, fxij, fyij, fzij)
+     fx(ipar) = fx(ipar) + fxij
+     fy(ipar) = fy(ipar) + fyij
+     fz(ipar) = fz(ipar) + fzij
+     fx(jpar) = fx(jpar) - fxij
+     fy(jpar) = fy(jpar) - fyij
+     fz(jpar) = fz(jpar) - fzij
+  end do
+
+end subroutine gauss_forcepairs
@@ -5,6 +5,10 @@
 ! Fortran subroutine for executing Monte carlo cycles.  A cycle
 ! consists of nparfl attempted positional moves and a single volume
 ! move (on average).  The Metropolis Monte Carlo algorithm is used.
+! The energy of a trial volume is computed with scaled positions
+! (see gauss_totalenlistscaled in gauss_energy.f90), so that the
+! positions are only rescaled, and the cell list only rebuilt, when
+! a volume move is accepted.
 !
 ! SUBROUTINES:
 ! gauss_executecyclesnpt - execute ncycles monte carlo cycles
@@ -18,6 +22,11 @@ subroutine gauss_executecyclesnpt(xpos, ypos, zpos, ncycles, nsamp,&
                                   sameseed, etot)
   ! execute ncycles MC cycles
 
+  use simstate, only: ncelx, ncely, ncelz, rnx, rny, rnz, ll, lp, hoc,&
+                      simstate_seed, simstate_nlist, simstate_store,&
+                      simstate_addmoves
+  use rng, only: rng_uniform, rng_uniform3
+  use cellstencil, only: cellsub
   implicit none
   integer, parameter :: db = 8 !selected_real_kind(13)
 
@@ -39,27 +48,27 @@ subroutine gauss_executecyclesnpt(xpos, ypos, zpos, ncycles, nsamp,&
              nparfl, i, j
   real(kind=db) :: rsc, xposi, yposi, zposi, xposinew, yposinew,&
                    zposinew, eold, enew
-  real(kind=db) :: lboxnew, lboxxold, lboxyold, lboxzold
+  real(kind=db) :: lboxxnew, lboxynew, lboxznew
   real(kind=db) :: vboxold, lnvold, lnvnew, vboxnew
   real(kind=db) :: scalefacx, scalefacy, scalefacz, arg, etotnew
   real(kind=db), dimension(3) :: rvec
   logical :: accept
   ! these are for cell lists
-  integer :: ncelx, ncely, ncelz, ncelxold, ncelyold, ncelzold
-  real(kind=db) :: rnx, rny, rnz, rnxold, rnyold, rnzold
-  integer, dimension(npar) :: ll, llold
-  integer, allocatable, dimension(:,:,:) :: hoc, hocold
-  logical :: newlist
+  integer :: ncelxnew, ncelynew, ncelznew
+  real(kind=db) :: rnxnew, rnynew, rnznew
+  integer, dimension(npar) :: llnew
+  real(kind=db), dimension(npar) :: xposnew, yposnew, zposnew
+  integer, allocatable, dimension(:,:,:) :: hocnew
   
-  ! initialize random number generator
-  call init_random_seed(sameseed)
+  ! initialize random number generator (if the simulation state is
+  ! kept between calls, this was done once by simstate_init).  If a
+  ! counter-based stream has been set (see rng.f90), it is used
+  ! instead.
+  call simstate_seed(sameseed)
 
-  ! get the number of cells and build the cell list
-  call getnumcells(lboxx, lboxy, lboxz, rc, ncelx, ncely, ncelz)
-  write(*,*) 'num cells', ncelx, ncely, ncelz
-  allocate( hoc(ncelx, ncely, ncelx) )
-  call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar,&
-                 ncelx, ncely, ncelz, ll, hoc, rnx, rny, rnz)
+  ! get the cell list; this is only built if the cell list stored
+  ! by the previous call cannot be reused (see simstate.f90)
+  call simstate_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar)
 
   atmovdisp = 0
   acmovdisp = 0
@@ -73,7 +82,7 @@ subroutine gauss_executecyclesnpt(xpos, ypos, zpos, ncycles, nsamp,&
      do it = 1, nparfl + 1 
 
         ! pick a random number between [nsurf,ntot+1]
-        call random_number(rsc)
+        call rng_uniform(rsc)
         ipar = int(rsc * (nparfl + 1)) + nsurf + 1
 
         ! if ipar > npar, we attempt a volume move, else we attempt a
@@ -83,14 +92,11 @@ subroutine gauss_executecyclesnpt(xpos, ypos, zpos, ncycles, nsamp,&
            atmovvol = atmovvol + 1
 
            ! old box volume
-           lboxxold = lboxx
-           lboxyold = lboxy
-           lboxzold = lboxz
            vboxold = lboxx * lboxy * lboxz
            lnvold = log(vboxold)
 
            ! random number between 0 and 1 for attempted volume move
-           call random_number(rsc)
+           call rng_uniform(rsc)
               
            ! new box volume
            lnvnew = lnvold + maxvol*(rsc - 0.5_db)
@@ -113,91 +119,105 @@ subroutine gauss_executecyclesnpt(xpos, ypos, zpos, ncycles, nsamp,&
            end if
 
            ! new box dimensions
-           lboxx = lboxx * scalefacx
-           lboxy = lboxy * scalefacy
-           lboxz = lboxz * scalefacz
-
-           ! rescale particle positions to new volume
-           xpos = xpos * scalefacx
-           ypos = ypos * scalefacy
-           zpos = zpos * scalefacz
-
-           ! if z is periodic, and we have some 'surface' particles -
-           ! this is the case, e.g., when we are studying a 'seed'
-           ! particle immersed in fluid - don't rescale the positions
-           ! of the surface particles .  We need to be a bit careful
-           ! with the position of the seed here, since we are not
-           ! checking that the seed is still inside the simulation
-           ! box.
-           if ((zperiodic) .and. (nsurf > 0)) then
-              xpos(1:nsurf) = xpos(1:nsurf) / scalefacx
-              ypos(1:nsurf) = ypos(1:nsurf) / scalefacy
-              zpos(1:nsurf) = zpos(1:nsurf) / scalefacz
+           lboxxnew = lboxx * scalefacx
+           lboxynew = lboxy * scalefacy
+           lboxznew = lboxz * scalefacz
+
+           ! new energy.  We don't rescale the positions or rebuild the
+           ! cell list here: the energy is computed from the current
+           ! positions and cell list, with each position scaled by the
+           ! scale factors, so nothing needs to be undone if the move
+           ! is rejected.  This needs the cells to still be at least rc
+           ! / cellsub wide in the new box, and all particles to be
+           ! scaled.  If z is periodic, and we have some 'surface'
+           ! particles - this is the case, e.g., when we are studying
+           ! a 'seed' particle immersed in fluid - we don't rescale
+           ! the positions of the surface particles, so for this, or
+           ! if the box shrunk, we compute the energy from a copy of
+           ! the rescaled positions and a new cell list.  We need to be
+           ! a bit careful with the position of the seed here, since
+           ! we are not checking that the seed is still inside the
+           ! simulation box.
+           if (.not. (zperiodic .and. nsurf > 0) .and.&
+               (ncelx == 1 .or. cellsub * rnx * scalefacx >= rc) .and.&
+               (ncely == 1 .or. cellsub * rny * scalefacy >= rc) .and.&
+               (ncelz == 1 .or. cellsub * rnz * scalefacz >= rc)) then
+              call gauss_totalenlistscaled(ll, hoc, ncelx, ncely,&
+                                           ncelz, rnx, rny, rnz, xpos,&
+                                           ypos, zpos, scalefacx,&
+                                           scalefacy, scalefacz, rc,&
+                                           rcsq, lboxxnew, lboxynew,&
+                                           lboxznew, vrc, vrc2, npar,&
+                                           nsurf, zperiodic, etotnew)
+           else
+              xposnew = xpos * scalefacx
+              yposnew = ypos * scalefacy
+              zposnew = zpos * scalefacz
+              if (zperiodic .and. nsurf > 0) then
+                 xposnew(1:nsurf) = xpos(1:nsurf)
+                 yposnew(1:nsurf) = ypos(1:nsurf)
+                 zposnew(1:nsurf) = zpos(1:nsurf)
+              end if
+              call getnumcells(lboxxnew, lboxynew, lboxznew, rc,&
+                               ncelxnew, ncelynew, ncelznew)
+              allocate(hocnew(ncelxnew, ncelynew, ncelznew))
+              call new_nlist(xposnew, yposnew, zposnew, rc, lboxxnew,&
+                             lboxynew, lboxznew, npar, ncelxnew,&
+                             ncelynew, ncelznew, llnew, hocnew, rnxnew,&
+                             rnynew, rnznew)
+              call gauss_totalenlist(llnew, hocnew, ncelxnew, ncelynew,&
+                                     ncelznew, rnxnew, rnynew, rnznew,&
+                                     xposnew, yposnew, zposnew, rc,&
+                                     rcsq, lboxxnew, lboxynew, lboxznew,&
+                                     vrc, vrc2, npar, nsurf, zperiodic,&
+                                     etotnew)
+              deallocate(hocnew)
            end if
-        
-           ! save old cell list info
-           llold = ll
-           hocold = hoc
-           ncelxold = ncelx
-           ncelyold = ncely
-           ncelzold = ncelz
-           rnxold = rnx
-           rnyold = rny
-           rnzold = rnz
-           
-           ! get the number of cells and build the cell list
-           call getnumcells(lboxx, lboxy, lboxz, rc, ncelx, ncely, ncelz)
-           deallocate(hoc)
-           allocate( hoc(ncelx, ncely, ncelx) )
-           call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar,&
-                          ncelx, ncely, ncelz, ll, hoc, rnx, rny, rnz)           
-      
-           ! new energy, note we are using new box dimensions
-           call gauss_totalenlist(ll, hoc, ncelx, ncely, ncelz, rnx,&
-                                  rny, rnz, xpos, ypos, zpos, rc, rcsq,&
-                                  lboxx, lboxy, lboxz, vrc, vrc2, npar,&
-                                  nsurf, zperiodic, etotnew)
 
            ! See FS p122 (Algorithm 11) for this acceptance rule
+           
            arg = epsovert * (etot - etotnew + press * (vboxold - vboxnew)) + &
                  (nparfl + 1) * (lnvnew - lnvold)
            accept = .True.
            if (arg < 0) then
-              call random_number(rsc)
-              if (rsc > exp(arg)) then
-                 accept = .False.
-                 
-                 ! back to old boxsize and positions
-                 lboxx = lboxxold
-                 lboxy = lboxyold
-                 lboxz = lboxzold
-                 xpos = xpos / scalefacx
-                 ypos = ypos / scalefacy
-                 zpos = zpos / scalefacz
-                 
-                 ! if we are periodic and we have a surface, put the
-                 ! surface particles back in they're original
-                 ! positions.  Note this is for simulations with seed
-                 ! particles.
-                 if (zperiodic .and. nsurf > 0) then
-                    xpos(1:nsurf) = xpos(1:nsurf) * scalefacx
-                    ypos(1:nsurf) = ypos(1:nsurf) * scalefacy
-                    zpos(1:nsurf) = zpos(1:nsurf) * scalefacz
-                 end if
-                 
-                 ! old cell list info
-                 ll = llold
-                 hoc = hocold
-                 ncelx = ncelxold
-                 ncely = ncelyold
-                 ncelz = ncelzold
-                 rnx = rnxold
-                 rny = rnyold
-                 rnz = rnzold
-              end if
+              call rng_uniform(rsc)
+              if (rsc > exp(arg)) accept = .False.
            end if
 
            if (accept) then
+              ! rescale box and particle positions to new volume
+              lboxx = lboxxnew
+              lboxy = lboxynew
+              lboxz = lboxznew
+              if (zperiodic .and. nsurf > 0) then
+                 xpos(nsurf+1:npar) = xpos(nsurf+1:npar) * scalefacx
+                 ypos(nsurf+1:npar) = ypos(nsurf+1:npar) * scalefacy
+                 zpos(nsurf+1:npar) = zpos(nsurf+1:npar) * scalefacz
+              else
+                 xpos = xpos * scalefacx
+                 ypos = ypos * scalefacy
+                 zpos = zpos * scalefacz
+              end if
+
+              ! rebuild the cell list for the new positions (we don't
+              ! keep the old one: after rescaling, rounding can put a
+              ! particle on a cell boundary in a different cell from
+              ! the one it is listed in, see update_nlist in clist.f90)
+              call getnumcells(lboxx, lboxy, lboxz, rc, ncelxnew,&
+                               ncelynew, ncelznew)
+              if (ncelxnew /= ncelx .or. ncelynew /= ncely .or.&
+                  ncelznew /= ncelz) then
+                 ncelx = ncelxnew
+                 ncely = ncelynew
+                 ncelz = ncelznew
+                 deallocate(hoc)
+                 allocate(hoc(ncelx, ncely, ncelz))
+              end if
+              call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz,&
+                             npar, ncelx, ncely, ncelz, ll, hoc, rnx,&
+                             rny, rnz)
+              call nlist_prev(ll, hoc, ncelx, ncely, ncelz, npar, lp)
+
               etot = etotnew
               acmovvol = acmovvol + 1
            end if
@@ -216,7 +236,7 @@ subroutine gauss_executecyclesnpt(xpos, ypos, zpos, ncycles, nsamp,&
                              nsurf, zperiodic, eold)
 
            ! displace particle
-           call random_number(rvec)
+           call rng_uniform3(rvec)
            xposinew = xposi + maxdisp * (rvec(1) - 0.5_db)
            yposinew = yposi + maxdisp * (rvec(2) - 0.5_db)
            zposinew = zposi + maxdisp * (rvec(3) - 0.5_db)
@@ -255,39 +275,26 @@ subroutine gauss_executecyclesnpt(xpos, ypos, zpos, ncycles, nsamp,&
               ! choose whether to accept the move or not
               accept = .True.
               if (enew > eold) then
-                 call random_number(rsc)
+                 call rng_uniform(rsc)
                  if (exp((eold - enew) * epsovert) < rsc) accept = .False.
               end if
 
               ! update positions if move accepted
               if (accept) then
 
-                 ! we don't rebuild the cell list by default.
-                 newlist = .false.
-
-                 ! check if the particle moved outside of its cell, if
-                 ! so we need the rebuild the cell list.  Note that
-                 ! the bracketed terms are in fact the cell number
-                 ! minus one, but there is clearly no point in adding
-                 ! the one here.
-                 if ((int(xpos(ipar) / rnx) .ne. int(xposinew / rnx)) .or.&
-                      (int(ypos(ipar) / rny) .ne. int(yposinew / rny)) .or.&
-                      (int(zpos(ipar) / rnz) .ne. int(zposinew / rnz))) then
-                    newlist = .true.
-                 end if
-                 
+                 ! move the particle to its new cell, if it has left its
+                 ! old cell (this is much cheaper than rebuilding the
+                 ! cell list)
+                 call update_nlist(ipar, xpos(ipar), ypos(ipar), zpos(ipar),&
+                                   xposinew, yposinew, zposinew, ncelx,&
+                                   ncely, ncelz, rnx, rny, rnz, npar, ll,&
+                                   lp, hoc)
+
                  xpos(ipar) = xposinew
                  ypos(ipar) = yposinew
                  zpos(ipar) = zposinew
                  etot = etot - eold + enew
                  acmovdisp = acmovdisp + 1
-
-                 if (newlist) then
-                    ! update the cell list
-                    call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, &
-                                   lboxz, npar, ncelx, ncely, ncelz, ll, &
-                                   hoc, rnx, rny, rnz)
-                 end if
               end if
            end if
         end if
@@ -298,6 +305,10 @@ subroutine gauss_executecyclesnpt(xpos, ypos, zpos, ncycles, nsamp,&
      
   end do
 
+  ! the cell list is up to date for the final positions and box
+  call simstate_store(rc, lboxx, lboxy, lboxz)
+  call simstate_addmoves(atmovdisp, acmovdisp, atmovvol, acmovvol)
+
   ! write out acceptance ratio
   write(*, '("acceptance ratio", I7, I7, F7.3, I7, I7, F7.3)')&
        acmovdisp,atmovdisp, real(acmovdisp) / atmovdisp,&
@@ -3,7 +3,11 @@
 ! j.mithen@surrey.ac.uk
 !
 ! Fortran subroutine for executing Molecular dynamics cycles.  We use
-! the velocity Verlet algorithm.
+! the velocity Verlet algorithm.  If skin > 0, the forces are computed
+! from a Verlet list of all pairs of particles within rc + skin, which
+! is rebuilt only when some particle has moved by more than skin / 2
+! since the list was built; otherwise the cell list is rebuilt every
+! timestep.
 !
 ! SUBROUTINES:
 ! gauss_executecyclesnve - execute ncycles molecular dynmics cycles
@@ -13,7 +17,7 @@ subroutine gauss_executecyclesnve(xpos, ypos, zpos, xvel, yvel, zvel,&
                                   fx, fy, fz, ncycles, nsamp, dt, rc,&
                                   rcsq, vrc, vrc2, lboxx, lboxy, lboxz,&
                                   mass, npar, nsurf, zperiodic, vscale,&
-                                  temp)
+                                  temp, skin)
 
   implicit none
   integer, parameter :: db = 8 !selected_real_kind(13)
@@ -21,7 +25,7 @@ subroutine gauss_executecyclesnve(xpos, ypos, zpos, xvel, yvel, zvel,&
   ! inputs
   integer, intent(in) :: ncycles, nsamp, npar, nsurf
   real(kind=db), intent(in) :: dt, rc, rcsq, vrc, vrc2
-  real(kind=db), intent(in) :: lboxx, lboxy, lboxz, mass, temp
+  real(kind=db), intent(in) :: lboxx, lboxy, lboxz, mass, temp, skin
   logical, intent(in) :: zperiodic, vscale
 
   ! outputs
@@ -30,7 +34,7 @@ subroutine gauss_executecyclesnve(xpos, ypos, zpos, xvel, yvel, zvel,&
                                                    fx, fy, fz
 
   !f2py intent(in) :: ncycles, nsamp, dt, rc, rcsq, lboxx, lboxy, lboxz
-  !f2py intent(in) :: vrc, vrc2, mass, npar, nparsuf, zperiodic
+  !f2py intent(in) :: vrc, vrc2, mass, npar, nparsuf, zperiodic, skin
   !f2py intent(in,out) :: xpos, ypos, zpos, xvel, yvel, zvel, fx, fy, fz
 
   real(kind=db) :: rsc, xposi, yposi, zposi, xposinew, yposinew,&
@@ -43,24 +47,59 @@ subroutine gauss_executecyclesnve(xpos, ypos, zpos, xvel, yvel, zvel,&
   real(kind=db) :: rnx, rny, rnz
   integer, dimension(npar) :: ll
   integer, allocatable, dimension(:,:,:) :: hoc
+  ! these are for the Verlet list
+  logical :: useverlet
+  integer :: npair, maxpair, nbuild
+  integer, allocatable, dimension(:) :: pairi, pairj
+  real(kind=db), dimension(npar) :: xref, yref, zref
+  real(kind=db) :: dispsq
+
+  useverlet = (skin > 0.0_db)
+  if (useverlet) then
+     ! build the Verlet list of pairs within rc + skin
+     maxpair = 16 * npar
+     allocate( pairi(maxpair), pairj(maxpair) )
+     nbuild = 0
+     call new_vlist(xpos, ypos, zpos, rc + skin, lboxx, lboxy, lboxz,&
+                    npar, zperiodic, maxpair, npair, pairi, pairj)
+     if (npair > maxpair) then
+        ! not enough room for all of the pairs: enlarge the arrays,
+        ! leaving some room for the number of pairs to grow
+        deallocate(pairi, pairj)
+        maxpair = npair + npair / 4 + npar
+        allocate( pairi(maxpair), pairj(maxpair) )
+        call new_vlist(xpos, ypos, zpos, rc + skin, lboxx, lboxy, lboxz,&
+                       npar, zperiodic, maxpair, npair, pairi, pairj)
+     end if
+     xref = xpos
+     yref = ypos
+     zref = zpos
+     nbuild = nbuild + 1
+  else
+     ! get the number of cells and build the cell list
+     call getnumcells(lboxx, lboxy, lboxz, rc, ncelx, ncely, ncelz)
+     write(*,*) 'num cells', ncelx, ncely, ncelz
+     allocate( hoc(ncelx, ncely, ncelz) )
+     ! construct the cell list
+     call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar,&
+                    ncelx, ncely, ncelz, ll, hoc, rnx, rny, rnz)
+  end if
 
-  ! get the number of cells and build the cell list
-  call getnumcells(lboxx, lboxy, lboxz, rc, ncelx, ncely, ncelz)
-  write(*,*) 'num cells', ncelx, ncely, ncelz
-  allocate( hoc(ncelx, ncely, ncelx) )
-  ! construct the cell list
-  call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar,&
-                 ncelx, ncely, ncelz, ll, hoc, rnx, rny, rnz)
-  
   ! precompute half of timestep and half of timestep squared
   p5dt = 0.5_db * dt
   p5dtsq = 0.5_db * (dt**2)
 
   ! output initial PE, KE and total energy per particle
-  call gauss_totalenlist(ll, hoc, ncelx, ncely, ncelz, rnx, rny,&
-                         rnz, xpos, ypos, zpos, rc, rcsq, lboxx,&
-                         lboxy, lboxz, vrc, vrc2, npar, nsurf,&
-                         zperiodic, epottot)
+  if (useverlet) then
+     call gauss_totalenpairs(npair, pairi, pairj, xpos, ypos, zpos,&
+                             rc, rcsq, lboxx, lboxy, lboxz, vrc, vrc2,&
+                             npar, nsurf, zperiodic, epottot)
+  else
+     call gauss_totalenlist(ll, hoc, ncelx, ncely, ncelz, rnx, rny,&
+                            rnz, xpos, ypos, zpos, rc, rcsq, lboxx,&
+                            lboxy, lboxz, vrc, vrc2, npar, nsurf,&
+                            zperiodic, epottot)
+  end if
   call gauss_kineticen(xvel, yvel, zvel, npar, ekintot)
 
   ! we use ekintot2 and epottot2 to store total kinetic and total
@@ -106,16 +145,47 @@ subroutine gauss_executecyclesnve(xpos, ypos, zpos, xvel, yvel, zvel,&
         
      end do ! apply periodic BCs
 
-     ! we need to rebuild the cell list with the new positions
-     call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar,&
-                    ncelx, ncely, ncelz, ll, hoc, rnx, rny, rnz)
+     if (useverlet) then
+        ! the Verlet list is still valid unless some particle has
+        ! moved by more than half of the skin
+        call vlist_maxdispsq(xpos, ypos, zpos, xref, yref, zref,&
+                             lboxx, lboxy, lboxz, npar, zperiodic,&
+                             dispsq)
+        if (dispsq > (0.5_db * skin)**2) then
+           call new_vlist(xpos, ypos, zpos, rc + skin, lboxx, lboxy,&
+                          lboxz, npar, zperiodic, maxpair, npair, pairi,&
+                          pairj)
+           if (npair > maxpair) then
+              deallocate(pairi, pairj)
+              maxpair = npair + npair / 4 + npar
+              allocate( pairi(maxpair), pairj(maxpair) )
+              call new_vlist(xpos, ypos, zpos, rc + skin, lboxx, lboxy,&
+                             lboxz, npar, zperiodic, maxpair, npair,&
+                             pairi, pairj)
+           end if
+           xref = xpos
+           yref = ypos
+           zref = zpos
+           nbuild = nbuild + 1
+        end if
 
-     ! compute new forces using new positions (note we still need to
-     ! keep old forces)
-     call gauss_forcelist(ll, hoc, ncelx, ncely, ncelz, rnx, rny, rnz,&
-                          xpos, ypos, zpos, rc, rcsq, lboxx, lboxy,&
-                          lboxz, npar, nsurf, zperiodic, newfx, newfy,&
-                          newfz)
+        ! compute new forces using new positions (note we still need
+        ! to keep old forces)
+        call gauss_forcepairs(npair, pairi, pairj, xpos, ypos, zpos,&
+                              rc, rcsq, lboxx, lboxy, lboxz, npar,&
+                              nsurf, zperiodic, newfx, newfy, newfz)
+     else
+        ! we need to rebuild the cell list with the new positions
+        call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar,&
+                       ncelx, ncely, ncelz, ll, hoc, rnx, rny, rnz)
+
+        ! compute new forces using new positions (note we still need
+        ! to keep old forces)
+        call gauss_forcelist(ll, hoc, ncelx, ncely, ncelz, rnx, rny,&
+                             rnz, xpos, ypos, zpos, rc, rcsq, lboxx,&
+                             lboxy, lboxz, npar, nsurf, zperiodic,&
+                             newfx, newfy, newfz)
+     end if
   
      ! compute new velocities using new and old forces
      xvel = xvel + (newfx + fx) * p5dt
@@ -139,10 +209,17 @@ subroutine gauss_executecyclesnve(xpos, ypos, zpos, xvel, yvel, zvel,&
      ! write out diagnostics after every nsamp cycles
      if (mod(cy, nsamp) == 0) then
         ! compute PE and KE
-        call gauss_totalenlist(ll, hoc, ncelx, ncely, ncelz, rnx, rny,&
-                               rnz, xpos, ypos, zpos, rc, rcsq, lboxx,&
-                               lboxy, lboxz, vrc, vrc2, npar, nsurf,&
-                               zperiodic, epottot)
+        if (useverlet) then
+           call gauss_totalenpairs(npair, pairi, pairj, xpos, ypos,&
+                                   zpos, rc, rcsq, lboxx, lboxy, lboxz,&
+                                   vrc, vrc2, npar, nsurf, zperiodic,&
+                                   epottot)
+        else
+           call gauss_totalenlist(ll, hoc, ncelx, ncely, ncelz, rnx,&
+                                  rny, rnz, xpos, ypos, zpos, rc, rcsq,&
+                                  lboxx, lboxy, lboxz, vrc, vrc2, npar,&
+                                  nsurf, zperiodic, epottot)
+        end if
         call gauss_kineticen(xvel, yvel, zvel, npar, ekintot)
         ! output PE/npar, KE/(npar*T) ~ 1.5 and total energy per particle
         epottot2 = epottot / npar
@@ -151,5 +228,12 @@ subroutine gauss_executecyclesnve(xpos, ypos, zpos, xvel, yvel, zvel,&
      end if
 
   end do
-  
+
+  if (useverlet) then
+     write(*,*) 'Verlet list builds', nbuild
+     deallocate(pairi, pairj)
+  else
+     deallocate(hoc)
+  end if
+
 end subroutine gauss_executecyclesnve
@@ -0,0 +1,154 @@
+! cellstencil.f90
+! James Mithen
+! j.mithen@surrey.ac.uk
+!
+! Stencil of neighbouring cells searched by the cell list subroutines
+! (see clist.f90).  By default the cells have sides of at least rc,
+! and the 27 cells around and including the cell of a particle are
+! searched.  These make up a volume of 27 rc^3, whereas the sphere
+! of radius rc is only 4.2 rc^3, so most of the pairs tested are
+! outside the cutoff.  If cellsub is 2 or 3, the cells have sides of
+! at least rc / cellsub instead, and the stencil is all the cells
+! within cellsub cells of the cell of the particle, less those that
+! are entirely further than rc away from it; for cellsub = 2 this is
+! a volume of 15.6 rc^3 and for cellsub = 3 it is 11.5 rc^3.  Smaller
+! cells mean more empty cells to visit, so this pays only for dense
+! systems.  The checkerboard MC subroutines (*_mccyclepar.f90) need
+! cells of side rc, and set cellsub = 1 while they run.
+!
+! SUBROUTINES:
+! cellstencil_set   - set the number of cells per rc and build the stencil
+! cellstencil_heads - heads of the nonempty cells of the stencil of a cell
+
+module cellstencil
+
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! largest number of cells per rc
+  integer, parameter :: maxsub = 3
+
+  ! number of cells per rc in each dimension
+  integer :: cellsub = 1
+
+  ! number of cells in the stencil, and the offset (x, y, z) of each
+  ! cell from the cell of the particle.  The stencil is built by
+  ! getnumcells if it has not been set.
+  integer, parameter :: maxsten = 343
+  integer :: nsten = 0
+  integer, dimension(3, maxsten) :: dsten
+
+contains
+
+  subroutine cellstencil_set(k)
+    !!! use cells of side at least rc / k (k from 1 to maxsub), and
+    !!! build the stencil of cells that can contain particles within
+    !!! rc of a particle in the central cell
+
+    ! inputs
+    integer, intent(in) :: k
+
+    !f2py intent(in) :: k
+
+    integer :: dx, dy, dz
+
+    cellsub = min(max(k, 1), maxsub)
+
+    ! the gap between the central cell and the cell at offset d is
+    ! at least (|d| - 1) rc / cellsub in each dimension.  The order
+    ! for cellsub = 1 is the order of the 27 cells used before.
+    nsten = 0
+    do dz = -cellsub, cellsub
+       do dy = -cellsub, cellsub
+          do dx = -cellsub, cellsub
+             if (max(abs(dx) - 1, 0)**2 + max(abs(dy) - 1, 0)**2 +&
+                 max(abs(dz) - 1, 0)**2 < cellsub**2) then
+                nsten = nsten + 1
+                dsten(1, nsten) = dx
+                dsten(2, nsten) = dy
+                dsten(3, nsten) = dz
+             end if
+          end do
+       end do
+    end do
+
+  end subroutine cellstencil_set
+
+  subroutine cellstencil_heads(hoc, icelx, icely, icelz, ncelx, ncely,&
+                               ncelz, zperiodic, nhead, heads)
+    !!! get the heads (see new_nlist in clist.f90) of the nonempty
+    !!! cells of the stencil around and including cell icelx, icely,
+    !!! icelz.  If there are too few cells in a dimension, some of the
+    !!! cells in the stencil are the same cell, since the cells wrap
+    !!! around; each cell is given once only.  Cells beyond the top
+    !!! or bottom of the box are left out if the system is not
+    !!! periodic in z.
+
+    ! inputs
+    integer, intent(in) :: icelx, icely, icelz, ncelx, ncely, ncelz
+    integer, dimension(ncelx, ncely, ncelz), intent(in) :: hoc
+    logical, intent(in) :: zperiodic
+
+    ! outputs (heads has maxsten elements; f2py needs the number)
+    integer, intent(out) :: nhead
+    integer, dimension(343), intent(out) :: heads
+
+    !f2py intent(in) :: hoc, icelx, icely, icelz, ncelx, ncely, ncelz
+    !f2py intent(in) :: zperiodic
+    !f2py intent(out) :: nhead, heads
+
+    integer :: n, lox, hix, loy, hiy, loz, hiz, celx, cely, celz
+
+    ! with m cells in a dimension, offsets d and d + m are the same
+    ! cell, so only the offsets from -(m - 1) / 2 to m / 2 are used
+    ! (e.g. with a single cell only 0, and with two cells 0 and 1).
+    ! These are the offsets of smallest magnitude, so that they are in
+    ! the stencil if any offset of the same cell is.
+    lox = -(ncelx - 1) / 2
+    hix = ncelx / 2
+    loy = -(ncely - 1) / 2
+    hiy = ncely / 2
+    if (zperiodic) then
+       loz = -(ncelz - 1) / 2
+       hiz = ncelz / 2
+    else
+       ! no periodic boundary in z
+       loz = 1 - icelz
+       hiz = ncelz - icelz
+    end if
+
+    nhead = 0
+    do n = 1, nsten
+       if (dsten(1, n) < lox .or. dsten(1, n) > hix .or.&
+           dsten(2, n) < loy .or. dsten(2, n) > hiy .or.&
+           dsten(3, n) < loz .or. dsten(3, n) > hiz) cycle
+
+       ! periodic boundary conditions
+       celx = icelx + dsten(1, n)
+       if (celx <= 0) then
+          celx = celx + ncelx
+       else if (celx > ncelx) then
+          celx = celx - ncelx
+       end if
+       cely = icely + dsten(2, n)
+       if (cely <= 0) then
+          cely = cely + ncely
+       else if (cely > ncely) then
+          cely = cely - ncely
+       end if
+       celz = icelz + dsten(3, n)
+       if (celz <= 0) then
+          celz = celz + ncelz
+       else if (celz > ncelz) then
+          celz = celz - ncelz
+       end if
+
+       if (hoc(celx, cely, celz) /= 0) then
+          nhead = nhead + 1
+          heads(nhead) = hoc(celx, cely, celz)
+       end if
+    end do
+
+  end subroutine cellstencil_heads
+
+end module cellstencil
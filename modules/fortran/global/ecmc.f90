@@ -0,0 +1,258 @@
+! ecmc.f90
+! James Mithen
+! j.mithen@surrey.ac.uk
+!
+! Event-chain Monte Carlo (ECMC), used by the *_executecyclesecmc
+! subroutines (ipl_mccycleecmc.f90 and gauss_mccycleecmc.f90).  In an
+! event chain, a single particle moves in a straight line along x, y
+! or z until one of its pair interactions stops it; the move is then
+! handed on ('lifted') to the other particle of that pair, which
+! moves in the same direction.  The chain ends when the displacements
+! add up to the chain length.  There are no rejected moves.  Each
+! pair stops the move where its energy has risen by an amount drawn
+! from the exponential distribution exp(-de / kT), which gives the
+! Boltzmann distribution (the factorised Metropolis filter, see
+! Michel, Kapfer and Krauth, J. Chem. Phys. 140, 054116 (2014)).
+!
+! A chain cannot be lifted to the surface particles, which never move,
+! or to the hard walls at z = 0 and z = lboxz if the system is not
+! periodic in z.  At such an event the particle instead reverses its
+! direction, so that chains must then go in both directions along
+! each axis; otherwise they only go in the positive direction.
+!
+! The pairs that can stop the move are found from the cell list of
+! simstate.f90.  The move of a particle is cut short when it leaves
+! its cell, and continued from its new cell (the exponential
+! distribution has no memory, so this does not change the chain).
+!
+! SUBROUTINES:
+! ecmc_neighbours - separations from the moving particle of the
+!                   particles that it can interact with
+! ecmc_maxstep    - furthest the particle can move in its cell
+! ecmc_move       - move the particle and update the cell list
+
+module ecmc
+
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! particles that the moving particle can interact with (set by
+  ! ecmc_neighbours): index, separation along the direction of the
+  ! move (positive if the particle is ahead) and squared separation
+  ! perpendicular to it
+  integer :: nnb = 0
+  integer, allocatable, dimension(:) :: nbj
+  real(kind=db), allocatable, dimension(:) :: nbd, nbbsq
+
+  ! a particle leaving its cell is moved this fraction of the cell
+  ! side into the next cell, and a particle stops this fraction of
+  ! the cell side short of a hard wall, so that its cell is always
+  ! well defined
+  real(kind=db), parameter :: cellskip = 1.0e-9_db
+
+  ! if the pair energy jumps at the cutoff (i.e. the shift is not the
+  ! energy at rc), a pair can stop the move as it comes within rc.
+  ! It then stops it this fraction of rc^2 inside the cutoff, so that
+  ! the pair is within the cutoff after the move despite rounding.
+  real(kind=db), parameter :: rcskip = 1.0e-12_db
+
+contains
+
+  subroutine ecmc_neighbours(ipar, iaxis, idir, xpos, ypos, zpos,&
+                             rcsq, lboxx, lboxy, lboxz, npar,&
+                             zperiodic)
+    !!! find the particles that particle ipar can interact with when
+    !!! it moves in direction idir (1 or -1) along axis iaxis (1 to
+    !!! 3), from the cell list in simstate, and store them in nbj,
+    !!! nbd and nbbsq.  These are the particles within rc of it, or
+    !!! ahead of it and less than rc from its line of motion.
+
+    use simstate, only: ncelx, ncely, ncelz, rnx, rny, rnz, ll, hoc
+    use cellstencil, only: maxsten, cellstencil_heads
+
+    ! inputs
+    integer, intent(in) :: ipar, iaxis, idir, npar
+    real(kind=db), dimension(npar), intent(in) :: xpos, ypos, zpos
+    real(kind=db), intent(in) :: rcsq, lboxx, lboxy, lboxz
+    logical, intent(in) :: zperiodic
+
+    !f2py intent(in) :: ipar, iaxis, idir, xpos, ypos, zpos, rcsq
+    !f2py intent(in) :: lboxx, lboxy, lboxz, npar, zperiodic
+
+    real(kind=db), dimension(3) :: sep
+    real(kind=db) :: d, bsq
+    integer :: icelx, icely, icelz, cellnum, jpar, nhead
+    integer, dimension(maxsten) :: heads
+
+    if (allocated(nbj)) then
+       if (size(nbj) < npar) deallocate(nbj, nbd, nbbsq)
+    end if
+    if (.not. allocated(nbj)) allocate(nbj(npar), nbd(npar), nbbsq(npar))
+
+    icelx = int(xpos(ipar) / rnx) + 1
+    icely = int(ypos(ipar) / rny) + 1
+    icelz = int(zpos(ipar) / rnz) + 1
+    call cellstencil_heads(hoc, icelx, icely, icelz, ncelx, ncely,&
+                           ncelz, zperiodic, nhead, heads)
+
+    nnb = 0
+    do cellnum = 1, nhead
+       jpar = heads(cellnum)
+
+       do while (jpar /= 0)
+          if (ipar /= jpar) then
+             sep(1) = xpos(jpar) - xpos(ipar)
+             sep(2) = ypos(jpar) - ypos(ipar)
+             sep(3) = zpos(jpar) - zpos(ipar)
+
+             ! periodic boundary conditions
+             if (sep(1) > 0.5 * lboxx) then
+                sep(1) = sep(1) - lboxx
+             else if (sep(1) < -0.5 * lboxx) then
+                sep(1) = sep(1) + lboxx
+             end if
+             if (sep(2) > 0.5 * lboxy) then
+                sep(2) = sep(2) - lboxy
+             else if (sep(2) < -0.5 * lboxy) then
+                sep(2) = sep(2) + lboxy
+             end if
+             if (zperiodic) then
+                if (sep(3) > 0.5 * lboxz) then
+                   sep(3) = sep(3) - lboxz
+                else if (sep(3) < -0.5 * lboxz) then
+                   sep(3) = sep(3) + lboxz
+                end if
+             end if
+
+             d = idir * sep(iaxis)
+             bsq = sep(1)**2 + sep(2)**2 + sep(3)**2 - sep(iaxis)**2
+             if (bsq < rcsq .and. (d > 0.0_db .or. d**2 + bsq < rcsq)) then
+                nnb = nnb + 1
+                nbj(nnb) = jpar
+                nbd(nnb) = d
+                nbbsq(nnb) = bsq
+             end if
+          end if
+          jpar = ll(jpar)
+       end do
+    end do
+
+  end subroutine ecmc_neighbours
+
+  subroutine ecmc_maxstep(iaxis, idir, posi, remain, zperiodic, smax,&
+                          ilimit)
+    !!! furthest that a particle at position posi along axis iaxis can
+    !!! move in direction idir, if the chain has length remain left.
+    !!! ilimit is 0 if the chain ends there, 1 if the particle leaves
+    !!! its cell there, and 2 if it reaches a hard wall there.
+
+    use simstate, only: ncelz, rnx, rny, rnz
+
+    ! inputs
+    integer, intent(in) :: iaxis, idir
+    real(kind=db), intent(in) :: posi, remain
+    logical, intent(in) :: zperiodic
+
+    ! outputs
+    real(kind=db), intent(out) :: smax
+    integer, intent(out) :: ilimit
+
+    !f2py intent(in) :: iaxis, idir, posi, remain, zperiodic
+    !f2py intent(out) :: smax, ilimit
+
+    real(kind=db) :: rn
+    integer :: icel
+    logical :: wall
+
+    if (iaxis == 1) then
+       rn = rnx
+    else if (iaxis == 2) then
+       rn = rny
+    else
+       rn = rnz
+    end if
+
+    ! distance to the edge of the cell
+    icel = int(posi / rn) + 1
+    if (idir > 0) then
+       smax = icel * rn - posi
+    else
+       smax = posi - (icel - 1) * rn
+    end if
+
+    ! no periodic boundary in z
+    wall = (.not. zperiodic) .and. iaxis == 3 .and.&
+           ((idir > 0 .and. icel == ncelz) .or. (idir < 0 .and. icel == 1))
+    if (wall) then
+       smax = max(smax - cellskip * rn, 0.0_db)
+       ilimit = 2
+    else
+       smax = max(smax, 0.0_db) + cellskip * rn
+       ilimit = 1
+    end if
+
+    if (remain <= smax) then
+       smax = remain
+       ilimit = 0
+    end if
+
+  end subroutine ecmc_maxstep
+
+  subroutine ecmc_move(ipar, iaxis, idir, s, xpos, ypos, zpos, lboxx,&
+                       lboxy, lboxz, npar)
+    !!! move particle ipar a distance s in direction idir along axis
+    !!! iaxis, and move it to its new cell in the cell list
+
+    use simstate, only: ncelx, ncely, ncelz, rnx, rny, rnz, ll, lp, hoc
+
+    ! inputs
+    integer, intent(in) :: ipar, iaxis, idir, npar
+    real(kind=db), intent(in) :: s, lboxx, lboxy, lboxz
+
+    ! outputs
+    real(kind=db), dimension(npar), intent(inout) :: xpos, ypos, zpos
+
+    !f2py intent(in) :: ipar, iaxis, idir, s, lboxx, lboxy, lboxz, npar
+    !f2py intent(in,out) :: xpos, ypos, zpos
+
+    real(kind=db) :: xnew, ynew, znew
+
+    xnew = xpos(ipar)
+    ynew = ypos(ipar)
+    znew = zpos(ipar)
+
+    ! periodic boundary conditions (a particle never reaches the top
+    ! or bottom of the box if there are hard walls, see ecmc_maxstep)
+    if (iaxis == 1) then
+       xnew = xnew + idir * s
+       if (xnew < 0.0_db) then
+          xnew = xnew + lboxx
+       else if (xnew >= lboxx) then
+          xnew = xnew - lboxx
+       end if
+    else if (iaxis == 2) then
+       ynew = ynew + idir * s
+       if (ynew < 0.0_db) then
+          ynew = ynew + lboxy
+       else if (ynew >= lboxy) then
+          ynew = ynew - lboxy
+       end if
+    else
+       znew = znew + idir * s
+       if (znew < 0.0_db) then
+          znew = znew + lboxz
+       else if (znew >= lboxz) then
+          znew = znew - lboxz
+       end if
+    end if
+
+    call update_nlist(ipar, xpos(ipar), ypos(ipar), zpos(ipar), xnew,&
+                      ynew, znew, ncelx, ncely, ncelz, rnx, rny, rnz,&
+                      npar, ll, lp, hoc)
+    xpos(ipar) = xnew
+    ypos(ipar) = ynew
+    zpos(ipar) = znew
+
+  end subroutine ecmc_move
+
+end module ecmc
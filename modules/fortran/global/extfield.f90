@@ -0,0 +1,237 @@
+! extfield.f90
+! James Mithen
+! j.mithen@surrey.ac.uk
+!
+! External field of the surface, for the tabulated potential (see
+! pottable.f90).  The surface particles 1..nsurf never move, so their
+! interaction with a fluid particle depends only on the position of
+! the fluid particle.  This is computed once on a grid (periodic in x
+! and y, and also in z if the system is periodic in z) and
+! interpolated (Catmull-Rom splines), so that the surface particles can
+! be left out of the cell list entirely.  The surface-surface energy is
+! then a constant.  The grid is built the first time it is needed by
+! the MC cycle or energy subroutines (see tab_mccyclenvt.f90 and
+! tab_energy.f90), from the surface positions passed to them, and is
+! rebuilt if the number of surface particles, the cutoff or the box
+! changes.  It must not be used if the surface moves or changes with
+! the box, i.e. for NPT MC.  For Lennard-Jones, a grid spacing of
+! 0.05 sigma gives errors of around 1e-3 eps in the energy of a fluid
+! particle.
+!
+! SUBROUTINES:
+! extfield_set    - set the grid spacing (0 for no field)
+! extfield_free   - free the field
+! extfield_build  - build the field for the given surface, if needed
+! extfield_energy - energy of a fluid particle in the field
+
+module extfield
+
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! requested grid spacing; if zero, there is no field
+  real(kind=db) :: spacing = 0.0_db
+
+  ! number of grid points, grid spacings and their inverse, and range
+  ! of z covered by the grid.  The field is zero outside this range,
+  ! which is the range of z within rc of the surface, unless the
+  ! system is periodic in z.
+  integer :: nfx = 0, nfy = 0, nfz = 0
+  real(kind=db) :: hx, hy, hz, hxinv, hyinv, hzinv, zlo, zhi
+  logical :: fzperiodic
+
+  ! field at the grid points, and surface-surface energy
+  real(kind=db), allocatable, dimension(:,:,:) :: fld
+  real(kind=db) :: esurf
+
+  ! the field is capped at emax before it is interpolated.  Higher
+  ! energies only occur where a fluid particle overlaps a surface
+  ! particle, and capping them stops the interpolation overshooting
+  ! near such points; a move to such a position is still always
+  ! rejected.
+  real(kind=db), parameter :: emax = 100.0_db
+
+  ! surface, cutoff and box the field was built for
+  integer :: fnsurf
+  real(kind=db) :: frc, flboxx, flboxy, flboxz
+
+contains
+
+  subroutine extfield_set(h)
+    !!! set the grid spacing; the field will be built when it is
+    !!! first needed.  If h is zero, no field is used.
+
+    ! inputs
+    real(kind=8), intent(in) :: h
+
+    !f2py intent(in) :: h
+
+    call extfield_free()
+    spacing = h
+
+  end subroutine extfield_set
+
+  subroutine extfield_free()
+    !!! free the field
+
+    if (allocated(fld)) deallocate(fld)
+    nfx = 0
+    nfy = 0
+    nfz = 0
+
+  end subroutine extfield_free
+
+  subroutine extfield_build(xpos, ypos, zpos, nsurf, rc, rcsq, lboxx,&
+                            lboxy, lboxz, zperiodic)
+    !!! build the field of the surface particles xpos, ypos, zpos,
+    !!! unless it has already been built for this surface and box
+
+    ! inputs
+    integer, intent(in) :: nsurf
+    real(kind=db), dimension(nsurf), intent(in) :: xpos, ypos, zpos
+    real(kind=db), intent(in) :: rc, rcsq, lboxx, lboxy, lboxz
+    logical, intent(in) :: zperiodic
+
+    integer, dimension(nsurf) :: ll
+    integer, allocatable, dimension(:,:,:) :: hoc
+    integer :: ncelx, ncely, ncelz, i, j, k
+    real(kind=db) :: rnx, rny, rnz, zk
+
+    if (nfx > 0) then
+       if (nsurf == fnsurf .and. rc == frc .and. lboxx == flboxx .and.&
+           lboxy == flboxy .and. lboxz == flboxz) return
+       call extfield_free()
+    end if
+
+    fnsurf = nsurf
+    frc = rc
+    flboxx = lboxx
+    flboxy = lboxy
+    flboxz = lboxz
+
+    nfx = max(nint(lboxx / spacing), 4)
+    nfy = max(nint(lboxy / spacing), 4)
+    hx = lboxx / nfx
+    hy = lboxy / nfy
+    fzperiodic = zperiodic
+    if (zperiodic) then
+       nfz = max(nint(lboxz / spacing), 4)
+       zlo = 0.0_db
+       hz = lboxz / nfz
+       zhi = lboxz
+    else
+       ! the last grid point must be inside the box, since the cell
+       ! list is used to compute the field there
+       zlo = max(minval(zpos) - rc, 0.0_db)
+       zhi = min(maxval(zpos) + rc, (1.0_db - 1.0e-9_db) * lboxz)
+       nfz = max(ceiling((zhi - zlo) / spacing), 3) + 1
+       hz = (zhi - zlo) / (nfz - 1)
+    end if
+    hxinv = 1.0_db / hx
+    hyinv = 1.0_db / hy
+    hzinv = 1.0_db / hz
+    write(*,*) 'surface field', nfx, nfy, nfz
+
+    ! cell list of the surface particles only
+    call getnumcells(lboxx, lboxy, lboxz, rc, ncelx, ncely, ncelz)
+    allocate(hoc(ncelx, ncely, ncelz))
+    call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, nsurf,&
+                   ncelx, ncely, ncelz, ll, hoc, rnx, rny, rnz)
+
+    ! energy of a fluid particle at each grid point, i.e. of a
+    ! particle that is not one of the surface particles (ipar = 0)
+    allocate(fld(0:nfx - 1, 0:nfy - 1, 0:nfz - 1))
+    !$omp parallel do private(i, j, zk) schedule(dynamic)
+    do k = 0, nfz - 1
+       zk = zlo + k * hz
+       do j = 0, nfy - 1
+          do i = 0, nfx - 1
+             call tab_enlist(ll, hoc, ncelx, ncely, ncelz, 0, i * hx,&
+                             j * hy, zk, xpos, ypos, zpos, rc, rcsq,&
+                             lboxx, lboxy, lboxz, nsurf, nsurf,&
+                             zperiodic, fld(i, j, k))
+             fld(i, j, k) = min(fld(i, j, k), emax)
+          end do
+       end do
+    end do
+    !$omp end parallel do
+
+    call tab_totalenlist(ll, hoc, ncelx, ncely, ncelz, rnx, rny, rnz,&
+                         xpos, ypos, zpos, rc, rcsq, lboxx, lboxy,&
+                         lboxz, nsurf, nsurf, zperiodic, esurf)
+    deallocate(hoc)
+
+  end subroutine extfield_build
+
+  function extfield_energy(x, y, z) result(e)
+    !!! energy of a fluid particle at x, y, z in the field of the
+    !!! surface, by tricubic (Catmull-Rom) interpolation of the grid
+
+    ! inputs
+    real(kind=8), intent(in) :: x, y, z
+
+    ! outputs
+    real(kind=8) :: e
+
+    real(kind=db), dimension(4) :: wx, wy, wz
+    integer, dimension(4) :: ix, iy, iz
+    real(kind=db) :: t
+    integer :: i, j, k, m
+
+    if (.not. fzperiodic) then
+       if (z <= zlo .or. z >= zhi) then
+          e = 0.0_db
+          return
+       end if
+    end if
+
+    ! interpolation weights and grid points in each direction; x and
+    ! y (and z if periodic) are in [0, lbox]
+    t = x * hxinv
+    i = int(t)
+    call crweights(t - i, wx)
+    t = y * hyinv
+    j = int(t)
+    call crweights(t - j, wy)
+    t = (z - zlo) * hzinv
+    k = int(t)
+    call crweights(t - k, wz)
+    do m = 1, 4
+       ix(m) = modulo(i + m - 2, nfx)
+       iy(m) = modulo(j + m - 2, nfy)
+       if (fzperiodic) then
+          iz(m) = modulo(k + m - 2, nfz)
+       else
+          iz(m) = min(max(k + m - 2, 0), nfz - 1)
+       end if
+    end do
+
+    e = 0.0_db
+    do k = 1, 4
+       do j = 1, 4
+          e = e + wz(k) * wy(j) * (wx(1) * fld(ix(1), iy(j), iz(k)) +&
+                                   wx(2) * fld(ix(2), iy(j), iz(k)) +&
+                                   wx(3) * fld(ix(3), iy(j), iz(k)) +&
+                                   wx(4) * fld(ix(4), iy(j), iz(k)))
+       end do
+    end do
+
+  end function extfield_energy
+
+  subroutine crweights(t, w)
+    !!! Catmull-Rom weights of the four grid points around t, 0 <= t < 1
+
+    ! inputs
+    real(kind=db), intent(in) :: t
+
+    ! outputs
+    real(kind=db), dimension(4), intent(out) :: w
+
+    w(1) = 0.5_db * t * ((2.0_db - t) * t - 1.0_db)
+    w(2) = 0.5_db * (t * t * (3.0_db * t - 5.0_db) + 2.0_db)
+    w(3) = 0.5_db * t * ((4.0_db - 3.0_db * t) * t + 1.0_db)
+    w(4) = 0.5_db * t * t * (t - 1.0_db)
+
+  end subroutine crweights
+
+end module extfield
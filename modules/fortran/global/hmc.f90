@@ -0,0 +1,187 @@
+! hmc.f90
+! James Mithen
+! j.mithen@surrey.ac.uk
+!
+! Hybrid Monte Carlo (HMC), used by the *_executecycleshmc
+! subroutines (e.g. len_mccyclehmc.f90).  In an HMC move, the fluid
+! particles are given velocities drawn from the Maxwell-Boltzmann
+! distribution, and the system is moved along a short NVE trajectory
+! of nsteps velocity Verlet timesteps.  The move is accepted with
+! probability min(1, exp(-dH / kT)), where dH is the change in total
+! (potential plus kinetic) energy along the trajectory; otherwise the
+! particles go back to where they started.  The velocity Verlet
+! integrator is time reversible and conserves phase space volume, so
+! this samples the Boltzmann distribution exactly, whatever the
+! timestep (which only affects the acceptance ratio), see Duane et
+! al., Phys. Lett. B 195, 216 (1987).
+!
+! The surface particles never move.  If the system is not periodic in
+! z, a particle that reaches one of the hard walls at z = 0 or z =
+! lboxz bounces off it (its z velocity is reversed), which is the
+! exact dynamics of a hard wall and is also time reversible.  The
+! energy error of a timestep in which a particle bounces is only first
+! order in dt, so a smaller timestep is needed with hard walls.
+!
+! As for the energy, the kinetic energy is in units of 1 / beta, where
+! beta is passed to the subroutines (e.g. eps4 for Lennard-Jones).
+!
+! SUBROUTINES:
+! hmc_velocities - draw velocities from the Maxwell-Boltzmann
+!                  distribution
+! hmc_kineticen  - kinetic energy of the fluid particles
+! hmc_kick       - update the velocities of the fluid particles by
+!                  half a timestep
+! hmc_drift      - update the positions of the fluid particles by a
+!                  timestep
+
+module hmc
+
+  use rng, only: rng_normal
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+contains
+
+  subroutine hmc_velocities(xvel, yvel, zvel, beta, mass, npar, nsurf)
+    !!! velocities of the fluid particles from the Maxwell-Boltzmann
+    !!! distribution at inverse temperature beta; the velocities of
+    !!! the surface particles are zero
+
+    ! inputs
+    real(kind=8), intent(in) :: beta, mass
+    integer, intent(in) :: npar, nsurf
+
+    ! outputs
+    real(kind=8), dimension(npar), intent(out) :: xvel, yvel, zvel
+
+    !f2py intent(in) :: beta, mass, npar, nsurf
+    !f2py intent(out) :: xvel, yvel, zvel
+
+    real(kind=db) :: sigma
+    integer :: i
+
+    sigma = sqrt(1.0_db / (beta * mass))
+    xvel(1:nsurf) = 0.0_db
+    yvel(1:nsurf) = 0.0_db
+    zvel(1:nsurf) = 0.0_db
+    do i = nsurf + 1, npar
+       call rng_normal(xvel(i))
+       call rng_normal(yvel(i))
+       call rng_normal(zvel(i))
+       xvel(i) = sigma * xvel(i)
+       yvel(i) = sigma * yvel(i)
+       zvel(i) = sigma * zvel(i)
+    end do
+
+  end subroutine hmc_velocities
+
+  subroutine hmc_kineticen(xvel, yvel, zvel, mass, npar, nsurf, ekin)
+    !!! kinetic energy of the fluid particles
+
+    ! inputs
+    integer, intent(in) :: npar, nsurf
+    real(kind=8), dimension(npar), intent(in) :: xvel, yvel, zvel
+    real(kind=8), intent(in) :: mass
+
+    ! outputs
+    real(kind=8), intent(out) :: ekin
+
+    !f2py intent(in) :: xvel, yvel, zvel, mass, npar, nsurf
+    !f2py intent(out) :: ekin
+
+    ekin = 0.5_db * mass * sum(xvel(nsurf + 1:npar)**2 +&
+                               yvel(nsurf + 1:npar)**2 +&
+                               zvel(nsurf + 1:npar)**2)
+
+  end subroutine hmc_kineticen
+
+  subroutine hmc_kick(xvel, yvel, zvel, fx, fy, fz, dt, mass, npar,&
+                      nsurf)
+    !!! update the velocities of the fluid particles by half a
+    !!! timestep, using the forces fx, fy, fz
+
+    ! inputs
+    integer, intent(in) :: npar, nsurf
+    real(kind=8), dimension(npar), intent(in) :: fx, fy, fz
+    real(kind=8), intent(in) :: dt, mass
+
+    ! outputs
+    real(kind=8), dimension(npar), intent(inout) :: xvel, yvel, zvel
+
+    !f2py intent(in) :: fx, fy, fz, dt, mass, npar, nsurf
+    !f2py intent(in,out) :: xvel, yvel, zvel
+
+    real(kind=db) :: p5dtm
+
+    p5dtm = 0.5_db * dt / mass
+    xvel(nsurf + 1:npar) = xvel(nsurf + 1:npar) + p5dtm * fx(nsurf + 1:npar)
+    yvel(nsurf + 1:npar) = yvel(nsurf + 1:npar) + p5dtm * fy(nsurf + 1:npar)
+    zvel(nsurf + 1:npar) = zvel(nsurf + 1:npar) + p5dtm * fz(nsurf + 1:npar)
+
+  end subroutine hmc_kick
+
+  subroutine hmc_drift(xpos, ypos, zpos, xvel, yvel, zvel, dt, lboxx,&
+                       lboxy, lboxz, npar, nsurf, zperiodic, inbox)
+    !!! update the positions of the fluid particles by a timestep,
+    !!! using the velocities xvel, yvel, zvel, bouncing them off the
+    !!! hard walls if the system is not periodic in z.  inbox is
+    !!! false if a particle is still not strictly inside the box
+    !!! (i.e. it is on a wall, or moved further than the box height),
+    !!! in which case the trajectory is rejected.
+
+    ! inputs
+    integer, intent(in) :: npar, nsurf
+    real(kind=8), dimension(npar), intent(in) :: xvel, yvel
+    real(kind=8), intent(in) :: dt, lboxx, lboxy, lboxz
+    logical, intent(in) :: zperiodic
+
+    ! outputs
+    real(kind=8), dimension(npar), intent(inout) :: xpos, ypos, zpos, zvel
+    logical, intent(out) :: inbox
+
+    !f2py intent(in) :: xvel, yvel, dt, lboxx, lboxy, lboxz
+    !f2py intent(in) :: npar, nsurf, zperiodic
+    !f2py intent(in,out) :: xpos, ypos, zpos, zvel
+    !f2py intent(out) :: inbox
+
+    integer :: i
+
+    inbox = .true.
+    do i = nsurf + 1, npar
+       xpos(i) = xpos(i) + dt * xvel(i)
+       ypos(i) = ypos(i) + dt * yvel(i)
+       zpos(i) = zpos(i) + dt * zvel(i)
+
+       ! periodic boundary conditions
+       if (xpos(i) < 0.0_db) then
+          xpos(i) = xpos(i) + lboxx
+       else if (xpos(i) >= lboxx) then
+          xpos(i) = xpos(i) - lboxx
+       end if
+       if (ypos(i) < 0.0_db) then
+          ypos(i) = ypos(i) + lboxy
+       else if (ypos(i) >= lboxy) then
+          ypos(i) = ypos(i) - lboxy
+       end if
+       if (zperiodic) then
+          if (zpos(i) < 0.0_db) then
+             zpos(i) = zpos(i) + lboxz
+          else if (zpos(i) >= lboxz) then
+             zpos(i) = zpos(i) - lboxz
+          end if
+       else
+          ! hard walls
+          if (zpos(i) < 0.0_db) then
+             zpos(i) = -zpos(i)
+             zvel(i) = -zvel(i)
+          else if (zpos(i) > lboxz) then
+             zpos(i) = 2.0_db * lboxz - zpos(i)
+             zvel(i) = -zvel(i)
+          end if
+          if (zpos(i) <= 0.0_db .or. zpos(i) >= lboxz) inbox = .false.
+       end if
+    end do
+
+  end subroutine hmc_drift
+
+end module hmc
@@ -0,0 +1,110 @@
+! pottable.f90
+! James Mithen
+! j.mithen@surrey.ac.uk
+!
+! Tabulated pair potential, used by the tab_* subroutines (see
+! tab/tab_energy.f90) in place of the analytic potentials.  The pair
+! energy is tabulated as a function of the squared separation r^2 on
+! ntab equally spaced points from r2min to r2max (normally rc^2), and
+! interpolated with a natural cubic spline, so that no sqrt, exp or
+! power is needed for each pair.  There are two tables, one for pairs
+! of fluid particles and one for pairs involving a surface particle;
+! the values include the shift of the potential at the cutoff (vrc
+! and vrc2), and any scaling of the surface interaction (e.g. r6mult
+! and r12mult for Lennard-Jones).  For r^2 < r2min, the value at
+! r2min is used.  The table is built once per run, see PotTable in
+! pottable.py.
+!
+! SUBROUTINES:
+! pottable_set  - build the spline table from the tabulated values
+! pottable_free - free the table
+
+module pottable
+
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! number of points, first point, spacing and 1/spacing in r^2
+  integer :: ntab = 0
+  real(kind=db) :: r2min, dr2, dr2inv
+
+  ! spline coefficients for each of the ntab - 1 intervals: for
+  ! r^2 = r2min + (k - 1 + t) * dr2, with 0 <= t < 1, the energy is
+  ! c(1,k) + t * (c(2,k) + t * (c(3,k) + t * c(4,k))).  cff is for
+  ! pairs of fluid particles, cfs for pairs involving a surface
+  ! particle.
+  real(kind=db), allocatable, dimension(:,:) :: cff, cfs
+
+contains
+
+  subroutine pottable_set(n, r2lo, r2hi, eff, efs)
+    !!! build the spline table from the energies eff (fluid-fluid)
+    !!! and efs (fluid-surface) at n equally spaced values of r^2
+    !!! from r2lo to r2hi
+
+    ! inputs
+    integer, intent(in) :: n
+    real(kind=8), intent(in) :: r2lo, r2hi
+    real(kind=8), dimension(n), intent(in) :: eff, efs
+
+    !f2py intent(in) :: n, r2lo, r2hi, eff, efs
+
+    call pottable_free()
+    ntab = n
+    r2min = r2lo
+    dr2 = (r2hi - r2lo) / (n - 1)
+    dr2inv = 1.0_db / dr2
+    allocate(cff(4, n - 1), cfs(4, n - 1))
+    call spline_coeffs(n, eff, cff)
+    call spline_coeffs(n, efs, cfs)
+
+  end subroutine pottable_set
+
+  subroutine pottable_free()
+    !!! free the table
+
+    if (allocated(cff)) deallocate(cff, cfs)
+    ntab = 0
+
+  end subroutine pottable_free
+
+  subroutine spline_coeffs(n, y, c)
+    !!! natural cubic spline through the n equally spaced values y;
+    !!! the coefficients are for unit spacing (see cff above)
+
+    ! inputs
+    integer, intent(in) :: n
+    real(kind=db), dimension(n), intent(in) :: y
+
+    ! outputs
+    real(kind=db), dimension(4, n - 1), intent(out) :: c
+
+    real(kind=db), dimension(n) :: m, cp, dp
+    real(kind=db) :: den
+    integer :: i
+
+    ! second derivatives m, with m(1) = m(n) = 0, from the tridiagonal
+    ! system m(i-1) + 4 m(i) + m(i+1) = 6 (y(i+1) - 2 y(i) + y(i-1))
+    m = 0.0_db
+    cp(1) = 0.0_db
+    dp(1) = 0.0_db
+    do i = 2, n - 1
+       den = 4.0_db - cp(i - 1)
+       cp(i) = 1.0_db / den
+       dp(i) = (6.0_db * (y(i + 1) - 2.0_db * y(i) + y(i - 1))&
+                - dp(i - 1)) / den
+    end do
+    do i = n - 1, 2, -1
+       m(i) = dp(i) - cp(i) * m(i + 1)
+    end do
+
+    do i = 1, n - 1
+       c(1, i) = y(i)
+       c(2, i) = y(i + 1) - y(i) - (2.0_db * m(i) + m(i + 1)) / 6.0_db
+       c(3, i) = 0.5_db * m(i)
+       c(4, i) = (m(i + 1) - m(i)) / 6.0_db
+    end do
+
+  end subroutine spline_coeffs
+
+end module pottable
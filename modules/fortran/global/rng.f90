@@ -0,0 +1,268 @@
+! rng.f90
+! James Mithen
+! j.mithen@surrey.ac.uk
+!
+! Counter-based random number generator (Philox4x32-10, see Salmon et
+! al., 'Parallel random numbers: as easy as 1, 2, 3', SC11).  The
+! random numbers are a fixed function of a key and a counter, so that
+! a stream is completely determined by the run seed, and by two
+! integers identifying e.g. the FFS interface and shot number (see
+! rng_setstream).  Different shots therefore get independent streams
+! whichever process runs them, and a shot can be repeated exactly.
+! The same generator is implemented in Python in rng.py.
+!
+! The key is (seed, sub) and the counter is (n, stream, shot), where
+! n is a 64 bit block number (the first two counter words) and sub
+! separates the numbers used by the Fortran code (sub = 0) from those
+! used by the Python code (sub = 1).  Random numbers are generated
+! nbuf at a time into a buffer.
+!
+! If no stream has been set, rng_uniform and rng_uniform3 simply call
+! the intrinsic random_number.
+!
+! rng_next does not use the module data, so that each OpenMP thread
+! can draw from its own stream (see e.g. len_mccyclepar.f90).
+!
+! SUBROUTINES:
+! rng_setstream   - use the stream for the given seed, stream and shot
+! rng_unsetstream - go back to the intrinsic random_number
+! rng_mulhilo     - high and low words of the product of two words
+! rng_philox      - Philox4x32-10 block function
+! rng_block       - four uniform random numbers in (0,1) from a block
+! rng_fill        - fill the buffer with the next nbuf random numbers
+! rng_uniform     - a single uniform random number in (0,1)
+! rng_uniform3    - three uniform random numbers in (0,1)
+! rng_normal      - a single random number from the standard normal
+!                   distribution
+! rng_next        - next number of a stream whose state the caller keeps
+
+module rng
+
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+  integer, parameter :: i8 = 8
+
+  ! numbers of random numbers generated at a time (4 per block)
+  integer, parameter :: nbuf = 256
+
+  logical :: usestream = .false.
+  integer(kind=i8), dimension(2) :: rngkey
+  integer(kind=i8), dimension(4) :: rngctr
+  real(kind=db), dimension(nbuf) :: rngbuf
+  integer :: ibuf = nbuf + 1
+
+  integer(kind=i8), parameter, private :: mask32 = 4294967295_i8
+  integer(kind=i8), parameter, private :: mask16 = 65535_i8
+
+contains
+
+  subroutine rng_setstream(seed, stream, shot, sub)
+    !!! use the stream of random numbers for the given seed, stream
+    !!! and shot numbers, starting from its first number
+
+    ! inputs (literal kinds, since f2py does not resolve the module
+    ! kind parameters for the arguments of module subroutines)
+    integer(kind=8), intent(in) :: seed, stream, shot, sub
+
+    !f2py intent(in) :: seed, stream, shot, sub
+
+    rngkey(1) = iand(seed, mask32)
+    rngkey(2) = iand(sub, mask32)
+    rngctr(1) = 0
+    rngctr(2) = 0
+    rngctr(3) = iand(stream, mask32)
+    rngctr(4) = iand(shot, mask32)
+    ibuf = nbuf + 1
+    usestream = .true.
+
+  end subroutine rng_setstream
+
+  subroutine rng_unsetstream()
+    !!! go back to using the intrinsic random_number
+
+    usestream = .false.
+
+  end subroutine rng_unsetstream
+
+  subroutine rng_mulhilo(a, b, hi, lo)
+    !!! high and low 32 bits of the 64 bit product of the 32 bit
+    !!! unsigned integers a and b.  b is split into 16 bit halves so
+    !!! that nothing overflows a signed 64 bit integer.
+
+    integer(kind=i8), intent(in) :: a, b
+    integer(kind=i8), intent(out) :: hi, lo
+
+    integer(kind=i8) :: p1, p2, t
+
+    p1 = a * iand(b, mask16)
+    p2 = a * ishft(b, -16)
+    t = p1 + ishft(iand(p2, mask16), 16)
+    lo = iand(t, mask32)
+    hi = ishft(p2, -16) + ishft(t, -32)
+
+  end subroutine rng_mulhilo
+
+  subroutine rng_philox(ctr, key, res)
+    !!! Philox4x32-10: four 32 bit random integers (stored in 64 bit
+    !!! integers) from the counter ctr and key
+
+    ! inputs
+    integer(kind=i8), dimension(4), intent(in) :: ctr
+    integer(kind=i8), dimension(2), intent(in) :: key
+
+    ! outputs
+    integer(kind=i8), dimension(4), intent(out) :: res
+
+    !f2py intent(in) :: ctr, key
+    !f2py intent(out) :: res
+
+    integer(kind=i8), parameter :: m0 = 3528531795_i8 ! 0xD2511F53
+    integer(kind=i8), parameter :: m1 = 3449720151_i8 ! 0xCD9E8D57
+    integer(kind=i8), parameter :: w0 = 2654435769_i8 ! 0x9E3779B9
+    integer(kind=i8), parameter :: w1 = 3144134277_i8 ! 0xBB67AE85
+    integer(kind=i8), dimension(2) :: k
+    integer(kind=i8) :: hi0, lo0, hi1, lo1
+    integer :: r
+
+    res = ctr
+    k = key
+    do r = 1, 10
+       if (r > 1) then
+          k(1) = iand(k(1) + w0, mask32)
+          k(2) = iand(k(2) + w1, mask32)
+       end if
+       call rng_mulhilo(m0, res(1), hi0, lo0)
+       call rng_mulhilo(m1, res(3), hi1, lo1)
+       res(1) = ieor(ieor(hi1, res(2)), k(1))
+       res(2) = lo1
+       res(3) = ieor(ieor(hi0, res(4)), k(2))
+       res(4) = lo0
+    end do
+
+  end subroutine rng_philox
+
+  subroutine rng_block(ctr, key, u)
+    !!! the four uniform random numbers in (0,1) for the counter ctr
+    !!! and key
+
+    ! inputs
+    integer(kind=i8), dimension(4), intent(in) :: ctr
+    integer(kind=i8), dimension(2), intent(in) :: key
+
+    ! outputs
+    real(kind=db), dimension(4), intent(out) :: u
+
+    integer(kind=i8), dimension(4) :: res
+    integer :: j
+
+    call rng_philox(ctr, key, res)
+    do j = 1, 4
+       u(j) = (real(res(j), db) + 0.5_db) * 2.0_db**(-32)
+    end do
+
+  end subroutine rng_block
+
+  subroutine rng_fill()
+    !!! fill the buffer with the next nbuf random numbers of the
+    !!! stream, each in (0,1)
+
+    integer :: i
+
+    do i = 1, nbuf, 4
+       call rng_block(rngctr, rngkey, rngbuf(i : i + 3))
+       ! next block (the block number is a 64 bit integer)
+       rngctr(1) = iand(rngctr(1) + 1, mask32)
+       if (rngctr(1) == 0) then
+          rngctr(2) = iand(rngctr(2) + 1, mask32)
+       end if
+    end do
+    ibuf = 1
+
+  end subroutine rng_fill
+
+  subroutine rng_uniform(r)
+    !!! a single uniform random number in (0,1)
+
+    ! outputs
+    real(kind=8), intent(out) :: r
+
+    !f2py intent(out) :: r
+
+    if (.not. usestream) then
+       call random_number(r)
+       return
+    end if
+    if (ibuf > nbuf) call rng_fill()
+    r = rngbuf(ibuf)
+    ibuf = ibuf + 1
+
+  end subroutine rng_uniform
+
+  subroutine rng_uniform3(rvec)
+    !!! three uniform random numbers in (0,1)
+
+    ! outputs
+    real(kind=8), dimension(3), intent(out) :: rvec
+
+    !f2py intent(out) :: rvec
+
+    integer :: i
+
+    if (.not. usestream) then
+       call random_number(rvec)
+       return
+    end if
+    do i = 1, 3
+       if (ibuf > nbuf) call rng_fill()
+       rvec(i) = rngbuf(ibuf)
+       ibuf = ibuf + 1
+    end do
+
+  end subroutine rng_uniform3
+
+  subroutine rng_normal(r)
+    !!! a single random number from the normal distribution with zero
+    !!! mean and unit variance (Box-Muller, from two uniform numbers)
+
+    ! outputs
+    real(kind=8), intent(out) :: r
+
+    !f2py intent(out) :: r
+
+    real(kind=db), parameter :: twopi = 6.283185307179586_db
+    real(kind=db) :: u1, u2
+
+    ! random_number can return 0, so use 1 - u1 in the logarithm
+    call rng_uniform(u1)
+    call rng_uniform(u2)
+    r = sqrt(-2.0_db * log(1.0_db - u1)) * cos(twopi * u2)
+
+  end subroutine rng_normal
+
+  subroutine rng_next(key, ctr, ubuf, ib, r)
+    !!! next uniform random number in (0,1) of the stream with the
+    !!! given key and counter, for callers that keep the state of the
+    !!! stream themselves.  ctr(1) is the block number, and ubuf and
+    !!! ib are the current block and the position in it; set ib = 5
+    !!! to start the stream.
+
+    ! inputs
+    integer(kind=i8), dimension(2), intent(in) :: key
+
+    ! outputs
+    integer(kind=i8), dimension(4), intent(inout) :: ctr
+    real(kind=db), dimension(4), intent(inout) :: ubuf
+    integer, intent(inout) :: ib
+    real(kind=db), intent(out) :: r
+
+    if (ib > 4) then
+       call rng_block(ctr, key, ubuf)
+       ctr(1) = iand(ctr(1) + 1, mask32)
+       ib = 1
+    end if
+    r = ubuf(ib)
+    ib = ib + 1
+
+  end subroutine rng_next
+
+end module rng
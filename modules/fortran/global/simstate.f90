@@ -0,0 +1,180 @@
+! simstate.f90
+! James Mithen
+! j.mithen@surrey.ac.uk
+!
+! Simulation state that is kept between calls to the MC cycle
+! subroutines (*_executecyclesnvt and *_executecyclesnpt).  In FFS
+! and umbrella sampling, these subroutines are called every few MC
+! cycles; without this module, each call seeds the random number
+! generator and builds the cell list from scratch.  Once
+! simstate_init has been called, the random number generator is
+! seeded only once, and the cell list built at the end of one call is
+! reused by the next call, provided that the number of particles, the
+! cutoff and the box are the same, and that simstate_invalidate has
+! not been called (the caller must call it if the positions have been
+! changed between calls, see SimState in mccycle.py).  The numbers of
+! attempted and accepted moves are also accumulated over all calls.
+!
+! If simstate_init has not been called, the MC cycle subroutines
+! behave as before: the random number generator is seeded and the
+! cell list built on every call.
+!
+! SUBROUTINES:
+! simstate_init       - keep the simulation state between calls
+! simstate_free       - stop keeping the state, and free the cell list
+! simstate_invalidate - mark the stored cell list as out of date
+! simstate_seed       - seed the random number generator if needed
+! simstate_nlist      - build the cell list if needed
+! simstate_store      - mark the cell list as up to date
+! simstate_addmoves   - add to the counts of attempted and accepted moves
+
+module simstate
+
+  use cellstencil, only: cellsub
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! true once simstate_init has been called
+  logical :: active = .false.
+
+  ! the cell list (see clist.f90), used directly by the MC cycle
+  ! subroutines
+  integer :: ncelx, ncely, ncelz
+  real(kind=db) :: rnx, rny, rnz
+  integer, allocatable, dimension(:) :: ll, lp
+  integer, allocatable, dimension(:,:,:) :: hoc
+
+  ! cutoff, box and cells per rc (see cellstencil.f90) for which the
+  ! stored cell list was built
+  logical :: listvalid = .false.
+  real(kind=db) :: listrc, listlboxx, listlboxy, listlboxz
+  integer :: listcellsub
+
+  ! total numbers of attempted and accepted moves since simstate_init
+  integer(kind=8) :: natmovdisp = 0, nacmovdisp = 0
+  integer(kind=8) :: natmovvol = 0, nacmovvol = 0
+
+contains
+
+  subroutine simstate_init(sameseed)
+    !!! keep the simulation state between calls, seed the random
+    !!! number generator and zero the move counters
+
+    ! inputs
+    logical, intent(in) :: sameseed
+
+    !f2py intent(in) :: sameseed
+
+    call init_random_seed(sameseed)
+    active = .true.
+    listvalid = .false.
+    natmovdisp = 0
+    nacmovdisp = 0
+    natmovvol = 0
+    nacmovvol = 0
+
+  end subroutine simstate_init
+
+  subroutine simstate_free()
+    !!! stop keeping the simulation state between calls
+
+    active = .false.
+    listvalid = .false.
+    if (allocated(ll)) deallocate(ll, lp)
+    if (allocated(hoc)) deallocate(hoc)
+
+  end subroutine simstate_free
+
+  subroutine simstate_invalidate()
+    !!! the particle positions have been changed outside of the MC
+    !!! cycle subroutines, so the stored cell list cannot be used
+
+    listvalid = .false.
+
+  end subroutine simstate_invalidate
+
+  subroutine simstate_seed(sameseed)
+    !!! seed the random number generator, unless the state is kept
+    !!! between calls (in which case it was seeded by simstate_init)
+
+    ! inputs
+    logical, intent(in) :: sameseed
+
+    !f2py intent(in) :: sameseed
+
+    if (.not. active) then
+       call init_random_seed(sameseed)
+    end if
+
+  end subroutine simstate_seed
+
+  subroutine simstate_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz,&
+                            npar)
+    !!! build the cell list (ll, lp, hoc) for the given positions,
+    !!! unless the stored cell list is up to date
+
+    ! inputs
+    integer, intent(in) :: npar
+    real(kind=db), dimension(npar), intent(in) :: xpos, ypos, zpos
+    real(kind=db), intent(in) :: rc, lboxx, lboxy, lboxz
+
+    !f2py intent(in) :: xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar
+
+    if (active .and. listvalid) then
+       if (size(ll) == npar .and. rc == listrc .and.&
+           lboxx == listlboxx .and. lboxy == listlboxy .and.&
+           lboxz == listlboxz .and. cellsub == listcellsub) then
+          return
+       end if
+    end if
+
+    if (allocated(ll)) then
+       if (size(ll) /= npar) deallocate(ll, lp)
+    end if
+    if (.not. allocated(ll)) allocate(ll(npar), lp(npar))
+    if (allocated(hoc)) deallocate(hoc)
+
+    ! get the number of cells and build the cell list
+    call getnumcells(lboxx, lboxy, lboxz, rc, ncelx, ncely, ncelz)
+    write(*,*) 'num cells', ncelx, ncely, ncelz
+    allocate( hoc(ncelx, ncely, ncelz) )
+    call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar,&
+                   ncelx, ncely, ncelz, ll, hoc, rnx, rny, rnz)
+    call nlist_prev(ll, hoc, ncelx, ncely, ncelz, npar, lp)
+
+  end subroutine simstate_nlist
+
+  subroutine simstate_store(rc, lboxx, lboxy, lboxz)
+    !!! the cell list is up to date for the positions returned by the
+    !!! MC cycle subroutine, with this cutoff and box
+
+    ! inputs
+    real(kind=db), intent(in) :: rc, lboxx, lboxy, lboxz
+
+    !f2py intent(in) :: rc, lboxx, lboxy, lboxz
+
+    listvalid = active
+    listrc = rc
+    listlboxx = lboxx
+    listlboxy = lboxy
+    listlboxz = lboxz
+    listcellsub = cellsub
+
+  end subroutine simstate_store
+
+  subroutine simstate_addmoves(atmovdisp, acmovdisp, atmovvol, acmovvol)
+    !!! add to the total numbers of attempted and accepted moves
+
+    ! inputs
+    integer, intent(in) :: atmovdisp, acmovdisp, atmovvol, acmovvol
+
+    !f2py intent(in) :: atmovdisp, acmovdisp, atmovvol, acmovvol
+
+    natmovdisp = natmovdisp + atmovdisp
+    nacmovdisp = nacmovdisp + acmovdisp
+    natmovvol = natmovvol + atmovvol
+    nacmovvol = nacmovvol + acmovvol
+
+  end subroutine simstate_addmoves
+
+end module simstate
@@ -0,0 +1,209 @@
+! ipl_force.f90
+! James Mithen
+! j.mithen@surrey.ac.uk
+!
+! Subroutines for computing force on every particle for the Inverse
+! Power Law interaction, using the cell list construction for
+! efficiency.
+!
+! SUBROUTINES:
+! ipl_fij             - compute force on particle i due to particle j
+! ipl_forcecreatelist - create cell list then return force on each par
+! ipl_forcelist       - compute force on every particle using cell list
+
+subroutine ipl_fij(ipar, jpar, xposi, yposi, zposi, xposj, yposj, zposj,&
+                   lboxx, lboxy, lboxz, rc, rcsq, npar, nsurf,&
+                   zperiodic, potexponent, fx, fy, fz)
+  !!! Compute force on particle i due to particle j, taking into
+  !!! account periodic bcs.
+
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  integer, intent(in) :: ipar, jpar
+  real(kind=db), intent(in) :: xposi, yposi, zposi, xposj, yposj, zposj
+  real(kind=db), intent(in) :: lboxx, lboxy, lboxz, rc, rcsq
+  integer, intent(in) :: npar, nsurf
+  logical, intent(in) :: zperiodic
+  real(kind=db), intent(in) :: potexponent
+
+  ! outputs
+  real(kind=db), intent(out) :: fx, fy, fz
+
+  !f2py intent(in) :: ipar, jpar, xposi, yposi, zposi, xposj, yposj, zposj
+  !f2py intent(in) :: lboxx, lboxy, lboxz, rc, rcsq, npar, nsurf, zperiodic
+  !f2py intent(in) :: potexponent
+  !f2py intent(out) :: fx, fy, fz
+
+  real(kind=db) :: sepx, sepy, sepz, sepsq, rexponenti, prefac,&
+                   halfexpminus2
+  halfexpminus2 = (potexponent - 2.0_db) / 2.0_db
+
+  fx = 0.0_db
+  fy = 0.0_db
+  fz = 0.0_db
+  ! note the ordering of the separation here; this is important for
+  ! getting the direction of the force correct.  If sepx is positive,
+  ! the force on particle i should be in the negative x direction
+  ! (for a repulsive force).
+  sepx = xposj - xposi
+  ! periodic boundary conditions
+  if (sepx > 0.5 * lboxx) then
+     sepx = sepx - lboxx
+  else if (sepx < -0.5 * lboxx) then
+     sepx = sepx + lboxx
+  end if
+
+  if (abs(sepx) < rc) then
+     sepy = yposj - yposi
+     ! periodic boundary conditions
+     if (sepy > 0.5*lboxy) then
+        sepy = sepy - lboxy
+     else if (sepy < -0.5*lboxy) then
+        sepy = sepy + lboxy
+     end if
+
+     if (abs(sepy) < rc) then
+        sepz = zposj - zposi
+        if (zperiodic) then
+           ! periodic boundary conditions
+           if (sepz > 0.5 * lboxz) then
+              sepz = sepz - lboxz
+           else if (sepz < -0.5 * lboxz) then
+              sepz = sepz + lboxz
+           end if
+        end if
+        sepsq = sepx**2 + sepy**2 + sepz**2
+        if (sepsq < rcsq) then
+           ! the pair energy is r^-n, so the force on i is
+           ! -n r^-(n+2) sep (the same for surface particles)
+           rexponenti = 1.0_db / (sepsq * (sepsq**halfexpminus2))
+           prefac = -potexponent * rexponenti / sepsq
+           fx = sepx * prefac
+           fy = sepy * prefac
+           fz = sepz * prefac
+        end if
+     end if
+  end if
+end subroutine ipl_fij
+
+subroutine ipl_forcecreatelist(xpos, ypos, zpos, rc, rcsq,&
+                               lboxx, lboxy, lboxz,&
+                               npar, nsurf, zperiodic, potexponent,&
+                               fx, fy, fz)
+  ! Create the cell list and then return force on each particle
+
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  real(kind=db), dimension(npar), intent(in) :: xpos, ypos, zpos
+  real(kind=db), intent(in) :: rc, rcsq, lboxx, lboxy, lboxz
+  integer, intent(in) :: npar, nsurf
+  logical, intent(in) :: zperiodic
+  real(kind=db), intent(in) :: potexponent
+
+  ! outputs
+  real(kind=db), dimension(npar), intent(out) :: fx, fy, fz
+
+  !f2py intent(in) :: xpos, ypos, zpos, rc, rcsq, lboxx, lboxy, lboxz
+  !f2py intent(in) :: npar, nsurf, zperiodic, potexponent
+  !f2py intent(out) :: fx, fy, fz
+
+  integer, dimension(npar) :: ll
+  integer, allocatable, dimension(:,:,:) :: hoc
+  integer :: ncelx, ncely, ncelz, status
+  real(kind=db) :: rnx, rny, rnz
+
+  ! get the number of cells and build the cell list
+  call getnumcells(lboxx, lboxy, lboxz, rc, ncelx, ncely, ncelz)
+  allocate(hoc(ncelx, ncely, ncelz))
+  call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar,&
+                 ncelx, ncely, ncelz, ll, hoc, rnx, rny, rnz)
+  ! get force on each particle using cell list
+  call ipl_forcelist(ll, hoc, ncelx, ncely, ncelz, rnx, rny, rnz,&
+                     xpos, ypos, zpos, rc, rcsq, lboxx, lboxy,&
+                     lboxz, npar, nsurf, zperiodic, potexponent,&
+                     fx, fy, fz)
+  ! deallocate the head of cell array
+  deallocate(hoc, STAT=status)
+
+end subroutine ipl_forcecreatelist
+
+subroutine ipl_forcelist(ll, hoc, ncelx, ncely, ncelz,&
+                         rnx, rny, rnz, xpos, ypos, zpos,&
+                         rc, rcsq, lboxx, lboxy, lboxz, npar,&
+                         nsurf, zperiodic, potexponent, fx, fy, fz)
+  ! Compute force on every particle using cell list for efficiency.
+  ! Each pair is seen from both of its particles, so it is only
+  ! computed from the particle with the lower index, and the force on
+  ! the other particle is taken from Newton's third law.
+
+  use cellstencil, only: maxsten, cellstencil_heads
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  integer, dimension(npar), intent(in) :: ll
+  integer, intent(in) :: ncelx, ncely, ncelz
+  real(kind=db), intent(in) :: rnx, rny, rnz
+  integer, dimension(ncelx, ncely, ncelz), intent(in) :: hoc
+  real(kind=db), dimension(npar), intent(in) :: xpos, ypos, zpos
+  real(kind=db), intent(in) :: rc, rcsq, lboxx, lboxy, lboxz
+  integer, intent(in) :: npar, nsurf
+  logical, intent(in) :: zperiodic
+  real(kind=db), intent(in) :: potexponent
+
+  ! outputs
+  real(kind=db), dimension(npar), intent(out) :: fx, fy, fz
+
+  real(kind=db) :: xposi, yposi, zposi, fxij, fyij, fzij
+  integer :: icelx, icely, icelz, cellnum, jpar, ipar, nhead
+  integer, dimension(maxsten) :: heads
+
+  fx = 0.0_db
+  fy = 0.0_db
+  fz = 0.0_db
+
+  do ipar = 1, npar
+
+     xposi = xpos(ipar)
+     yposi = ypos(ipar)
+     zposi = zpos(ipar)
+
+     ! determine cell that particle i is in
+     icelx = int(xposi / rnx) + 1
+     icely = int(yposi / rny) + 1
+     icelz = int(zposi / rnz) + 1
+
+     ! go through each nonempty cell of the stencil (cellstencil.f90),
+     ! and add force on particle i due to all particles in the cell
+     ! (each cell is visited once, see cellstencil_heads).
+     call cellstencil_heads(hoc, icelx, icely, icelz, ncelx, ncely,&
+                            ncelz, zperiodic, nhead, heads)
+     do cellnum = 1, nhead
+        jpar = heads(cellnum)
+
+        do while (jpar /= 0)
+           if (jpar > ipar) then
+
+              ! get force on particle i due to particle j
+              call ipl_fij(ipar, jpar, xposi, yposi, zposi, xpos(jpar),&
+                           ypos(jpar), zpos(jpar),&
+                           lboxx, lboxy, lboxz, rc, rcsq, npar, nsurf,&
+                           zperiodic, potexponent, fxij, fyij, fzij)
+              fx(ipar) = fx(ipar) + fxij
+              fy(ipar) = fy(ipar) + fyij
+              fz(ipar) = fz(ipar) + fzij
+              fx(jpar) = fx(jpar) - fxij
+              fy(jpar) = fy(jpar) - fyij
+              fz(jpar) = fz(jpar) - fzij
+           end if
+           ! next particle in this cell
+           jpar = ll(jpar)
+        end do
+     end do
+  end do
+
+end subroutine ipl_forcelist
@@ -0,0 +1,197 @@
+! ipl_mccycleecmc.f90
+! James Mithen
+! j.mithen@surrey.ac.uk
+!
+! Fortran subroutine for executing event-chain Monte Carlo cycles
+! (see ecmc.f90).  A cycle consists of chains of length chainlen,
+! enough of them that the total displacement is nparfl * maxdisp.
+!
+! SUBROUTINES:
+! ipl_executecyclesecmc - execute ncycles event-chain MC cycles
+!                         note xpos,ypos,zpos and etot are returned
+
+subroutine ipl_executecyclesecmc(xpos, ypos, zpos, ncycles, nsamp, rc,&
+                                 rcsq, vrc, vrc2, lboxx, lboxy, lboxz,&
+                                 epsovert, maxdisp, chainlen, npar,&
+                                 nsurf, zperiodic, sameseed,&
+                                 potexponent, etot)
+  ! execute ncycles event-chain MC cycles
+
+  use simstate, only: simstate_seed, simstate_nlist, simstate_store,&
+                      simstate_addmoves
+  use ecmc, only: rcskip, nnb, nbj, nbd, nbbsq, ecmc_neighbours,&
+                  ecmc_maxstep, ecmc_move
+  use rng, only: rng_uniform
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  integer, intent(in) :: ncycles, nsamp, npar, nsurf
+  real(kind=db), intent(in) :: rc, rcsq, vrc, vrc2, lboxx, lboxy, lboxz
+  real(kind=db), intent(in) :: epsovert, maxdisp, chainlen, potexponent
+  logical, intent(in) :: zperiodic, sameseed
+
+  ! outputs
+  real(kind=db), dimension(npar), intent(inout) :: xpos, ypos, zpos
+  real(kind=db), intent(inout) :: etot
+
+  !f2py intent(in) :: ncycles, nsamp, rc, rcsq, vrc, vrc2, lboxx, lboxy, lboxz, epsovert
+  !f2py intent(in) :: maxdisp, chainlen, npar, nsurf, zperiodic, sameseed, potexponent
+  !f2py intent(in,out) :: xpos, ypos, zpos, etot
+
+  integer :: ipar, iaxis, idir, ilimit, jev, n, ic, cy, nchain, nparfl
+  integer :: nevent
+  real(kind=db) :: rsc, posi, remain, smax, s, sj, v, rsq, rcsqin, g, de,&
+                   halfexpminus2, halfexpinv
+  logical :: reversible
+
+  ! initialize random number generator (if the simulation state is
+  ! kept between calls, this was done once by simstate_init).  If a
+  ! counter-based stream has been set (see rng.f90), it is used
+  ! instead.
+  call simstate_seed(sameseed)
+
+  ! get the cell list; this is only built if the cell list stored
+  ! by the previous call cannot be reused (see simstate.f90)
+  call simstate_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar)
+
+  nparfl = npar - nsurf
+  nchain = max(nint(nparfl * maxdisp / chainlen), 1)
+  nevent = 0
+
+  ! chains go in both directions if they can be reversed (see ecmc.f90)
+  reversible = nsurf > 0 .or. .not. zperiodic
+
+  ! squared separation at which a pair coming within the cutoff stops
+  ! the move, if it does so as soon as it is within the cutoff
+  rcsqin = (1.0_db - rcskip) * rcsq
+
+  ! the pair energy is r^-n = 1 / (r^2 * (r^2)^(n/2 - 1))
+  halfexpminus2 = (potexponent - 2.0_db) / 2.0_db
+  halfexpinv = 2.0_db / potexponent
+
+  write(*,*) 0,etot
+  do cy = 1, ncycles
+     do ic = 1, nchain
+
+        ! pick a particle at random from fluid particles, and a
+        ! direction of motion
+        call rng_uniform(rsc)
+        ipar = int(rsc * nparfl) + 1 + nsurf
+        call rng_uniform(rsc)
+        iaxis = int(rsc * 3) + 1
+        idir = 1
+        if (reversible) then
+           call rng_uniform(rsc)
+           if (rsc < 0.5_db) idir = -1
+        end if
+
+        remain = chainlen
+        do while (remain > 0.0_db)
+           nevent = nevent + 1
+
+           if (iaxis == 1) then
+              posi = xpos(ipar)
+           else if (iaxis == 2) then
+              posi = ypos(ipar)
+           else
+              posi = zpos(ipar)
+           end if
+           call ecmc_neighbours(ipar, iaxis, idir, xpos, ypos, zpos,&
+                                rcsq, lboxx, lboxy, lboxz, npar,&
+                                zperiodic)
+           call ecmc_maxstep(iaxis, idir, posi, remain, zperiodic,&
+                             smax, ilimit)
+
+           ! for each particle ahead, the distance at which the pair
+           ! energy has risen by de from its present value.  The
+           ! energy rises until the particles are closest, i.e. for
+           ! a distance nbd, and is zero beyond the cutoff.
+           s = smax
+           jev = 0
+           do n = 1, nnb
+              if (nbd(n) <= 0.0_db) cycle
+              if (nbj(n) > nsurf) then
+                 v = vrc
+              else
+                 v = vrc2
+              end if
+              call rng_uniform(rsc)
+              de = -log(1.0_db - rsc) / epsovert
+
+              ! r^-n when the pair energy has risen by de
+              rsq = nbbsq(n) + nbd(n)**2
+              if (rsq < rcsq) then
+                 g = 1.0_db / (rsq * (rsq**halfexpminus2)) + de
+              else
+                 g = v + de
+              end if
+              if (g > 0.0_db) then
+                 rsq = min(g**(-halfexpinv), rcsqin)
+              else
+                 rsq = rcsqin
+              end if
+
+              if (rsq > nbbsq(n)) then
+                 sj = max(nbd(n) - sqrt(rsq - nbbsq(n)), 0.0_db)
+                 if (sj < s) then
+                    s = sj
+                    jev = n
+                 end if
+              end if
+           end do
+
+           ! change in energy when the particle moves a distance s
+           do n = 1, nnb
+              if (nbj(n) > nsurf) then
+                 v = vrc
+              else
+                 v = vrc2
+              end if
+              rsq = nbbsq(n) + nbd(n)**2
+              if (rsq < rcsq) then
+                 etot = etot - 1.0_db / (rsq * (rsq**halfexpminus2)) + v
+              end if
+              rsq = nbbsq(n) + (nbd(n) - s)**2
+              if (rsq < rcsq) then
+                 etot = etot + 1.0_db / (rsq * (rsq**halfexpminus2)) - v
+              end if
+           end do
+
+           call ecmc_move(ipar, iaxis, idir, s, xpos, ypos, zpos, lboxx,&
+                          lboxy, lboxz, npar)
+           if (jev == 0 .and. ilimit == 0) then
+              remain = 0.0_db
+           else
+              remain = remain - s
+           end if
+
+           ! lift the chain to the particle that stopped it, or
+           ! reverse it at a surface particle or hard wall
+           if (jev /= 0) then
+              if (nbj(jev) > nsurf) then
+                 ipar = nbj(jev)
+              else
+                 idir = -idir
+              end if
+           else if (ilimit == 2) then
+              idir = -idir
+           end if
+        end do
+
+     end do
+
+     ! write out energy after every nsamp cycles
+     if (mod(cy, nsamp) == 0) write(*, *) cy, etot
+
+  end do
+
+  ! the cell list is up to date for the final positions
+  call simstate_store(rc, lboxx, lboxy, lboxz)
+  call simstate_addmoves(nevent, nevent, 0, 0)
+
+  ! write out number of events (including cell crossings) per chain
+  write(*,'("events per chain", I9, I7, F9.2)') nevent, nchain * ncycles,&
+       real(nevent) / (nchain * ncycles)
+
+end subroutine ipl_executecyclesecmc
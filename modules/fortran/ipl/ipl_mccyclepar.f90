@@ -0,0 +1,486 @@
+! ipl_mccyclepar.f90
+! James Mithen
+! j.mithen@surrey.ac.uk
+!
+! Fortran subroutines for executing Monte Carlo cycles in parallel
+! (OpenMP), using a checkerboard decomposition of the box.  The box is
+! divided into an even number of cells, each of side at least rc, in
+! each dimension, and each cell is given one of 8 colours according to
+! whether its indices are odd or even.  In a phase, the particles in
+! all cells of one colour are moved, with the cells shared out between
+! threads.  A move that would take a particle out of its cell is
+! rejected, so that particles in different cells of the same colour
+! never interact, and the cells can be updated independently.
+!
+! Each phase uses a random colour, and the cell grid is shifted by a
+! random vector, so that every phase satisfies detailed balance and
+! the particles near the cell walls are moved as often as the rest.
+! A phase makes on average nparfl / 8 attempted moves (one per fluid
+! particle in the cells of its colour), so that a cycle of 8 phases is
+! on average nparfl attempted moves, as in ipl_executecyclesnvt.  In
+! NPT, a cycle is 9 steps, each of which is a volume move with
+! probability 1/9 and a phase otherwise.  The random numbers of each
+! cell come from their own counter-based stream (see rng.f90).
+!
+! If the box is too small for at least 4 cells in each dimension, the
+! serial subroutines are used.
+!
+! SUBROUTINES:
+! ipl_checkerphase        - one phase of checkerboard MC
+! ipl_executecyclesnvtpar - execute ncycles monte carlo cycles (NVT)
+! ipl_executecyclesnptpar - execute ncycles monte carlo cycles (NPT)
+
+subroutine ipl_checkerphase(xpos, ypos, zpos, rc, rcsq, vrc, vrc2,&
+                            lboxx, lboxy, lboxz, epsovert, maxdisp,&
+                            npar, nsurf, zperiodic, potexponent,&
+                            nthreads, etot, atmov, acmov)
+  ! one phase of checkerboard MC
+
+  use rng, only: rng_uniform, rng_next
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+  integer, parameter :: i8 = 8
+
+  ! inputs
+  integer, intent(in) :: npar, nsurf, nthreads
+  real(kind=db), intent(in) :: rc, rcsq, vrc, vrc2, lboxx, lboxy, lboxz
+  real(kind=db), intent(in) :: epsovert, maxdisp, potexponent
+  logical, intent(in) :: zperiodic
+
+  ! outputs
+  real(kind=db), dimension(npar), intent(inout) :: xpos, ypos, zpos
+  real(kind=db), intent(inout) :: etot
+  integer, intent(inout) :: atmov, acmov
+
+  !f2py intent(in) :: rc, rcsq, vrc, vrc2, lboxx, lboxy, lboxz, epsovert
+  !f2py intent(in) :: maxdisp, npar, nsurf, zperiodic, potexponent, nthreads
+  !f2py intent(in,out) :: xpos, ypos, zpos, etot, atmov, acmov
+
+  integer :: ncelx, ncely, ncelz, icol, ncell, n, i, it, nfl, k, ipar,&
+             jpar, celx, cely, celz, ib
+  real(kind=db) :: rnx, rny, rnz, rsc, sx, sy, sz, dx, dy, dz, xsnew,&
+                   ysnew, zsnew, xposinew, yposinew, zposinew, eold,&
+                   enew, de
+  integer(kind=i8), dimension(4) :: words, ctr
+  integer(kind=i8), dimension(2) :: key
+  real(kind=db), dimension(4) :: ubuf
+  logical :: accept
+  ! shifted positions and their cell list
+  real(kind=db), allocatable, dimension(:) :: xs, ys, zs
+  integer, allocatable, dimension(:) :: ll
+  integer, allocatable, dimension(:,:,:) :: hoc
+
+  call checker_numcells(lboxx, lboxy, lboxz, rc, ncelx, ncely, ncelz)
+
+  ! random shift of the cell grid (not in z if there is a wall), and
+  ! random colour
+  call rng_uniform(rsc)
+  sx = rsc * lboxx
+  call rng_uniform(rsc)
+  sy = rsc * lboxy
+  sz = 0.0_db
+  if (zperiodic) then
+     call rng_uniform(rsc)
+     sz = rsc * lboxz
+  end if
+  call rng_uniform(rsc)
+  icol = int(rsc * 8)
+
+  ! key and counter words for the random number streams of the cells
+  do i = 1, 4
+     call rng_uniform(rsc)
+     words(i) = int(rsc * 4294967296.0_db, i8)
+  end do
+
+  ! shifted positions, all in [0, lbox)
+  allocate(xs(npar), ys(npar), zs(npar), ll(npar))
+  allocate(hoc(ncelx, ncely, ncelz))
+  do i = 1, npar
+     xs(i) = xpos(i) + sx
+     if (xs(i) >= lboxx) xs(i) = xs(i) - lboxx
+     ys(i) = ypos(i) + sy
+     if (ys(i) >= lboxy) ys(i) = ys(i) - lboxy
+     zs(i) = zpos(i) + sz
+     if (zs(i) >= lboxz) zs(i) = zs(i) - lboxz
+  end do
+  call new_nlist(xs, ys, zs, rc, lboxx, lboxy, lboxz, npar, ncelx,&
+                 ncely, ncelz, ll, hoc, rnx, rny, rnz)
+
+  ncell = (ncelx / 2) * (ncely / 2) * (ncelz / 2)
+  de = 0.0_db
+
+  !$omp parallel do num_threads(nthreads) schedule(dynamic)&
+  !$omp default(shared) reduction(+:de, atmov, acmov)&
+  !$omp private(celx, cely, celz, key, ctr, ubuf, ib, nfl, it, k,&
+  !$omp         ipar, jpar, rsc, dx, dy, dz, xsnew, ysnew, zsnew,&
+  !$omp         xposinew, yposinew, zposinew, eold, enew, accept)
+  do n = 1, ncell
+     call checker_cell(n, icol, ncelx, ncely, ncelz, celx, cely, celz)
+
+     ! random number stream of this cell
+     key(1) = words(1)
+     key(2) = words(2)
+     ctr(1) = 0
+     ctr(2) = n
+     ctr(3) = words(3)
+     ctr(4) = words(4)
+     ib = 5
+
+     ! number of fluid particles in the cell; no particle enters or
+     ! leaves the cell during the phase
+     nfl = 0
+     jpar = hoc(celx, cely, celz)
+     do while (jpar /= 0)
+        if (jpar > nsurf) nfl = nfl + 1
+        jpar = ll(jpar)
+     end do
+
+     do it = 1, nfl
+        atmov = atmov + 1
+
+        ! pick a fluid particle in the cell at random
+        call rng_next(key, ctr, ubuf, ib, rsc)
+        k = int(rsc * nfl) + 1
+        ipar = hoc(celx, cely, celz)
+        do
+           if (ipar > nsurf) then
+              k = k - 1
+              if (k == 0) exit
+           end if
+           ipar = ll(ipar)
+        end do
+
+        ! displace particle, rejecting the move if it leaves the cell
+        call rng_next(key, ctr, ubuf, ib, rsc)
+        dx = maxdisp * (rsc - 0.5_db)
+        call rng_next(key, ctr, ubuf, ib, rsc)
+        dy = maxdisp * (rsc - 0.5_db)
+        call rng_next(key, ctr, ubuf, ib, rsc)
+        dz = maxdisp * (rsc - 0.5_db)
+        xsnew = xs(ipar) + dx
+        ysnew = ys(ipar) + dy
+        zsnew = zs(ipar) + dz
+        if (floor(xsnew / rnx) + 1 /= celx .or.&
+            floor(ysnew / rny) + 1 /= cely .or.&
+            floor(zsnew / rnz) + 1 /= celz .or. zsnew <= 0.0_db) cycle
+
+        ! find old and new energy
+        call ipl_enlist(ll, hoc, ncelx, ncely, ncelz, ipar, xs(ipar),&
+                        ys(ipar), zs(ipar), xs, ys, zs, rc, rcsq,&
+                        lboxx, lboxy, lboxz, vrc, vrc2, npar, nsurf,&
+                        zperiodic, potexponent, eold)
+        call ipl_enlist(ll, hoc, ncelx, ncely, ncelz, ipar, xsnew,&
+                        ysnew, zsnew, xs, ys, zs, rc, rcsq, lboxx,&
+                        lboxy, lboxz, vrc, vrc2, npar, nsurf,&
+                        zperiodic, potexponent, enew)
+
+        ! choose whether to accept the move or not
+        accept = .True.
+        if (enew > eold) then
+           call rng_next(key, ctr, ubuf, ib, rsc)
+           if (exp((eold - enew) * epsovert) < rsc) accept = .False.
+        end if
+
+        ! update positions if move accepted
+        if (accept) then
+           xs(ipar) = xsnew
+           ys(ipar) = ysnew
+           zs(ipar) = zsnew
+
+           ! periodic boundary conditions for the unshifted positions
+           xposinew = xpos(ipar) + dx
+           if (xposinew < 0.0_db) then
+              xposinew = xposinew + lboxx
+           else if (xposinew > lboxx) then
+              xposinew = xposinew - lboxx
+           end if
+           yposinew = ypos(ipar) + dy
+           if (yposinew < 0.0_db) then
+              yposinew = yposinew + lboxy
+           else if (yposinew > lboxy) then
+              yposinew = yposinew - lboxy
+           end if
+           zposinew = zpos(ipar) + dz
+           if (zperiodic) then
+              if (zposinew < 0.0_db) then
+                 zposinew = zposinew + lboxz
+              else if (zposinew > lboxz) then
+                 zposinew = zposinew - lboxz
+              end if
+           end if
+
+           xpos(ipar) = xposinew
+           ypos(ipar) = yposinew
+           zpos(ipar) = zposinew
+           de = de - eold + enew
+           acmov = acmov + 1
+        end if
+     end do
+  end do
+  !$omp end parallel do
+
+  etot = etot + de
+  deallocate(xs, ys, zs, ll, hoc)
+
+end subroutine ipl_checkerphase
+
+subroutine ipl_executecyclesnvtpar(xpos, ypos, zpos, ncycles, nsamp,&
+                                   rc, rcsq, vrc, vrc2, lboxx, lboxy,&
+                                   lboxz, epsovert, maxdisp, npar,&
+                                   nsurf, zperiodic, sameseed,&
+                                   potexponent, nthreads, etot)
+  ! execute ncycles MC cycles
+
+  use simstate, only: simstate_seed, simstate_invalidate,&
+                      simstate_addmoves
+  use cellstencil, only: cellsub, cellstencil_set
+  !$ use omp_lib, only: omp_get_num_procs
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  integer, intent(in) :: ncycles, nsamp, npar, nsurf, nthreads
+  real(kind=db), intent(in) :: rc, rcsq, vrc, vrc2, lboxx, lboxy, lboxz
+  real(kind=db), intent(in) :: epsovert, maxdisp, potexponent
+  logical, intent(in) :: zperiodic, sameseed
+
+  ! outputs
+  real(kind=db), dimension(npar), intent(inout) :: xpos, ypos, zpos
+  real(kind=db), intent(inout) :: etot
+
+  !f2py intent(in) :: ncycles, nsamp, rc, rcsq, vrc, vrc2, lboxx, lboxy, lboxz, epsovert
+  !f2py intent(in) :: maxdisp, npar, nparsuf, zperiodic, sameseed, potexponent
+  !f2py intent(in) :: nthreads
+  !f2py intent(in,out) :: xpos, ypos, zpos, etot
+
+  integer :: atmov, acmov, cy, ph, nthr, ncelx, ncely, ncelz,&
+             cellsubold
+
+  ! at least 4 cells in each dimension are needed
+  call checker_numcells(lboxx, lboxy, lboxz, rc, ncelx, ncely, ncelz)
+  if (min(ncelx, ncely, ncelz) < 4) then
+     write(*,*) 'box too small for checkerboard MC, using serial MC'
+     call ipl_executecyclesnvt(xpos, ypos, zpos, ncycles, nsamp, rc,&
+                               rcsq, vrc, vrc2, lboxx, lboxy, lboxz,&
+                               epsovert, maxdisp, npar, nsurf,&
+                               zperiodic, sameseed, potexponent, etot)
+     return
+  end if
+
+  ! number of threads (if 0, one per processor)
+  nthr = max(nthreads, 1)
+  !$ if (nthreads <= 0) nthr = omp_get_num_procs()
+
+  ! initialize random number generator (see ipl_executecyclesnvt);
+  ! this is only used to choose the colour, shift and streams of
+  ! each phase
+  call simstate_seed(sameseed)
+
+  ! the energies are computed with the stencil of the 27 cells of
+  ! side rc around a particle (see cellstencil.f90), whatever the
+  ! stencil used by the serial code; that one is restored at the end
+  cellsubold = cellsub
+  call cellstencil_set(1)
+
+  atmov = 0
+  acmov = 0
+
+  write(*,*) 0,etot
+  do cy = 1, ncycles
+     do ph = 1, 8
+        call ipl_checkerphase(xpos, ypos, zpos, rc, rcsq, vrc, vrc2,&
+                              lboxx, lboxy, lboxz, epsovert, maxdisp,&
+                              npar, nsurf, zperiodic, potexponent,&
+                              nthr, etot, atmov, acmov)
+     end do
+
+     ! write out energy after every nsamp cycles
+     if (mod(cy, nsamp) == 0) write(*, *) cy, etot
+
+  end do
+
+  ! the cell list kept by simstate was not updated
+  call simstate_invalidate()
+  call cellstencil_set(cellsubold)
+  call simstate_addmoves(atmov, acmov, 0, 0)
+
+  ! write out acceptance ratio
+  write(*,'("acceptance ratio", I7, I7, F7.3)') acmov, atmov, real(acmov) / atmov
+
+end subroutine ipl_executecyclesnvtpar
+
+subroutine ipl_executecyclesnptpar(xpos, ypos, zpos, ncycles, nsamp,&
+                                   rc, rcsq, vrc, vrc2, press, lboxx,&
+                                   lboxy, lboxz, epsovert, maxdisp,&
+                                   maxvol, npar, nsurf, zperiodic,&
+                                   sameseed, potexponent, nthreads,&
+                                   etot)
+  ! execute ncycles MC cycles
+
+  use simstate, only: simstate_seed, simstate_invalidate,&
+                      simstate_addmoves
+  use cellstencil, only: cellsub, cellstencil_set
+  use rng, only: rng_uniform
+  !$ use omp_lib, only: omp_get_num_procs
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  integer, intent(in) :: ncycles, nsamp, npar, nsurf, nthreads
+  real(kind=db), intent(in) :: rc, rcsq, vrc, vrc2, press
+  real(kind=db), intent(in) :: epsovert, maxdisp, maxvol, potexponent
+  logical, intent(in) :: zperiodic, sameseed
+
+  ! outputs
+  real(kind=db), dimension(npar), intent(inout) :: xpos, ypos, zpos
+  real(kind=db), intent(inout) :: lboxx, lboxy, lboxz, etot
+
+  !f2py intent(in) :: ncycles, nsamp, rc, rcsq, vrc, vrc2, epsovert
+  !f2py intent(in) :: maxdisp, npar, nparsuf, zperiodic, sameseed, potexponent
+  !f2py intent(in) :: nthreads
+  !f2py intent(in,out) :: xpos, ypos, zpos, lboxx, lboxy, lboxz, etot
+
+  integer :: atmovdisp, acmovdisp, atmovvol, acmovvol, cy, it, nparfl,&
+             nthr, ncelx, ncely, ncelz, cellsubold
+  real(kind=db) :: rsc, lboxxold, lboxyold, lboxzold
+  real(kind=db) :: vboxold, lnvold, lnvnew, vboxnew
+  real(kind=db) :: scalefacx, scalefacy, scalefacz, arg, etotnew
+  logical :: accept
+
+  ! at least 4 cells in each dimension are needed
+  call checker_numcells(lboxx, lboxy, lboxz, rc, ncelx, ncely, ncelz)
+  if (min(ncelx, ncely, ncelz) < 4) then
+     write(*,*) 'box too small for checkerboard MC, using serial MC'
+     call ipl_executecyclesnpt(xpos, ypos, zpos, ncycles, nsamp, rc,&
+                               rcsq, vrc, vrc2, press, lboxx, lboxy,&
+                               lboxz, epsovert, maxdisp, maxvol, npar,&
+                               nsurf, zperiodic, sameseed, potexponent,&
+                               etot)
+     return
+  end if
+
+  ! number of threads (if 0, one per processor)
+  nthr = max(nthreads, 1)
+  !$ if (nthreads <= 0) nthr = omp_get_num_procs()
+
+  ! initialize random number generator (see ipl_executecyclesnpt)
+  call simstate_seed(sameseed)
+
+  ! the energies are computed with the stencil of the 27 cells of
+  ! side rc around a particle (see cellstencil.f90), whatever the
+  ! stencil used by the serial code; that one is restored at the end
+  cellsubold = cellsub
+  call cellstencil_set(1)
+
+  atmovdisp = 0
+  acmovdisp = 0
+  atmovvol = 0
+  acmovvol = 0
+  nparfl = npar - nsurf
+
+  write(*, '(F12.6, F12.6, F12.6, F12.6)') etot, lboxx, lboxy, lboxz
+  do cy = 1, ncycles
+     ! each cycle is on average 8 phases + 1 vol move
+     do it = 1, 9
+
+        call rng_uniform(rsc)
+        if (int(rsc * 9) == 8) then ! volume move
+           atmovvol = atmovvol + 1
+
+           ! old box volume
+           lboxxold = lboxx
+           lboxyold = lboxy
+           lboxzold = lboxz
+           vboxold = lboxx * lboxy * lboxz
+           lnvold = log(vboxold)
+
+           ! random number between 0 and 1 for attempted volume move
+           call rng_uniform(rsc)
+
+           ! new box volume
+           lnvnew = lnvold + maxvol * (rsc - 0.5_db)
+           vboxnew = exp(lnvnew)
+
+           ! scale factor for each dimension of the simulation box
+           ! (see ipl_executecyclesnpt)
+           if (zperiodic) then
+              scalefacx = (vboxnew / vboxold) ** (1.0_db/3.0_db)
+              scalefacy = scalefacx
+              scalefacz = scalefacx
+           else
+              scalefacx = 1.0_db
+              scalefacy = 1.0_db
+              scalefacz = (vboxnew / vboxold)
+           end if
+
+           ! new box dimensions; boxes too small for the checkerboard
+           ! are excluded, i.e. the move is rejected
+           lboxx = lboxx * scalefacx
+           lboxy = lboxy * scalefacy
+           lboxz = lboxz * scalefacz
+           call checker_numcells(lboxx, lboxy, lboxz, rc, ncelx, ncely,&
+                                 ncelz)
+           accept = min(ncelx, ncely, ncelz) >= 4
+
+           if (accept) then
+              ! rescale particle positions to new volume
+              xpos = xpos * scalefacx
+              ypos = ypos * scalefacy
+              zpos = zpos * scalefacz
+
+              ! new energy, note we are using new box dimensions
+              call ipl_totalencreatelist(xpos, ypos, zpos, rc, rcsq,&
+                                         lboxx, lboxy, lboxz, vrc,&
+                                         vrc2, npar, nsurf, zperiodic,&
+                                         potexponent, etotnew)
+
+              ! See FS p122 (Algorithm 11) for this acceptance rule
+              arg = epsovert * (etot - etotnew + press * (vboxold - vboxnew)) + &
+                    (nparfl + 1) * (lnvnew - lnvold)
+              if (arg < 0) then
+                 call rng_uniform(rsc)
+                 if (rsc > exp(arg)) then
+                    accept = .False.
+                    ! back to old positions
+                    xpos = xpos / scalefacx
+                    ypos = ypos / scalefacy
+                    zpos = zpos / scalefacz
+                 end if
+              end if
+           end if
+
+           if (accept) then
+              etot = etotnew
+              acmovvol = acmovvol + 1
+           else
+              ! back to old boxsize
+              lboxx = lboxxold
+              lboxy = lboxyold
+              lboxz = lboxzold
+           end if
+
+        else ! phase of displacement moves
+           call ipl_checkerphase(xpos, ypos, zpos, rc, rcsq, vrc, vrc2,&
+                                 lboxx, lboxy, lboxz, epsovert,&
+                                 maxdisp, npar, nsurf, zperiodic,&
+                                 potexponent, nthr, etot, atmovdisp,&
+                                 acmovdisp)
+        end if
+     end do
+
+     ! write out energy after every nsamp cycles
+     if (mod(cy,nsamp) == 0) write(*, '(F12.6, F12.6, F12.6, F12.6)') etot, lboxx, lboxy, lboxz
+
+  end do
+
+  ! the cell list kept by simstate was not updated
+  call simstate_invalidate()
+  call cellstencil_set(cellsubold)
+  call simstate_addmoves(atmovdisp, acmovdisp, atmovvol, acmovvol)
+
+  ! write out acceptance ratio
+  write(*,'("acceptance ratio", I7, I7, F7.3, I7, I7, F7.3)')&
+        acmovdisp, atmovdisp, real(acmovdisp) / atmovdisp,&
+        acmovvol, atmovvol, real(acmovvol) / atmovvol
+
+end subroutine ipl_executecyclesnptpar
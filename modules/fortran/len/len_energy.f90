@@ -16,6 +16,14 @@
 ! len_totalenlist       - compute total p.e. using cell lists
 ! len_enlist            - compute total p.e. of particle i using
 !                         cell lists
+! len_enbuf             - add p.e. between a particle and a buffer of
+!                         particles (used by len_enlist)
+! len_totalenlistscaled - compute total p.e. using cell lists, with
+!                         the box and positions scaled
+! len_eijsums           - compute p.e. between particles i and j,
+!                         and the r^-6 and r^-12 terms separately
+! len_enlistsums        - compute total p.e. of particle i using
+!                         cell lists, and the r^-6 and r^-12 sums
 
 subroutine len_totalenergy(xpos, ypos, zpos, rc, rcsq,&
                            lboxx, lboxy, lboxz, vrc, vrc2, npar,&
@@ -283,7 +291,7 @@ subroutine len_totalencreatelist(xpos, ypos, zpos, rc, rcsq,&
   
   ! get the number of cells and build the cell list
   call getnumcells(lboxx, lboxy, lboxz, rc, ncelx, ncely, ncelz)
-  allocate(hoc(ncelx, ncely, ncelx))
+  allocate(hoc(ncelx, ncely, ncelz))
   call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar,&
                  ncelx, ncely, ncelz, ll, hoc, rnx, rny, rnz)
   ! get total energy using cell list
@@ -303,6 +311,7 @@ subroutine len_totalenlist(ll, hoc, ncelx, ncely, ncelz,&
                            zperiodic, r6mult, r12mult, etot)
   ! Compute total potential energy of system using cell lists
 
+  use cellstencil, only: maxsten, cellstencil_heads
   implicit none
   integer, parameter :: db = 8 !selected_real_kind(13)
 
@@ -321,8 +330,8 @@ subroutine len_totalenlist(ll, hoc, ncelx, ncely, ncelz,&
   real(kind=db), intent(out) :: etot
 
   real(kind=db) :: eij, xposi, yposi, zposi
-  integer :: icelx, icely, icelz, cellnum, jpar, celx, cely, celz,&
-             nceltot, ipar
+  integer :: icelx, icely, icelz, cellnum, jpar, ipar, nhead
+  integer, dimension(maxsten) :: heads
   etot = 0.0_db
 
   do ipar = 1, npar
@@ -336,23 +345,13 @@ subroutine len_totalenlist(ll, hoc, ncelx, ncely, ncelz,&
      icely = int(yposi / rny) + 1
      icelz = int(zposi / rnz) + 1
 
-     ! go through each cell in turn (27 in total in three dimensions),
+     ! go through each nonempty cell of the stencil (cellstencil.f90),
      ! and add pot energy between particle i and all particles in the
      ! cell.
-     if (ncelx == 1) then
-        nceltot = 1
-     else
-        nceltot = 27
-     end if
-
-     do cellnum = 1, nceltot
-
-        ! get the next cell indexes (ncelx, ncely, ncelz)
-        call cellindx(cellnum, icelx, icely, icelz,& ! cell of particle i
-                      ncelx, ncely, ncelz,&          ! total num cells in each dim
-                      celx, cely, celz)              ! cell index we want
-
-        jpar = hoc(celx, cely, celz)
+     call cellstencil_heads(hoc, icelx, icely, icelz, ncelx, ncely,&
+                            ncelz, zperiodic, nhead, heads)
+     do cellnum = 1, nhead
+        jpar = heads(cellnum)
 
         do while (jpar /= 0)
            if (ipar /= jpar) then
@@ -381,6 +380,7 @@ subroutine len_enlist(ll, hoc, ncelx, ncely, ncelz, ipar, xposi,&
                       zperiodic, r6mult, r12mult, epot)
   ! Compute potential energy of particle i using cell lists
 
+  use cellstencil, only: maxsten, cellstencil_heads
   implicit none
   integer, parameter :: db = 8 !selected_real_kind(13)
 
@@ -399,8 +399,14 @@ subroutine len_enlist(ll, hoc, ncelx, ncely, ncelz, ipar, xposi,&
   ! outputs
   real(kind=db), intent(out) :: epot
 
-  real(kind=db) :: rnx, rny, rnz, eij
-  integer :: icelx, icely, icelz, cellnum, jpar, celx, cely, celz, nceltot
+  ! size of the buffers of particle positions
+  integer, parameter :: maxbuf = 256
+
+  real(kind=db) :: rnx, rny, rnz
+  integer :: icelx, icely, icelz, cellnum, jpar, nhead, nbuf
+  integer, dimension(maxsten) :: heads
+  real(kind=db), dimension(maxbuf) :: xbuf, ybuf, zbuf
+  logical, dimension(maxbuf) :: fluid
   epot = 0.0_db
 
   ! cell dimension in x, y and z directions
@@ -413,37 +419,350 @@ subroutine len_enlist(ll, hoc, ncelx, ncely, ncelz, ipar, xposi,&
   icely = int(yposi / rny) + 1
   icelz = int(zposi / rnz) + 1
   
-  ! go through each cell in turn (27 in total in three dimensions),
+  ! go through each nonempty cell of the stencil (cellstencil.f90),
   ! and add pot energy between particle i and all particles in the
-  ! cell.  Note if
-  if (ncelx == 1) then
-     nceltot = 1
+  ! cell (each cell is visited once, see cellstencil_heads).
+  call cellstencil_heads(hoc, icelx, icely, icelz, ncelx, ncely,&
+                         ncelz, zperiodic, nhead, heads)
+  ! The positions of the particles are gathered into buffers, and the
+  ! p.e. of each full buffer is computed by len_enbuf.
+  nbuf = 0
+  do cellnum = 1, nhead
+     jpar = heads(cellnum)
+     
+     do while (jpar /= 0)
+        if (ipar /= jpar) then
+           nbuf = nbuf + 1
+           xbuf(nbuf) = xpos(jpar)
+           ybuf(nbuf) = ypos(jpar)
+           zbuf(nbuf) = zpos(jpar)
+           fluid(nbuf) = ipar > nsurf .and. jpar > nsurf
+           if (nbuf == maxbuf) then
+              call len_enbuf(nbuf, xbuf, ybuf, zbuf, fluid, xposi,&
+                             yposi, zposi, lboxx, lboxy, lboxz, rcsq,&
+                             vrc, vrc2, zperiodic, r6mult, r12mult,&
+                             epot)
+              nbuf = 0
+           end if
+        end if
+        jpar = ll(jpar)
+
+     end do
+  enddo
+  call len_enbuf(nbuf, xbuf, ybuf, zbuf, fluid, xposi, yposi, zposi,&
+                 lboxx, lboxy, lboxz, rcsq, vrc, vrc2, zperiodic,&
+                 r6mult, r12mult, epot)
+
+end subroutine len_enlist
+
+subroutine len_enbuf(nbuf, xbuf, ybuf, zbuf, fluid, xposi, yposi,&
+                     zposi, lboxx, lboxy, lboxz, rcsq, vrc, vrc2,&
+                     zperiodic, r6mult, r12mult, epot)
+  ! Add to epot the potential energy between a particle at xposi,
+  ! yposi, zposi and the nbuf particles at xbuf, ybuf, zbuf; fluid is
+  ! true if both particles of the pair are fluid particles.  The
+  ! loop over the particles has no branches, so that the compiler
+  ! can vectorise it: the periodic images and the cutoff are chosen
+  ! with merge, and the p.e. of all the pairs is computed, including
+  ! those beyond the cutoff.  The p.e. of each pair is the same as
+  ! that from len_eij, and the pairs are added in order, so epot is
+  ! the same as if len_eij were called for each pair.
+
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  integer, intent(in) :: nbuf
+  real(kind=db), dimension(nbuf), intent(in) :: xbuf, ybuf, zbuf
+  logical, dimension(nbuf), intent(in) :: fluid
+  real(kind=db), intent(in) :: xposi, yposi, zposi
+  real(kind=db), intent(in) :: lboxx, lboxy, lboxz, rcsq, vrc, vrc2
+  logical, intent(in) :: zperiodic
+  real(kind=db), intent(in) :: r6mult, r12mult
+
+  ! outputs
+  real(kind=db), intent(inout) :: epot
+
+  !f2py intent(in) :: nbuf, xbuf, ybuf, zbuf, fluid, xposi, yposi, zposi
+  !f2py intent(in) :: lboxx, lboxy, lboxz, rcsq, vrc, vrc2, zperiodic
+  !f2py intent(in) :: r6mult, r12mult
+  !f2py intent(in,out) :: epot
+
+  real(kind=db), dimension(nbuf) :: eij
+  real(kind=db) :: sepx, sepy, sepz, sepsq, r2i, r6i, r12i, hlboxz
+  integer :: n
+
+  ! no periodic boundary in z if hlboxz is huge
+  if (zperiodic) then
+     hlboxz = 0.5 * lboxz
   else
-     nceltot = 27
+     hlboxz = huge(hlboxz)
   end if
+
+  do n = 1, nbuf
+     sepx = xposi - xbuf(n)
+     sepx = sepx - merge(lboxx, 0.0_db, sepx > 0.5 * lboxx)&
+                 + merge(lboxx, 0.0_db, sepx < -0.5 * lboxx)
+     sepy = yposi - ybuf(n)
+     sepy = sepy - merge(lboxy, 0.0_db, sepy > 0.5 * lboxy)&
+                 + merge(lboxy, 0.0_db, sepy < -0.5 * lboxy)
+     sepz = zposi - zbuf(n)
+     sepz = sepz - merge(lboxz, 0.0_db, sepz > hlboxz)&
+                 + merge(lboxz, 0.0_db, sepz < -hlboxz)
+     sepsq = sepx**2 + sepy**2 + sepz**2
+
+     r2i = 1.0_db / sepsq
+     r6i = r2i**3
+     r12i = r6i**2
+     eij(n) = merge(merge(r12i - r6i - vrc,&
+                          r12mult * r12i - r6mult * r6i - vrc2,&
+                          fluid(n)), 0.0_db, sepsq < rcsq)
+  end do
+
+  do n = 1, nbuf
+     epot = epot + eij(n)
+  end do
+
+end subroutine len_enbuf
+
+subroutine len_totalenlistscaled(ll, hoc, ncelx, ncely, ncelz, rnx, rny,&
+                                 rnz, xpos, ypos, zpos, scalefacx,&
+                                 scalefacy, scalefacz, rc, rcsq, lboxx,&
+                                 lboxy, lboxz, vrc, vrc2, npar, nsurf,&
+                                 zperiodic, r6mult, r12mult, etot,&
+                                 r6tot, r12tot)
+  ! Compute total potential energy of system using cell lists, for the
+  ! positions multiplied by scalefacx, scalefacy and scalefacz, in
+  ! the box lboxx, lboxy, lboxz (i.e. the box after scaling).  The
+  ! cell list (and rnx, rny, rnz) is for the unscaled positions; the
+  ! cells must be at least rc wide after scaling.  This gives the
+  ! energy for a trial volume move without changing the positions.
+  ! The sums of the r^-6 and r^-12 terms (see len_eijsums) are also
+  ! returned.
+
+  use cellstencil, only: maxsten, cellstencil_heads
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  integer, dimension(npar), intent(in) :: ll
+  integer, intent(in) :: ncelx, ncely, ncelz
+  real(kind=db), intent(in) :: rnx, rny, rnz
+  integer, dimension(ncelx, ncely, ncelz), intent(in) :: hoc
+  real(kind=db), dimension(npar), intent(in) :: xpos, ypos, zpos
+  real(kind=db), intent(in) :: scalefacx, scalefacy, scalefacz
+  real(kind=db), intent(in) :: rc, rcsq, lboxx, lboxy, lboxz, vrc, vrc2
+  integer, intent(in) :: npar, nsurf
+  logical, intent(in) :: zperiodic
+  real(kind=db), intent(in) :: r6mult, r12mult
+
+  ! outputs
+  real(kind=db), intent(out) :: etot, r6tot, r12tot
+
+  real(kind=db) :: eij, r6ij, r12ij, xposi, yposi, zposi
+  integer :: icelx, icely, icelz, cellnum, jpar, ipar, nhead
+  integer, dimension(maxsten) :: heads
+  etot = 0.0_db
+  r6tot = 0.0_db
+  r12tot = 0.0_db
+
+  do ipar = 1, npar
+
+     ! determine cell that particle i is in
+     icelx = int(xpos(ipar) / rnx) + 1
+     icely = int(ypos(ipar) / rny) + 1
+     icelz = int(zpos(ipar) / rnz) + 1
+
+     xposi = xpos(ipar) * scalefacx
+     yposi = ypos(ipar) * scalefacy
+     zposi = zpos(ipar) * scalefacz
+
+     ! go through each nonempty cell of the stencil (cellstencil.f90),
+     ! and add pot energy between particle i and all particles in the
+     ! cell.
+     call cellstencil_heads(hoc, icelx, icely, icelz, ncelx, ncely,&
+                            ncelz, zperiodic, nhead, heads)
+     do cellnum = 1, nhead
+        jpar = heads(cellnum)
+
+        do while (jpar /= 0)
+           if (ipar /= jpar) then
+
+              ! get p.e. between particles i and j
+              call len_eijsums(ipar, jpar, xposi, yposi, zposi,&
+                               xpos(jpar) * scalefacx,&
+                               ypos(jpar) * scalefacy,&
+                               zpos(jpar) * scalefacz, lboxx, lboxy,&
+                               lboxz, rc, rcsq, vrc, vrc2, npar, nsurf,&
+                               zperiodic, r6mult, r12mult, eij, r6ij,&
+                               r12ij)
+              etot = etot + eij
+              r6tot = r6tot + r6ij
+              r12tot = r12tot + r12ij
+           end if
+           jpar = ll(jpar)
+
+        end do
+     end do
+  end do
+
+  ! double counting of potential energy
+  etot = etot / 2.0_db
+  r6tot = r6tot / 2.0_db
+  r12tot = r12tot / 2.0_db
+
+end subroutine len_totalenlistscaled
+
+subroutine len_eijsums(ipar, jpar, xposi, yposi, zposi, xposj, yposj,&
+                       zposj, lboxx, lboxy, lboxz, rc, rcsq, vrc, vrc2,&
+                       npar, nsurf, zperiodic, r6mult, r12mult, eij,&
+                       r6ij, r12ij)
+  !!! Compute potential energy between particles i and j, as len_eij,
+  !!! and also the r^-6 and r^-12 terms (with the r6mult and r12mult
+  !!! factors for surface particles) separately.  Under a uniform
+  !!! scaling of the separation by s, these scale as s^-6 and s^-12.
   
-  do cellnum = 1, nceltot
-     
-     ! get the next cell indexes (ncelx, ncely, ncelz)
-     call cellindx(cellnum, icelx, icely, icelz,& ! cell of particle i
-                   ncelx, ncely, ncelz,&          ! total num cells in each dim
-                   celx, cely, celz)              ! cell index we want
-     
-     jpar = hoc(celx, cely, celz)
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+  
+  ! inputs
+  integer, intent(in) :: ipar, jpar
+  real(kind=db), intent(in) :: xposi, yposi, zposi, xposj, yposj, zposj
+  real(kind=db), intent(in) :: lboxx, lboxy, lboxz, rc, rcsq, vrc, vrc2
+  integer, intent(in) :: npar, nsurf
+  logical, intent(in) :: zperiodic
+  real(kind=db), intent(in) :: r6mult, r12mult
+
+  ! outputs
+  real(kind=db), intent(out) :: eij, r6ij, r12ij
+
+  !f2py intent(in) :: ipar, jpar, xposi, yposi, zposi, xposj, yposj, zposj
+  !f2py intent(in) :: lboxx, lboxy, lboxz, vrc, vrc2, npar, nsurf, zperiodic
+  !f2py intent(in) :: r6mult, r12mult
+  !f2py intent(out) :: eij, r6ij, r12ij
+
+  real(kind=db) :: sepx, sepy, sepz, sepsq, r2i, r6i, r12i
+
+  eij = 0.0_db
+  r6ij = 0.0_db
+  r12ij = 0.0_db
+  sepx = xposi - xposj
+  ! periodic boundary conditions
+  if (sepx > 0.5 * lboxx) then
+     sepx = sepx - lboxx
+  else if (sepx < -0.5 * lboxx) then
+     sepx = sepx + lboxx
+  end if
+
+  if (abs(sepx) < rc) then
+     sepy = yposi - yposj
+     ! periodic boundary conditions
+     if (sepy > 0.5 * lboxy) then
+        sepy = sepy - lboxy
+     else if (sepy < -0.5 * lboxy) then
+        sepy = sepy + lboxy
+     end if
+
+     if (abs(sepy) < rc) then
+        sepz = zposi - zposj
+        if (zperiodic) then
+           ! periodic boundary conditions
+           if (sepz > 0.5 * lboxz) then
+              sepz = sepz - lboxz
+           else if (sepz < -0.5 * lboxz) then
+              sepz = sepz + lboxz
+           end if
+        end if
+        sepsq = sepx**2 + sepy**2 + sepz**2
+        if (sepsq < rcsq) then
+           r2i = 1.0_db / sepsq
+           r6i = r2i**3
+           r12i = r6i**2
+           ! add contribution to total potential energy
+           if (ipar > nsurf .and. jpar > nsurf) then
+              ! both particles are fluid particles
+              r6ij = r6i
+              r12ij = r12i
+              eij = r12ij - r6ij - vrc
+           else
+              ! at least one particle is a surface particle
+              r6ij = r6mult * r6i
+              r12ij = r12mult * r12i
+              eij = r12ij - r6ij - vrc2
+           end if
+        end if
+     end if
+  end if
+end subroutine len_eijsums
+
+subroutine len_enlistsums(ll, hoc, ncelx, ncely, ncelz, ipar, xposi,&
+                          yposi, zposi, xpos, ypos, zpos, rc, rcsq,&
+                          lboxx, lboxy, lboxz, vrc, vrc2, npar, nsurf,&
+                          zperiodic, r6mult, r12mult, epot, r6sum,&
+                          r12sum)
+  ! Compute potential energy of particle i using cell lists, and the
+  ! sums of the r^-6 and r^-12 terms (see len_eijsums)
+
+  use cellstencil, only: maxsten, cellstencil_heads
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  integer, dimension(npar), intent(in) :: ll
+  integer, intent(in) :: ncelx, ncely, ncelz  
+  integer, dimension(ncelx, ncely, ncelz), intent(in) :: hoc
+  integer, intent(in) :: ipar
+  real(kind=db), intent(in) :: xposi, yposi, zposi
+  real(kind=db), dimension(npar), intent(in) :: xpos, ypos, zpos
+  real(kind=db), intent(in) :: rc, rcsq, lboxx, lboxy, lboxz, vrc, vrc2
+  integer, intent(in) :: npar, nsurf
+  logical, intent(in) :: zperiodic
+  real(kind=db), intent(in) :: r6mult, r12mult
+
+  ! outputs
+  real(kind=db), intent(out) :: epot, r6sum, r12sum
+
+  real(kind=db) :: rnx, rny, rnz, eij, r6ij, r12ij
+  integer :: icelx, icely, icelz, cellnum, jpar, nhead
+  integer, dimension(maxsten) :: heads
+  epot = 0.0_db
+  r6sum = 0.0_db
+  r12sum = 0.0_db
+
+  ! cell dimension in x, y and z directions
+  rnx = lboxx / ncelx
+  rny = lboxy / ncely
+  rnz = lboxz / ncelz
+
+  ! determine cell that particle i is in
+  icelx = int(xposi / rnx) + 1
+  icely = int(yposi / rny) + 1
+  icelz = int(zposi / rnz) + 1
+  
+  ! go through each nonempty cell of the stencil (cellstencil.f90),
+  ! and add pot energy between particle i and all particles in the
+  ! cell (each cell is visited once, see cellstencil_heads).
+  call cellstencil_heads(hoc, icelx, icely, icelz, ncelx, ncely,&
+                         ncelz, zperiodic, nhead, heads)
+  do cellnum = 1, nhead
+     jpar = heads(cellnum)
      
      do while (jpar /= 0)
         if (ipar /= jpar) then
            
            ! get p.e. between particles i and j
-           call len_eij(ipar, jpar, xposi, yposi, zposi, xpos(jpar),&
-                        ypos(jpar), zpos(jpar), lboxx, lboxy, lboxz,&
-                        rc, rcsq, vrc, vrc2, npar, nsurf, zperiodic,&
-                        r6mult, r12mult, eij)
+           call len_eijsums(ipar, jpar, xposi, yposi, zposi,&
+                            xpos(jpar), ypos(jpar), zpos(jpar), lboxx,&
+                            lboxy, lboxz, rc, rcsq, vrc, vrc2, npar,&
+                            nsurf, zperiodic, r6mult, r12mult, eij,&
+                            r6ij, r12ij)
            epot = epot + eij
+           r6sum = r6sum + r6ij
+           r12sum = r12sum + r12ij
         end if
         jpar = ll(jpar)
 
      end do
   enddo
 
-end subroutine len_enlist
+end subroutine len_enlistsums
@@ -0,0 +1,157 @@
+! len_mccyclehmc.f90
+! James Mithen
+! j.mithen@surrey.ac.uk
+!
+! Fortran subroutine for executing hybrid Monte Carlo cycles (see
+! hmc.f90).  A cycle consists of a single HMC move, i.e. an NVE
+! trajectory of nsteps timesteps which is then accepted or rejected.
+! The cell list is rebuilt every timestep.
+!
+! SUBROUTINES:
+! len_executecycleshmc - execute ncycles hybrid MC cycles
+!                        note xpos,ypos,zpos and etot are returned
+
+subroutine len_executecycleshmc(xpos, ypos, zpos, ncycles, nsamp, rc,&
+                                rcsq, vrc, vrc2, lboxx, lboxy, lboxz,&
+                                eps4, dt, mass, nsteps, npar, nsurf,&
+                                zperiodic, sameseed, r6mult, r12mult,&
+                                etot)
+  ! execute ncycles hybrid MC cycles
+
+  use simstate, only: ncelx, ncely, ncelz, rnx, rny, rnz, ll, lp, hoc,&
+                      simstate_seed, simstate_nlist, simstate_store,&
+                      simstate_addmoves
+  use hmc, only: hmc_velocities, hmc_kineticen, hmc_kick, hmc_drift
+  use rng, only: rng_uniform
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  integer, intent(in) :: ncycles, nsamp, nsteps, npar, nsurf
+  real(kind=db), intent(in) :: rc, rcsq, vrc, vrc2, lboxx, lboxy, lboxz
+  real(kind=db), intent(in) :: eps4, dt, mass, r6mult, r12mult
+  logical, intent(in) :: zperiodic, sameseed
+
+  ! outputs
+  real(kind=db), dimension(npar), intent(inout) :: xpos, ypos, zpos
+  real(kind=db), intent(inout) :: etot
+
+  !f2py intent(in) :: ncycles, nsamp, rc, rcsq, vrc, vrc2, lboxx, lboxy, lboxz, eps4
+  !f2py intent(in) :: dt, mass, nsteps, npar, nsurf, zperiodic, sameseed, r6mult, r12mult
+  !f2py intent(in,out) :: xpos, ypos, zpos, etot
+
+  integer :: atmov, acmov, cy, step
+  real(kind=db) :: rsc, ekin, hold, enew
+  logical :: accept, inbox
+  real(kind=db), allocatable, dimension(:) :: xold, yold, zold, xvel,&
+                                              yvel, zvel, fx, fy, fz,&
+                                              fxold, fyold, fzold
+
+  ! initialize random number generator (if the simulation state is
+  ! kept between calls, this was done once by simstate_init).  If a
+  ! counter-based stream has been set (see rng.f90), it is used
+  ! instead.
+  call simstate_seed(sameseed)
+
+  ! get the cell list; this is only built if the cell list stored
+  ! by the previous call cannot be reused (see simstate.f90)
+  call simstate_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar)
+
+  allocate( xold(npar), yold(npar), zold(npar), xvel(npar), yvel(npar),&
+            zvel(npar), fx(npar), fy(npar), fz(npar), fxold(npar),&
+            fyold(npar), fzold(npar) )
+
+  ! forces at the starting positions; after each move, fx, fy, fz are
+  ! the forces at the current positions
+  call len_forcelist(ll, hoc, ncelx, ncely, ncelz, rnx, rny, rnz,&
+                     xpos, ypos, zpos, rc, rcsq, lboxx, lboxy, lboxz,&
+                     npar, nsurf, zperiodic, r6mult, r12mult, fx, fy, fz)
+
+  ! counters for attempted and accepted moves
+  atmov = 0
+  acmov = 0
+
+  write(*,*) 0,etot
+  do cy = 1, ncycles
+     atmov = atmov + 1
+
+     ! keep the starting point, in case the move is rejected
+     xold = xpos
+     yold = ypos
+     zold = zpos
+     fxold = fx
+     fyold = fy
+     fzold = fz
+
+     ! fresh velocities, and total energy at the start
+     call hmc_velocities(xvel, yvel, zvel, eps4, mass, npar, nsurf)
+     call hmc_kineticen(xvel, yvel, zvel, mass, npar, nsurf, ekin)
+     hold = etot + ekin
+
+     ! NVE trajectory (velocity Verlet)
+     do step = 1, nsteps
+        call hmc_kick(xvel, yvel, zvel, fx, fy, fz, dt, mass, npar,&
+                      nsurf)
+        call hmc_drift(xpos, ypos, zpos, xvel, yvel, zvel, dt, lboxx,&
+                       lboxy, lboxz, npar, nsurf, zperiodic, inbox)
+        if (.not. inbox) exit
+
+        ! rebuild the cell list and compute the forces at the new
+        ! positions
+        call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar,&
+                       ncelx, ncely, ncelz, ll, hoc, rnx, rny, rnz)
+        call len_forcelist(ll, hoc, ncelx, ncely, ncelz, rnx, rny,&
+                           rnz, xpos, ypos, zpos, rc, rcsq, lboxx,&
+                           lboxy, lboxz, npar, nsurf, zperiodic,&
+                           r6mult, r12mult, fx, fy, fz)
+        call hmc_kick(xvel, yvel, zvel, fx, fy, fz, dt, mass, npar,&
+                      nsurf)
+     end do
+
+     ! choose whether to accept the move or not
+     accept = inbox
+     if (accept) then
+        call len_totalenlist(ll, hoc, ncelx, ncely, ncelz, rnx, rny,&
+                             rnz, xpos, ypos, zpos, rc, rcsq, lboxx,&
+                             lboxy, lboxz, vrc, vrc2, npar, nsurf,&
+                             zperiodic, r6mult, r12mult, enew)
+        call hmc_kineticen(xvel, yvel, zvel, mass, npar, nsurf, ekin)
+        if (enew + ekin > hold) then
+           call rng_uniform(rsc)
+           if (exp((hold - enew - ekin) * eps4) < rsc) accept = .False.
+        end if
+     end if
+
+     if (accept) then
+        etot = enew
+        acmov = acmov + 1
+     else
+        ! go back to the starting point
+        xpos = xold
+        ypos = yold
+        zpos = zold
+        fx = fxold
+        fy = fyold
+        fz = fzold
+        call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar,&
+                       ncelx, ncely, ncelz, ll, hoc, rnx, rny, rnz)
+     end if
+
+     ! write out energy after every nsamp cycles
+     if (mod(cy, nsamp) == 0) write(*, *) cy, etot
+
+  end do
+
+  ! the cell list is up to date for the final positions (new_nlist
+  ! does not build the backward links used by update_nlist)
+  call nlist_prev(ll, hoc, ncelx, ncely, ncelz, npar, lp)
+  call simstate_store(rc, lboxx, lboxy, lboxz)
+  call simstate_addmoves(atmov, acmov, 0, 0)
+
+  deallocate(xold, yold, zold, xvel, yvel, zvel, fx, fy, fz, fxold,&
+             fyold, fzold)
+
+  ! write out acceptance ratio
+  write(*,'("acceptance ratio", I7, I7, F7.3)') acmov, atmov, real(acmov) / atmov
+
+end subroutine len_executecycleshmc
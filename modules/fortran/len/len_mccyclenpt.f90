@@ -5,6 +5,12 @@
 ! Fortran subroutine for executing Monte carlo cycles.  A cycle
 ! consists of nparfl attempted positional moves and a single volume
 ! move (on average).  The Metropolis Monte Carlo algorithm is used.
+! The energy of a trial volume is computed with scaled positions
+! (see len_totalenlistscaled in len_energy.f90), so that the
+! positions are only rescaled, and the cell list only rebuilt, when
+! a volume move is accepted.  For these potentials, most volume moves
+! are rejected without computing the energy at all, using the scaling
+! of the energy with the box size (see the volume move below).
 !
 ! SUBROUTINES:
 ! len_executecyclesnpt - execute ncycles monte carlo cycles
@@ -18,6 +24,11 @@ subroutine len_executecyclesnpt(xpos, ypos, zpos, ncycles, nsamp, rc,&
                                 r12mult, etot)
   ! execute ncycles MC cycles
 
+  use simstate, only: ncelx, ncely, ncelz, rnx, rny, rnz, ll, lp, hoc,&
+                      simstate_seed, simstate_nlist, simstate_store,&
+                      simstate_addmoves
+  use rng, only: rng_uniform, rng_uniform3
+  use cellstencil, only: cellsub
   implicit none
   integer, parameter :: db = 8 !selected_real_kind(13)
 
@@ -39,27 +50,38 @@ subroutine len_executecyclesnpt(xpos, ypos, zpos, ncycles, nsamp, rc,&
              nparfl, i, j
   real(kind=db) :: rsc, xposi, yposi, zposi, xposinew, yposinew,&
                    zposinew,eold,enew
-  real(kind=db) :: lboxnew, lboxxold, lboxyold, lboxzold
+  real(kind=db) :: lboxxnew, lboxynew, lboxznew
   real(kind=db) :: vboxold, lnvold, lnvnew, vboxnew
   real(kind=db) :: scalefacx, scalefacy, scalefacz, arg, etotnew
   real(kind=db), dimension(3) :: rvec
   logical :: accept
   ! these are for cell lists
-  integer :: ncelx, ncely, ncelz, ncelxold, ncelyold, ncelzold
-  real(kind=db) :: rnx, rny, rnz, rnxold, rnyold, rnzold
-  integer, dimension(npar) :: ll, llold
-  integer, allocatable, dimension(:,:,:) :: hoc, hocold
-  logical :: newlist
+  integer :: ncelxnew, ncelynew, ncelznew
+  real(kind=db) :: rnxnew, rnynew, rnznew
+  integer, dimension(npar) :: llnew
+  integer, allocatable, dimension(:,:,:) :: hocnew
+  ! these are for the volume move estimate
+  real(kind=db) :: etotest, arg1, arg1r, r6tot, r12tot, r6totnew,&
+                   r12totnew, r6old, r12old, r6new, r12new
   
-  ! initialize random number generator
-  call init_random_seed(sameseed)
-
-  ! get the number of cells and build the cell list
-  call getnumcells(lboxx, lboxy, lboxz, rc, ncelx, ncely, ncelz)
-  write(*,*) 'num cells', ncelx, ncely, ncelz
-  allocate( hoc(ncelx, ncely, ncelx) )
-  call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar,&
-                 ncelx, ncely, ncelz, ll, hoc, rnx, rny, rnz)
+  ! initialize random number generator (if the simulation state is
+  ! kept between calls, this was done once by simstate_init).  If a
+  ! counter-based stream has been set (see rng.f90), it is used
+  ! instead.
+  call simstate_seed(sameseed)
+
+  ! get the cell list; this is only built if the cell list stored
+  ! by the previous call cannot be reused (see simstate.f90)
+  call simstate_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar)
+
+  ! sums used for the volume move estimate; these are updated with
+  ! each accepted displacement move, and computed exactly again with
+  ! each accepted volume move
+  call len_totalenlistscaled(ll, hoc, ncelx, ncely, ncelz, rnx, rny,&
+                             rnz, xpos, ypos, zpos, 1.0_db, 1.0_db,&
+                             1.0_db, rc, rcsq, lboxx, lboxy, lboxz,&
+                             vrc, vrc2, npar, nsurf, zperiodic, r6mult,&
+                             r12mult, etotnew, r6tot, r12tot)
 
   atmovdisp = 0
   acmovdisp = 0
@@ -73,7 +95,7 @@ subroutine len_executecyclesnpt(xpos, ypos, zpos, ncycles, nsamp, rc,&
      do it = 1, nparfl + 1 
 
         ! pick a random number between [nsurf+1, ntot+1]
-        call random_number(rsc)
+        call rng_uniform(rsc)
         ipar = int(rsc * (nparfl + 1)) + nsurf + 1
 
         ! if ipar > npar, we attempt a volume move, else we attempt a
@@ -83,14 +105,11 @@ subroutine len_executecyclesnpt(xpos, ypos, zpos, ncycles, nsamp, rc,&
            atmovvol = atmovvol + 1
            
            ! old box volume
-           lboxxold = lboxx
-           lboxyold = lboxy
-           lboxzold = lboxz
            vboxold = lboxx * lboxy * lboxz
            lnvold = log(vboxold)
            
            ! random number between 0 and 1 for attempted volume move
-           call random_number(rsc)
+           call rng_uniform(rsc)
 
            ! new box volume
            lnvnew = lnvold + maxvol * (rsc - 0.5_db)
@@ -113,69 +132,129 @@ subroutine len_executecyclesnpt(xpos, ypos, zpos, ncycles, nsamp, rc,&
            end if
 
            ! new box dimensions
-           lboxx = lboxx * scalefacx
-           lboxy = lboxy * scalefacy
-           lboxz = lboxz * scalefacz
-
-           ! rescale particle positions to new volume
-           xpos = xpos * scalefacx
-           ypos = ypos * scalefacy
-           zpos = zpos * scalefacz
-
-           ! save old cell list info
-           llold = ll
-           hocold = hoc
-           ncelxold = ncelx
-           ncelyold = ncely
-           ncelzold = ncelz
-           rnxold = rnx
-           rnyold = rny
-           rnzold = rnz
-           
-           ! get the number of cells and build the cell list
-           call getnumcells(lboxx, lboxy, lboxz, rc, ncelx, ncely, ncelz)
-           deallocate(hoc)
-           allocate(hoc(ncelx, ncely, ncelx))
-           call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar,&
-                          ncelx, ncely, ncelz, ll, hoc, rnx, rny, rnz)
-
-           ! new energy, note we are using new box dimensions
-           call len_totalenlist(ll, hoc, ncelx, ncely, ncelz, rnx,&
-                                rny, rnz, xpos, ypos, zpos, rc, rcsq,&
-                                lboxx, lboxy, lboxz, vrc, vrc2, npar,&
-                                nsurf, zperiodic, r6mult, r12mult,&
-                                etotnew)
-
-           ! See FS p122 (Algorithm 11) for this acceptance rule
-           
-           arg = eps4 * (etot - etotnew + 0.25_db * press * (vboxold - vboxnew)) + &
-                 (nparfl + 1) * (lnvnew - lnvold)
+           lboxxnew = lboxx * scalefacx
+           lboxynew = lboxy * scalefacy
+           lboxznew = lboxz * scalefacz
+
+           ! If z is periodic, the box is scaled by the same factor s
+           ! in each dimension, and if no pair crosses the cutoff the
+           ! energy in the new box is
+           !    etot + (s^-12 - 1) r12tot - (s^-6 - 1) r6tot,
+           ! where r12tot and r6tot are the sums of the r^-12 and r^-6
+           ! terms (see len_eijsums).  This takes no time to compute,
+           ! so we use it to reject most of the moves that would be
+           ! rejected, and only compute the exact energy for the moves
+           ! that pass this first test.  The second test below corrects for the
+           ! difference between the estimate and the exact energy,
+           ! so that moves are accepted with the correct probability
+           ! (this is 'delayed acceptance', see Christen and Fox,
+           ! J. Comput. Graph. Stat. 14, 795 (2005)).
            accept = .True.
-           if (arg < 0) then
-              call random_number(rsc)
-              if (rsc > exp(arg)) then
-                 accept = .False.
-                 ! back to old boxsize and positions
-                 lboxx = lboxxold
-                 lboxy = lboxyold
-                 lboxz = lboxzold
-                 xpos = xpos / scalefacx
-                 ypos = ypos / scalefacy
-                 zpos = zpos / scalefacz
-                 ! old cell list info
-                 ll = llold
-                 hoc = hocold
-                 ncelx = ncelxold
-                 ncely = ncelyold
-                 ncelz = ncelzold
-                 rnx = rnxold
-                 rny = rnyold
-                 rnz = rnzold
+           arg1 = 0.0_db
+           if (zperiodic) then
+              etotest = etot + (scalefacx**(-12) - 1.0_db) * r12tot&
+                        - (scalefacx**(-6) - 1.0_db) * r6tot
+              arg1 = eps4 * (etot - etotest + 0.25_db * press * (vboxold - vboxnew)) + &
+                     (nparfl + 1) * (lnvnew - lnvold)
+              if (arg1 < 0) then
+                 call rng_uniform(rsc)
+                 if (rsc > exp(arg1)) accept = .False.
               end if
            end if
 
            if (accept) then
+              ! new energy.  We don't rescale the positions or rebuild
+              ! the cell list here: the energy is computed from the
+              ! current positions and cell list, with each position
+              ! scaled by the scale factors, so nothing needs to be
+              ! undone if the move is rejected.  This needs the cells
+              ! to still be at least rc / cellsub wide in the new box;
+              ! if they are not (the box shrunk), we build a cell list
+              ! with the new number of cells for the current
+              ! positions.
+              if ((ncelx == 1 .or. cellsub * rnx * scalefacx >= rc) .and.&
+                  (ncely == 1 .or. cellsub * rny * scalefacy >= rc) .and.&
+                  (ncelz == 1 .or. cellsub * rnz * scalefacz >= rc)) then
+                 call len_totalenlistscaled(ll, hoc, ncelx, ncely,&
+                                            ncelz, rnx, rny, rnz, xpos,&
+                                            ypos, zpos, scalefacx,&
+                                            scalefacy, scalefacz, rc,&
+                                            rcsq, lboxxnew, lboxynew,&
+                                            lboxznew, vrc, vrc2, npar,&
+                                            nsurf, zperiodic, r6mult,&
+                                            r12mult, etotnew, r6totnew,&
+                                            r12totnew)
+              else
+                 call getnumcells(lboxxnew, lboxynew, lboxznew, rc,&
+                                  ncelxnew, ncelynew, ncelznew)
+                 allocate(hocnew(ncelxnew, ncelynew, ncelznew))
+                 call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy,&
+                                lboxz, npar, ncelxnew, ncelynew,&
+                                ncelznew, llnew, hocnew, rnxnew,&
+                                rnynew, rnznew)
+                 call len_totalenlistscaled(llnew, hocnew, ncelxnew,&
+                                            ncelynew, ncelznew, rnxnew,&
+                                            rnynew, rnznew, xpos, ypos,&
+                                            zpos, scalefacx, scalefacy,&
+                                            scalefacz, rc, rcsq,&
+                                            lboxxnew, lboxynew,&
+                                            lboxznew, vrc, vrc2, npar,&
+                                            nsurf, zperiodic, r6mult,&
+                                            r12mult, etotnew, r6totnew,&
+                                            r12totnew)
+                 deallocate(hocnew)
+              end if
+
+              ! See FS p122 (Algorithm 11) for this acceptance rule
+           
+              arg = eps4 * (etot - etotnew + 0.25_db * press * (vboxold - vboxnew)) + &
+                    (nparfl + 1) * (lnvnew - lnvold)
+              if (zperiodic) then
+                 ! correct for the first test: arg1r is its argument for
+                 ! the reverse move, from the new box back to the old one
+                 etotest = etotnew + (scalefacx**12 - 1.0_db) * r12totnew&
+                           - (scalefacx**6 - 1.0_db) * r6totnew
+                 arg1r = eps4 * (etotnew - etotest + 0.25_db * press * (vboxnew - vboxold)) + &
+                         (nparfl + 1) * (lnvold - lnvnew)
+                 arg = arg + min(arg1r, 0.0_db) - min(arg1, 0.0_db)
+              end if
+              if (arg < 0) then
+                 call rng_uniform(rsc)
+                 if (rsc > exp(arg)) accept = .False.
+              end if
+           end if
+
+           if (accept) then
+              ! rescale box and particle positions to new volume
+              lboxx = lboxxnew
+              lboxy = lboxynew
+              lboxz = lboxznew
+              xpos = xpos * scalefacx
+              ypos = ypos * scalefacy
+              zpos = zpos * scalefacz
+
+              ! rebuild the cell list for the new positions (we don't
+              ! keep the old one: after rescaling, rounding can put a
+              ! particle on a cell boundary in a different cell from
+              ! the one it is listed in, see update_nlist in clist.f90)
+              call getnumcells(lboxx, lboxy, lboxz, rc, ncelxnew,&
+                               ncelynew, ncelznew)
+              if (ncelxnew /= ncelx .or. ncelynew /= ncely .or.&
+                  ncelznew /= ncelz) then
+                 ncelx = ncelxnew
+                 ncely = ncelynew
+                 ncelz = ncelznew
+                 deallocate(hoc)
+                 allocate(hoc(ncelx, ncely, ncelz))
+              end if
+              call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz,&
+                             npar, ncelx, ncely, ncelz, ll, hoc, rnx,&
+                             rny, rnz)
+              call nlist_prev(ll, hoc, ncelx, ncely, ncelz, npar, lp)
+
               etot = etotnew
+              r6tot = r6totnew
+              r12tot = r12totnew
               acmovvol = acmovvol + 1
            end if
 
@@ -187,13 +266,14 @@ subroutine len_executecyclesnpt(xpos, ypos, zpos, ncycles, nsamp, rc,&
            zposi = zpos(ipar)
 
            ! find old energy
-           call len_enlist(ll, hoc, ncelx, ncely, ncelz, ipar,&
-                           xposi, yposi, zposi, xpos, ypos, zpos,&
-                           rc, rcsq, lboxx, lboxy, lboxz, vrc, vrc2, npar,&
-                           nsurf, zperiodic, r6mult, r12mult, eold)
+           call len_enlistsums(ll, hoc, ncelx, ncely, ncelz, ipar,&
+                               xposi, yposi, zposi, xpos, ypos, zpos,&
+                               rc, rcsq, lboxx, lboxy, lboxz, vrc,&
+                               vrc2, npar, nsurf, zperiodic, r6mult,&
+                               r12mult, eold, r6old, r12old)
 
            ! displace particle
-           call random_number(rvec)
+           call rng_uniform3(rvec)
            xposinew = xposi + maxdisp * (rvec(1) - 0.5_db)
            yposinew = yposi + maxdisp * (rvec(2) - 0.5_db)
            zposinew = zposi + maxdisp * (rvec(3) - 0.5_db)
@@ -223,48 +303,38 @@ subroutine len_executecyclesnpt(xpos, ypos, zpos, ncycles, nsamp, rc,&
               end if
 
               ! find new energy
-              call len_enlist(ll, hoc, ncelx, ncely, ncelz, ipar,&
-                              xposinew, yposinew, zposinew, xpos,&
-                              ypos, zpos, rc, rcsq, lboxx, lboxy,&
-                              lboxz, vrc, vrc2, npar, nsurf,&
-                              zperiodic, r6mult, r12mult, enew)
+              call len_enlistsums(ll, hoc, ncelx, ncely, ncelz, ipar,&
+                                  xposinew, yposinew, zposinew, xpos,&
+                                  ypos, zpos, rc, rcsq, lboxx, lboxy,&
+                                  lboxz, vrc, vrc2, npar, nsurf,&
+                                  zperiodic, r6mult, r12mult, enew,&
+                                  r6new, r12new)
 
               ! choose whether to accept the move or not
               accept = .True.
               if (enew > eold) then
-                 call random_number(rsc)
+                 call rng_uniform(rsc)
                  if (exp((eold - enew)*eps4) < rsc) accept = .False.
               end if
 
               ! update positions if move accepted
               if (accept) then
 
-                 ! we don't rebuild the cell list by default.
-                 newlist = .false.
-
-                 ! check if the particle moved outside of its cell, if
-                 ! so we need the rebuild the cell list.  Note that
-                 ! the bracketed terms are in fact the cell number
-                 ! minus one, but there is clearly no point in adding
-                 ! the one here.
-                 if ((int(xpos(ipar) / rnx) .ne. int(xposinew / rnx)) .or.&
-                     (int(ypos(ipar) / rny) .ne. int(yposinew / rny)) .or.&
-                     (int(zpos(ipar) / rnz) .ne. int(zposinew / rnz))) then
-                    newlist = .true.
-                 end if
-                 
+                 ! move the particle to its new cell, if it has left its
+                 ! old cell (this is much cheaper than rebuilding the
+                 ! cell list)
+                 call update_nlist(ipar, xpos(ipar), ypos(ipar), zpos(ipar),&
+                                   xposinew, yposinew, zposinew, ncelx,&
+                                   ncely, ncelz, rnx, rny, rnz, npar, ll,&
+                                   lp, hoc)
+
                  xpos(ipar) = xposinew
                  ypos(ipar) = yposinew
                  zpos(ipar) = zposinew
                  etot = etot - eold + enew
+                 r6tot = r6tot - r6old + r6new
+                 r12tot = r12tot - r12old + r12new
                  acmovdisp = acmovdisp + 1
-
-                 if (newlist) then
-                    ! update the cell list
-                    call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, &
-                                   lboxz, npar, ncelx, ncely, ncelz, ll, &
-                                   hoc, rnx, rny, rnz)
-                 end if
               end if
            end if
         endif
@@ -275,6 +345,10 @@ subroutine len_executecyclesnpt(xpos, ypos, zpos, ncycles, nsamp, rc,&
      
   end do
 
+  ! the cell list is up to date for the final positions and box
+  call simstate_store(rc, lboxx, lboxy, lboxz)
+  call simstate_addmoves(atmovdisp, acmovdisp, atmovvol, acmovvol)
+
   ! write out acceptance ratio
   write(*,'("acceptance ratio", I7, I7, F7.3, I7, I7, F7.3)')&
         acmovdisp, atmovdisp, real(acmovdisp) / atmovdisp,&
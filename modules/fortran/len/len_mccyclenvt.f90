@@ -16,6 +16,10 @@ subroutine len_executecyclesnvt(xpos, ypos, zpos, ncycles, nsamp, rc,&
                                 sameseed, r6mult,r12mult, etot)
   ! execute ncycles MD cycles
 
+  use simstate, only: ncelx, ncely, ncelz, rnx, rny, rnz, ll, lp, hoc,&
+                      simstate_seed, simstate_nlist, simstate_store,&
+                      simstate_addmoves
+  use rng, only: rng_uniform, rng_uniform3
   implicit none
   integer, parameter :: db = 8 !selected_real_kind(13)
 
@@ -39,21 +43,16 @@ subroutine len_executecyclesnvt(xpos, ypos, zpos, ncycles, nsamp, rc,&
   real(kind=db), dimension(3) :: rvec
   logical :: accept
   ! these are for cell lists
-  integer :: ncelx, ncely, ncelz
-  real(kind=db) :: rnx, rny, rnz
-  integer, dimension(npar) :: ll
-  integer, allocatable, dimension(:,:,:) :: hoc
-  logical :: newlist
   
-  ! initialize random number generator
-  call init_random_seed(sameseed)
+  ! initialize random number generator (if the simulation state is
+  ! kept between calls, this was done once by simstate_init).  If a
+  ! counter-based stream has been set (see rng.f90), it is used
+  ! instead.
+  call simstate_seed(sameseed)
 
-  ! get the number of cells and build the cell list
-  call getnumcells(lboxx, lboxy, lboxz, rc, ncelx, ncely, ncelz)
-  write(*,*) 'num cells', ncelx, ncely, ncelz
-  allocate(hoc(ncelx, ncely, ncelx))
-  call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar,&
-                 ncelx, ncely, ncelz, ll, hoc, rnx, rny, rnz)
+  ! get the cell list; this is only built if the cell list stored
+  ! by the previous call cannot be reused (see simstate.f90)
+  call simstate_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar)
 
   ! counters for attempted and accepted moves
   atmov = 0
@@ -66,7 +65,7 @@ subroutine len_executecyclesnvt(xpos, ypos, zpos, ncycles, nsamp, rc,&
         atmov = atmov + 1
 
         ! pick a particle at random from fluid particles
-        call random_number(rsc)
+        call rng_uniform(rsc)
         ipar = int(rsc * nparfl) + 1 + nsurf
         xposi = xpos(ipar)
         yposi = ypos(ipar)
@@ -79,7 +78,7 @@ subroutine len_executecyclesnvt(xpos, ypos, zpos, ncycles, nsamp, rc,&
                         nsurf, zperiodic, r6mult, r12mult, eold)
 
         ! displace particle
-        call random_number(rvec)
+        call rng_uniform3(rvec)
         xposinew = xposi + maxdisp * (rvec(1) - 0.5_db)
         yposinew = yposi + maxdisp * (rvec(2) - 0.5_db)
         zposinew = zposi + maxdisp * (rvec(3) - 0.5_db)
@@ -118,38 +117,26 @@ subroutine len_executecyclesnvt(xpos, ypos, zpos, ncycles, nsamp, rc,&
            ! choose whether to accept the move or not
            accept = .True.
            if (enew > eold) then
-              call random_number(rsc)
+              call rng_uniform(rsc)
               if (exp((eold - enew) * eps4) < rsc) accept = .False.
            end if
            ! update positions if move accepted
            if (accept) then
 
-              ! we don't rebuild the cell list by default.
-              newlist = .False.
-
-              ! check if the particle moved outside of its cell, if so
-              ! we need the rebuild the cell list.  Note that the
-              ! bracketed terms are in fact the cell number minus one,
-              ! but there is clearly no point in adding the one here.
-              if ((int(xpos(ipar) / rnx) .ne. int(xposinew / rnx)) .or.&
-                  (int(ypos(ipar) / rny) .ne. int(yposinew / rny)) .or.&
-                  (int(zpos(ipar) / rnz) .ne. int(zposinew / rnz))) then
-                 newlist = .True.
-              end if
-              
+              ! move the particle to its new cell, if it has left its
+              ! old cell (this is much cheaper than rebuilding the
+              ! cell list)
+              call update_nlist(ipar, xpos(ipar), ypos(ipar), zpos(ipar),&
+                                xposinew, yposinew, zposinew, ncelx,&
+                                ncely, ncelz, rnx, rny, rnz, npar, ll,&
+                                lp, hoc)
+
               xpos(ipar) = xposinew
               ypos(ipar) = yposinew
               zpos(ipar) = zposinew
               etot = etot - eold + enew
               acmov = acmov + 1
 
-              if (newlist) then
-                 ! update the cell list
-                 call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, &
-                                lboxz, npar, ncelx, ncely, ncelz, ll, &
-                                hoc, rnx, rny, rnz)
-              end if
-
            end if
         end if
 
@@ -160,6 +147,10 @@ subroutine len_executecyclesnvt(xpos, ypos, zpos, ncycles, nsamp, rc,&
      
   end do
 
+  ! the cell list is up to date for the final positions
+  call simstate_store(rc, lboxx, lboxy, lboxz)
+  call simstate_addmoves(atmov, acmov, 0, 0)
+
   ! write out acceptance ratio
   write(*,'("acceptance ratio", I7, I7, F7.3)') acmov, atmov, real(acmov) / atmov
 
@@ -0,0 +1,358 @@
+! tab_energy.f90
+! James Mithen
+! j.mithen@surrey.ac.uk
+!
+! Fortran subroutines for computing potential energy (p.e.) for a
+! tabulated pair potential (see global/pottable.f90).  These work for
+! any of the potentials, once the table has been built.
+!
+! SUBROUTINES:
+! tab_eij               - compute p.e. between particles i and j
+! tab_totalencreatelist - create the cell list and return total
+!                         p.e.
+! tab_totalenlist       - compute total p.e. using cell lists
+! tab_enlist            - compute total p.e. of particle i using
+!                         cell lists
+! tab_totalenlistscaled - compute total p.e. using cell lists, with
+!                         the box and positions scaled
+
+subroutine tab_eij(ipar, jpar, xposi, yposi, zposi, xposj, yposj,&
+                   zposj, lboxx, lboxy, lboxz, rc, rcsq, npar, nsurf,&
+                   zperiodic, eij)
+  !!! Compute potential energy between particles i and j, taking into
+  !!! account periodic bcs.  The energy is interpolated from the
+  !!! table in pottable.f90.
+  
+  use pottable, only: ntab, r2min, dr2inv, cff, cfs
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+  
+  ! inputs
+  integer, intent(in) :: ipar, jpar
+  real(kind=db), intent(in) :: xposi, yposi, zposi, xposj, yposj, zposj
+  real(kind=db), intent(in) :: lboxx, lboxy, lboxz, rc, rcsq
+  integer, intent(in) :: npar, nsurf
+  logical, intent(in) :: zperiodic
+
+  ! outputs
+  real(kind=db), intent(out) :: eij
+
+  !f2py intent(in) :: ipar, jpar, xposi, yposi, zposi, xposj, yposj, zposj
+  !f2py intent(in) :: lboxx, lboxy, lboxz, npar, nsurf, zperiodic
+  !f2py intent(out) :: eij
+
+  real(kind=db) :: sepx, sepy, sepz, sepsq, t
+  integer :: k
+
+  eij = 0.0_db
+  sepx = xposi - xposj
+  ! periodic boundary conditions
+  if (sepx > 0.5 * lboxx) then
+     sepx = sepx - lboxx
+  else if (sepx < -0.5 * lboxx) then
+     sepx = sepx + lboxx
+  end if
+
+  if (abs(sepx) < rc) then
+     sepy = yposi - yposj
+     ! periodic boundary conditions
+     if (sepy > 0.5 * lboxy) then
+        sepy = sepy - lboxy
+     else if (sepy < -0.5 * lboxy) then
+        sepy = sepy + lboxy
+     end if
+
+     if (abs(sepy) < rc) then
+        sepz = zposi - zposj
+        if (zperiodic) then
+           ! periodic boundary conditions
+           if (sepz > 0.5 * lboxz) then
+              sepz = sepz - lboxz
+           else if (sepz < -0.5 * lboxz) then
+              sepz = sepz + lboxz
+           end if
+        end if
+        sepsq = sepx**2 + sepy**2 + sepz**2
+        if (sepsq < rcsq) then
+           ! interval k of the table, and position t in it
+           t = max(sepsq - r2min, 0.0_db) * dr2inv
+           k = min(int(t), ntab - 2)
+           t = t - k
+           k = k + 1
+           ! add contribution to total potential energy
+           if (ipar > nsurf .and. jpar > nsurf) then
+              ! both particles are fluid particles
+              eij = cff(1,k) + t * (cff(2,k) + t * (cff(3,k) + t * cff(4,k)))
+           else
+              ! at least one particle is a surface particle
+              eij = cfs(1,k) + t * (cfs(2,k) + t * (cfs(3,k) + t * cfs(4,k)))
+           end if
+        end if
+     end if
+  end if
+end subroutine tab_eij
+
+subroutine tab_totalencreatelist(xpos, ypos, zpos, rc, rcsq, lboxx,&
+                                 lboxy, lboxz, npar, nsurf, zperiodic,&
+                                 etot)
+  ! Create the cell list and then return total energy.  If the
+  ! surface field is used (see extfield.f90), the surface particles
+  ! are left out of the cell list.
+
+  use extfield, only: spacing, esurf, extfield_build, extfield_energy
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  real(kind=db), dimension(npar), intent(in) :: xpos, ypos, zpos
+  real(kind=db), intent(in) :: rc, rcsq, lboxx, lboxy, lboxz
+  integer, intent(in) :: npar, nsurf
+  logical, intent(in) :: zperiodic
+
+  ! outputs
+  real(kind=db), intent(out) :: etot
+
+  !f2py intent(in) :: xpos, ypos, zpos, rc, rcsq, lboxx, lboxy, lboxz
+  !f2py intent(in) :: npar, nsurf, zperiodic
+  !f2py intent(out) :: etot
+
+  integer, dimension(npar) :: ll
+  integer, allocatable, dimension(:,:,:) :: hoc  
+  integer :: ncelx, ncely, ncelz, status, nlo, ipar
+  real(kind=db) :: rnx, rny, rnz
+  
+  ! particles 1..nlo are not in the cell list
+  nlo = 0
+  if (spacing > 0.0_db .and. nsurf > 0) then
+     call extfield_build(xpos, ypos, zpos, nsurf, rc, rcsq, lboxx,&
+                         lboxy, lboxz, zperiodic)
+     nlo = nsurf
+  end if
+
+  ! get the number of cells and build the cell list
+  call getnumcells(lboxx, lboxy, lboxz, rc, ncelx, ncely, ncelz)
+  allocate(hoc(ncelx, ncely, ncelz))
+  call new_nlist(xpos(nlo + 1:npar), ypos(nlo + 1:npar),&
+                 zpos(nlo + 1:npar), rc, lboxx, lboxy, lboxz,&
+                 npar - nlo, ncelx, ncely, ncelz, ll, hoc, rnx, rny,&
+                 rnz)
+  ! get total energy using cell list
+  call tab_totalenlist(ll, hoc, ncelx, ncely, ncelz, rnx, rny, rnz,&
+                       xpos(nlo + 1:npar), ypos(nlo + 1:npar),&
+                       zpos(nlo + 1:npar), rc, rcsq, lboxx, lboxy,&
+                       lboxz, npar - nlo, nsurf - nlo, zperiodic, etot)
+  ! add the energy in the surface field
+  if (nlo > 0) then
+     etot = etot + esurf
+     do ipar = nlo + 1, npar
+        etot = etot + extfield_energy(xpos(ipar), ypos(ipar), zpos(ipar))
+     end do
+  end if
+  ! deallocate the head of cell array
+  deallocate(hoc, STAT=status)
+
+end subroutine tab_totalencreatelist
+
+subroutine tab_totalenlist(ll, hoc, ncelx, ncely, ncelz, rnx, rny, rnz,&
+                           xpos, ypos, zpos, rc, rcsq, lboxx, lboxy,&
+                           lboxz, npar, nsurf, zperiodic, etot)
+  ! Compute total potential energy of system using cell lists
+
+  use cellstencil, only: maxsten, cellstencil_heads
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  integer, dimension(npar), intent(in) :: ll
+  integer, intent(in) :: ncelx, ncely, ncelz
+  real(kind=db), intent(in) :: rnx, rny, rnz
+  integer, dimension(ncelx, ncely, ncelz), intent(in) :: hoc
+  real(kind=db), dimension(npar), intent(in) :: xpos, ypos, zpos
+  real(kind=db), intent(in) :: rc, rcsq, lboxx, lboxy, lboxz
+  integer, intent(in) :: npar, nsurf
+  logical, intent(in) :: zperiodic
+
+  ! outputs
+  real(kind=db), intent(out) :: etot
+
+  real(kind=db) :: eij, xposi, yposi, zposi
+  integer :: icelx, icely, icelz, cellnum, jpar, ipar, nhead
+  integer, dimension(maxsten) :: heads
+  etot = 0.0_db
+
+  do ipar = 1, npar
+
+     xposi = xpos(ipar)
+     yposi = ypos(ipar)
+     zposi = zpos(ipar)
+     
+     ! determine cell that particle i is in
+     icelx = int(xposi / rnx) + 1
+     icely = int(yposi / rny) + 1
+     icelz = int(zposi / rnz) + 1
+
+     ! go through each nonempty cell of the stencil (cellstencil.f90),
+     ! and add pot energy between particle i and all particles in the
+     ! cell.
+     call cellstencil_heads(hoc, icelx, icely, icelz, ncelx, ncely,&
+                            ncelz, zperiodic, nhead, heads)
+     do cellnum = 1, nhead
+        jpar = heads(cellnum)
+
+        do while (jpar /= 0)
+           if (ipar /= jpar) then
+
+              ! get p.e. between particles i and j
+              call tab_eij(ipar, jpar, xposi, yposi, zposi, xpos(jpar),&
+                           ypos(jpar), zpos(jpar), lboxx, lboxy, lboxz,&
+                           rc, rcsq, npar, nsurf, zperiodic, eij)
+              etot = etot + eij
+           end if
+           jpar = ll(jpar)
+
+        end do
+     end do
+  end do
+
+  ! double counting of potential energy
+  etot = etot / 2.0_db
+
+end subroutine tab_totalenlist
+
+subroutine tab_enlist(ll, hoc, ncelx, ncely, ncelz, ipar, xposi, yposi,&
+                      zposi, xpos, ypos, zpos, rc, rcsq, lboxx, lboxy,&
+                      lboxz, npar, nsurf, zperiodic, epot)
+  ! Compute potential energy of particle i using cell lists
+
+  use cellstencil, only: maxsten, cellstencil_heads
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  integer, dimension(npar), intent(in) :: ll
+  integer, intent(in) :: ncelx, ncely, ncelz  
+  integer, dimension(ncelx, ncely, ncelz), intent(in) :: hoc
+  integer, intent(in) :: ipar
+  real(kind=db), intent(in) :: xposi, yposi, zposi
+  real(kind=db), dimension(npar), intent(in) :: xpos, ypos, zpos
+  real(kind=db), intent(in) :: rc, rcsq, lboxx, lboxy, lboxz
+  integer, intent(in) :: npar, nsurf
+  logical, intent(in) :: zperiodic
+
+  ! outputs
+  real(kind=db), intent(out) :: epot
+
+  real(kind=db) :: rnx, rny, rnz, eij
+  integer :: icelx, icely, icelz, cellnum, jpar, nhead
+  integer, dimension(maxsten) :: heads
+  epot = 0.0_db
+
+  ! cell dimension in x, y and z directions
+  rnx = lboxx / ncelx
+  rny = lboxy / ncely
+  rnz = lboxz / ncelz
+
+  ! determine cell that particle i is in
+  icelx = int(xposi / rnx) + 1
+  icely = int(yposi / rny) + 1
+  icelz = int(zposi / rnz) + 1
+  
+  ! go through each nonempty cell of the stencil (cellstencil.f90),
+  ! and add pot energy between particle i and all particles in the
+  ! cell (each cell is visited once, see cellstencil_heads).
+  call cellstencil_heads(hoc, icelx, icely, icelz, ncelx, ncely,&
+                         ncelz, zperiodic, nhead, heads)
+  do cellnum = 1, nhead
+     jpar = heads(cellnum)
+     
+     do while (jpar /= 0)
+        if (ipar /= jpar) then
+           
+           ! get p.e. between particles i and j
+           call tab_eij(ipar, jpar, xposi, yposi, zposi, xpos(jpar),&
+                        ypos(jpar), zpos(jpar), lboxx, lboxy, lboxz,&
+                        rc, rcsq, npar, nsurf, zperiodic, eij)
+           epot = epot + eij
+        end if
+        jpar = ll(jpar)
+
+     end do
+  enddo
+
+end subroutine tab_enlist
+
+subroutine tab_totalenlistscaled(ll, hoc, ncelx, ncely, ncelz, rnx,&
+                                 rny, rnz, xpos, ypos, zpos, scalefacx,&
+                                 scalefacy, scalefacz, rc, rcsq, lboxx,&
+                                 lboxy, lboxz, npar, nsurf, zperiodic,&
+                                 etot)
+  ! Compute total potential energy of system using cell lists, for the
+  ! positions multiplied by scalefacx, scalefacy and scalefacz, in
+  ! the box lboxx, lboxy, lboxz (i.e. the box after scaling).  The
+  ! cell list (and rnx, rny, rnz) is for the unscaled positions; the
+  ! cells must be at least rc wide after scaling.  This gives the
+  ! energy for a trial volume move without changing the positions.
+
+  use cellstencil, only: maxsten, cellstencil_heads
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  integer, dimension(npar), intent(in) :: ll
+  integer, intent(in) :: ncelx, ncely, ncelz
+  real(kind=db), intent(in) :: rnx, rny, rnz
+  integer, dimension(ncelx, ncely, ncelz), intent(in) :: hoc
+  real(kind=db), dimension(npar), intent(in) :: xpos, ypos, zpos
+  real(kind=db), intent(in) :: scalefacx, scalefacy, scalefacz
+  real(kind=db), intent(in) :: rc, rcsq, lboxx, lboxy, lboxz
+  integer, intent(in) :: npar, nsurf
+  logical, intent(in) :: zperiodic
+
+  ! outputs
+  real(kind=db), intent(out) :: etot
+
+  real(kind=db) :: eij, xposi, yposi, zposi
+  integer :: icelx, icely, icelz, cellnum, jpar, ipar, nhead
+  integer, dimension(maxsten) :: heads
+  etot = 0.0_db
+
+  do ipar = 1, npar
+
+     ! determine cell that particle i is in
+     icelx = int(xpos(ipar) / rnx) + 1
+     icely = int(ypos(ipar) / rny) + 1
+     icelz = int(zpos(ipar) / rnz) + 1
+
+     xposi = xpos(ipar) * scalefacx
+     yposi = ypos(ipar) * scalefacy
+     zposi = zpos(ipar) * scalefacz
+
+     ! go through each nonempty cell of the stencil (cellstencil.f90),
+     ! and add pot energy between particle i and all particles in the
+     ! cell.
+     call cellstencil_heads(hoc, icelx, icely, icelz, ncelx, ncely,&
+                            ncelz, zperiodic, nhead, heads)
+     do cellnum = 1, nhead
+        jpar = heads(cellnum)
+
+        do while (jpar /= 0)
+           if (ipar /= jpar) then
+
+              ! get p.e. between particles i and j
+              call tab_eij(ipar, jpar, xposi, yposi, zposi,&
+                           xpos(jpar) * scalefacx,&
+                           ypos(jpar) * scalefacy,&
+                           zpos(jpar) * scalefacz, lboxx, lboxy, lboxz,&
+                           rc, rcsq, npar, nsurf, zperiodic, eij)
+              etot = etot + eij
+           end if
+           jpar = ll(jpar)
+
+        end do
+     end do
+  end do
+
+  ! double counting of potential energy
+  etot = etot / 2.0_db
+
+end subroutine tab_totalenlistscaled
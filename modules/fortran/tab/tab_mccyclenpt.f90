@@ -0,0 +1,325 @@
+! tab_mccyclenpt.f90
+! James Mithen
+! j.mithen@surrey.ac.uk
+!
+! Fortran subroutine for executing Monte carlo cycles.  A cycle
+! consists of nparfl attempted positional moves and a single volume
+! move (on average).  The Metropolis Monte Carlo algorithm is used.
+! The pair energies are interpolated from the table in pottable.f90
+! (see tab_energy.f90), which must have been built first.
+! The energy of a trial volume is computed with scaled positions
+! (see tab_totalenlistscaled in tab_energy.f90), so that the
+! positions are only rescaled, and the cell list only rebuilt, when
+! a volume move is accepted.  If fixsurf is true, the surface
+! particles are not moved by a volume move, as for the seed in
+! gauss_executecyclesnpt (see tab_cyclenpt in mccycle.py).
+!
+! SUBROUTINES:
+! tab_executecyclesnpt - execute ncycles monte carlo cycles
+!                        note xpos,ypos,zpos,lboxx,lboxy,lboxz and
+!                        etot are returned. 
+
+subroutine tab_executecyclesnpt(xpos, ypos, zpos, ncycles, nsamp, rc,&
+                                rcsq, press, lboxx, lboxy, lboxz,&
+                                epsovert, maxdisp, maxvol, npar, nsurf,&
+                                zperiodic, fixsurf, sameseed, etot)
+  ! execute ncycles MC cycles
+
+  use simstate, only: ncelx, ncely, ncelz, rnx, rny, rnz, ll, lp, hoc,&
+                      simstate_seed, simstate_nlist, simstate_store,&
+                      simstate_addmoves
+  use rng, only: rng_uniform, rng_uniform3
+  use cellstencil, only: cellsub
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  integer, intent(in) :: ncycles, nsamp, npar, nsurf
+  real(kind=db), intent(in) :: rc, rcsq, press
+  real(kind=db), intent(in) :: epsovert, maxdisp, maxvol
+  logical, intent(in) :: zperiodic, fixsurf, sameseed
+
+  ! outputs
+  real(kind=db), dimension(npar), intent(inout) :: xpos, ypos, zpos
+  real(kind=db), intent(inout) :: lboxx, lboxy, lboxz, etot
+
+  !f2py intent(in) :: ncycles, nsamp, rc, rcsq, epsovert
+  !f2py intent(in) :: maxdisp, npar, nparsuf, zperiodic, fixsurf
+  !f2py intent(in) :: sameseed
+  !f2py intent(in,out) :: xpos, ypos, zpos, lboxx, lboxy, lboxz, etot
+
+  integer :: ipar, atmovdisp, acmovdisp, atmovvol, acmovvol, cy, it,&
+             nparfl, i, j
+  real(kind=db) :: rsc, xposi, yposi, zposi, xposinew, yposinew,&
+                   zposinew,eold,enew
+  real(kind=db) :: lboxxnew, lboxynew, lboxznew
+  real(kind=db) :: vboxold, lnvold, lnvnew, vboxnew
+  real(kind=db) :: scalefacx, scalefacy, scalefacz, arg, etotnew
+  real(kind=db), dimension(3) :: rvec
+  logical :: accept
+  ! these are for cell lists
+  integer :: ncelxnew, ncelynew, ncelznew
+  real(kind=db) :: rnxnew, rnynew, rnznew
+  integer, dimension(npar) :: llnew
+  real(kind=db), dimension(npar) :: xposnew, yposnew, zposnew
+  integer, allocatable, dimension(:,:,:) :: hocnew
+  
+  ! initialize random number generator (if the simulation state is
+  ! kept between calls, this was done once by simstate_init).  If a
+  ! counter-based stream has been set (see rng.f90), it is used
+  ! instead.
+  call simstate_seed(sameseed)
+
+  ! get the cell list; this is only built if the cell list stored
+  ! by the previous call cannot be reused (see simstate.f90)
+  call simstate_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz, npar)
+
+  atmovdisp = 0
+  acmovdisp = 0
+  atmovvol = 0
+  acmovvol = 0
+  nparfl = npar - nsurf
+  
+  write(*, '(F12.6, F12.6, F12.6, F12.6)') etot, lboxx, lboxy, lboxz
+  do cy = 1, ncycles
+     ! each cycle is on average 1 move per fluid par + 1 vol move     
+     do it = 1, nparfl + 1 
+
+        ! pick a random number between [nsurf+1, ntot+1]
+        call rng_uniform(rsc)
+        ipar = int(rsc * (nparfl + 1)) + nsurf + 1
+
+        ! if ipar > npar, we attempt a volume move, else we attempt a
+        ! positional move
+
+        if (ipar > npar) then ! volume move
+           atmovvol = atmovvol + 1
+           
+           ! old box volume
+           vboxold = lboxx * lboxy * lboxz
+           lnvold = log(vboxold)
+           
+           ! random number between 0 and 1 for attempted volume move
+           call rng_uniform(rsc)
+
+           ! new box volume
+           lnvnew = lnvold + maxvol * (rsc - 0.5_db)
+           vboxnew = exp(lnvnew)
+
+           ! scale factor for multiplying each dimension of simulation
+           ! box. If z is periodic we multiply each of the three box
+           ! dimensions by the same scale factor.  Otherwise, if z is
+           ! not periodic, we make the box larger/smaller in the z
+           ! direction only.
+           
+           if (zperiodic) then
+              scalefacx = (vboxnew / vboxold) ** (1.0_db/3.0_db)
+              scalefacy = scalefacx
+              scalefacz = scalefacx
+           else
+              scalefacx = 1.0_db
+              scalefacy = 1.0_db
+              scalefacz = (vboxnew / vboxold)
+           end if
+
+           ! new box dimensions
+           lboxxnew = lboxx * scalefacx
+           lboxynew = lboxy * scalefacy
+           lboxznew = lboxz * scalefacz
+
+           ! new energy.  We don't rescale the positions or rebuild the
+           ! cell list here: the energy is computed from the current
+           ! positions and cell list, with each position scaled by the
+           ! scale factors, so nothing needs to be undone if the move
+           ! is rejected.  This needs the cells to still be at least rc
+           ! / cellsub wide in the new box; if they are not (the box
+           ! shrunk), we build a cell list with the new number of
+           ! cells for the current positions.  If the surface
+           ! particles are fixed, we compute the energy from a copy of
+           ! the rescaled positions and a new cell list instead.
+           if (fixsurf) then
+              xposnew = xpos * scalefacx
+              yposnew = ypos * scalefacy
+              zposnew = zpos * scalefacz
+              xposnew(1:nsurf) = xpos(1:nsurf)
+              yposnew(1:nsurf) = ypos(1:nsurf)
+              zposnew(1:nsurf) = zpos(1:nsurf)
+              call getnumcells(lboxxnew, lboxynew, lboxznew, rc,&
+                               ncelxnew, ncelynew, ncelznew)
+              allocate(hocnew(ncelxnew, ncelynew, ncelznew))
+              call new_nlist(xposnew, yposnew, zposnew, rc, lboxxnew,&
+                             lboxynew, lboxznew, npar, ncelxnew,&
+                             ncelynew, ncelznew, llnew, hocnew, rnxnew,&
+                             rnynew, rnznew)
+              call tab_totalenlist(llnew, hocnew, ncelxnew, ncelynew,&
+                                   ncelznew, rnxnew, rnynew, rnznew,&
+                                   xposnew, yposnew, zposnew, rc, rcsq,&
+                                   lboxxnew, lboxynew, lboxznew, npar,&
+                                   nsurf, zperiodic, etotnew)
+              deallocate(hocnew)
+           else if ((ncelx == 1 .or. cellsub * rnx * scalefacx >= rc) .and.&
+                    (ncely == 1 .or. cellsub * rny * scalefacy >= rc) .and.&
+                    (ncelz == 1 .or. cellsub * rnz * scalefacz >= rc)) then
+              call tab_totalenlistscaled(ll, hoc, ncelx, ncely, ncelz,&
+                                         rnx, rny, rnz, xpos, ypos,&
+                                         zpos, scalefacx, scalefacy,&
+                                         scalefacz, rc, rcsq, lboxxnew,&
+                                         lboxynew, lboxznew, npar,&
+                                         nsurf, zperiodic, etotnew)
+           else
+              call getnumcells(lboxxnew, lboxynew, lboxznew, rc,&
+                               ncelxnew, ncelynew, ncelznew)
+              allocate(hocnew(ncelxnew, ncelynew, ncelznew))
+              call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz,&
+                             npar, ncelxnew, ncelynew, ncelznew, llnew,&
+                             hocnew, rnxnew, rnynew, rnznew)
+              call tab_totalenlistscaled(llnew, hocnew, ncelxnew,&
+                                         ncelynew, ncelznew, rnxnew,&
+                                         rnynew, rnznew, xpos, ypos,&
+                                         zpos, scalefacx, scalefacy,&
+                                         scalefacz, rc, rcsq, lboxxnew,&
+                                         lboxynew, lboxznew, npar,&
+                                         nsurf, zperiodic, etotnew)
+              deallocate(hocnew)
+           end if
+
+           ! See FS p122 (Algorithm 11) for this acceptance rule
+           
+           arg = epsovert * (etot - etotnew + press * (vboxold - vboxnew)) + &
+                 (nparfl + 1) * (lnvnew - lnvold)
+           accept = .True.
+           if (arg < 0) then
+              call rng_uniform(rsc)
+              if (rsc > exp(arg)) accept = .False.
+           end if
+
+           if (accept) then
+              ! rescale box and particle positions to new volume
+              lboxx = lboxxnew
+              lboxy = lboxynew
+              lboxz = lboxznew
+              if (fixsurf) then
+                 xpos(nsurf+1:npar) = xpos(nsurf+1:npar) * scalefacx
+                 ypos(nsurf+1:npar) = ypos(nsurf+1:npar) * scalefacy
+                 zpos(nsurf+1:npar) = zpos(nsurf+1:npar) * scalefacz
+              else
+                 xpos = xpos * scalefacx
+                 ypos = ypos * scalefacy
+                 zpos = zpos * scalefacz
+              end if
+
+              ! rebuild the cell list for the new positions (we don't
+              ! keep the old one: after rescaling, rounding can put a
+              ! particle on a cell boundary in a different cell from
+              ! the one it is listed in, see update_nlist in clist.f90)
+              call getnumcells(lboxx, lboxy, lboxz, rc, ncelxnew,&
+                               ncelynew, ncelznew)
+              if (ncelxnew /= ncelx .or. ncelynew /= ncely .or.&
+                  ncelznew /= ncelz) then
+                 ncelx = ncelxnew
+                 ncely = ncelynew
+                 ncelz = ncelznew
+                 deallocate(hoc)
+                 allocate(hoc(ncelx, ncely, ncelz))
+              end if
+              call new_nlist(xpos, ypos, zpos, rc, lboxx, lboxy, lboxz,&
+                             npar, ncelx, ncely, ncelz, ll, hoc, rnx,&
+                             rny, rnz)
+              call nlist_prev(ll, hoc, ncelx, ncely, ncelz, npar, lp)
+
+              etot = etotnew
+              acmovvol = acmovvol + 1
+           end if
+
+        else ! displacement move
+           atmovdisp = atmovdisp + 1
+
+           xposi = xpos(ipar)
+           yposi = ypos(ipar)
+           zposi = zpos(ipar)
+
+           ! find old energy
+           call tab_enlist(ll, hoc, ncelx, ncely, ncelz, ipar, xposi,&
+                           yposi, zposi, xpos, ypos, zpos, rc, rcsq,&
+                           lboxx, lboxy, lboxz, npar, nsurf, zperiodic,&
+                           eold)
+
+           ! displace particle
+           call rng_uniform3(rvec)
+           xposinew = xposi + maxdisp * (rvec(1) - 0.5_db)
+           yposinew = yposi + maxdisp * (rvec(2) - 0.5_db)
+           zposinew = zposi + maxdisp * (rvec(3) - 0.5_db)
+
+           if (zperiodic) then
+              if (zposinew < 0.0_db) then
+                 zposinew = zposinew + lboxz
+              else if (zposinew > lboxz) then
+                 zposinew = zposinew - lboxz
+              end if
+           end if
+
+           ! if z not periodic, we will reject
+           ! the move if z > lboxz (hard wall boundary)
+           if (zposinew < lboxz .and. zposinew > 0.0_db) then
+
+              ! periodic boundary conditions in x and y
+              if (xposinew < 0.0_db) then
+                 xposinew = xposinew + lboxx
+              else if (xposinew > lboxx) then
+                 xposinew = xposinew - lboxx
+              end if
+              if (yposinew < 0.0_db) then
+                 yposinew = yposinew + lboxy
+              else if (yposinew > lboxy) then
+                 yposinew = yposinew - lboxy
+              end if
+
+              ! find new energy
+              call tab_enlist(ll, hoc, ncelx, ncely, ncelz, ipar,&
+                              xposinew, yposinew, zposinew, xpos, ypos,&
+                              zpos, rc, rcsq, lboxx, lboxy, lboxz,&
+                              npar, nsurf, zperiodic, enew)
+
+              ! choose whether to accept the move or not
+              accept = .True.
+              if (enew > eold) then
+                 call rng_uniform(rsc)
+                 if (exp((eold - enew) *epsovert) < rsc) accept = .False.
+              end if
+
+              ! update positions if move accepted
+              if (accept) then
+
+                 ! move the particle to its new cell, if it has left its
+                 ! old cell (this is much cheaper than rebuilding the
+                 ! cell list)
+                 call update_nlist(ipar, xpos(ipar), ypos(ipar),&
+                                   zpos(ipar), xposinew, yposinew,&
+                                   zposinew, ncelx, ncely, ncelz, rnx,&
+                                   rny, rnz, npar, ll, lp, hoc)
+
+                 xpos(ipar) = xposinew
+                 ypos(ipar) = yposinew
+                 zpos(ipar) = zposinew
+                 etot = etot - eold + enew
+                 acmovdisp = acmovdisp + 1
+              end if
+           end if
+        endif
+     end do
+     
+     ! write out energy after every nsamp cycles
+     if (mod(cy,nsamp) == 0) write(*, '(F12.6, F12.6, F12.6, F12.6)') etot, lboxx, lboxy, lboxz
+     
+  end do
+
+  ! the cell list is up to date for the final positions and box
+  call simstate_store(rc, lboxx, lboxy, lboxz)
+  call simstate_addmoves(atmovdisp, acmovdisp, atmovvol, acmovvol)
+
+  ! write out acceptance ratio
+  write(*,'("acceptance ratio", I7, I7, F7.3, I7, I7, F7.3)')&
+        acmovdisp, atmovdisp, real(acmovdisp) / atmovdisp,&
+        acmovvol, atmovvol, real(acmovvol) / atmovvol
+
+end subroutine tab_executecyclesnpt
@@ -0,0 +1,183 @@
+! tab_mccyclenvt.f90
+! James Mithen
+! j.mithen@surrey.ac.uk
+!
+! Fortran subroutine for executing Monte carlo cycles.  A cycle
+! consists of nparfl attempted positional moves.  The Metropolis Monte
+! Carlo algorithm is used.  The pair energies are interpolated from
+! the table in pottable.f90 (see tab_energy.f90), which must have been
+! built first.  If the surface field is used (see extfield.f90), the
+! surface particles are left out of the cell list, and the energy of
+! a fluid particle with the surface is interpolated from the field.
+!
+! SUBROUTINES:
+! tab_executecyclesnvt - execute ncycles monte carlo cycles
+!                        note xpos,ypos,zpos and etot are returned 
+
+subroutine tab_executecyclesnvt(xpos, ypos, zpos, ncycles, nsamp, rc,&
+                                rcsq, lboxx, lboxy, lboxz, epsovert,&
+                                maxdisp, npar, nsurf, zperiodic,&
+                                sameseed, etot)
+  ! execute ncycles MC cycles
+
+  use simstate, only: ncelx, ncely, ncelz, rnx, rny, rnz, ll, lp, hoc,&
+                      simstate_seed, simstate_nlist, simstate_store,&
+                      simstate_addmoves
+  use rng, only: rng_uniform, rng_uniform3
+  use extfield, only: spacing, extfield_build, extfield_energy
+  implicit none
+  integer, parameter :: db = 8 !selected_real_kind(13)
+
+  ! inputs
+  integer, intent(in) :: ncycles, nsamp, npar, nsurf
+  real(kind=db), intent(in) :: rc, rcsq, lboxx, lboxy, lboxz
+  real(kind=db), intent(in) :: epsovert, maxdisp
+  logical, intent(in) :: zperiodic, sameseed
+
+  ! outputs
+  real(kind=db), dimension(npar), intent(inout) :: xpos, ypos, zpos
+  real(kind=db), intent(inout) :: etot
+
+  !f2py intent(in) :: ncycles, nsamp, rc, rcsq, lboxx, lboxy, lboxz
+  !f2py intent(in) :: epsovert, maxdisp, npar, nparsuf, zperiodic, sameseed
+  !f2py intent(in,out) :: xpos, ypos, zpos, etot
+
+  integer :: ipar, atmov, acmov, cy, it, nparfl, nlo
+  real(kind=db) :: rsc, xposi, yposi, zposi, xposinew, yposinew,&
+                   zposinew, eold, enew
+  real(kind=db), dimension(3) :: rvec
+  logical :: accept
+  ! these are for cell lists
+  
+  ! initialize random number generator (if the simulation state is
+  ! kept between calls, this was done once by simstate_init).  If a
+  ! counter-based stream has been set (see rng.f90), it is used
+  ! instead.
+  call simstate_seed(sameseed)
+
+  ! particles 1..nlo are not in the cell list; the cell list
+  ! indexes the particles nlo+1..npar from 1
+  nlo = 0
+  if (spacing > 0.0_db .and. nsurf > 0) then
+     call extfield_build(xpos, ypos, zpos, nsurf, rc, rcsq, lboxx,&
+                         lboxy, lboxz, zperiodic)
+     nlo = nsurf
+  end if
+
+  ! get the cell list; this is only built if the cell list stored
+  ! by the previous call cannot be reused (see simstate.f90)
+  call simstate_nlist(xpos(nlo + 1:npar), ypos(nlo + 1:npar),&
+                      zpos(nlo + 1:npar), rc, lboxx, lboxy, lboxz,&
+                      npar - nlo)
+
+  ! counters for attempted and accepted moves
+  atmov = 0
+  acmov = 0
+  nparfl = npar - nsurf
+  
+  write(*,*) 0, etot
+  do cy = 1, ncycles
+     do it = 1, nparfl
+        atmov = atmov + 1
+
+        ! pick a particle at random from fluid particles
+        call rng_uniform(rsc)
+        ipar = int(rsc * nparfl) + 1 + nsurf
+        xposi = xpos(ipar)
+        yposi = ypos(ipar)
+        zposi = zpos(ipar)
+
+        ! find old energy
+        call tab_enlist(ll, hoc, ncelx, ncely, ncelz, ipar - nlo,&
+                        xposi, yposi, zposi, xpos(nlo + 1:npar),&
+                        ypos(nlo + 1:npar), zpos(nlo + 1:npar), rc,&
+                        rcsq, lboxx, lboxy, lboxz, npar - nlo,&
+                        nsurf - nlo, zperiodic, eold)
+        if (nlo > 0) eold = eold + extfield_energy(xposi, yposi, zposi)
+
+        ! displace particle
+        call rng_uniform3(rvec)
+        xposinew = xposi + maxdisp * (rvec(1) - 0.5_db)
+        yposinew = yposi + maxdisp * (rvec(2) - 0.5_db)
+        zposinew = zposi + maxdisp * (rvec(3) - 0.5_db)
+
+        if (zperiodic) then
+           if (zposinew < 0.0_db) then
+              zposinew = zposinew + lboxz
+           else if (zposinew > lboxz) then
+              zposinew = zposinew - lboxz
+           end if
+        end if
+        
+        ! if z not periodic, we will reject
+        ! the move if z > lboxz (hard wall boundary)
+        if (zposinew < lboxz .and. zposinew > 0.0_db) then
+           
+           ! periodic boundary conditions in x and y
+           if (xposinew < 0.0_db) then
+              xposinew = xposinew + lboxx
+           else if (xposinew > lboxx) then
+              xposinew = xposinew - lboxx
+           end if
+           if (yposinew < 0.0_db) then
+              yposinew = yposinew + lboxy
+           else if (yposinew > lboxy) then
+              yposinew = yposinew - lboxy
+           end if
+           
+           ! find new energy
+           call tab_enlist(ll, hoc, ncelx, ncely, ncelz, ipar - nlo,&
+                           xposinew, yposinew, zposinew,&
+                           xpos(nlo + 1:npar), ypos(nlo + 1:npar),&
+                           zpos(nlo + 1:npar), rc, rcsq, lboxx, lboxy,&
+                           lboxz, npar - nlo, nsurf - nlo, zperiodic,&
+                           enew)
+           if (nlo > 0) then
+              enew = enew + extfield_energy(xposinew, yposinew,&
+                                            zposinew)
+           end if
+
+           ! choose whether to accept the move or not
+           accept = .True.
+           if (enew > eold) then
+              call rng_uniform(rsc)
+              if (exp((eold - enew) * epsovert) < rsc) then
+                 accept = .False.
+              end if
+           end if
+
+           ! update positions if move accepted
+           if (accept) then
+
+              ! move the particle to its new cell, if it has left its
+              ! old cell (this is much cheaper than rebuilding the
+              ! cell list)
+              call update_nlist(ipar - nlo, xpos(ipar), ypos(ipar),&
+                                zpos(ipar), xposinew, yposinew,&
+                                zposinew, ncelx, ncely, ncelz, rnx,&
+                                rny, rnz, npar - nlo, ll, lp, hoc)
+
+              xpos(ipar) = xposinew
+              ypos(ipar) = yposinew
+              zpos(ipar) = zposinew
+              etot = etot - eold + enew
+              acmov = acmov + 1
+              
+           end if
+        end if
+
+     end do
+     
+     ! write out energy after every nsamp cycles
+     if (mod(cy, nsamp) == 0) write(*, *) cy, etot
+
+  end do
+
+  ! the cell list is up to date for the final positions
+  call simstate_store(rc, lboxx, lboxy, lboxz)
+  call simstate_addmoves(atmov, acmov, 0, 0)
+
+  ! write out acceptance ratio
+  write(*,'("acceptance ratio", I7, I7, F7.3)') acmov, atmov, real(acmov) / atmov
+
+end subroutine tab_executecyclesnvt
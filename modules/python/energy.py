@@ -33,6 +33,11 @@ gauss_totalenlist - computes total potential energy of system, including
                     surface, for Gaussian potential.  This uses cell lists
                     for efficiency, and therefore should be preferred to
                     gauss_totalenergy above.
+tab_totalenlist   - computes total potential energy of system, including
+                    surface, for the tabulated potential (see
+                    pottable.py), using cell lists.
+setcellsub        - set the number of cells per cutoff used by the cell
+                    lists.
 """
 
 import mcfuncs
@@ -275,3 +280,36 @@ def gauss_totalenlist(positions, params):
                                            vrc2, nparsurf,
                                            zperiodic)
     return etot
+
+def tab_totalenlist(positions, params):
+    """
+    Compute total energy of system, including surface, using cell
+    list and the tabulated potential.  The table must have been built
+    (see pottable.PotTable).
+    """
+
+    rcut = params['rcut']
+    rcsq = params['rcsq']
+    lboxx = params['lboxx']
+    lboxy = params['lboxy']
+    lboxz = params['lboxz']
+    nparsurf = params['nparsurf']
+    zperiodic = params['zperiodic']
+
+    etot = mcfuncs.tab_totalencreatelist(positions[:,0],
+                                         positions[:,1],
+                                         positions[:,2], rcut,
+                                         rcsq, lboxx,
+                                         lboxy, lboxz, nparsurf,
+                                         zperiodic)
+    return etot
+
+def setcellsub(cellsub):
+    """
+    Use cells of side at least rc / cellsub (cellsub from 1 to 3) in
+    all of the cell lists of the Fortran code, so that fewer pairs
+    outside the cutoff are tested (see
+    modules/fortran/global/cellstencil.f90).
+    """
+
+    mcfuncs.cellstencil.cellstencil_set(cellsub)
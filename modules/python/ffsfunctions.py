@@ -11,6 +11,14 @@ getpickparams     - return dictionary of parameters from pickle file.
 getnumsuccess     - return number of successful shots at a given
                     interface.
 takeshot          - take FFS shot from a given configuration.
+pickinitconfig    - pick a successful configuration at random (by
+                    weight) from the previous interface.
+runshot           - take a complete FFS shot, writing the shots and
+                    pos files read by finishinterface.
+finishinterface   - gather the results of all shots at an interface
+                    and write the interface files.
+initshotworker    - initialise a worker process in a local shot pool.
+poolshot          - run a single shot in a local shot pool.
 savelambda0config - save the particle positions and time of hitting
                     first FFS interface (lambda0).
 """
@@ -24,6 +32,7 @@ import numpy as np
 
 import funcselector
 import readwrite
+import rng
 
 def getshotdict(nint):
     """Return shot dictionary from pickle file at interface nint."""
@@ -68,8 +77,13 @@ def getnumsuccess(nint):
     nsuccess = len(files)
     return nsuccess
 
-def takeshot(initfile, nint, params):
-    """Take FFS shot from configuration in initfile."""
+def takeshot(initfile, nint, params, stopfunc=None, rand=np.random.rand):
+    """
+    Take FFS shot from configuration in initfile.  If stopfunc is
+    given, it is called between each block of lambdasamp cycles, and
+    the shot is aborted if it returns True.  rand returns the random
+    numbers used for pruning.
+    """
 
     # lambda A is the order parameter below which the system is in the
     # 'initial phase'.
@@ -105,6 +119,7 @@ def takeshot(initfile, nint, params):
     lowlambda = params['lambdas'][lowint]
     ttot = 0
     pruned = False
+    aborted = False
     
     while (oparam >= lamA) and (oparam < lamint):
 
@@ -121,7 +136,7 @@ def takeshot(initfile, nint, params):
                 if (lowint >= 0):
 
                     # kill with prob prunprob
-                    r = np.random.rand()
+                    r = rand()
                     if (r < params['prunprob']):
                         print 'Run killed by prune since OP <= {0}'\
                               .format(lowlambda)
@@ -148,6 +163,13 @@ def takeshot(initfile, nint, params):
         # we were killed by pruning, exit while loop
         if pruned:
             break
+
+        # somebody else has already provided enough successful shots
+        # at this interface
+        if stopfunc is not None and stopfunc():
+            print 'Run aborted since minsuccess reached at interface'
+            aborted = True
+            break
                 
         # make some trial moves
         positions, epot = mccyclefunc(positions, params, epot)
@@ -164,7 +186,299 @@ def takeshot(initfile, nint, params):
     else:
         success = False
 
-    return success, weight, ttot, positions
+    return success, weight, ttot, positions, aborted
+
+def pickinitconfig(shotdict, rand=np.random.rand):
+    """
+    Return the number of a successful shot from the previous
+    interface, picked at random according to its weight.
+    """
+
+    # pick random number between 0 and total weight.
+    r = shotdict['nsuccesseff']*rand()
+    wcounter = 0.0
+    for (num, w) in zip(shotdict['successnumbers'],
+                        shotdict['successweights']):
+        wcounter = wcounter + w
+        if (r <= wcounter):
+            return num
+    # guard against rounding in the cumulative sum
+    return shotdict['successnumbers'][-1]
+
+def runshot(intfrom, shotnum, params, stopfunc=None):
+    """
+    Take shot number shotnum from interface intfrom.  An initial
+    configuration is chosen from the previous interface, and the
+    results are written to shots{intfrom+1}_{shotnum}.out (and the
+    final configuration to pos{intfrom+1}_{shotnum}.xyz if the shot
+    was successful).  stopfunc is passed on to takeshot, except for
+    the shots of the first batch (shotnum <= nshots), which are never
+    aborted.  Return True if the shot was successful.
+    """
+
+    # we modify restartfile and the box dimensions below
+    params = params.copy()
+
+    # the first batch of nshots shots is always completed, so that
+    # the estimate of P(success) from it is not biased towards short
+    # (successful) shots; only shots of the extra batches are aborted
+    if shotnum <= params['nshots']:
+        stopfunc = None
+
+    # random number streams for this shot (if params['rngseed'] is
+    # set, these depend only on the seed, interface and shot number,
+    # so that the shot can be repeated exactly)
+    rand = rng.setstreams(params, intfrom + 1, shotnum)
+
+    # get shot dictionary from previous interface.  The shot
+    # dictionary stores the number of successful shots and their
+    # numbers (and some other stuff), which allows us to pick an
+    # initial configuration for the current shot.
+    shotdict = getshotdict(intfrom)
+    initnum = pickinitconfig(shotdict, rand)
+    initfile = 'pos{0}_{1}.xyz'.format(intfrom, initnum)
+
+    # print some diagnostic information handy for debugging
+    print ('I found {0} successful shots at the previous interface - you '
+           'should check this is correct'.format(shotdict['nsuccess']))
+    print 'These are runs {0}'\
+          .format(','.join([str(i) for i in shotdict['successnumbers']]))
+    print 'I have chosen the initial config {0}'.format(initfile)
+
+    # set up params dictionary using the chosen file
+    # i) override restartfile (means we read in positions)
+    params['restartfile'] = initfile
+    # ii) get box dimensions: if these are written in the XYZ file, as
+    # they would be for an NPT simulation, we use the ones in the XYZ
+    # file to overwrite those in the parameters dictionary.
+    boxdims = getboxdims(initfile)
+    if boxdims:
+        params['lboxx'] = boxdims[0]
+        params['lboxy'] = boxdims[1]
+        params['lboxz'] = boxdims[2]
+
+    # take the shot
+    success, weight, time, positions, aborted = takeshot(initfile,
+                                                         intfrom, params,
+                                                         stopfunc, rand)
+
+    # print out whether success/fail and time
+    if success:
+        # we reached the next interface
+        sucstring = 'SUCCESS'
+    elif aborted:
+        sucstring = 'ABORTED'
+        weight = 0
+    else:
+        sucstring = 'FAIL'
+        # set weight in case we survived pruning attempts and still
+        # failed
+        weight = 0
+
+    print 'Shot number {0} finished in time {1} with status {2}'\
+          .format(shotnum, time, sucstring)
+
+    # if I was successful, I need to save my config
+    if success:
+        # get the desired writexyz function.
+        writexyzfunc = funcselector.FuncSelector(params).WriteXyzFunc()
+        writexyzfunc('pos{0}_{1}.xyz'.format(intfrom + 1, shotnum),
+                     positions, params)
+
+    # finally (whether success or fail), write to shotsi_j.out.  These
+    # files are read by finishinterface. Here i is the interface we
+    # are trying to reach, and j is the shot number.  We write 5
+    # numbers on single line: initialconfignumber timetaken success
+    # weight aborted
+    fname = 'shots{0}_{1}.out'.format(intfrom + 1, shotnum)
+    fout = open(fname, 'w')
+    fout.write('from time success weight aborted\n'
+               '{0} {1} {2:d} {3:.6f} {4:d}\n'\
+               .format(initnum, time, success, weight, aborted))
+    fout.close()
+
+    return success
+
+def finishinterface(intfrom, delete=True):
+    """
+    Gather the results of every shot from interface intfrom, from
+    files like shots1_32.out, and write the interface{intfrom+1}.out
+    and interface{intfrom+1}.pkl files.  If delete is True, the
+    individual shot files are removed afterwards.  Shots that were
+    aborted (see takeshot) are not counted, and their number is
+    written to the interface file.
+    """
+
+    # get sorted list of shot numbers from the shots%d_%d.out files,
+    # leaving out the shots that were aborted; the shot file of an
+    # aborted shot has a non-zero fifth entry (older shot files have
+    # only four entries).
+    sfiles = glob.glob('shots{0}_*.out'.format(intfrom + 1))
+    snums = []
+    naborted = 0
+    for sfile in sfiles:
+        fout = open(sfile, 'r')
+        dataline = fout.readlines()[1].split()
+        fout.close()
+        if len(dataline) > 4 and int(dataline[4]):
+            naborted = naborted + 1
+            continue
+        snums.append(int(sfile.split('_')[1].split('.')[0]))
+    nshots = len(snums)
+    shotnums = np.array(sorted(snums), dtype=int)
+    if naborted:
+        print '{0} aborted shots to interface {1} were not counted'\
+              .format(naborted, intfrom + 1)
+
+    # open each shot file for interface, and get from, time, success,
+    # weight.
+    shotfrom = np.zeros(nshots,dtype=int)
+    times = np.zeros(nshots,dtype=int)
+    success = np.zeros(nshots,dtype=int)
+    weights = np.zeros(nshots)
+    # also want shot numbers of successful shots and their weights
+    successnumbers = []
+    successweights = []
+    nsuccess = 0 # total number successes
+    nsuccesseff = 0.0 # total weight of successful shots (>= nsuccess)
+    i = 0
+    for sn in shotnums:
+        fout = open('shots{0}_{1}.out'.format(intfrom + 1, sn), 'r')
+        dataline = fout.readlines()[1].split()
+        fout.close()
+        f = int(dataline[0])
+        t = int(dataline[1])
+        s = int(dataline[2])
+        w = float(dataline[3])
+        shotfrom[i] = f
+        times[i] = t
+        success[i] = s
+        weights[i] = w
+        if s:
+            successnumbers.append(sn)
+            successweights.append(w)
+        nsuccess = nsuccess + s
+        nsuccesseff = nsuccesseff + w
+        i = i + 1
+    # 'effective' number of shots, taking into account pruning
+    nshotseff = nsuccesseff + (nshots - nsuccess)
+
+    # write shot data to interface file
+    # In the SUMMARY section is
+    # nshots - the number of shots fired to reach the interface
+    # nsuccess - the number of successful shots
+    # P(success) - fraction of shots successful
+    # nshotseff - the effective number of shots fired,
+    #             taking into account pruning (>=nfired)
+    # nsuccesseff - the effective number of successful shots, again
+    #               taking into account prunint (>=nsuccess)
+    # P(successeff) - fracition of effective shots successful
+    # Note that it is P(successeff) that is our estimate of
+    # reaching the next interface.
+    # If pruning is not applied, then P(successeff) == P(success)
+    # see Allen, Valerani, ten Wolde J. Phys. Condens. matter 21,
+    # 463102 for more info on pruning.
+
+    fout = open('interface%d.out' %(intfrom+1),'w')
+    fout.write(('SUMMARY\nshots nsuccess P(success) nshotseff nsuccesseff '
+                'P(successeff)\n'))
+    fout.write('%d %d %.6f %.6f %.6f %.6f\n'
+               %(nshots,nsuccess, float(nsuccess)/float(nshots),
+                 nshotseff,nsuccesseff,nsuccesseff/nshotseff))
+    # shots of the extra batches that were aborted once there were
+    # minsuccess successes ('earlystop'), these are not in nshots
+    if naborted:
+        fout.write('aborted shots not counted: %d\n' %naborted)
+
+    # Write a detailed breakdown of every shot
+    fout.write('----------\nDETAILED BREAKDOWN\nshotnum from time success\n')
+    fstr = ''
+    for (s,f,t,suc,w) in zip(shotnums,shotfrom,times,success,weights):
+        # write shotnum from time success weight
+        fstr = '%s%d %d %d %d %.3f\n' %(fstr,s,f,t,suc,w)
+    fout.write(fstr)
+    fout.close()
+
+    # now create the dictionary with shot information
+    # this is pickled and read by shots at the subsequent interface
+    shotdict = {'nshots': nshots,'nshotseff': nshotseff,
+                'nsuccess': nsuccess,
+                'nsuccesseff' : nsuccesseff,
+                'successnumbers' : np.array(successnumbers),
+                'successweights': np.array(successweights),
+                'naborted': naborted}
+    # write out to pickle file
+    fout = open('interface%d.pkl' %(intfrom+1), 'wb')
+    pickle.dump(shotdict, fout)
+    fout.close()
+
+    # now clean up the directory by deleting files
+    if delete:
+        # delete the error and output files produced by qsub command
+        delfiles = glob.glob('shots%d*.e*' %(intfrom + 1))
+        for f in delfiles:
+            os.remove(f)
+        delfiles = glob.glob('shots%d*.o*' %(intfrom + 1))
+        for f in delfiles:
+            os.remove(f)
+
+        # delete the shots1_1.out files that are written by runshot
+        delfiles = glob.glob('shots%d*.out' %(intfrom + 1))
+        for f in delfiles:
+            os.remove(f)
+
+    return shotdict
+
+# parameters dictionary of a worker process in a local shot pool, set
+# once by initshotworker so that params.pkl is only read once per
+# worker rather than once per shot.
+_WORKERPARAMS = None
+# number of successful shots at the current interface, shared between
+# all of the workers in a local shot pool.
+_SUCCESSCOUNT = None
+
+def initshotworker(successcount=None):
+    """
+    Initialise a worker process of a local shot pool (see
+    codeffslocal.py).  successcount is a multiprocessing.Value holding
+    the number of successful shots at the current interface, which is
+    shared between the workers.
+    """
+
+    global _WORKERPARAMS, _SUCCESSCOUNT
+    _WORKERPARAMS = getpickparams()
+    _SUCCESSCOUNT = successcount
+    # worker processes are forked from the same parent, and would
+    # otherwise all share the same numpy random state.
+    np.random.seed()
+
+def _enoughsuccesses():
+    """
+    Return True if the local shot pool already has minsuccess
+    successful shots at the current interface.
+    """
+
+    return _SUCCESSCOUNT.value >= _WORKERPARAMS['minsuccess']
+
+def poolshot(args):
+    """
+    Take a single shot in a worker process of a local shot pool.  args
+    is the tuple (intfrom, shotnum).  Return True if the shot was
+    successful.
+    """
+
+    intfrom, shotnum = args
+    if _WORKERPARAMS['earlystop'] and _SUCCESSCOUNT is not None:
+        stopfunc = _enoughsuccesses
+    else:
+        stopfunc = None
+    success = runshot(intfrom, shotnum, _WORKERPARAMS, stopfunc)
+    if success and _SUCCESSCOUNT is not None:
+        with _SUCCESSCOUNT.get_lock():
+            _SUCCESSCOUNT.value += 1
+    # output from the different workers is interleaved
+    sys.stdout.flush()
+    return success
 
 def savelambda0config(qhits, thit, oparam, positions, params, wfunc):
     """Save configuration at lambda0 and add to the times file."""
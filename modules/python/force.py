@@ -11,6 +11,8 @@ gauss_forceslist - computes force on every particle in the system
                    potential energy of system, including surface,
                    for Gaussian potential.  This uses cell lists
                    for efficiency.
+len_forceslist   - same as above, for Lennard-Jones potential.
+ipl_forceslist   - same as above, for IPL potential.
 """
 
 import mcfuncs
@@ -39,3 +41,52 @@ def gauss_forceslist(positions, params):
     forces[:,0], forces[:,1], forces[:,2] = fx, fy, fz
 
     return forces
+
+def len_forceslist(positions, params):
+    """Compute force on every particle in system, including surface."""
+
+    rcut = params['rcut']
+    rcsq = params['rcsq']
+    lboxx = params['lboxx']
+    lboxy = params['lboxy']
+    lboxz = params['lboxz']
+    nparsurf = params['nparsurf']
+    zperiodic = params['zperiodic']
+    r6mult = params['r6mult']
+    r12mult = params['r12mult']
+
+    # note the function creates the cell list for us
+    fx, fy, fz = mcfuncs.\
+                 len_forcecreatelist(positions[:,0], positions[:,1],
+                                     positions[:,2], rcut, rcsq,
+                                     lboxx, lboxy, lboxz, nparsurf,
+                                     zperiodic, r6mult, r12mult)
+
+    forces = np.empty([len(fx), 3])
+    forces[:,0], forces[:,1], forces[:,2] = fx, fy, fz
+
+    return forces
+
+def ipl_forceslist(positions, params):
+    """Compute force on every particle in system, including surface."""
+
+    rcut = params['rcut']
+    rcsq = params['rcsq']
+    lboxx = params['lboxx']
+    lboxy = params['lboxy']
+    lboxz = params['lboxz']
+    nparsurf = params['nparsurf']
+    zperiodic = params['zperiodic']
+    potexponent = params['potexponent']
+
+    # note the function creates the cell list for us
+    fx, fy, fz = mcfuncs.\
+                 ipl_forcecreatelist(positions[:,0], positions[:,1],
+                                     positions[:,2], rcut, rcsq,
+                                     lboxx, lboxy, lboxz, nparsurf,
+                                     zperiodic, potexponent)
+
+    forces = np.empty([len(fx), 3])
+    forces[:,0], forces[:,1], forces[:,2] = fx, fy, fz
+
+    return forces
@@ -16,6 +16,7 @@ from lenexceptions import *
 import energy
 import mccycle
 import orderparam
+import pottable
 import writeoutput
 
 class FuncSelector(object):
@@ -30,6 +31,8 @@ class FuncSelector(object):
     MCTYPE = 'mctype'
     ORDERPARAM = 'orderparam'
     WRITEXYZ = 'writexyz'
+    OPINCREMENTAL = 'opincremental'
+    SIMSTATE = 'simstate'
     # choices for potential
     LEN = 'len'
     GAUSS = 'gauss'
@@ -37,6 +40,10 @@ class FuncSelector(object):
     # choices for mctype
     NVT = 'nvt'
     NPT = 'npt'
+    NVTPAR = 'nvtpar' # parallel (checkerboard) NVT
+    NPTPAR = 'nptpar' # parallel (checkerboard) NPT
+    ECMC = 'ecmc' # event-chain NVT (IPL and Gaussian only)
+    HMC = 'hmc' # hybrid NVT (short NVE trajectories)
     MD  = 'md'
     # choices for orderparam
     Q6 = 'q6global' # global Q6 of entire system
@@ -58,12 +65,27 @@ class FuncSelector(object):
     NOOP = 'noop'
     # the first on the list is taken as the default here (!)
     OPTIONS = {POTENTIAL : [LEN, GAUSS],
-               MCTYPE : [NVT, NPT, MD],
+               MCTYPE : [NVT, NPT, NVTPAR, NPTPAR, ECMC, HMC, MD],
                ORDERPARAM: [Q6, NTF, NLD, FRACTF, FRACLD, ALLFRACLD,
                             ALLFRAC, NONE],
-               WRITEXYZ: [TF, LD, NOOP]
+               WRITEXYZ: [TF, LD, NOOP],
+               OPINCREMENTAL: [False, True],
+               SIMSTATE: [False, True]
                }
 
+    # state of the Fortran MC code, kept between calls to the MC
+    # cycle function (see mccycle.SimState).  There is one per
+    # process, so this is shared by all instances.
+    simstate = None
+    # tabulated pair potential (see pottable.PotTable), used by the
+    # NVT and NPT MC cycle functions and total energy function if
+    # params['pottable'] is nonzero.  Like the simstate, this belongs
+    # to the Fortran module and is shared by all instances.
+    pottable = None
+    # cell order of the particles for the MC cycle functions (see
+    # mccycle.CellOrder), used if params['cellsort'] is nonzero
+    cellorder = None
+
     def __init__(self, params):
         self.store_input(params)
     
@@ -84,11 +106,41 @@ class FuncSelector(object):
                 cls.option[oname] = cls.OPTIONS[oname][0]
                 pass
 
+        # number of threads used by the C++ order parameter code
+        if 'opthreads' in params:
+            orderparam.setopthreads(params['opthreads'])
+
+        # the checkerboard (parallel) MC codes need cells of side rc
+        if ('cellsub' in params and
+            cls.option[cls.MCTYPE] not in [cls.NVTPAR, cls.NPTPAR]):
+            energy.setcellsub(params['cellsub'])
+
+        if cls.option[cls.SIMSTATE] and cls.simstate is None:
+            cls.simstate = mccycle.SimState(params['sameseed'])
+
+        if (params.get('cellsort', 0) and cls.cellorder is None and
+            cls.option[cls.MCTYPE] != cls.MD):
+            cls.cellorder = mccycle.CellOrder(params['cellsort'])
+
+        # the table is only used by the serial NVT and NPT MC codes
+        if (params.get('pottable', 0) and cls.pottable is None and
+            cls.option[cls.MCTYPE] in [cls.NVT, cls.NPT]):
+            # the surface field can only be used if the surface is
+            # fixed, i.e. not for NPT MC where it changes with the box
+            if cls.option[cls.MCTYPE] == cls.NVT:
+                surffield = params.get('surffield', 0.0)
+            else:
+                surffield = 0.0
+            cls.pottable = pottable.PotTable(params,
+                                             surffield=surffield)
+
     @classmethod
     def TotalEnergyFunc(cls):
         """Return function that evaluates total energy."""
         
-        if cls.option[cls.POTENTIAL] == cls.LEN:
+        if cls.pottable is not None:
+            return energy.tab_totalenlist
+        elif cls.option[cls.POTENTIAL] == cls.LEN:
             # this uses neighbour lists
             return energy.len_totalenlist
         elif cls.option[cls.POTENTIAL] == cls.GAUSS:
@@ -111,7 +163,44 @@ class FuncSelector(object):
     @classmethod
     def MCCycleFunc(cls):
         """Return function that computes an MC cycle."""
+
+        cyclefunc = cls._MCCycleFunc()
+        if cls.option[cls.MCTYPE] == cls.MD:
+            return cyclefunc
+
+        if cls.simstate is not None:
+            # let the Fortran code reuse its cell list if the positions
+            # are those it returned last time
+            def cycle_state(positions, params, etot):
+                cls.simstate.begin(positions)
+                positions, etot = cyclefunc(positions, params, etot)
+                cls.simstate.end(positions)
+                return positions, etot
+        else:
+            cycle_state = cyclefunc
+
+        if cls.cellorder is None:
+            return cycle_state
+
+        # give the MC code the particles in cell order; the simstate
+        # sees the sorted positions, so the cell list is still reused
+        def cycle_sorted(positions, params, etot):
+            positions = cls.cellorder.begin(positions, params)
+            positions, etot = cycle_state(positions, params, etot)
+            return cls.cellorder.end(positions, params), etot
+
+        return cycle_sorted
+
+    @classmethod
+    def _MCCycleFunc(cls):
+        """Return MC cycle function for the potential and mctype."""
         
+        if cls.pottable is not None:
+            # tabulated potential, same functions for all potentials
+            if cls.option[cls.MCTYPE] == cls.NPT:
+                return mccycle.tab_cyclenpt
+            if cls.option[cls.MCTYPE] == cls.NVT:
+                return mccycle.tab_cyclenvt
         if cls.option[cls.MCTYPE] == cls.NPT:
             # functions for NPT MC for each different potential            
             if cls.option[cls.POTENTIAL] == cls.LEN:
@@ -128,6 +217,36 @@ class FuncSelector(object):
                 return mccycle.gauss_cyclenvt
             elif cls.option[cls.POTENTIAL] == cls.IPL:
                 return mccycle.ipl_cyclenvt
+        if cls.option[cls.MCTYPE] == cls.NPTPAR:
+            # parallel (checkerboard) NPT MC
+            if cls.option[cls.POTENTIAL] == cls.LEN:
+                return mccycle.len_cyclenptpar
+            elif cls.option[cls.POTENTIAL] == cls.GAUSS:
+                return mccycle.gauss_cyclenptpar
+            elif cls.option[cls.POTENTIAL] == cls.IPL:
+                return mccycle.ipl_cyclenptpar
+        if cls.option[cls.MCTYPE] == cls.NVTPAR:
+            # parallel (checkerboard) NVT MC
+            if cls.option[cls.POTENTIAL] == cls.LEN:
+                return mccycle.len_cyclenvtpar
+            elif cls.option[cls.POTENTIAL] == cls.GAUSS:
+                return mccycle.gauss_cyclenvtpar
+            elif cls.option[cls.POTENTIAL] == cls.IPL:
+                return mccycle.ipl_cyclenvtpar
+        if cls.option[cls.MCTYPE] == cls.ECMC:
+            # event-chain NVT MC, for the purely repulsive potentials
+            if cls.option[cls.POTENTIAL] == cls.GAUSS:
+                return mccycle.gauss_cycleecmc
+            elif cls.option[cls.POTENTIAL] == cls.IPL:
+                return mccycle.ipl_cycleecmc
+        if cls.option[cls.MCTYPE] == cls.HMC:
+            # hybrid NVT MC
+            if cls.option[cls.POTENTIAL] == cls.LEN:
+                return mccycle.len_cyclehmc
+            elif cls.option[cls.POTENTIAL] == cls.GAUSS:
+                return mccycle.gauss_cyclehmc
+            elif cls.option[cls.POTENTIAL] == cls.IPL:
+                return mccycle.ipl_cyclehmc
         if cls.option[cls.MCTYPE] == cls.MD:
             # NVE MD is only available for Gaussian potential currently
             if cls.option[cls.POTENTIAL] == cls.GAUSS:
@@ -137,6 +256,24 @@ class FuncSelector(object):
     def OrderParamFunc(cls):
         """Return function that computes the order parameter."""
 
+        if cls.option[cls.OPINCREMENTAL]:
+            # these order parameters can reuse the neighbour lists
+            # and qlm values from the previous call
+            if cls.option[cls.ORDERPARAM] == cls.FRACLD:
+                return orderparam.fracld_state
+            elif cls.option[cls.ORDERPARAM] == cls.FRACTF:
+                return orderparam.fractf_state
+            elif cls.option[cls.ORDERPARAM] == cls.NCP:
+                return orderparam.ncluscpld_state
+            elif cls.option[cls.ORDERPARAM] == cls.NBCCNCP:
+                return orderparam.nclusbcld_state
+            elif cls.option[cls.ORDERPARAM] == cls.NLD:
+                return orderparam.nclusld_state
+            elif cls.option[cls.ORDERPARAM] == cls.NTF:
+                return orderparam.nclustf_state
+            elif cls.option[cls.ORDERPARAM] == cls.Q6:
+                return orderparam.q6global_state
+
         if cls.option[cls.ORDERPARAM] == cls.ALLVX:
             return orderparam.allvx
         if cls.option[cls.ORDERPARAM] == cls.ALLFRACLD:
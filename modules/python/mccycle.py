@@ -13,10 +13,154 @@ len_cyclenvt   - NVT MC for Lennard-Jones potential.
 len_cyclenpt   - NPT MC for Lennard-Jones potential.
 gauss_cyclenvt - NVT MC for Gaussian potential.
 gauss_cyclenpt - NPT MC for Gaussian potential.
+ipl_cyclenvtpar   - parallel (checkerboard) NVT MC for IPL potential.
+ipl_cyclenptpar   - parallel (checkerboard) NPT MC for IPL potential.
+len_cyclenvtpar   - parallel (checkerboard) NVT MC for Lennard-Jones potential.
+len_cyclenptpar   - parallel (checkerboard) NPT MC for Lennard-Jones potential.
+gauss_cyclenvtpar - parallel (checkerboard) NVT MC for Gaussian potential.
+gauss_cyclenptpar - parallel (checkerboard) NPT MC for Gaussian potential.
+ipl_cycleecmc     - event-chain NVT MC for IPL potential.
+gauss_cycleecmc   - event-chain NVT MC for Gaussian potential.
+ipl_cyclehmc      - hybrid NVT MC for IPL potential.
+len_cyclehmc      - hybrid NVT MC for Lennard-Jones potential.
+gauss_cyclehmc    - hybrid NVT MC for Gaussian potential.
 gauss_cyclemd  - NVE MD (not MC!) for Gaussian potential.
+tab_cyclenvt   - NVT MC for the tabulated potential.
+tab_cyclenpt   - NPT MC for the tabulated potential.
+cellorder      - permutation that puts the particles in cell order.
+
+CLASSES:
+SimState       - state of the Fortran MC code kept between calls.
+CellOrder      - keep the particles in cell order for the MC code.
 """
 
+import numpy as np
+
 import mcfuncs
+import pottable
+
+class SimState(object):
+    """
+    Handle for the state that the Fortran MC code keeps between calls
+    to the NVT and NPT cycle functions below: the cell list, the
+    random number generator, and the total numbers of attempted and
+    accepted moves (see modules/fortran/global/simstate.f90).  Once
+    this is created, the random number generator is seeded only once,
+    and the cell list is only rebuilt when it cannot be reused.  The
+    state belongs to the Fortran module, so there is one per process
+    and only one SimState should be created.
+    """
+
+    def __init__(self, sameseed=False):
+        mcfuncs.simstate.simstate_init(sameseed)
+        self.positions = None
+
+    def begin(self, positions):
+        """
+        Call before each call to a cycle function.  The stored cell
+        list can only be reused if positions is the array returned by
+        the previous call (it is not if, for example, an umbrella
+        sampling block has been rejected and the positions reverted).
+        """
+
+        if positions is not self.positions:
+            mcfuncs.simstate.simstate_invalidate()
+
+    def end(self, positions):
+        """Call with the positions returned by a cycle function."""
+
+        self.positions = positions
+
+    def movecounts(self):
+        """
+        Return total numbers of attempted and accepted displacement
+        moves, and attempted and accepted volume moves.
+        """
+
+        state = mcfuncs.simstate
+        return (int(state.natmovdisp), int(state.nacmovdisp),
+                int(state.natmovvol), int(state.nacmovvol))
+
+    def free(self):
+        """Stop keeping the state between calls."""
+
+        mcfuncs.simstate.simstate_free()
+        self.positions = None
+
+def _spreadbits(i):
+    """Spread the lowest 10 bits of i out to every third bit."""
+
+    i = (i | (i << 16)) & 0x030000FF
+    i = (i | (i << 8)) & 0x0300F00F
+    i = (i | (i << 4)) & 0x030C30C3
+    i = (i | (i << 2)) & 0x09249249
+    return i
+
+def cellorder(positions, params):
+    """
+    Return the permutation perm such that positions[perm] has the
+    fluid particles sorted by the cell of the Fortran cell list that
+    they are in (see getnumcells in modules/fortran/clist/clist.f90),
+    with the cells in Morton (Z-curve) order.  The surface particles
+    are left at the start, in their original order.  In cell order,
+    the particles in a cell are contiguous in memory, and those in
+    neighbouring cells are mostly nearby.
+    """
+
+    nsurf = params['nparsurf']
+    ncel = mcfuncs.getnumcells(params['lboxx'], params['lboxy'],
+                               params['lboxz'], params['rcut'])
+    lbox = np.array([params['lboxx'], params['lboxy'], params['lboxz']])
+    icel = (positions[nsurf:] * (np.array(ncel) / lbox)).astype(np.int64)
+    # particles outside the box in z (if not periodic) go in the end
+    # cells, as in the Fortran code
+    icel = np.clip(icel, 0, np.array(ncel) - 1)
+    key = (_spreadbits(icel[:,0]) | (_spreadbits(icel[:,1]) << 1) |
+           (_spreadbits(icel[:,2]) << 2))
+    return np.concatenate([np.arange(nsurf),
+                           nsurf + np.argsort(key, kind='mergesort')])
+
+class CellOrder(object):
+    """
+    Keep the particles in cell order (see cellorder above) for the
+    MC cycle functions, so that the Fortran code reads the positions
+    of neighbouring particles from nearby memory.  The cycle function
+    is given the positions in cell order, and the positions are put
+    back in the original order afterwards, so the order seen by the
+    rest of the code (the order parameter and the xyz files) does not
+    change.  The particles are sorted again after every nsort MC
+    cycles, or if the positions are not those returned last time.
+    """
+
+    def __init__(self, nsort):
+        self.nsort = nsort
+        # permutation from cell order to the original order, and the
+        # positions in both orders as returned last time
+        self.perm = None
+        self.positions = None
+        self.sorted = None
+        self.ncycle = 0
+
+    def begin(self, positions, params):
+        """Return the positions in cell order for the cycle function."""
+
+        if positions is not self.positions or self.ncycle >= self.nsort:
+            self.perm = cellorder(positions, params)
+            self.sorted = positions[self.perm]
+            self.ncycle = 0
+        return self.sorted
+
+    def end(self, positions, params):
+        """
+        Return the positions returned by the cycle function in the
+        original order.
+        """
+
+        self.ncycle += params['cycle']
+        self.sorted = positions
+        self.positions = np.empty_like(positions)
+        self.positions[self.perm] = positions
+        return self.positions
 
 def ipl_cyclenvt(positions, params, etot):
     """Performs the requested number of cycles of NVT MC."""
@@ -271,6 +415,502 @@ def gauss_cyclenpt(positions, params, etot):
 
     return positions, etot
 
+def ipl_cyclenvtpar(positions, params, etot):
+    """
+    Performs the requested number of cycles of NVT MC, in parallel
+    (checkerboard MC, see e.g. len_mccyclepar.f90).
+    """
+
+    # ncycle is the number of MC cycles we perform (one cycle consists
+    # of on average a single displacement move per moving particle).
+    ncycle = params['cycle']
+    nsamp = params['nsamp']
+    rc = params['rcut']
+    rcsq = params['rcsq']
+    vrc = params['vrc']
+    vrc2 = params['vrc2']
+    lboxx = params['lboxx']
+    lboxy = params['lboxy']
+    lboxz = params['lboxz']
+    epsovert = 1.0/params['Tstar']    
+    maxdisp = params['maxdisp']
+    nparsurf = params['nparsurf']
+    zperiodic = params['zperiodic']
+    potexponent = params['potexponent']
+    ss = params['sameseed']
+    nthreads = params['mcthreads']
+
+    # setup and call the fortran subroutine
+    xpos,ypos,zpos = positions[:,0],positions[:,1],positions[:,2]
+    xpos, ypos, zpos, etot  = mcfuncs.\
+                              ipl_executecyclesnvtpar(xpos, ypos, zpos,
+                                                      ncycle, nsamp,
+                                                      rc, rcsq, vrc,
+                                                      vrc2, lboxx, lboxy,
+                                                      lboxz, epsovert,
+                                                      maxdisp, nparsurf,
+                                                      zperiodic, ss,
+                                                      potexponent,
+                                                      nthreads, etot)
+    
+    positions[:,0], positions[:,1], positions[:,2] = xpos, ypos, zpos
+
+    return positions, etot
+
+def ipl_cyclenptpar(positions, params, etot):
+    """
+    Performs the requested number of cycles of NPT MC, in parallel
+    (checkerboard MC, see e.g. len_mccyclepar.f90).
+    """
+
+    # ncycle is the number of MC cycles we perform (one cycle consists
+    # of on average a single displacement move per moving particle AND
+    # a single volume move).
+    ncycle = params['cycle']
+    nsamp = params['nsamp']
+    rc = params['rcut']
+    rcsq = params['rcsq']
+    vrc = params['vrc']
+    vrc2 = params['vrc2']
+    lboxx = params['lboxx']
+    lboxy = params['lboxy']
+    lboxz = params['lboxz']
+    epsovert = 1.0/params['Tstar']    
+    maxdisp = params['maxdisp']
+    maxvol = params['maxvol']
+    nparsurf = params['nparsurf']
+    zperiodic = params['zperiodic']
+    potexponent = params['potexponent']
+    pressure = params['pressure']
+    ss = params['sameseed']
+    nthreads = params['mcthreads']
+
+    # setup and call the fortran subroutine
+    xpos, ypos, zpos = positions[:,0], positions[:,1], positions[:,2]
+    xpos,ypos,zpos,lx,ly,lz,etot  = mcfuncs.\
+                                    ipl_executecyclesnptpar(xpos, ypos,
+                                                            zpos,
+                                                            ncycle, nsamp,
+                                                            rc, rcsq, vrc,
+                                                            vrc2,
+                                                            pressure,
+                                                            lboxx, lboxy,
+                                                            lboxz, epsovert,
+                                                            maxdisp,
+                                                            maxvol,
+                                                            nparsurf,
+                                                            zperiodic, ss,
+                                                            potexponent,
+                                                            nthreads, etot)
+    # update box dimensions
+    params['lboxx'] = lx
+    params['lboxy'] = ly
+    params['lboxz'] = lz
+    positions[:,0], positions[:,1], positions[:,2] = xpos, ypos, zpos
+
+    return positions, etot
+
+def len_cyclenvtpar(positions, params, etot):
+    """
+    Performs the requested number of cycles of NVT MC, in parallel
+    (checkerboard MC, see e.g. len_mccyclepar.f90).
+    """
+
+    # ncycle is the number of MC cycles we perform (one cycle consists
+    # of on average a single displacement move per moving particle).
+    ncycle = params['cycle']
+    nsamp = params['nsamp']
+    rc = params['rcut']
+    rcsq = params['rcsq']
+    vrc = params['vrc']
+    vrc2 = params['vrc2']
+    lboxx = params['lboxx']
+    lboxy = params['lboxy']
+    lboxz = params['lboxz']
+    eps4 = 4.0/params['Tstar']    
+    maxdisp = params['maxdisp']
+    nparsurf = params['nparsurf']
+    zperiodic = params['zperiodic']
+    r6mult = params['r6mult']
+    r12mult = params['r12mult']
+    ss = params['sameseed']
+    nthreads = params['mcthreads']
+
+    # setup and call the fortran subroutine
+    xpos,ypos,zpos = positions[:,0],positions[:,1],positions[:,2]
+    xpos, ypos, zpos, etot  = mcfuncs.\
+                              len_executecyclesnvtpar(xpos, ypos, zpos,
+                                                      ncycle, nsamp,
+                                                      rc, rcsq, vrc,
+                                                      vrc2, lboxx, lboxy,
+                                                      lboxz, eps4,
+                                                      maxdisp, nparsurf,
+                                                      zperiodic, ss,
+                                                      r6mult, r12mult,
+                                                      nthreads, etot)
+    
+    positions[:,0], positions[:,1], positions[:,2] = xpos, ypos, zpos
+
+    return positions, etot
+
+def len_cyclenptpar(positions, params, etot):
+    """
+    Performs the requested number of cycles of NPT MC, in parallel
+    (checkerboard MC, see e.g. len_mccyclepar.f90).
+    """
+
+    # ncycle is the number of MC cycles we perform (one cycle consists
+    # of on average a single displacement move per moving particle AND
+    # a single volume move).
+    ncycle = params['cycle']
+    nsamp = params['nsamp']
+    rc = params['rcut']
+    rcsq = params['rcsq']
+    vrc = params['vrc']
+    vrc2 = params['vrc2']
+    lboxx = params['lboxx']
+    lboxy = params['lboxy']
+    lboxz = params['lboxz']
+    eps4 = 4.0/params['Tstar']    
+    maxdisp = params['maxdisp']
+    maxvol = params['maxvol']
+    nparsurf = params['nparsurf']
+    zperiodic = params['zperiodic']
+    r6mult = params['r6mult']
+    r12mult = params['r12mult']
+    pressure = params['pressure']
+    ss = params['sameseed']
+    nthreads = params['mcthreads']
+
+    # setup and call the fortran subroutine
+    xpos, ypos, zpos = positions[:,0], positions[:,1], positions[:,2]
+    xpos,ypos,zpos,lx,ly,lz,etot  = mcfuncs.\
+                                    len_executecyclesnptpar(xpos, ypos,
+                                                            zpos,
+                                                            ncycle, nsamp,
+                                                            rc, rcsq, vrc,
+                                                            vrc2,
+                                                            pressure,
+                                                            lboxx, lboxy,
+                                                            lboxz, eps4,
+                                                            maxdisp,
+                                                            maxvol,
+                                                            nparsurf,
+                                                            zperiodic, ss,
+                                                            r6mult,
+                                                            r12mult,
+                                                            nthreads, etot)
+    # update box dimensions
+    params['lboxx'] = lx
+    params['lboxy'] = ly
+    params['lboxz'] = lz
+    positions[:,0], positions[:,1], positions[:,2] = xpos, ypos, zpos
+
+    return positions, etot
+
+def gauss_cyclenvtpar(positions, params, etot):
+    """
+    Performs the requested number of cycles of NVT MC, in parallel
+    (checkerboard MC, see e.g. len_mccyclepar.f90).
+    """
+
+    # ncycle is the number of MC cycles we perform (one cycle consists
+    # of on average a single displacement move per moving particle).    
+    ncycle = params['cycle']
+    nsamp = params['nsamp']
+    rc = params['rcut']
+    rcsq = params['rcsq']
+    vrc = params['vrc']
+    vrc2 = params['vrc2']
+    lboxx = params['lboxx']
+    lboxy = params['lboxy']
+    lboxz = params['lboxz']
+    epsovert = 1.0/params['Tstar']    
+    maxdisp = params['maxdisp']
+    nparsurf = params['nparsurf']
+    zperiodic = params['zperiodic']
+    ss = params['sameseed']
+    nthreads = params['mcthreads']
+
+    # setup and call the fortran subroutine
+    xpos, ypos, zpos = positions[:,0], positions[:,1], positions[:,2]
+    xpos, ypos, zpos, etot  = mcfuncs.\
+                              gauss_executecyclesnvtpar(xpos, ypos, zpos,
+                                                        ncycle, nsamp,
+                                                        rc, rcsq, vrc,
+                                                        vrc2, lboxx,
+                                                        lboxy, lboxz,
+                                                        epsovert,
+                                                        maxdisp, nparsurf,
+                                                        zperiodic, ss,
+                                                        nthreads, etot)
+    positions[:,0], positions[:,1], positions[:,2] = xpos, ypos, zpos
+
+    return positions, etot
+
+def gauss_cyclenptpar(positions, params, etot):
+    """
+    Performs the requested number of cycles of NPT MC, in parallel
+    (checkerboard MC, see e.g. len_mccyclepar.f90).
+    """
+    
+    # ncycle is the number of MC cycles we perform (one cycle consists
+    # of on average a single displacement move per moving particle AND
+    # a single volume move).
+    ncycle = params['cycle']
+    nsamp = params['nsamp']
+    rc = params['rcut']
+    rcsq = params['rcsq']
+    vrc = params['vrc']
+    vrc2 = params['vrc2']
+    lboxx = params['lboxx']
+    lboxy = params['lboxy']
+    lboxz = params['lboxz']
+    epsovert = 1.0/params['Tstar']    
+    maxdisp = params['maxdisp']
+    maxvol = params['maxvol']
+    nparsurf = params['nparsurf']
+    zperiodic = params['zperiodic']
+    pressure = params['pressure']
+    ss = params['sameseed']
+    nthreads = params['mcthreads']
+
+    # setup and call the fortran subroutine
+    xpos, ypos, zpos = positions[:,0], positions[:,1], positions[:,2]
+    xpos, ypos, zpos, lx, ly, lz, \
+          etot  = mcfuncs.gauss_executecyclesnptpar(xpos, ypos, zpos,
+                                                    ncycle, nsamp, rc,
+                                                    rcsq, vrc, vrc2,
+                                                    pressure, lboxx,
+                                                    lboxy, lboxz,
+                                                    epsovert, maxdisp,
+                                                    maxvol, nparsurf,
+                                                    zperiodic, ss,
+                                                    nthreads, etot)
+    # update box dimensions
+    params['lboxx'] = lx
+    params['lboxy'] = ly
+    params['lboxz'] = lz
+    positions[:,0], positions[:,1], positions[:,2] = xpos, ypos, zpos
+
+    return positions, etot
+
+def ipl_cycleecmc(positions, params, etot):
+    """
+    Performs the requested number of cycles of event-chain NVT MC
+    (see modules/fortran/global/ecmc.f90).
+    """
+
+    # ncycle is the number of MC cycles we perform (one cycle consists
+    # of event chains of length ecmclength, with a total displacement
+    # of maxdisp per moving particle).
+    ncycle = params['cycle']
+    nsamp = params['nsamp']
+    rc = params['rcut']
+    rcsq = params['rcsq']
+    vrc = params['vrc']
+    vrc2 = params['vrc2']
+    lboxx = params['lboxx']
+    lboxy = params['lboxy']
+    lboxz = params['lboxz']
+    epsovert = 1.0/params['Tstar']
+    maxdisp = params['maxdisp']
+    chainlen = params['ecmclength']
+    nparsurf = params['nparsurf']
+    zperiodic = params['zperiodic']
+    potexponent = params['potexponent']
+    ss = params['sameseed']
+
+    # setup and call the fortran subroutine
+    xpos, ypos, zpos = positions[:,0], positions[:,1], positions[:,2]
+    xpos, ypos, zpos, etot  = mcfuncs.\
+                              ipl_executecyclesecmc(xpos, ypos, zpos,
+                                                    ncycle, nsamp,
+                                                    rc, rcsq, vrc,
+                                                    vrc2, lboxx, lboxy,
+                                                    lboxz, epsovert,
+                                                    maxdisp, chainlen,
+                                                    nparsurf,
+                                                    zperiodic, ss,
+                                                    potexponent,
+                                                    etot)
+    positions[:,0], positions[:,1], positions[:,2] = xpos, ypos, zpos
+
+    return positions, etot
+
+def gauss_cycleecmc(positions, params, etot):
+    """
+    Performs the requested number of cycles of event-chain NVT MC
+    (see modules/fortran/global/ecmc.f90).
+    """
+
+    # ncycle is the number of MC cycles we perform (one cycle consists
+    # of event chains of length ecmclength, with a total displacement
+    # of maxdisp per moving particle).
+    ncycle = params['cycle']
+    nsamp = params['nsamp']
+    rc = params['rcut']
+    rcsq = params['rcsq']
+    vrc = params['vrc']
+    vrc2 = params['vrc2']
+    lboxx = params['lboxx']
+    lboxy = params['lboxy']
+    lboxz = params['lboxz']
+    epsovert = 1.0/params['Tstar']
+    maxdisp = params['maxdisp']
+    chainlen = params['ecmclength']
+    nparsurf = params['nparsurf']
+    zperiodic = params['zperiodic']
+    ss = params['sameseed']
+
+    # setup and call the fortran subroutine
+    xpos, ypos, zpos = positions[:,0], positions[:,1], positions[:,2]
+    xpos, ypos, zpos, etot  = mcfuncs.\
+                              gauss_executecyclesecmc(xpos, ypos, zpos,
+                                                      ncycle, nsamp,
+                                                      rc, rcsq, vrc,
+                                                      vrc2, lboxx,
+                                                      lboxy, lboxz,
+                                                      epsovert,
+                                                      maxdisp, chainlen,
+                                                      nparsurf,
+                                                      zperiodic, ss,
+                                                      etot)
+    positions[:,0], positions[:,1], positions[:,2] = xpos, ypos, zpos
+
+    return positions, etot
+
+def ipl_cyclehmc(positions, params, etot):
+    """
+    Performs the requested number of cycles of hybrid NVT MC (see
+    modules/fortran/global/hmc.f90).
+    """
+
+    # ncycle is the number of MC cycles we perform (one cycle consists
+    # of a single hybrid MC move, an NVE trajectory of hmcsteps
+    # timesteps of length dt).
+    ncycle = params['cycle']
+    nsamp = params['nsamp']
+    rc = params['rcut']
+    rcsq = params['rcsq']
+    vrc = params['vrc']
+    vrc2 = params['vrc2']
+    lboxx = params['lboxx']
+    lboxy = params['lboxy']
+    lboxz = params['lboxz']
+    epsovert = 1.0/params['Tstar']
+    dt = params['dt']
+    mass = params['mass']
+    nsteps = params['hmcsteps']
+    nparsurf = params['nparsurf']
+    zperiodic = params['zperiodic']
+    potexponent = params['potexponent']
+    ss = params['sameseed']
+
+    # setup and call the fortran subroutine
+    xpos, ypos, zpos = positions[:,0], positions[:,1], positions[:,2]
+    xpos, ypos, zpos, etot  = mcfuncs.\
+                              ipl_executecycleshmc(xpos, ypos, zpos,
+                                                   ncycle, nsamp,
+                                                   rc, rcsq, vrc,
+                                                   vrc2, lboxx, lboxy,
+                                                   lboxz, epsovert,
+                                                   dt, mass, nsteps,
+                                                   nparsurf,
+                                                   zperiodic, ss,
+                                                   potexponent, etot)
+    positions[:,0], positions[:,1], positions[:,2] = xpos, ypos, zpos
+
+    return positions, etot
+
+def len_cyclehmc(positions, params, etot):
+    """
+    Performs the requested number of cycles of hybrid NVT MC (see
+    modules/fortran/global/hmc.f90).
+    """
+
+    # ncycle is the number of MC cycles we perform (one cycle consists
+    # of a single hybrid MC move, an NVE trajectory of hmcsteps
+    # timesteps of length dt).
+    ncycle = params['cycle']
+    nsamp = params['nsamp']
+    rc = params['rcut']
+    rcsq = params['rcsq']
+    vrc = params['vrc']
+    vrc2 = params['vrc2']
+    lboxx = params['lboxx']
+    lboxy = params['lboxy']
+    lboxz = params['lboxz']
+    eps4 = 4.0/params['Tstar']
+    dt = params['dt']
+    mass = params['mass']
+    nsteps = params['hmcsteps']
+    nparsurf = params['nparsurf']
+    zperiodic = params['zperiodic']
+    r6mult = params['r6mult']
+    r12mult = params['r12mult']
+    ss = params['sameseed']
+
+    # setup and call the fortran subroutine
+    xpos, ypos, zpos = positions[:,0], positions[:,1], positions[:,2]
+    xpos, ypos, zpos, etot  = mcfuncs.\
+                              len_executecycleshmc(xpos, ypos, zpos,
+                                                   ncycle, nsamp,
+                                                   rc, rcsq, vrc,
+                                                   vrc2, lboxx, lboxy,
+                                                   lboxz, eps4,
+                                                   dt, mass, nsteps,
+                                                   nparsurf,
+                                                   zperiodic, ss,
+                                                   r6mult, r12mult,
+                                                   etot)
+    positions[:,0], positions[:,1], positions[:,2] = xpos, ypos, zpos
+
+    return positions, etot
+
+def gauss_cyclehmc(positions, params, etot):
+    """
+    Performs the requested number of cycles of hybrid NVT MC (see
+    modules/fortran/global/hmc.f90).
+    """
+
+    # ncycle is the number of MC cycles we perform (one cycle consists
+    # of a single hybrid MC move, an NVE trajectory of hmcsteps
+    # timesteps of length dt).
+    ncycle = params['cycle']
+    nsamp = params['nsamp']
+    rc = params['rcut']
+    rcsq = params['rcsq']
+    vrc = params['vrc']
+    vrc2 = params['vrc2']
+    lboxx = params['lboxx']
+    lboxy = params['lboxy']
+    lboxz = params['lboxz']
+    epsovert = 1.0/params['Tstar']
+    dt = params['dt']
+    mass = params['mass']
+    nsteps = params['hmcsteps']
+    nparsurf = params['nparsurf']
+    zperiodic = params['zperiodic']
+    ss = params['sameseed']
+
+    # setup and call the fortran subroutine
+    xpos, ypos, zpos = positions[:,0], positions[:,1], positions[:,2]
+    xpos, ypos, zpos, etot  = mcfuncs.\
+                              gauss_executecycleshmc(xpos, ypos, zpos,
+                                                     ncycle, nsamp,
+                                                     rc, rcsq, vrc,
+                                                     vrc2, lboxx,
+                                                     lboxy, lboxz,
+                                                     epsovert, dt,
+                                                     mass, nsteps,
+                                                     nparsurf,
+                                                     zperiodic, ss,
+                                                     etot)
+    positions[:,0], positions[:,1], positions[:,2] = xpos, ypos, zpos
+
+    return positions, etot
+
 def gauss_cyclemd(positions, params, velocities, forces):
     """Performs the requested number of cycles of NVE MD (not MC!)."""
 
@@ -291,6 +931,7 @@ def gauss_cyclemd(positions, params, velocities, forces):
     mass = params['mass']
     vscale = params['vscale']
     temp = params['Tstar']
+    skin = params['mdskin']
 
     # setup and call the fortran subroutine
     xpos, ypos, zpos = positions[:,0], positions[:,1], positions[:,2]
@@ -309,10 +950,93 @@ def gauss_cyclemd(positions, params, velocities, forces):
                                                  mass,
                                                  nparsurf,
                                                  zperiodic,
-                                                 vscale, temp)
+                                                 vscale, temp, skin)
 
     positions[:,0], positions[:,1], positions[:,2] = xpos, ypos, zpos
     velocities[:,0], velocities[:,1], velocities[:,2] = xvel, yvel, zvel
     forces[:,0], forces[:,1], forces[:,2] = fx, fy, fz
 
     return positions, velocities, forces
+
+def tab_cyclenvt(positions, params, etot):
+    """
+    Performs the requested number of cycles of NVT MC, for the
+    tabulated potential (see pottable.py).
+    """
+
+    # ncycle is the number of MC cycles we perform (one cycle consists
+    # of on average a single displacement move per moving particle).
+    ncycle = params['cycle']
+    nsamp = params['nsamp']
+    rc = params['rcut']
+    rcsq = params['rcsq']
+    lboxx = params['lboxx']
+    lboxy = params['lboxy']
+    lboxz = params['lboxz']
+    epsovert, pressure = pottable.tableunits(params)
+    maxdisp = params['maxdisp']
+    nparsurf = params['nparsurf']
+    zperiodic = params['zperiodic']
+    ss = params['sameseed']
+
+    # setup and call the fortran subroutine
+    xpos, ypos, zpos = positions[:,0], positions[:,1], positions[:,2]
+    xpos, ypos, zpos, etot  = mcfuncs.\
+                              tab_executecyclesnvt(xpos, ypos, zpos,
+                                                   ncycle, nsamp,
+                                                   rc, rcsq, lboxx,
+                                                   lboxy, lboxz,
+                                                   epsovert,
+                                                   maxdisp, nparsurf,
+                                                   zperiodic, ss,
+                                                   etot)
+    positions[:,0], positions[:,1], positions[:,2] = xpos, ypos, zpos
+
+    return positions, etot
+
+def tab_cyclenpt(positions, params, etot):
+    """
+    Performs the requested number of cycles of NPT MC, for the
+    tabulated potential (see pottable.py).
+    """
+
+    # ncycle is the number of MC cycles we perform (one cycle consists
+    # of on average a single displacement move per moving particle AND
+    # a single volume move).
+    ncycle = params['cycle']
+    nsamp = params['nsamp']
+    rc = params['rcut']
+    rcsq = params['rcsq']
+    lboxx = params['lboxx']
+    lboxy = params['lboxy']
+    lboxz = params['lboxz']
+    # epsilon/kT and the pressure in the energy units of the table
+    epsovert, pressure = pottable.tableunits(params)
+    maxdisp = params['maxdisp']
+    maxvol = params['maxvol']
+    nparsurf = params['nparsurf']
+    zperiodic = params['zperiodic']
+    ss = params['sameseed']
+    # as in gauss_cyclenpt, a seed of surface particles in a periodic
+    # box is not scaled by the volume moves
+    fixsurf = (params['potential'] == 'gauss' and zperiodic and
+               nparsurf > 0)
+
+    # setup and call the fortran subroutine
+    xpos, ypos, zpos = positions[:,0], positions[:,1], positions[:,2]
+    xpos, ypos, zpos, lx, ly, lz, \
+          etot  = mcfuncs.tab_executecyclesnpt(xpos, ypos, zpos,
+                                               ncycle, nsamp, rc,
+                                               rcsq, pressure, lboxx,
+                                               lboxy, lboxz,
+                                               epsovert, maxdisp,
+                                               maxvol, nparsurf,
+                                               zperiodic, fixsurf, ss,
+                                               etot)
+    # update box dimensions
+    params['lboxx'] = lx
+    params['lboxy'] = ly
+    params['lboxz'] = lz
+    positions[:,0], positions[:,1], positions[:,2] = xpos, ypos, zpos
+
+    return positions, etot
@@ -9,12 +9,12 @@ implemented in orderparam.py .
 FUNCTIONS:
 clusnums        - Indices of particles in the largest cluster according
                   to TF criterion.
-ldclass         - List of particle classifications according to LD method.
+ldclass         - Array of particle classifications according to LD method.
 ldclusnums      - Indices of particles in the largest cluster according
                   to LD criterion.
 q4w4q6w6        - Return q4bar, w4bar, q6bar, w6bar (the Lechner Dellago
                   versions) for all particles.
-tfclass         - List of particle classifications according to TF method.                  
+tfclass         - Array of particle classifications according to TF method.                  
 // FUNCTIONS FOR USE WITH FORTRAN EXTENSION MODULE (DEPRECATED)
 getxpars        - Return array of particle numbers that are xtal,
                   according to local bond order parameters.
@@ -35,15 +35,14 @@ def clusnums(cpositions, params):
     if cpositions.shape == (0,):
         return []
     
-    return mcfuncs.largestcluster(cpositions[:,0], cpositions[:,1],
-                                  cpositions[:,2], len(cpositions),
+    return mcfuncs.largestcluster(cpositions, len(cpositions),
                                   params['lboxx'], params['lboxy'],
                                   params['lboxz'], params['zperiodic'],
                                   params['stillsep'])
 
 
 def ldclass(positions, params):
-    """Return list of particle classifications according to LD method."""
+    """Return array of particle classifications according to LD method."""
     
     npar = params['npartot']
     nsep = params['stillsep']
@@ -51,8 +50,7 @@ def ldclass(positions, params):
     zperiodic = params['zperiodic']
     usenearest = params['usenearest']
 
-    parclass = mcfuncs.ldclass(positions[:,0], positions[:,1],
-                               positions[:,2], npar, nparsurf,
+    parclass = mcfuncs.ldclass(positions, npar, nparsurf,
                                params['lboxx'], params['lboxy'],
                                params['lboxz'], zperiodic, nsep,
                                usenearest)
@@ -86,27 +84,20 @@ def q4w4q6w6(positions, params):
     """Return LD order parameters."""
 
     ntot = params['npartot']
-    q4w4q6w6 =  mcfuncs.q4w4q6w6(positions[:,0], positions[:,1],
-                                 positions[:,2], ntot,
+    q4w4q6w6 =  mcfuncs.q4w4q6w6(positions, ntot,
                                  params['nparsurf'],
                                  params['lboxx'], params['lboxy'],
                                  params['lboxz'], params['zperiodic'],
                                  params['stillsep'],
                                  params['usenearest'])
 
-    # the C++ function returns a long list with q4 values followed by
-    # w4 values followed by q6values followed by w6 values.  Split
-    # this up here and return four lists.
-    q4 = q4w4q6w6[:ntot]
-    w4 = q4w4q6w6[ntot:2*ntot]
-    q6 = q4w4q6w6[2*ntot:3*ntot]
-    w6 = q4w4q6w6[3*ntot:4*ntot]
-
-    return np.array(q4), np.array(w4), np.array(q6), np.array(w6)
+    # the C++ function returns a (4, ntot) array with rows q4, w4, q6
+    # and w6.
+    return q4w4q6w6[0], q4w4q6w6[1], q4w4q6w6[2], q4w4q6w6[3]
 
 
 def tfclass(positions, params):
-    """Return list of particle classifications according to TF method."""
+    """Return array of particle classifications according to TF method."""
     
     npar = params['npartot']
     nsep = params['stillsep']
@@ -116,8 +107,7 @@ def tfclass(positions, params):
     minlinks = params['q6numlinks']
     usenearest = params['usenearest']
 
-    parclass = mcfuncs.tfclass(positions[:,0], positions[:,1],
-                               positions[:,2], npar, nparsurf,
+    parclass = mcfuncs.tfclass(positions, npar, nparsurf,
                                params['lboxx'], params['lboxy'],
                                params['lboxz'], zperiodic, nsep,
                                minlinks, thresh, usenearest)
@@ -125,10 +115,9 @@ def tfclass(positions, params):
 
 
 def numneighcut(positions, params):
-    """Return list of number of neighbours of each particle."""
+    """Return array of number of neighbours of each particle."""
 
-    nn = mcfuncs.numneighcut(positions[:,0], positions[:,1],
-                             positions[:,2], params['npartot'],
+    nn = mcfuncs.numneighcut(positions, params['npartot'],
                              params['lboxx'],
                              params['lboxy'],
                              params['lboxz'],
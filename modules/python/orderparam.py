@@ -29,6 +29,14 @@ nclusld_cpp     - Number of particles in largest cluster according to LD
 nclustf_cpp     - Number of particles in largest cluster according to TF
                   criterion.
 q6global_cpp    - Global Q6 of the system.
+batchop         - Order parameter of each of a stack of configurations.
+setopthreads    - Set number of threads used by the C++ extension module.
+
+The functions with the suffix _state (e.g. nclusld_state) compute the
+same order parameters as the corresponding _cpp functions, but keep
+the neighbour lists and qlm values of the previous configuration
+between calls (see modules/cpp/ops/opstate.h), so that only particles
+that have moved by more than params['optol'] are recomputed.
 """
 
 import numpy as np
@@ -50,6 +58,27 @@ TFLIQ = 0
 TFXTAL = 1
 TFSURF = 2
 
+# OrderParamState objects used by the _state functions, keyed by the
+# parameters that define the neighbour lists.
+_OPSTATES = {}
+
+def _getopstate(params):
+    """Return OrderParamState object for the given parameters."""
+
+    key = (params['stillsep'], params['zperiodic'], params['usenearest'],
+           params['optol'])
+    if key not in _OPSTATES:
+        _OPSTATES[key] = mcfuncs.OrderParamState(*key)
+    return _OPSTATES[key]
+
+def setopthreads(nthreads):
+    """
+    Set number of (OpenMP) threads used for computing the order
+    parameter.  If nthreads is 0, one thread per processor is used.
+    """
+
+    mcfuncs.setopthreads(nthreads)
+
 def stringify(op):
     """Return OP tuple as a string for writing to file."""
 
@@ -94,8 +123,7 @@ def fracld_cpp(positions, params):
     minlinks = params['q6numlinks']
     usenearest = params['usenearest']
 
-    frac = mcfuncs.fracsolidld(positions[:,0], positions[:,1],
-                               positions[:,2], npar, nparsurf,
+    frac = mcfuncs.fracsolidld(positions, npar, nparsurf,
                                params['lboxx'], params['lboxy'],
                                params['lboxz'], zperiodic, nsep,
                                usenearest)
@@ -117,8 +145,7 @@ def fractf_cpp(positions, params):
     minlinks = params['q6numlinks']
     usenearest = params['usenearest']
 
-    nclus = mcfuncs.fracsolidtf(positions[:,0], positions[:,1],
-                                positions[:,2], npar, nparsurf,
+    nclus = mcfuncs.fracsolidtf(positions, npar, nparsurf,
                                 params['lboxx'], params['lboxy'],
                                 params['lboxz'], zperiodic, nsep,
                                 minlinks, thresh, usenearest)
@@ -139,8 +166,7 @@ def _ncluspolyld_cpp(positions, params):
     minlinks = params['q6numlinks']
     usenearest = params['usenearest']
 
-    npoly = mcfuncs.ncluspolyld(positions[:,0], positions[:,1],
-                                positions[:,2], npar, nparsurf,
+    npoly = mcfuncs.ncluspolyld(positions, npar, nparsurf,
                                 params['lboxx'], params['lboxy'],
                                 params['lboxz'], zperiodic, nsep,
                                 usenearest)
@@ -177,9 +203,9 @@ def nclusallcpld_cpp(positions, params):
     packed (nb this is different to ncluscpld_cpp).
     """
 
-    # get classification of all particles as np array so we can do
-    # clever manipulations
-    pclass = np.array(orderfuncs.ldclass(positions, params), dtype='int')
+    # get classification of all particles (this is a numpy array, so
+    # we can do clever manipulations)
+    pclass = orderfuncs.ldclass(positions, params)
 
     cpclass = (pclass == LDFCC) + (pclass == LDHCP)
     npar = int(sum(cpclass)) # number of fcc or hcp particles
@@ -187,8 +213,7 @@ def nclusallcpld_cpp(positions, params):
     nsep = params['stillsep']
 
     # get indices of particles in largest cluster
-    clusnums = mcfuncs.largestcluster(positions[cpclass, 0], positions[cpclass, 1],
-                                      positions[cpclass, 2], npar,
+    clusnums = mcfuncs.largestcluster(positions[cpclass], npar,
                                       params['lboxx'], params['lboxy'],
                                       params['lboxz'], zperiodic, nsep)
     return (len(clusnums),)
@@ -206,8 +231,7 @@ def nclusld_cpp(positions, params):
     nsep = params['stillsep']
     usenearest = params['usenearest']
 
-    nclus = mcfuncs.nclusld(positions[:,0], positions[:,1],
-                            positions[:,2], npar, nparsurf,
+    nclus = mcfuncs.nclusld(positions, npar, nparsurf,
                             params['lboxx'], params['lboxy'],
                             params['lboxz'], zperiodic, nsep,
                             usenearest)
@@ -229,8 +253,7 @@ def nclustf_cpp(positions, params):
     minlinks = params['q6numlinks']
     usenearest = params['usenearest']
 
-    nclus = mcfuncs.nclustf(positions[:,0], positions[:,1],
-                            positions[:,2], npar, nparsurf,
+    nclus = mcfuncs.nclustf(positions, npar, nparsurf,
                             params['lboxx'], params['lboxy'],
                             params['lboxz'], zperiodic, nsep,
                             minlinks, thresh, usenearest)
@@ -252,10 +275,126 @@ def q6global_cpp(positions, params):
     minlinks = params['q6numlinks']
     usenearest = params['usenearest']
 
-    q6 = mcfuncs.q6global(positions[:,0], positions[:,1],
-                          positions[:,2], npar, nparsurf,
+    q6 = mcfuncs.q6global(positions, npar, nparsurf,
                           params['lboxx'], params['lboxy'],
                           params['lboxz'], zperiodic, nsep,
                           usenearest)
 
     return (q6,)
+
+
+def fracld_state(positions, params):
+    """Same as fracld_cpp, but using the stored OrderParamState."""
+
+    frac = _getopstate(params).fracsolidld(positions, params['npartot'],
+                                           params['nparsurf'],
+                                           params['lboxx'], params['lboxy'],
+                                           params['lboxz'])
+    return (frac,)
+
+
+def fractf_state(positions, params):
+    """Same as fractf_cpp, but using the stored OrderParamState."""
+
+    frac = _getopstate(params).fracsolidtf(positions, params['npartot'],
+                                           params['nparsurf'],
+                                           params['lboxx'], params['lboxy'],
+                                           params['lboxz'],
+                                           params['q6numlinks'],
+                                           params['q6link'])
+    return (frac,)
+
+
+def _ncluspolyld_state(positions, params):
+    """Same as _ncluspolyld_cpp, but using the stored OrderParamState."""
+
+    npoly = _getopstate(params).ncluspolyld(positions, params['npartot'],
+                                            params['nparsurf'],
+                                            params['lboxx'], params['lboxy'],
+                                            params['lboxz'])
+    return npoly
+
+
+def nclusbcld_state(positions, params):
+    """Same as nclusbcld_cpp, but using the stored OrderParamState."""
+
+    npoly = _ncluspolyld_state(positions, params)
+
+    return (npoly[LDBCC], npoly[LDFCC] + npoly[LDHCP])
+
+
+def ncluscpld_state(positions, params):
+    """Same as ncluscpld_cpp, but using the stored OrderParamState."""
+
+    npoly = _ncluspolyld_state(positions, params)
+
+    return (npoly[LDFCC] + npoly[LDHCP],)
+
+
+def nclusld_state(positions, params):
+    """Same as nclusld_cpp, but using the stored OrderParamState."""
+
+    nclus = _getopstate(params).nclusld(positions, params['npartot'],
+                                        params['nparsurf'], params['lboxx'],
+                                        params['lboxy'], params['lboxz'])
+    return (nclus,)
+
+
+def nclustf_state(positions, params):
+    """Same as nclustf_cpp, but using the stored OrderParamState."""
+
+    nclus = _getopstate(params).nclustf(positions, params['npartot'],
+                                        params['nparsurf'], params['lboxx'],
+                                        params['lboxy'], params['lboxz'],
+                                        params['q6numlinks'],
+                                        params['q6link'])
+    return (nclus,)
+
+
+def q6global_state(positions, params):
+    """Same as q6global_cpp, but using the stored OrderParamState."""
+
+    q6 = _getopstate(params).q6global(positions, params['npartot'],
+                                      params['nparsurf'], params['lboxx'],
+                                      params['lboxy'], params['lboxz'])
+    return (q6,)
+
+
+# order parameters that can be computed by batchop: for each, the name
+# of the C++ function and the columns of its result that make up the
+# order parameter tuple (None for all of them)
+_BATCHOPS = {'q6global': ('q6global', None),
+             'nclusld': ('nclusld', None),
+             'nclustf': ('nclustf', None),
+             'fracld': ('fracsolidld', None),
+             'fractf': ('fracsolidtf', None),
+             'ncluscpld': ('ncluspolyld', [[LDFCC, LDHCP]]),
+             'nclusbcld': ('ncluspolyld', [[LDBCC], [LDFCC, LDHCP]])}
+
+def batchop(positions, boxes, params, opname):
+    """
+    Order parameter of each of a stack of M configurations, computed
+    in a single call to the C++ extension module (which divides the
+    configurations between threads, see params['opthreads']).
+
+    positions is an (M, npartot, 3) array, and boxes an (M, 3) array
+    of the box dimensions of each configuration.  opname is the name
+    of the order parameter, which is the name of one of the _cpp
+    functions above without the suffix, e.g. 'nclusld' (see _BATCHOPS
+    for those available).  Returns an (M, k) array, row i of which is
+    the order parameter tuple for configuration i.
+    """
+
+    try:
+        cppname, cols = _BATCHOPS[opname]
+    except KeyError:
+        raise ValueError('batchop not available for {0}'.format(opname))
+
+    res = mcfuncs.batchop(positions, boxes, params['npartot'],
+                          params['nparsurf'], params['zperiodic'],
+                          params['stillsep'], params['usenearest'],
+                          params['q6numlinks'], params['q6link'], cppname)
+    if cols is None:
+        return res
+    # sum the numbers of particles of the polymorphs we want
+    return np.column_stack([res[:, c].sum(axis=1) for c in cols])
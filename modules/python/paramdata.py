@@ -71,6 +71,36 @@ PDICT = {# simulation params
          'maxdisp': FLOAT,
          'maxvol': FLOAT,
          'sameseed': BOOL,
+         # keep the cell list and random number generator of the
+         # Fortran code between calls to the MC cycle function
+         'simstate': BOOL,
+         # seed for the counter-based random number streams (see
+         # rng.py); if 0, the usual random number generators are used
+         'rngseed': INT,
+         # number of threads for parallel MC (mctype nvtpar or
+         # nptpar); 0 for one thread per processor
+         'mcthreads': INT,
+         # number of points in the table of the pair potential (see
+         # pottable.py), used instead of the analytic potential for NVT
+         # and NPT MC; if 0, the analytic potential is used
+         'pottable': INT,
+         # grid spacing of the external field that replaces the
+         # surface particles for NVT MC with the tabulated potential;
+         # if 0, the surface particles are treated as usual
+         'surffield': FLOAT,
+         # number of cells per cutoff in each dimension of the cell
+         # lists (1 to 3); more cells means fewer pairs tested, which
+         # is faster for dense systems.  Not used for parallel MC.
+         'cellsub': INT,
+         # number of MC cycles between sorting the particles into the
+         # order of the cells they are in, for faster access to the
+         # positions of neighbours (see mccycle.CellOrder); if 0, the
+         # particles are not sorted
+         'cellsort': INT,
+         # length of each event chain for event-chain MC (mctype
+         # ecmc); a cycle has enough chains to move each particle
+         # maxdisp on average
+         'ecmclength': FLOAT,
 
          # parameters for saving
          'nsave': INT,
@@ -83,6 +113,14 @@ PDICT = {# simulation params
          'q6link': FLOAT,
          'q6numlinks': INT,
          'usenearest': BOOL,
+         # keep neighbour lists and qlm values between order
+         # parameter evaluations, recomputing only for particles that
+         # have moved more than optol
+         'opincremental': BOOL,
+         'optol': FLOAT,
+         # number of threads used for computing the order parameter
+         # (0 for one thread per processor)
+         'opthreads': INT,
 
          # FFS params
          'useffs': BOOL,
@@ -98,6 +136,12 @@ PDICT = {# simulation params
          'lambdasamp': INT,
          'pruning': BOOL,
          'prunprob': FLOAT,
+         # number of worker processes for codeffslocal.py (0 means
+         # one per CPU)
+         'nprocs': INT,
+         # abort running shots of the extra batches once there are
+         # minsuccess successful shots at the interface
+         'earlystop': BOOL,
 
          # overrides (useful when be have surface particles)
          'o_zperiodic': BOOL,
@@ -108,13 +152,28 @@ PDICT = {# simulation params
          'dt': FLOAT,
          'mass': FLOAT,
          'vscale': BOOL,
+         # skin of the Verlet list used for the forces (if 0, the cell
+         # list is rebuilt every timestep instead)
+         'mdskin': FLOAT,
+         # number of timesteps (of length dt) in the trajectory of a
+         # hybrid MC move (mctype hmc)
+         'hmcsteps': INT,
 
          # umbrella paramaters
          'nunbiased': INT,
          'numbrellacycles': INT,
          'umb_centre': FLOATLIST,
+         # index of the window (set by wumbrella.py), which gives the
+         # random number stream of the window (see rng.py)
+         'umb_window': INT,
          'k': FLOATLIST,
          'umbequilcycles': INT,
+         # number of biased blocks between exchanges of configurations
+         # between neighbouring windows (reumbrella.py)
+         'umbexchangecycles': INT,
+         # number of cycles done by a run of reumbrella.py that is
+         # being continued with simulation 'restart'
+         'umbcyclesdone': INT,
 
          # window parameters
          'numwindows': INTLIST,
@@ -136,9 +195,25 @@ DEFAULTS = {
     'mctype': 'nvt',
     'sameseed': 'no',
     'usenearest': 'yes',
+    'opincremental': 'no',
+    'optol': '0.0',
+    'opthreads': '1',
+    'simstate': 'yes',
+    'rngseed': '0',
+    'mcthreads': '0',
+    'pottable': '0',
+    'surffield': '0.0',
+    'cellsub': '1',
+    'cellsort': '0',
+    'ecmclength': '1.0',
     'surface' : 'no',
     'nsamp' : '1000',
     'nsave' : '1000',
+    'nprocs' : '0',
+    'earlystop' : 'no',
+    'mdskin' : '0.0',
+    'mass' : '1.0',
+    'hmcsteps' : '10',
 
     # umbrella sampling
     'firstwindow': '0.0',
@@ -153,7 +228,10 @@ DEFAULTS = {
     'seedform': 'sc',
     'seedgencorrection': '1.0',
     'umb_centre': '0.0',
+    'umb_window': '0',
     'umbequilcycles': '0',
+    'umbexchangecycles': '10',
+    'umbcyclesdone': '0',
     'nparseed': '0',
 
     # legacy surface parameters
@@ -0,0 +1,96 @@
+# pottable.py
+# James Mithen
+# j.mithen@surrey.ac.uk
+
+"""
+Tabulated pair potential for the tab_* Fortran functions (see
+modules/fortran/global/pottable.f90).  The pair energy of the chosen
+potential is computed here on an equally spaced grid in r^2, and the
+Fortran code interpolates it with a cubic spline, so that the same MC
+code is used for every potential.  The energies are in the units used
+by the analytic Fortran code for that potential, i.e. 4eps for
+Lennard-Jones and eps for the Gaussian and IPL potentials.  The
+interaction of the fluid with a fixed surface can also be replaced by
+an external field computed from the table (see
+modules/fortran/global/extfield.f90).
+
+FUNCTIONS:
+pairenergies - fluid-fluid and fluid-surface pair energies at given r^2.
+tableunits   - epsilon/kT and pressure in the units of the table.
+
+CLASSES:
+PotTable     - the table used by the Fortran code.
+"""
+
+import numpy as np
+
+import mcfuncs
+
+# smallest r^2 in the table; for r^2 below this the energy at this r^2
+# is used.  For the Lennard-Jones and IPL potentials the energy at
+# r = 0.5 is so large that such moves are always rejected.
+R2MIN = {'len': 0.25, 'gauss': 0.0, 'ipl': 0.25}
+
+def pairenergies(r2, params):
+    """
+    Return the fluid-fluid and fluid-surface pair energies at the
+    squared separations r2, including the shift at the cutoff.
+    """
+
+    potential = params['potential']
+    if potential == 'len':
+        r6i = 1.0 / r2**3
+        r12i = r6i**2
+        eff = r12i - r6i - params['vrc']
+        efs = (params['r12mult'] * r12i - params['r6mult'] * r6i
+               - params['vrc2'])
+    elif potential == 'gauss':
+        eff = np.exp(-r2) - params['vrc']
+        efs = np.exp(-r2) - params['vrc2']
+    elif potential == 'ipl':
+        rni = 1.0 / r2**(0.5 * params['potexponent'])
+        eff = rni - params['vrc']
+        efs = rni - params['vrc2']
+    return eff, efs
+
+def tableunits(params):
+    """
+    Return epsilon/kT and the pressure in the energy units of the
+    table, as needed by the tab_* MC cycle functions.
+    """
+
+    epsovert = 1.0 / params['Tstar']
+    pressure = params.get('pressure', 0.0)
+    if params['potential'] == 'len':
+        # the table is in units of 4eps
+        return 4.0 * epsovert, 0.25 * pressure
+    return epsovert, pressure
+
+class PotTable(object):
+    """
+    The pair potential table of the Fortran code.  As with the
+    simulation state (see mccycle.SimState), the table belongs to the
+    Fortran module, so there is one per process, and creating a
+    PotTable replaces the previous table.  If surffield is nonzero,
+    the surface field is used too, with this grid spacing; the field
+    is built from the surface positions when it is first needed, so
+    it must only be used if the surface never moves (NVT MC).
+    """
+
+    def __init__(self, params, ntab=None, surffield=0.0):
+        if ntab is None:
+            ntab = params['pottable']
+        self.ntab = ntab
+        self.r2min = R2MIN[params['potential']]
+        self.r2max = params['rcsq']
+        r2 = np.linspace(self.r2min, self.r2max, ntab)
+        eff, efs = pairenergies(r2, params)
+        mcfuncs.pottable.pottable_set(self.r2min, self.r2max, eff, efs)
+        self.surffield = surffield
+        mcfuncs.extfield.extfield_set(surffield)
+
+    def free(self):
+        """Free the table and the surface field."""
+
+        mcfuncs.pottable.pottable_free()
+        mcfuncs.extfield.extfield_set(0.0)
@@ -0,0 +1,111 @@
+# rng.py
+# James Mithen
+# j.mithen@surrey.ac.uk
+
+"""
+Counter-based random number streams (Philox4x32-10), shared by the
+Fortran MC code and the Python drivers.  A stream is determined by
+the run seed params['rngseed'] and two integers, e.g. the FFS
+interface and shot number, so that every shot gets its own
+independent stream whichever process runs it, and the whole run can
+be repeated exactly.  FFS shots from interface i use stream i + 1,
+umbrella sampling windows use stream WINDOWSTREAM (with the window
+index params['umb_window'] as the shot number), and direct
+simulation (code.py) uses stream DIRECTSTREAM.  In reumbrella.py,
+a round of blocks that starts after b blocks uses stream b + 1 (with
+the window index as the shot number), and the exchanges use stream
+0.  The generator is the same as in modules/fortran/global/rng.f90:
+the Fortran code uses the numbers with sub = 0 and the Python code
+those with sub = 1.
+
+FUNCTIONS:
+philox           - Philox4x32-10 block function.
+setstreams       - set the streams for the Fortran and Python code.
+setwindowstreams - set the streams for an umbrella sampling window.
+
+CLASSES:
+RandomStream - stream of uniform random numbers for the Python code.
+"""
+
+import numpy as np
+
+import mcfuncs
+
+_MASK32 = 0xffffffff
+_M0 = 0xD2511F53
+_M1 = 0xCD9E8D57
+_W0 = 0x9E3779B9
+_W1 = 0xBB67AE85
+
+# streams of the umbrella sampling windows and of direct simulation
+# (the latter is never used by an FFS interface or a window)
+WINDOWSTREAM = 0
+DIRECTSTREAM = _MASK32
+
+def philox(ctr, key):
+    """
+    Return the four 32 bit random integers for the counter ctr (four
+    32 bit integers) and key (two 32 bit integers).
+    """
+
+    c0, c1, c2, c3 = ctr
+    k0, k1 = key
+    for r in range(10):
+        if r > 0:
+            k0 = (k0 + _W0) & _MASK32
+            k1 = (k1 + _W1) & _MASK32
+        p0 = _M0 * c0
+        p1 = _M1 * c2
+        c0, c1, c2, c3 = (((p1 >> 32) ^ c1 ^ k0), p1 & _MASK32,
+                          ((p0 >> 32) ^ c3 ^ k1), p0 & _MASK32)
+    return c0, c1, c2, c3
+
+class RandomStream(object):
+    """
+    Stream of uniform random numbers in (0,1), the same as would be
+    produced by the Fortran code after rng_setstream(seed, stream,
+    shot, sub).
+    """
+
+    def __init__(self, seed, stream, shot, sub=1):
+        self.key = (seed & _MASK32, sub & _MASK32)
+        self.stream = stream & _MASK32
+        self.shot = shot & _MASK32
+        self.block = 0
+        self.buf = []
+
+    def rand(self):
+        """Return the next random number of the stream."""
+
+        if not self.buf:
+            ctr = (self.block & _MASK32, (self.block >> 32) & _MASK32,
+                   self.stream, self.shot)
+            self.buf = [(i + 0.5) * 2.0**-32 for i in
+                        reversed(philox(ctr, self.key))]
+            self.block += 1
+        return self.buf.pop()
+
+def setstreams(params, stream, shot):
+    """
+    If params['rngseed'] is non-zero, set the stream used by the
+    Fortran MC code to the one for (rngseed, stream, shot), and return
+    the rand method of the corresponding stream for the Python code.
+    Otherwise, the Fortran code uses its usual generator, and
+    np.random.rand is returned.
+    """
+
+    seed = params.get('rngseed', 0)
+    if not seed:
+        mcfuncs.rng.rng_unsetstream()
+        return np.random.rand
+    mcfuncs.rng.rng_setstream(seed, stream, shot, 0)
+    return RandomStream(seed, stream, shot).rand
+
+def setwindowstreams(params):
+    """
+    Set the streams for the umbrella sampling window with index
+    params['umb_window'] (see setstreams), so that every window has
+    its own stream.
+    """
+
+    return setstreams(params, WINDOWSTREAM, params.get('umb_window', 0))
@@ -96,7 +96,7 @@ def _get_box_kwargs(params):
     This is used so that we can write box dimensions to the XYZ file.
     """
 
-    if params['mctype'] == 'npt':
+    if params['mctype'] in ['npt', 'nptpar']:
         return {'boxdims': [params['lboxx'], params['lboxy'],
                             params['lboxz']]}
     return {}
@@ -10,9 +10,6 @@ Allen, Valerani, ten Wolde J. Phys. Condens. matter 21, 463102.
 
 import sys
 import os
-import numpy as np
-import funcselector
-import readwrite
 from ffsfunctions import *
 
 # get command line arguments and complain if not right. We expect at
@@ -22,7 +19,10 @@ from ffsfunctions import *
 # already have minsuccess successful shots at this interface, and
 # terminate immediately if so (the latter functionality is provided so
 # that we can kill an entire 'batch' of shots, so codeffs.py for more
-# details).
+# details).  If the parameter 'earlystop' is set, the number of
+# successful shots is also checked between each block of lambdasamp
+# cycles, and a shot of an extra batch is aborted once there are
+# minsuccess of them (shots of the first batch are never aborted).
 
 argc = len(sys.argv)
 if (argc != 2 and argc != 3):
@@ -45,71 +45,11 @@ if argc == 3:
 # the (chunky) Sun Grid Engine manual for more info!
 myjobnm = int(os.environ['SGE_TASK_ID'])
 
-# get shot dictionary from previous interface.  The shot dictionary
-# stores the number of successful shots and their numbers (and some
-# other stuff), which allows us to pick an initial configuration for
-# the current shot.
-shotdict = getshotdict(intfrom)
-
-# pick an initial configuration at random from previous interface.
-# First pick random number between 0 and total weight.
-r = shotdict['nsuccesseff']*np.random.rand()
-wcounter = 0.0
-for (num, w) in zip(shotdict['successnumbers'],
-                    shotdict['successweights']):
-    wcounter = wcounter + w
-    if (r <= wcounter):
-        initnum = num
-        break
-initfile = 'pos{0}_{1}.xyz'.format(intfrom, initnum)
-
-# print some diagnostic information handy for debugging
-print ('I found {0} successful shots at the previous interface - you should'
-       'check this is correct'.format(shotdict['nsuccess']))
-print 'These are runs {0}'\
-      .format(','.join([str(i) for i in shotdict['successnumbers']]))
-print 'I have chosen the initial config {0}'.format(initfile)
-
-# set up params dictionary using the chosen file
-# i) override restartfile (means we read in positions)
-params['restartfile'] = initfile
-# ii) get box dimensions: if these are written in the XYZ file, as
-# they would be for an NPT simulation, we use the ones in the XYZ file
-# to overwrite those in the parameters dictionary.
-boxdims = getboxdims(initfile)
-if boxdims:
-    params['lboxx'] = boxdims[0]
-    params['lboxy'] = boxdims[1]
-    params['lboxz'] = boxdims[2]
-
-# take the shot (see ffsfunctions.py)
-success, weight, time, positions = takeshot(initfile, intfrom, params)
-
-# print out whether success/fail and time
-if success:
-    # we reached the next interface
-    sucstring = 'SUCCESS'
+if params['earlystop']:
+    stopfunc = lambda: getnumsuccess(intfrom+1) >= params['minsuccess']
 else:
-    sucstring = 'FAIL'
-    # set weight in case we survived pruning attempts and still failed
-    weight = 0
-    
-print 'Shot number {0} finished in time {1} with status {2}'\
-      .format(myjobnm, time, sucstring)
-
-# if I was successful, I need to save my config
-if success:
-    # get the desired writexyz function.
-    writexyzfunc = funcselector.FuncSelector(params).WriteXyzFunc()
-    writexyzfunc('pos{0}_{1}.xyz'.format(intfrom + 1, myjobnm),
-                 positions, params)
+    stopfunc = None
 
-# finally (whether success or fail), write the to shotsi_j.out.  These
-# files are read by 'finish.py'. Here i is the interface we are trying
-# to reach, and j is the shot number.  We write 3 numbers on single
-# line: initialconfignumber timetaken success
-fname = 'shots{0}_{1}.out'.format(intfrom + 1, myjobnm)
-fout = open(fname, 'w')
-fout.write('from time success weight\n{0} {1} {2:d} {3:.6f}\n'\
-           .format(initnum, time, success, weight))
-fout.close()
+# take the shot, writing shots{intfrom+1}_{myjobnm}.out and, if
+# successful, pos{intfrom+1}_{myjobnm}.xyz (see ffsfunctions.py)
+runshot(intfrom, myjobnm, params, stopfunc)
@@ -0,0 +1,130 @@
+import unittest
+import numpy as np
+
+import energy
+import mcfuncs
+import pottable
+
+class TestEnergy(unittest.TestCase):
+    """Test the cell list energy functions against the direct sums."""
+
+    def setUp(self):
+        # slab of particles in a box that is too thin for 3 cells in x
+        # and y, and tall in z
+        np.random.seed(7)
+        npar = 200
+        self.positions = np.random.uniform([0.0, 0.0, 0.0],
+                                           [6.0, 6.0, 10.0], (npar, 3))
+        self.params = {'rcut': 2.5, 'rcsq': 6.25, 'lboxx': 6.0,
+                       'lboxy': 6.0, 'lboxz': 30.0, 'vrc': 0.01,
+                       'vrc2': 0.005, 'nparsurf': 20, 'r6mult': 0.5,
+                       'r12mult': 0.5, 'potexponent': 12}
+
+    def compare(self, totalenlist, totalenergy):
+        for zperiodic in [False, True]:
+            self.params['zperiodic'] = zperiodic
+            self.assertAlmostEqual(
+                totalenlist(self.positions, self.params) /
+                totalenergy(self.positions, self.params), 1.0,
+                places=10)
+
+    def test_len(self):
+        self.compare(energy.len_totalenlist, energy.len_totalenergy)
+
+    def test_gauss(self):
+        self.compare(energy.gauss_totalenlist, energy.gauss_totalenergy)
+
+    def test_ipl(self):
+        self.compare(energy.ipl_totalenlist, energy.ipl_totalenergy)
+
+    def test_cellsub(self):
+        # cells smaller than rc; in x and y there are fewer cells than
+        # the stencil spans
+        for cellsub in [2, 3]:
+            energy.setcellsub(cellsub)
+            self.compare(energy.len_totalenlist, energy.len_totalenergy)
+        energy.setcellsub(1)
+
+    def scaledenergy(self, positions, lbox, scale, totalscaled, potargs):
+        """
+        Energy of positions (in the box lbox) scaled by scale, from the
+        cell list of the unscaled positions, as in the NPT MC codes: if
+        the cells are too small in the new box, a list with the number
+        of cells for the new box is used.  Also return whether this
+        was needed.
+        """
+
+        p = self.params
+        lnew = lbox * scale
+        ncel = np.array(mcfuncs.getnumcells(lbox[0], lbox[1], lbox[2],
+                                            p['rcut']))
+        rn = lbox / ncel
+        cellsub = mcfuncs.cellstencil.cellsub
+        newlist = not np.all((ncel == 1) |
+                             (cellsub * rn * scale >= p['rcut']))
+        if newlist:
+            ncel = mcfuncs.getnumcells(lnew[0], lnew[1], lnew[2],
+                                       p['rcut'])
+        ll, hoc, rnx, rny, rnz = mcfuncs.new_nlist(
+            positions[:,0], positions[:,1], positions[:,2], p['rcut'],
+            lbox[0], lbox[1], lbox[2], *ncel)
+        etot = totalscaled(ll, hoc, rnx, rny, rnz, positions[:,0],
+                           positions[:,1], positions[:,2], scale[0],
+                           scale[1], scale[2], p['rcut'], p['rcsq'],
+                           lnew[0], lnew[1], lnew[2], *potargs)
+        return np.atleast_1d(etot)[0], newlist
+
+    def test_scaled(self):
+        # energy of a trial volume from scaled positions, compared with
+        # the energy of the rescaled positions, for a box that grows,
+        # shrinks, and shrinks to fewer cells (the box is just over 4
+        # cells wide)
+        ncell = 6
+        a = 10.005 / ncell
+        basis = np.array([[0.0, 0.0, 0.0], [0.5, 0.5, 0.0],
+                          [0.5, 0.0, 0.5], [0.0, 0.5, 0.5]])
+        cells = np.array([[i, j, k] for i in range(ncell)
+                          for j in range(ncell) for k in range(ncell)])
+        np.random.seed(9)
+        positions = (((cells[:, np.newaxis, :] + basis)
+                      .reshape(-1, 3) + 0.25) * a +
+                     np.random.uniform(-0.1, 0.1, (4 * ncell**3, 3)))
+        lbox = np.array([ncell * a] * 3)
+        p = self.params
+        p.update({'potential': 'len', 'vrc': 2.5**-12 - 2.5**-6,
+                  'vrc2': 0.5 * (2.5**-12 - 2.5**-6), 'nparsurf': 32})
+        # scale factors, zperiodic, and whether the cells are too
+        # small after scaling
+        trials = [(np.array([1.02] * 3), True, False),
+                  (np.array([0.9998] * 3), True, False),
+                  (np.array([0.99] * 3), True, True),
+                  (np.array([1.0, 1.0, 0.99]), False, True)]
+        table = pottable.PotTable(p, 4000)
+        for cellsub in [1, 2]:
+            energy.setcellsub(cellsub)
+            for scale, zperiodic, newlist in trials:
+                p['zperiodic'] = zperiodic
+                p['lboxx'], p['lboxy'], p['lboxz'] = lbox * scale
+                for totalscaled, totalenlist, potargs in [
+                    (mcfuncs.len_totalenlistscaled,
+                     energy.len_totalenlist,
+                     (p['vrc'], p['vrc2'], p['nparsurf'], zperiodic,
+                      p['r6mult'], p['r12mult'])),
+                    (mcfuncs.tab_totalenlistscaled,
+                     energy.tab_totalenlist,
+                     (p['nparsurf'], zperiodic))]:
+                    etrial, usednew = self.scaledenergy(positions, lbox,
+                                                        scale,
+                                                        totalscaled,
+                                                        potargs)
+                    self.assertEqual(usednew, newlist)
+                    self.assertAlmostEqual(
+                        etrial / totalenlist(positions * scale, p), 1.0,
+                        places=10)
+        energy.setcellsub(1)
+        table.free()
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestEnergy)
+    unittest.TextTestRunner(verbosity=2).run(suite)
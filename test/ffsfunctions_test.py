@@ -0,0 +1,78 @@
+import unittest
+import os
+import pickle
+import shutil
+import tempfile
+
+import ffsfunctions
+
+class TestFinishInterface(unittest.TestCase):
+    """Test gathering the shot files of an FFS interface."""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        os.chdir(self.tmpdir)
+        # shot number: (from time success weight aborted), shot 4 has
+        # an old style shot file without the aborted column
+        self.shots = {1: (3, 200, 1, 1.0, 0), 2: (1, 50, 0, 0.0, 0),
+                      3: (2, 400, 1, 2.0, 0), 4: (1, 70, 0, 0.0, None),
+                      5: (2, 30, 0, 0.0, 1), 6: (3, 10, 0, 0.0, 1)}
+        for snum, (f, t, s, w, a) in self.shots.items():
+            fout = open('shots1_{0}.out'.format(snum), 'w')
+            if a is None:
+                fout.write('from time success weight\n'
+                           '{0} {1} {2:d} {3:.6f}\n'.format(f, t, s, w))
+            else:
+                fout.write('from time success weight aborted\n'
+                           '{0} {1} {2:d} {3:.6f} {4:d}\n'
+                           .format(f, t, s, w, a))
+            fout.close()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmpdir)
+
+    def test_aborted_shots(self):
+        # aborted shots are left out of the statistics, and their
+        # number is recorded in the interface files
+        shotdict = ffsfunctions.finishinterface(0)
+        self.assertEqual(shotdict['nshots'], 4)
+        self.assertEqual(shotdict['nsuccess'], 2)
+        self.assertEqual(shotdict['naborted'], 2)
+        self.assertAlmostEqual(shotdict['nsuccesseff'], 3.0)
+        self.assertAlmostEqual(shotdict['nshotseff'], 5.0)
+        self.assertEqual(list(shotdict['successnumbers']), [1, 3])
+        self.assertEqual(list(shotdict['successweights']), [1.0, 2.0])
+
+        lines = open('interface1.out').readlines()
+        summary = lines[2].split()
+        self.assertEqual(int(summary[0]), 4)
+        self.assertEqual(int(summary[1]), 2)
+        self.assertAlmostEqual(float(summary[2]), 0.5)
+        self.assertEqual(lines[3], 'aborted shots not counted: 2\n')
+        breakdown = lines[lines.index('DETAILED BREAKDOWN\n') + 2:]
+        self.assertEqual([int(l.split()[0]) for l in breakdown],
+                         [1, 2, 3, 4])
+
+        pshotdict = pickle.load(open('interface1.pkl', 'rb'))
+        self.assertEqual(pshotdict['nshots'], 4)
+        self.assertEqual(pshotdict['naborted'], 2)
+        # the shot files are deleted
+        self.assertFalse([f for f in os.listdir('.')
+                          if f.startswith('shots1_')])
+
+    def test_no_aborted_shots(self):
+        for snum in [5, 6]:
+            os.remove('shots1_{0}.out'.format(snum))
+        shotdict = ffsfunctions.finishinterface(0, delete=False)
+        self.assertEqual(shotdict['nshots'], 4)
+        self.assertEqual(shotdict['naborted'], 0)
+        lines = open('interface1.out').readlines()
+        self.assertEqual(lines[3], '----------\n')
+        self.assertTrue(os.path.exists('shots1_1.out'))
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestFinishInterface)
+    unittest.TextTestRunner(verbosity=2).run(suite)
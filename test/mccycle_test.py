@@ -0,0 +1,387 @@
+import unittest
+import os
+import subprocess
+import sys
+import numpy as np
+
+import energy
+import force
+import mccycle
+import mcfuncs
+import pottable
+
+# run the checkerboard NVT MC before any other Fortran code, and print
+# the energy change it returns and the actual energy change
+_NVTPARFIRST = """
+import sys
+sys.path.insert(0, {0!r})
+import mccycle_test, energy, mccycle
+test = mccycle_test.TestMCCycle('test_nvtpar_first')
+test.setUp()
+positions, de = mccycle.len_cyclenvtpar(test.positions.copy(), test.params,
+                                        0.0)
+print repr(de), repr(energy.len_totalenlist(positions, test.params) -
+                     energy.len_totalenlist(test.positions, test.params))
+"""
+
+def cellcontents(ll, hoc):
+    """Return the set of particles (from 1) in each cell of a cell list."""
+
+    contents = []
+    for head in hoc.flatten():
+        cell = set()
+        while head != 0:
+            cell.add(head)
+            head = ll[head - 1]
+        contents.append(cell)
+    return contents
+
+class TestMCCycle(unittest.TestCase):
+    """Test the parallel (checkerboard), event-chain and hybrid MC functions."""
+
+    def setUp(self):
+        # fcc crystal of Lennard-Jones particles, 8x8x8 unit cells
+        # (large enough for 4 cells of side rcut in each dimension)
+        ncell = 8
+        a = (4.0 / 0.9)**(1.0 / 3.0)
+        basis = np.array([[0.0, 0.0, 0.0], [0.5, 0.5, 0.0],
+                          [0.5, 0.0, 0.5], [0.0, 0.5, 0.5]])
+        cells = np.array([[i, j, k] for i in range(ncell)
+                          for j in range(ncell) for k in range(ncell)])
+        self.positions = (((cells[:, np.newaxis, :] + basis)
+                           .reshape(-1, 3) + 0.05) * a)
+        lbox = ncell * a
+        self.params = {'cycle': 5, 'nsamp': 100, 'rcut': 2.5,
+                       'rcsq': 6.25, 'vrc': 0.0, 'vrc2': 0.0,
+                       'lboxx': lbox, 'lboxy': lbox, 'lboxz': lbox,
+                       'Tstar': 1.0, 'maxdisp': 0.2, 'maxvol': 0.01,
+                       'pressure': 1.0, 'nparsurf': 0,
+                       'zperiodic': True, 'r6mult': 1.0,
+                       'r12mult': 1.0, 'sameseed': False,
+                       'mcthreads': 3}
+
+    def test_nvtpar_energy(self):
+        # the energy returned is the energy of the final positions
+        etot = energy.len_totalenlist(self.positions, self.params)
+        positions, etot = mccycle.len_cyclenvtpar(self.positions,
+                                                  self.params, etot)
+        self.assertAlmostEqual(etot,
+                               energy.len_totalenlist(positions,
+                                                      self.params))
+
+    def test_nptpar_energy(self):
+        etot = energy.len_totalenlist(self.positions, self.params)
+        positions, etot = mccycle.len_cyclenptpar(self.positions,
+                                                  self.params, etot)
+        self.assertAlmostEqual(etot,
+                               energy.len_totalenlist(positions,
+                                                      self.params))
+        for i, dim in enumerate(['lboxx', 'lboxy', 'lboxz']):
+            self.assertTrue(np.all(positions[:,i] <= self.params[dim]))
+
+    def test_npt_energy(self):
+        # the energy returned is the energy of the final positions in
+        # the final box, with and without the screening of the volume
+        # moves (only used if z is periodic)
+        self.params.update({'cycle': 10, 'potexponent': 12,
+                            'sameseed': True})
+        lbox = self.params['lboxx']
+        for nparsurf, zperiodic in [(0, True), (64, False)]:
+            for cyclefunc, totalenlist, vrc in [
+                (mccycle.len_cyclenpt, energy.len_totalenlist,
+                 2.5**-12 - 2.5**-6),
+                (mccycle.ipl_cyclenpt, energy.ipl_totalenlist,
+                 2.5**-12)]:
+                self.params.update({'nparsurf': nparsurf,
+                                    'zperiodic': zperiodic, 'vrc': vrc,
+                                    'vrc2': vrc, 'lboxx': lbox,
+                                    'lboxy': lbox, 'lboxz': lbox})
+                etot = totalenlist(self.positions, self.params)
+                positions, etot = cyclefunc(self.positions.copy(),
+                                            self.params, etot)
+                self.assertNotEqual(self.params['lboxz'], lbox)
+                if not zperiodic:
+                    self.assertEqual(self.params['lboxx'], lbox)
+                self.assertAlmostEqual(etot / totalenlist(positions,
+                                                          self.params),
+                                       1.0, places=10)
+                for i, dim in enumerate(['lboxx', 'lboxy', 'lboxz']):
+                    self.assertTrue(np.all(positions[:,i] >= 0.0))
+                    self.assertTrue(np.all(positions[:,i] <=
+                                           self.params[dim]))
+
+    def test_npt_fewercells(self):
+        # a box just over 4 cells wide under high pressure: the trial
+        # volumes that shrink it to fewer cells need a new cell list
+        ncell = 6
+        a = 10.005 / ncell
+        basis = np.array([[0.0, 0.0, 0.0], [0.5, 0.5, 0.0],
+                          [0.5, 0.0, 0.5], [0.0, 0.5, 0.5]])
+        cells = np.array([[i, j, k] for i in range(ncell)
+                          for j in range(ncell) for k in range(ncell)])
+        positions = ((cells[:, np.newaxis, :] + basis)
+                     .reshape(-1, 3) + 0.25) * a
+        self.params.update({'cycle': 5, 'pressure': 20.0, 'maxvol': 0.05,
+                            'potexponent': 12, 'sameseed': True})
+        for potential, cyclefunc, totalenlist, vrc in [
+            ('len', mccycle.len_cyclenpt, energy.len_totalenlist,
+             2.5**-12 - 2.5**-6),
+            ('ipl', mccycle.ipl_cyclenpt, energy.ipl_totalenlist,
+             2.5**-12),
+            ('gauss', mccycle.gauss_cyclenpt, energy.gauss_totalenlist,
+             np.exp(-6.25)),
+            ('len', mccycle.tab_cyclenpt, energy.tab_totalenlist,
+             2.5**-12 - 2.5**-6)]:
+            self.params.update({'potential': potential, 'vrc': vrc,
+                                'vrc2': vrc, 'lboxx': ncell * a,
+                                'lboxy': ncell * a, 'lboxz': ncell * a})
+            if cyclefunc == mccycle.tab_cyclenpt:
+                table = pottable.PotTable(self.params, 4000)
+            etot = totalenlist(positions, self.params)
+            newpos, etot = cyclefunc(positions.copy(), self.params, etot)
+            etrue = totalenlist(newpos, self.params)
+            if cyclefunc == mccycle.tab_cyclenpt:
+                table.free()
+            if potential != 'gauss':
+                self.assertTrue(self.params['lboxx'] < 4 * self.params['rcut'])
+            self.assertAlmostEqual(etot / etrue, 1.0, places=10)
+
+    def test_npt_sums(self):
+        # the sums of the r^-n terms used to screen the NPT volume
+        # moves are kept up to date with the *_enlistsums sums of each
+        # displaced particle; after many moves they are still the sums
+        # for the positions
+        p = self.params
+        p.update({'nparsurf': 64, 'r6mult': 0.5, 'r12mult': 0.7})
+        lbox = np.array([p['lboxx'], p['lboxy'], p['lboxz']])
+        for enlistsums, totalscaled, potargs in [
+            (mcfuncs.len_enlistsums, mcfuncs.len_totalenlistscaled,
+             (p['r6mult'], p['r12mult'])),
+            (mcfuncs.ipl_enlistsums, mcfuncs.ipl_totalenlistscaled,
+             (12,))]:
+            x, y, z = [self.positions[:,k].copy() for k in range(3)]
+            args = (p['rcut'], p['rcsq'], p['lboxx'], p['lboxy'],
+                    p['lboxz'], 0.01, 0.005, p['nparsurf'], True) + potargs
+            ncel = mcfuncs.getnumcells(p['lboxx'], p['lboxy'],
+                                       p['lboxz'], p['rcut'])
+            ll, hoc, rnx, rny, rnz = mcfuncs.new_nlist(
+                x, y, z, p['rcut'], p['lboxx'], p['lboxy'], p['lboxz'],
+                *ncel)
+            lp = mcfuncs.nlist_prev(ll, hoc)
+            sums = np.array(totalscaled(ll, hoc, rnx, rny, rnz, x, y, z,
+                                        1.0, 1.0, 1.0, *args))
+            rs = np.random.RandomState(4)
+            for n in range(500):
+                i = rs.randint(64, len(x))
+                old = (x[i], y[i], z[i])
+                new = (old + rs.uniform(-0.3, 0.3, 3)) % lbox
+                sums -= enlistsums(ll, hoc, i + 1, x[i], y[i], z[i], x, y,
+                                   z, *args)
+                sums += enlistsums(ll, hoc, i + 1, new[0], new[1], new[2],
+                                   x, y, z, *args)
+                ll, lp, hoc = mcfuncs.update_nlist(i + 1, x[i], y[i], z[i],
+                                                   new[0], new[1], new[2],
+                                                   rnx, rny, rnz, ll, lp,
+                                                   hoc)
+                x[i], y[i], z[i] = new
+            ll, hoc, rnx, rny, rnz = mcfuncs.new_nlist(
+                x, y, z, p['rcut'], p['lboxx'], p['lboxy'], p['lboxz'],
+                *ncel)
+            exact = totalscaled(ll, hoc, rnx, rny, rnz, x, y, z, 1.0, 1.0,
+                                1.0, *args)
+            for s, e in zip(sums, exact):
+                self.assertAlmostEqual(s / e, 1.0, places=10)
+
+    def test_update_nlist(self):
+        # after many single particle moves, the cell list kept up to
+        # date by update_nlist has the same cells as a new one, and lp
+        # is still the inverse of ll
+        p = self.params
+        lbox = np.array([p['lboxx'], p['lboxy'], p['lboxz']])
+        ncel = mcfuncs.getnumcells(p['lboxx'], p['lboxy'], p['lboxz'],
+                                   p['rcut'])
+        x, y, z = [self.positions[:,k].copy() for k in range(3)]
+        ll, hoc, rnx, rny, rnz = mcfuncs.new_nlist(
+            x, y, z, p['rcut'], p['lboxx'], p['lboxy'], p['lboxz'], *ncel)
+        lp = mcfuncs.nlist_prev(ll, hoc)
+        rs = np.random.RandomState(7)
+        for n in range(2000):
+            i = rs.randint(len(x))
+            new = (np.array([x[i], y[i], z[i]])
+                   + rs.uniform(-1.0, 1.0, 3)) % lbox
+            ll, lp, hoc = mcfuncs.update_nlist(i + 1, x[i], y[i], z[i],
+                                               new[0], new[1], new[2],
+                                               rnx, rny, rnz, ll, lp, hoc)
+            x[i], y[i], z[i] = new
+        llnew, hocnew = mcfuncs.new_nlist(x, y, z, p['rcut'], p['lboxx'],
+                                          p['lboxy'], p['lboxz'], *ncel)[:2]
+        self.assertEqual(cellcontents(ll, hoc), cellcontents(llnew, hocnew))
+        self.assertTrue(np.all(lp == mcfuncs.nlist_prev(ll, hoc)))
+
+    def test_simstate_reuse(self):
+        # the cell list kept between calls is reused for the array
+        # returned by the previous call, and rebuilt for any other
+        # array (e.g. positions reverted after an umbrella rejection)
+        state = mccycle.SimState(True)
+        try:
+            etot = energy.len_totalenlist(self.positions, self.params)
+            state.begin(self.positions)
+            positions, etot = mccycle.len_cyclenvt(self.positions.copy(),
+                                                   self.params, etot)
+            state.end(positions)
+            llold = mcfuncs.simstate.ll.copy()
+            p = self.params
+            ncel = mcfuncs.getnumcells(p['lboxx'], p['lboxy'], p['lboxz'],
+                                       p['rcut'])
+            llnew = mcfuncs.new_nlist(positions[:,0], positions[:,1],
+                                      positions[:,2], p['rcut'], p['lboxx'],
+                                      p['lboxy'], p['lboxz'], *ncel)[0]
+            # the moves have reordered the list
+            self.assertFalse(np.all(llold == llnew))
+
+            # no moves, so the list is only changed if it is rebuilt
+            self.params['cycle'] = 0
+            state.begin(positions)
+            self.assertTrue(mcfuncs.simstate.listvalid)
+            positions, etot = mccycle.len_cyclenvt(positions, self.params,
+                                                   etot)
+            state.end(positions)
+            self.assertTrue(np.all(mcfuncs.simstate.ll == llold))
+
+            reverted = positions.copy()
+            state.begin(reverted)
+            self.assertFalse(mcfuncs.simstate.listvalid)
+            positions, etot = mccycle.len_cyclenvt(reverted, self.params,
+                                                   etot)
+            state.end(positions)
+            self.assertTrue(np.all(mcfuncs.simstate.ll == llnew))
+            self.assertAlmostEqual(etot,
+                                   energy.len_totalenlist(positions,
+                                                          self.params))
+        finally:
+            state.free()
+
+    def test_nvtpar_first(self):
+        # the checkerboard code sets up its own cell stencil, so it
+        # also works as the first Fortran code called in a process
+        out = subprocess.check_output(
+            [sys.executable, '-c',
+             _NVTPARFIRST.format(os.path.dirname(os.path.abspath(__file__)))])
+        de, detrue = [float(x) for x in out.split()[-2:]]
+        self.assertNotEqual(detrue, 0.0)
+        self.assertAlmostEqual(de, detrue)
+
+    def test_par_cellsub(self):
+        # the stencil of the serial code is kept
+        energy.setcellsub(2)
+        etot = energy.len_totalenlist(self.positions, self.params)
+        positions, etot = mccycle.len_cyclenptpar(self.positions,
+                                                  self.params, etot)
+        self.assertEqual(mcfuncs.cellstencil.cellsub, 2)
+        self.assertAlmostEqual(etot,
+                               energy.len_totalenlist(positions,
+                                                      self.params))
+        energy.setcellsub(1)
+
+    def test_ecmc_energy(self):
+        # the energy returned is the energy of the final positions,
+        # also with surface particles and hard walls in z, where the
+        # chains are reversed
+        self.params.update({'cycle': 2, 'potexponent': 12,
+                            'ecmclength': 1.0, 'vrc': 2.5**-12,
+                            'vrc2': 0.5 * 2.5**-12})
+        for nparsurf, zperiodic in [(0, True), (64, False)]:
+            self.params['nparsurf'] = nparsurf
+            self.params['zperiodic'] = zperiodic
+            for cyclefunc, totalenlist in [(mccycle.ipl_cycleecmc,
+                                            energy.ipl_totalenlist),
+                                           (mccycle.gauss_cycleecmc,
+                                            energy.gauss_totalenlist)]:
+                etot = totalenlist(self.positions, self.params)
+                positions, etot = cyclefunc(self.positions.copy(),
+                                            self.params, etot)
+                self.assertAlmostEqual(etot, totalenlist(positions,
+                                                         self.params))
+                self.assertTrue(np.all(positions[:nparsurf] ==
+                                       self.positions[:nparsurf]))
+                self.assertTrue(np.all(positions[:,2] > 0.0))
+                self.assertTrue(np.all(positions[:,2] <
+                                       self.params['lboxz']))
+
+    def test_forces(self):
+        # the forces are minus the derivatives of the energy (the
+        # energy is continuous at the cutoff with these shifts)
+        self.params.update({'nparsurf': 64, 'potexponent': 12,
+                            'r6mult': 0.5, 'r12mult': 0.5})
+        positions = self.positions + np.random.RandomState(5).uniform(
+            -0.1, 0.1, self.positions.shape)
+        h = 1.0e-6
+        vlen = 2.5**-12 - 2.5**-6
+        for forceslist, totalenlist, vrc, vrc2 in [
+            (force.len_forceslist, energy.len_totalenlist, vlen,
+             0.5 * vlen),
+            (force.ipl_forceslist, energy.ipl_totalenlist, 2.5**-12,
+             2.5**-12),
+            (force.gauss_forceslist, energy.gauss_totalenlist,
+             np.exp(-6.25), np.exp(-6.25))]:
+            self.params['vrc'] = vrc
+            self.params['vrc2'] = vrc2
+            forces = forceslist(positions, self.params)
+            for i in [0, 100, 1000]:
+                for k in range(3):
+                    pplus = positions.copy()
+                    pplus[i, k] += h
+                    pminus = positions.copy()
+                    pminus[i, k] -= h
+                    deriv = (totalenlist(pplus, self.params) -
+                             totalenlist(pminus, self.params)) / (2 * h)
+                    self.assertAlmostEqual(forces[i, k], -deriv, places=4)
+
+    def test_hmc_energy(self):
+        # the energy returned is the energy of the final positions, and
+        # the surface particles do not move
+        self.params.update({'cycle': 3, 'potexponent': 12, 'dt': 0.002,
+                            'mass': 1.0, 'hmcsteps': 5})
+        for nparsurf, zperiodic in [(0, True), (64, False)]:
+            self.params['nparsurf'] = nparsurf
+            self.params['zperiodic'] = zperiodic
+            for cyclefunc, totalenlist in [(mccycle.len_cyclehmc,
+                                            energy.len_totalenlist),
+                                           (mccycle.ipl_cyclehmc,
+                                            energy.ipl_totalenlist),
+                                           (mccycle.gauss_cyclehmc,
+                                            energy.gauss_totalenlist)]:
+                etot = totalenlist(self.positions, self.params)
+                positions, etot = cyclefunc(self.positions.copy(),
+                                            self.params, etot)
+                self.assertAlmostEqual(etot, totalenlist(positions,
+                                                         self.params))
+                self.assertTrue(np.all(positions[:nparsurf] ==
+                                       self.positions[:nparsurf]))
+
+    def test_cellorder(self):
+        # the particles in each cell are contiguous in cell order, and
+        # the positions come back in the original order
+        self.params['nparsurf'] = 32
+        np.random.seed(3)
+        order = mccycle.CellOrder(10)
+        positions = self.positions[np.random.permutation(len(self.positions))]
+        sortpos = order.begin(positions, self.params)
+        self.assertTrue(np.all(sortpos[:32] == positions[:32]))
+        ncel = int(self.params['lboxx'] / self.params['rcut'])
+        icel = (sortpos[32:] * ncel / self.params['lboxx']).astype(int)
+        icel = icel[:,0] + 100 * icel[:,1] + 10000 * icel[:,2]
+        self.assertEqual(np.count_nonzero(np.diff(icel)) + 1,
+                         len(np.unique(icel)))
+        etot = energy.len_totalenlist(sortpos, self.params)
+        sortpos, etot = mccycle.len_cyclenvt(sortpos, self.params, etot)
+        newpos = order.end(sortpos, self.params)
+        self.assertTrue(np.all(newpos[order.perm] == sortpos))
+        self.assertTrue(np.all(newpos[:32] == positions[:32]))
+        self.assertAlmostEqual(etot,
+                               energy.len_totalenlist(newpos,
+                                                      self.params))
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestMCCycle)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -23,7 +23,8 @@ class TestOrderParam(unittest.TestCase):
                        'usenearest': False,
                        'lboxx': 3.0,
                        'lboxy': 3.0,
-                       'lboxz': 3.0
+                       'lboxz': 3.0,
+                       'optol': 0.0
                        }
 
         # most of the functions in orderparam.py should return (0.0,)
@@ -63,6 +64,28 @@ class TestOrderParam(unittest.TestCase):
         q6 = orderparam.q6global_cpp(self.positions, self.params)
         self.assertEqual(q6, self.zerotuple)
 
+    def test_nclusld_state(self):
+        nld = orderparam.nclusld_state(self.positions, self.params)
+        self.assertEqual(nld, self.zerotuple)
+
+    def test_nclustf_state(self):
+        ntf = orderparam.nclustf_state(self.positions, self.params)
+        self.assertEqual(ntf, self.zerotuple)
+
+    def test_state_matches_cpp(self):
+        # move one particle between calls, so that the stored state
+        # is updated rather than built from scratch
+        positions = self.positions.copy()
+        for disp in [0.0, 0.1, 0.3]:
+            positions[1] = self.positions[1] + disp
+            self.assertEqual(orderparam.q6global_state(positions,
+                                                       self.params),
+                             orderparam.q6global_cpp(positions,
+                                                     self.params))
+            self.assertEqual(orderparam.fractf_state(positions,
+                                                     self.params),
+                             orderparam.fractf_cpp(positions, self.params))
+
 
 if __name__ == "__main__":
     suite = unittest.TestLoader().loadTestsFromTestCase(TestOrderParam)
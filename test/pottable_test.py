@@ -0,0 +1,101 @@
+import unittest
+import numpy as np
+
+import energy
+import mccycle
+import pottable
+
+class TestPotTable(unittest.TestCase):
+    """Test the tabulated pair potential against the analytic one."""
+
+    def setUp(self):
+        # fcc crystal of 6x6x6 unit cells with random displacements
+        ncell = 6
+        a = (4.0 / 0.9)**(1.0 / 3.0)
+        basis = np.array([[0.0, 0.0, 0.0], [0.5, 0.5, 0.0],
+                          [0.5, 0.0, 0.5], [0.0, 0.5, 0.5]])
+        cells = np.array([[i, j, k] for i in range(ncell)
+                          for j in range(ncell) for k in range(ncell)])
+        np.random.seed(12)
+        self.positions = (((cells[:, np.newaxis, :] + basis)
+                           .reshape(-1, 3) + 0.25) * a +
+                          np.random.uniform(-0.1, 0.1, (4 * ncell**3, 3)))
+        lbox = ncell * a
+        self.params = {'rcut': 2.5, 'rcsq': 6.25, 'lboxx': lbox,
+                       'lboxy': lbox, 'lboxz': lbox, 'nparsurf': 0,
+                       'zperiodic': True, 'r6mult': 1.0,
+                       'r12mult': 1.0, 'potexponent': 12}
+
+    def compare(self, potential, vrc, totalenlist):
+        self.params['potential'] = potential
+        self.params['vrc'] = self.params['vrc2'] = vrc
+        table = pottable.PotTable(self.params, 4000)
+        etab = energy.tab_totalenlist(self.positions, self.params)
+        table.free()
+        self.assertAlmostEqual(etab / totalenlist(self.positions,
+                                                  self.params), 1.0,
+                               places=8)
+
+    def test_len(self):
+        self.compare('len', 2.5**-12 - 2.5**-6, energy.len_totalenlist)
+
+    def test_gauss(self):
+        self.compare('gauss', np.exp(-6.25), energy.gauss_totalenlist)
+
+    def test_ipl(self):
+        self.compare('ipl', 2.5**-12, energy.ipl_totalenlist)
+
+    def test_surffield(self):
+        # two (100) layers of a fcc surface, with fluid particles
+        # above it on a square lattice
+        a = 2.0**(2.0 / 3.0)
+        ncell = 6
+        surf = np.array([[i + x, j + y, k * 0.5 + 0.25]
+                         for i in range(ncell) for j in range(ncell)
+                         for k in range(2)
+                         for x, y in [(0.25, 0.25 + 0.5 * k),
+                                      (0.75, 0.75 - 0.5 * k)]]) * a
+        np.random.seed(5)
+        fluid = np.array([[i, j, 0.0] for i in range(ncell)
+                          for j in range(ncell)]) * a
+        fluid += np.random.uniform([0.0, 0.0, 2.0], [a, a, 4.0],
+                                   fluid.shape)
+        positions = np.vstack([surf, fluid])
+        self.params.update({'potential': 'len', 'lboxx': ncell * a,
+                            'lboxy': ncell * a, 'lboxz': 8.0,
+                            'nparsurf': len(surf), 'zperiodic': False,
+                            'r6mult': 0.5, 'r12mult': 0.5})
+        self.params['vrc'] = 2.5**-12 - 2.5**-6
+        self.params['vrc2'] = 0.5 * self.params['vrc']
+        table = pottable.PotTable(self.params, 4000)
+        edirect = energy.tab_totalenlist(positions, self.params)
+        table = pottable.PotTable(self.params, 4000, surffield=0.05)
+        efield = energy.tab_totalenlist(positions, self.params)
+        table.free()
+        self.assertAlmostEqual(efield, edirect, delta=0.01)
+
+    def test_gauss_npt_seed(self):
+        # as for gauss_cyclenpt, the volume moves don't move a seed of
+        # surface particles in a periodic box
+        nseed = 32
+        self.params.update({'potential': 'gauss', 'nparsurf': nseed,
+                            'vrc': np.exp(-6.25), 'vrc2': np.exp(-6.25),
+                            'cycle': 20, 'nsamp': 100, 'Tstar': 0.01,
+                            'pressure': 1.0, 'maxdisp': 0.1,
+                            'maxvol': 0.02, 'sameseed': False})
+        lbox = self.params['lboxx']
+        table = pottable.PotTable(self.params, 4000)
+        etot = energy.tab_totalenlist(self.positions, self.params)
+        positions, etot = mccycle.tab_cyclenpt(self.positions.copy(),
+                                               self.params, etot)
+        self.assertNotEqual(self.params['lboxx'], lbox)
+        self.assertTrue(np.all(positions[:nseed] ==
+                               self.positions[:nseed]))
+        self.assertAlmostEqual(etot, energy.tab_totalenlist(positions,
+                                                            self.params))
+        table.free()
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestPotTable)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,106 @@
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             '..', 'exec'))
+
+import energy
+import mccycle
+import reumbrella
+import rng
+import writeoutput
+
+class SerialPool(object):
+    """Stands in for the worker pool, running poolwindow in this process."""
+
+    def map(self, func, args, chunksize=1):
+        return [func(a) for a in args]
+
+    def close(self):
+        pass
+
+    def join(self):
+        pass
+
+def meanx(positions, params):
+    """Order parameter for the test: mean x coordinate."""
+
+    return (np.mean(positions[:,0]),)
+
+class TestREUmbrella(unittest.TestCase):
+    """Test continuing a replica exchange umbrella sampling run."""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        os.chdir(self.tmpdir)
+
+        # fcc crystal of Lennard-Jones particles, 4x4x4 unit cells
+        ncell = 4
+        a = (4.0 / 0.9)**(1.0 / 3.0)
+        basis = np.array([[0.0, 0.0, 0.0], [0.5, 0.5, 0.0],
+                          [0.5, 0.0, 0.5], [0.0, 0.5, 0.5]])
+        cells = np.array([[i, j, k] for i in range(ncell)
+                          for j in range(ncell) for k in range(ncell)])
+        positions = (((cells[:, np.newaxis, :] + basis)
+                      .reshape(-1, 3) + 0.05) * a)
+        lbox = ncell * a
+        params = {'cycle': 1, 'nsamp': 100, 'rcut': 2.5, 'rcsq': 6.25,
+                  'vrc': 0.0, 'vrc2': 0.0, 'lboxx': lbox, 'lboxy': lbox,
+                  'lboxz': lbox, 'Tstar': 1.0, 'maxdisp': 0.1,
+                  'nparsurf': 0, 'zperiodic': True, 'r6mult': 1.0,
+                  'r12mult': 1.0, 'sameseed': False, 'rngseed': 5,
+                  'numwindows': [3], 'nunbiased': 5, 'nsave': 10,
+                  'umbexchangecycles': 2, 'numbrellacycles': 4,
+                  'umbequilcycles': 10, 'umbcyclesdone': 0,
+                  'k': [0.5]}
+        reumbrella._WORKERPARAMS = params
+        reumbrella._WORKERFUNCS = (energy.len_totalenlist,
+                                   mccycle.len_cyclenvt, meanx,
+                                   writeoutput.writexyz_noop)
+
+        # REProgram without reading an input file or starting workers
+        prog = reumbrella.REProgram.__new__(reumbrella.REProgram)
+        prog.params = params
+        prog.windowcentres = [[c] for c in [1.0, 1.5, 2.0]]
+        prog.strwcs = [str(c[0]) for c in prog.windowcentres]
+        prog.exchangesets = prog.neighbourpairs()
+        prog.pool = SerialPool()
+        prog.writexyz = writeoutput.writexyz_noop
+        prog.rand = rng.setstreams(params, 0, 0)
+        prog.positions = [positions.copy() for c in prog.windowcentres]
+        prog.lbox = [[lbox, lbox, lbox] for c in prog.windowcentres]
+        prog.ops = [meanx(positions, params) for c in prog.windowcentres]
+        self.prog = prog
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmpdir)
+
+    def cycles(self, fname):
+        return [int(line.split()[0]) for line in open(fname)]
+
+    def test_continue(self):
+        # a continued run appends to the order parameter and exchange
+        # files, with cycle counts carrying on from the first run
+        self.prog.run()
+        self.prog.params['umbcyclesdone'] = 20
+        self.prog.run()
+        for strwc in self.prog.strwcs:
+            self.assertEqual(self.cycles('opvalequil{0}.out'.format(strwc)),
+                             [0, 5, 10])
+            self.assertEqual(self.cycles('opval{0}.out'.format(strwc)),
+                             [15, 20, 25, 30, 35, 40])
+            for cycles in [10, 20, 30, 40]:
+                self.assertTrue(os.path.exists('{0}pos{1}.xyz'
+                                               .format(strwc, cycles)))
+        self.assertEqual(self.cycles('exchange.out'), [10, 20, 30, 40])
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestREUmbrella)
+    unittest.TextTestRunner(verbosity=2).run(suite)
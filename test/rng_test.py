@@ -0,0 +1,59 @@
+import unittest
+
+import rng
+import mcfuncs
+
+class TestRng(unittest.TestCase):
+    """Test the counter-based random number streams."""
+
+    def test_philox_known_answers(self):
+        # known answer tests for Philox4x32-10 from Random123
+        self.assertEqual(rng.philox((0, 0, 0, 0), (0, 0)),
+                         (0x6627e8d5, 0xe169c58d, 0xbc57ac4c, 0x9b00dbd8))
+        self.assertEqual(rng.philox((0x243f6a88, 0x85a308d3,
+                                     0x13198a2e, 0x03707344),
+                                    (0xa4093822, 0x299f31d0)),
+                         (0xd16cfe09, 0x94fdcceb, 0x5001e420, 0x24126ea1))
+
+    def test_streams_repeat(self):
+        # the same seed, stream and shot give the same numbers, a
+        # different shot different numbers
+        r1 = rng.RandomStream(42, 3, 7)
+        r2 = rng.RandomStream(42, 3, 7)
+        r3 = rng.RandomStream(42, 3, 8)
+        n1 = [r1.rand() for i in range(10)]
+        self.assertEqual(n1, [r2.rand() for i in range(10)])
+        self.assertNotEqual(n1, [r3.rand() for i in range(10)])
+        for r in n1:
+            self.assertTrue(0.0 < r < 1.0)
+
+    def test_fortran_stream(self):
+        # the Fortran code uses the numbers with sub = 0
+        mcfuncs.rng.rng_setstream(42, 3, 7, 0)
+        fnums = [mcfuncs.rng.rng_uniform() for i in range(300)]
+        mcfuncs.rng.rng_unsetstream()
+        stream = rng.RandomStream(42, 3, 7, 0)
+        self.assertEqual(fnums, [stream.rand() for i in range(300)])
+
+    def test_window_streams(self):
+        # every umbrella window has its own Fortran and Python streams,
+        # which differ from the stream of direct simulation
+        fnums = []
+        pynums = []
+        for window in [0, 1]:
+            params = {'rngseed': 42, 'umb_window': window}
+            rand = rng.setwindowstreams(params)
+            fnums.append([mcfuncs.rng.rng_uniform() for i in range(10)])
+            pynums.append([rand() for i in range(10)])
+        rng.setstreams({'rngseed': 42}, rng.DIRECTSTREAM, 0)
+        fnums.append([mcfuncs.rng.rng_uniform() for i in range(10)])
+        mcfuncs.rng.rng_unsetstream()
+        self.assertNotEqual(fnums[0], fnums[1])
+        self.assertNotEqual(pynums[0], pynums[1])
+        self.assertNotEqual(fnums[0], fnums[2])
+        self.assertNotEqual(fnums[1], fnums[2])
+
+
+if __name__ == "__main__":
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestRng)
+    unittest.TextTestRunner(verbosity=2).run(suite)